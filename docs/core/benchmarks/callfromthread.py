@@ -0,0 +1,117 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Measure the throughput of calls made into the reactor thread with
+C{callFromThread} and C{callFromThreadMany}.
+
+Usage: callfromthread.py [calls [threads [batch]]]
+
+Each of C{threads} threads schedules C{calls} calls, and the reactor counts
+them until all have run.  This is repeated with the waker writing on every
+call (the previous behaviour), with coalesced wake-ups on a pipe waker, with
+coalesced wake-ups on an eventfd waker if available, and with calls passed in
+batches of C{batch} to C{callFromThreadMany}.  The number of calls run per
+second and the number of times the waker was written to are reported.
+"""
+
+from __future__ import division, print_function
+
+import sys
+import threading
+import time
+
+from twisted.internet import epollreactor, posixbase
+
+
+
+def counted(wakerFactory):
+    """
+    Make a subclass of C{wakerFactory} counting calls to C{wakeUp}.
+    """
+    class CountingWaker(wakerFactory):
+        wakeUps = 0
+
+        def wakeUp(self):
+            self.wakeUps += 1
+            wakerFactory.wakeUp(self)
+
+    return CountingWaker
+
+
+
+def makeReactor(wakerFactory, coalesce):
+    """
+    Create an L{epollreactor.EPollReactor} using C{wakerFactory}, which
+    coalesces wake-ups if C{coalesce} is true.
+    """
+    class BenchmarkReactor(epollreactor.EPollReactor):
+        _wakerFactory = counted(wakerFactory)
+
+        if not coalesce:
+            def _wakeUpForThreadCalls(self):
+                self.wakeUp()
+
+    return BenchmarkReactor()
+
+
+
+def run(reactor, calls, threads, batch):
+    """
+    Run C{calls} calls from each of C{threads} threads in C{reactor}, and
+    return the elapsed time.
+    """
+    remaining = [calls * threads]
+
+    def call():
+        remaining[0] -= 1
+        if not remaining[0]:
+            reactor.stop()
+
+    def produce():
+        if batch:
+            many = [(call, (), {})] * batch
+            for i in range(calls // batch):
+                reactor.callFromThreadMany(many)
+        else:
+            for i in range(calls):
+                reactor.callFromThread(call)
+
+    workers = [threading.Thread(target=produce) for i in range(threads)]
+    started = []
+    def start():
+        started.append(time.time())
+        for worker in workers:
+            worker.start()
+    reactor.callWhenRunning(start)
+    reactor.run(installSignalHandlers=False)
+    elapsed = time.time() - started[0]
+    for worker in workers:
+        worker.join()
+    return elapsed
+
+
+
+def main(calls=100000, threads=4, batch=100):
+    calls = calls - calls % batch
+    modes = [
+        ("pipe, waking every call", posixbase._UnixWaker, False, 0),
+        ("pipe, coalesced", posixbase._UnixWaker, True, 0),
+        ]
+    if posixbase.eventfd is not None:
+        modes.append(
+            ("eventfd, coalesced", posixbase._EventFDWaker, True, 0))
+    modes.append(
+        ("callFromThreadMany(%d)" % (batch,), posixbase._Waker, True, batch))
+
+    print("%d calls from each of %d threads" % (calls, threads))
+    for name, wakerFactory, coalesce, batchSize in modes:
+        reactor = makeReactor(wakerFactory, coalesce)
+        elapsed = run(reactor, calls, threads, batchSize)
+        print("%-28s %10.0f calls/s %8d wake-ups" % (
+                name, calls * threads / elapsed, reactor.waker.wakeUps))
+
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,158 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Microbenchmarks for the hot paths of L{twisted.internet.defer}.
+
+Usage: deferredcore.py [repeat]
+
+Each benchmark is run C{repeat} times (default 5) and the best time is
+reported, along with the number of operations per second that time
+corresponds to.  The benchmarks cover:
+
+  - creating fired Deferreds with L{defer.succeed} and adding one callback,
+    the most common use of a Deferred;
+  - firing a Deferred through a long chain of callbacks, errbacks and
+    callback/errback pairs;
+  - L{defer.gatherResults} over 100000 already fired Deferreds, and
+    L{defer.gatherBounded} over 100000 calls;
+  - an L{defer.inlineCallbacks} generator yielding 100000 already fired
+    Deferreds, and one yielding Deferreds which are fired later.
+"""
+
+from __future__ import division, print_function
+
+import sys
+import time
+
+from twisted.internet import defer
+
+
+
+benchmarks = []
+
+def benchmark(operations):
+    """
+    Register a benchmark function which performs C{operations} operations.
+    """
+    def decorator(f):
+        benchmarks.append((f, operations))
+        return f
+    return decorator
+
+
+
+def identity(result):
+    return result
+
+
+
+@benchmark(100000)
+def succeedAddCallback():
+    """
+    Create fired Deferreds and add a single callback to each.
+    """
+    succeed = defer.succeed
+    for i in range(100000):
+        succeed(i).addCallback(identity)
+
+
+
+@benchmark(100000)
+def callbackBeforeResult():
+    """
+    Add a single callback to unfired Deferreds, then fire them.
+    """
+    Deferred = defer.Deferred
+    for i in range(100000):
+        d = Deferred()
+        d.addCallback(identity)
+        d.callback(i)
+
+
+
+@benchmark(100000)
+def callbackChain():
+    """
+    Fire a Deferred through a chain of 100000 callbacks of all kinds.
+    """
+    d = defer.Deferred()
+    for i in range(25000):
+        d.addCallback(identity)
+        d.addErrback(identity)
+        d.addBoth(identity)
+        d.addCallbacks(identity, identity)
+    d.callback(None)
+
+
+
+@benchmark(100000)
+def gatherResults():
+    """
+    Gather the results of 100000 fired Deferreds.
+    """
+    succeed = defer.succeed
+    defer.gatherResults([succeed(i) for i in range(100000)])
+
+
+
+@benchmark(100000)
+def gatherBounded():
+    """
+    Gather the results of 100000 calls returning fired Deferreds, running at
+    most 100 at a time.
+    """
+    succeed = defer.succeed
+    defer.gatherBounded((lambda: succeed(i) for i in range(100000)), 100)
+
+
+
+@benchmark(100000)
+def inlineCallbacksFired():
+    """
+    Run an inlineCallbacks generator which yields 100000 fired Deferreds.
+    """
+    succeed = defer.succeed
+    @defer.inlineCallbacks
+    def loop():
+        for i in range(100000):
+            yield succeed(i)
+    loop()
+
+
+
+@benchmark(100000)
+def inlineCallbacksUnfired():
+    """
+    Run an inlineCallbacks generator which yields 100000 Deferreds which are
+    fired after the generator has started waiting on them.
+    """
+    pending = []
+    @defer.inlineCallbacks
+    def loop():
+        for i in range(100000):
+            d = defer.Deferred()
+            pending.append(d)
+            yield d
+    loop()
+    while pending:
+        pending.pop().callback(None)
+
+
+
+def main(repeat=5):
+    for f, operations in benchmarks:
+        best = None
+        for i in range(repeat):
+            before = time.time()
+            f()
+            elapsed = time.time() - before
+            if best is None or elapsed < best:
+                best = elapsed
+        print("%-24s %8.4f s %12.0f ops/s" % (
+            f.__name__, best, operations / best))
+
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
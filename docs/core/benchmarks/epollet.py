@@ -0,0 +1,186 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Compare the level-triggered and edge-triggered modes of
+L{twisted.internet.epollreactor.EPollReactor} serving HTTP/1.1 keep-alive
+requests.
+
+Usage: epollet.py [seconds [connections]]
+
+Each mode is run in a separate process so that the reactor is fresh.  The
+client is another process which keeps one request outstanding on each
+connection.  The CPU time used by the server and the number of
+C{epoll_ctl(2)} and C{epoll_wait(2)} calls it made are reported per request.
+"""
+
+from __future__ import division, print_function
+
+import select
+import socket
+import os
+import subprocess
+import sys
+import time
+
+
+
+REQUEST = (b'GET / HTTP/1.1\r\n'
+           b'Host: localhost\r\n'
+           b'Connection: keep-alive\r\n\r\n')
+
+
+
+def client(port, connections):
+    """
+    Send requests to C{port} on the loopback interface over C{connections}
+    connections, each as soon as the response to the last arrives, until the
+    server closes the connections.
+    """
+    poller = select.epoll()
+    sockets = {}
+    buffers = {}
+    for i in range(connections):
+        s = socket.create_connection(('127.0.0.1', port))
+        s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sockets[s.fileno()] = s
+        buffers[s.fileno()] = b''
+        poller.register(s.fileno(), select.EPOLLIN)
+        s.sendall(REQUEST)
+    while sockets:
+        for fd, event in poller.poll():
+            s = sockets[fd]
+            data = s.recv(65536)
+            if not data:
+                poller.unregister(fd)
+                del sockets[fd]
+                continue
+            buffered = buffers[fd] + data
+            while True:
+                end = buffered.find(b'\r\n\r\n')
+                if end == -1:
+                    break
+                headers = buffered[:end].lower()
+                start = headers.index(b'content-length:') + 15
+                length = int(headers[start:headers.index(b'\r\n', start)])
+                if len(buffered) < end + 4 + length:
+                    break
+                buffered = buffered[end + 4 + length:]
+                s.sendall(REQUEST)
+            buffers[fd] = buffered
+
+
+
+class CountingPoller(object):
+    """
+    Wrap an C{epoll} object, counting the calls made to it.
+    """
+    def __init__(self, poller):
+        self.poller = poller
+        self.ctl = 0
+        self.wait = 0
+
+
+    def register(self, fd, flags):
+        self.ctl += 1
+        return self.poller.register(fd, flags)
+
+
+    def modify(self, fd, flags):
+        self.ctl += 1
+        return self.poller.modify(fd, flags)
+
+
+    def unregister(self, fd):
+        self.ctl += 1
+        return self.poller.unregister(fd)
+
+
+    def poll(self, timeout, maxevents):
+        self.wait += 1
+        return self.poller.poll(timeout, maxevents)
+
+
+    def close(self):
+        return self.poller.close()
+
+
+
+def run(edgeTriggered, seconds, connections):
+    """
+    Serve keep-alive requests for C{seconds} seconds and report the request
+    rate and the number of epoll system calls per request.
+    """
+    from twisted.internet import epollreactor
+    epollreactor.install(edgeTriggered=edgeTriggered)
+    from twisted.internet import reactor
+    from twisted.web.server import Site
+    from twisted.web.resource import Resource
+
+    poller = reactor._poller = CountingPoller(reactor._poller)
+    state = {'requests': 0}
+
+    class Hello(Resource):
+        isLeaf = True
+
+        def render_GET(self, request):
+            state['requests'] += 1
+            request.setHeader(b'content-type', b'text/plain')
+            return b'hello, world'
+
+    site = Site(Hello())
+    site.log = lambda request: None
+
+    port = reactor.listenTCP(0, site, interface='127.0.0.1')
+    process = subprocess.Popen([sys.executable, __file__, '--client',
+                                str(port.getHost().port), str(connections)])
+
+    def cpu():
+        times = os.times()
+        return times[0] + times[1]
+
+    def start():
+        state['start'] = (time.time(), cpu(), state['requests'],
+                          poller.ctl, poller.wait)
+        reactor.callLater(seconds, stop)
+
+    def stop():
+        started, cpuStarted, requests, ctl, wait = state['start']
+        elapsed = time.time() - started
+        requests = state['requests'] - requests
+        print('%-15s %6.0f requests/s  %5.1f CPU us/request  '
+              'epoll_ctl/request: %.2f  epoll_wait/request: %.2f' % (
+                'edge-triggered' if edgeTriggered else 'level-triggered',
+                requests / elapsed, (cpu() - cpuStarted) / requests * 1e6,
+                (poller.ctl - ctl) / requests,
+                (poller.wait - wait) / requests))
+        reactor.stop()
+
+    # Give the client time to connect before measuring.
+    reactor.callLater(0.5, start)
+    reactor.run()
+    process.wait()
+
+
+
+def main(args):
+    if args and args[0] == '--client':
+        client(int(args[1]), int(args[2]))
+        return
+    if args and args[0] == '--run':
+        run(args[1] == 'edge', float(args[2]), int(args[3]))
+        return
+    seconds = 5.0
+    connections = 10
+    if args:
+        seconds = float(args[0])
+    if args[1:]:
+        connections = int(args[1])
+    for mode in ['level', 'edge']:
+        subprocess.check_call([sys.executable, __file__, '--run', mode,
+                               str(seconds), str(connections)])
+
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,91 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Measure the cost of running many L{task.LoopingCall}s with the same
+interval, with and without a L{task.CoalescingClock}.
+
+Usage: loopingcalls.py [calls [seconds [slack]]]
+
+C{calls} looping calls (default 50000) with an interval of one second are
+started at times spread evenly over one second, and the reactor is run for
+C{seconds} seconds (default 5).  This is done once with every call
+scheduled directly on the reactor and once with the calls sharing a
+L{task.CoalescingClock} with windows of C{slack} seconds (default 0.1).
+The number of timed calls pending in the reactor and the processor time
+used are reported.
+"""
+
+from __future__ import division, print_function
+
+import resource
+import subprocess
+import sys
+
+from twisted.internet import reactor, task
+
+
+
+def cpuTime():
+    """
+    Return the processor time used by this process, in seconds.
+    """
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+
+def run(calls, seconds, clock):
+    """
+    Start C{calls} looping calls using C{clock}, run the reactor for
+    C{seconds} seconds, and report what it cost.
+    """
+    ran = [0]
+    def tick():
+        ran[0] += 1
+
+    loops = []
+    def startOne():
+        loop = task.LoopingCall(tick)
+        loop.clock = clock
+        loop.start(1, now=False)
+        loops.append(loop)
+
+    for i in range(calls):
+        reactor.callLater(i / calls, startOne)
+
+    def report():
+        print("  %d calls run, %d timed calls pending in the reactor, "
+              "%.2f s of processor time" % (
+                  ran[0], len(reactor.getDelayedCalls()),
+                  cpuTime() - started))
+        for loop in loops:
+            loop.stop()
+        reactor.stop()
+
+    started = cpuTime()
+    reactor.callLater(seconds, report)
+    reactor.run()
+
+
+
+def main(calls=50000, seconds=5, slack=0.1, which=None):
+    if which == "reactor":
+        print("Scheduled on the reactor:")
+        run(calls, seconds, reactor)
+    elif which == "coalescing":
+        print("Scheduled on a CoalescingClock with slack %r:" % (slack,))
+        run(calls, seconds, task.CoalescingClock(reactor, slack))
+    else:
+        # A reactor can only be run once per process, so run each case in
+        # a process of its own.
+        for which in ["reactor", "coalescing"]:
+            subprocess.check_call(
+                [sys.executable, __file__, str(calls), str(seconds),
+                 str(slack), which])
+
+
+
+if __name__ == '__main__':
+    types = [int, int, float, str]
+    main(*[t(arg) for t, arg in zip(types, sys.argv[1:])])
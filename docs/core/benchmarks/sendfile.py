@@ -0,0 +1,109 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Measure loopback TCP throughput when serving a file with
+L{twisted.protocols.basic.FileSender}, with and without C{sendfile} (see
+L{twisted.internet.tcp.Connection.sendFile}).
+
+Usage: sendfile.py [megabytes]
+
+Each run is done in a separate process so that the reactor is fresh.  The
+CPU time reported includes the thread receiving the data.
+"""
+
+from __future__ import print_function
+
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+
+
+def receiver(port, state):
+    """
+    Connect to C{port} on the loopback interface and read everything sent
+    to it, from a separate thread.
+    """
+    client = socket.create_connection(('127.0.0.1', port))
+    while True:
+        data = client.recv(2 ** 18)
+        if not data:
+            break
+        state['received'] += len(data)
+    client.close()
+
+
+
+def run(path, mode):
+    """
+    Send the file at C{path} to one connection and report the throughput and
+    CPU time used.
+    """
+    from twisted.internet import reactor
+    from twisted.internet.protocol import Protocol, Factory
+    from twisted.protocols.basic import FileSender
+    from twisted.python import _sendfile
+
+    if mode == 'copy':
+        _sendfile.sendfile = None
+    state = {'received': 0}
+
+    class Source(Protocol):
+        def connectionMade(self):
+            self.fileObject = open(path, 'rb')
+            state['start'] = time.time()
+            state['cpu'] = resource.getrusage(resource.RUSAGE_SELF)
+            d = FileSender().beginFileTransfer(self.fileObject, self.transport)
+            d.addCallback(lambda ignored: self.transport.loseConnection())
+
+        def connectionLost(self, reason):
+            self.fileObject.close()
+            reactor.stop()
+
+    factory = Factory()
+    factory.protocol = Source
+    port = reactor.listenTCP(0, factory, interface='127.0.0.1')
+    thread = threading.Thread(
+        target=receiver, args=(port.getHost().port, state))
+    thread.start()
+    reactor.run()
+    thread.join()
+    elapsed = time.time() - state['start']
+    before, after = state['cpu'], resource.getrusage(resource.RUSAGE_SELF)
+    cpu = ((after.ru_utime - before.ru_utime) +
+           (after.ru_stime - before.ru_stime))
+    print('%8s: %5d MiB  %8.1f MiB/s  cpu %.2fs' % (
+            mode, state['received'] // 2 ** 20,
+            state['received'] / 2 ** 20 / elapsed, cpu))
+
+
+
+def main(args):
+    if args and args[0] == '--run':
+        run(args[1], args[2])
+        return
+    megabytes = 1024
+    if args:
+        megabytes = int(args[0])
+    fd, path = tempfile.mkstemp()
+    try:
+        chunk = b'x' * 2 ** 20
+        for i in range(megabytes):
+            os.write(fd, chunk)
+        os.close(fd)
+        for mode in ['copy', 'sendfile']:
+            subprocess.check_call(
+                [sys.executable, __file__, '--run', path, mode])
+    finally:
+        os.remove(path)
+
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
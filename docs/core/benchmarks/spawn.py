@@ -0,0 +1,92 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Measure how long C{spawnProcess} takes to run C{true} to completion as the
+number of open file descriptors in the parent grows.
+
+Usage: spawn.py [runs]
+
+For each number of descriptors, the time is reported with the child closing
+descriptors using C{close_range} or C{closefrom} (if available) and by
+closing each descriptor listed by C{_listOpenFDs} in turn.
+"""
+
+from __future__ import division, print_function
+
+import os
+import resource
+import sys
+import time
+
+from twisted.internet import reactor, process
+from twisted.internet.defer import Deferred, inlineCallbacks, returnValue
+from twisted.internet.protocol import ProcessProtocol
+from twisted.python.procutils import which
+
+
+
+class Waiter(ProcessProtocol):
+    """
+    Fire a L{Deferred} when the process ends.
+    """
+    def __init__(self):
+        self.ended = Deferred()
+
+
+    def processEnded(self, reason):
+        self.ended.callback(None)
+
+
+
+@inlineCallbacks
+def spawnTime(executable, runs):
+    """
+    Spawn C{executable} C{runs} times, one at a time, and return the mean
+    time from calling C{spawnProcess} to the end of the process.
+    """
+    total = 0
+    for i in range(runs):
+        protocol = Waiter()
+        start = time.time()
+        reactor.spawnProcess(protocol, executable, [executable])
+        yield protocol.ended
+        total += time.time() - start
+    returnValue(total / runs)
+
+
+
+@inlineCallbacks
+def main(runs=20):
+    executable = which('true')[0]
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    fastCloseRange = process.closeRange
+    opened = []
+    print("%10s %14s %14s" % ("fds", "closeRange ms", "one by one ms"))
+    try:
+        for count in [100, 1000, 10000, 50000]:
+            if count + 100 > hard:
+                break
+            while len(opened) < count:
+                opened.append(os.open(os.devnull, os.O_RDONLY))
+            results = []
+            for closeRange in [fastCloseRange, None]:
+                process.closeRange = closeRange
+                if closeRange is None and fastCloseRange is None:
+                    results.append(results[0])
+                    continue
+                result = yield spawnTime(executable, runs)
+                results.append(result * 1000)
+            print("%10d %14.2f %14.2f" % (count, results[0], results[1]))
+    finally:
+        process.closeRange = fastCloseRange
+        for fd in opened:
+            os.close(fd)
+        reactor.stop()
+
+
+
+if __name__ == '__main__':
+    reactor.callWhenRunning(main, *[int(arg) for arg in sys.argv[1:]])
+    reactor.run()
@@ -0,0 +1,157 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Measure the packets sent per response and the response latency of a TCP
+server writing each response in several pieces, with and without write
+coalescing.
+
+Usage: tcpcoalescing.py [requests]
+
+A client sends C{requests} requests (default 20000) over loopback, one at a
+time, to a server which has C{TCP_NODELAY} set.  The server writes a status
+line, headers and a body for each request with separate calls to C{write},
+either all at once or with the body written from a timed call, as though it
+came from a L{Deferred}.  Each combination is run once with write coalescing
+disabled and once with it enabled, and the number of data segments the
+server sent per response (from C{TCP_INFO}, on Linux), the number of sends
+per response and the mean latency of a request are reported.
+"""
+
+from __future__ import division, print_function
+
+import socket
+import struct
+import subprocess
+import sys
+import time
+
+from twisted.internet import reactor
+from twisted.internet.protocol import ClientFactory, Factory, Protocol
+
+
+
+def dataSegmentsOut(skt):
+    """
+    Return the number of segments carrying data sent on C{skt}, or C{None} if
+    the platform does not report it.
+    """
+    try:
+        info = skt.getsockopt(socket.IPPROTO_TCP, socket.TCP_INFO, 256)
+    except (AttributeError, socket.error):
+        return None
+    if len(info) < 160:
+        return None
+    # tcpi_data_segs_out follows 8 bytes of flags, 24 32-bit fields, 4
+    # 64-bit fields and 4 more 32-bit fields.
+    return struct.unpack("I", info[156:160])[0]
+
+
+
+class Responder(Protocol):
+    """
+    Write a response in several pieces for each line received.
+    """
+    sends = 0
+
+    def connectionMade(self):
+        self.factory.server = self
+        self.transport.setTcpNoDelay(True)
+        if self.factory.coalesce:
+            self.transport.setWriteCoalescing(True)
+        # Count the sends made for the responses.
+        for name in ["writeSomeData", "_writeSomeVectors"]:
+            send = getattr(self.transport, name, None)
+            if send is not None:
+                setattr(self.transport, name, self.counting(send))
+
+
+    def counting(self, send):
+        def counted(*args):
+            self.sends += 1
+            return send(*args)
+        return counted
+
+
+    def dataReceived(self, data):
+        write = self.transport.write
+        write(b"HTTP/1.1 200 OK\r\n")
+        write(b"Content-Type: text/plain\r\n")
+        write(b"Content-Length: 5\r\n\r\n")
+        if self.factory.later:
+            reactor.callLater(0, write, b"hello")
+        else:
+            write(b"hello")
+
+
+
+class Requester(Protocol):
+    """
+    Send requests one at a time, timing them.
+    """
+    def connectionMade(self):
+        self.remaining = self.factory.requests
+        self.received = 0
+        self.started = time.time()
+        self.transport.setTcpNoDelay(True)
+        self.transport.write(b"GET\n")
+
+
+    def dataReceived(self, data):
+        self.received += len(data)
+        # Each response is 66 bytes long.
+        if self.received < 66:
+            return
+        self.received -= 66
+        self.remaining -= 1
+        if self.remaining:
+            self.transport.write(b"GET\n")
+        else:
+            self.factory.elapsed = time.time() - self.started
+            server = self.factory.serverFactory.server
+            self.factory.segments = dataSegmentsOut(server.transport.socket)
+            reactor.stop()
+
+
+
+def run(requests, later, coalesce):
+    serverFactory = Factory.forProtocol(Responder)
+    serverFactory.later = later
+    serverFactory.coalesce = coalesce
+    port = reactor.listenTCP(0, serverFactory, interface="127.0.0.1")
+    clientFactory = ClientFactory.forProtocol(Requester)
+    clientFactory.requests = requests
+    clientFactory.serverFactory = serverFactory
+    reactor.connectTCP("127.0.0.1", port.getHost().port, clientFactory)
+    reactor.run()
+
+    server = serverFactory.server
+    segments = clientFactory.segments
+    if segments is None:
+        segments = "unknown"
+    else:
+        segments = "%.2f" % (segments / requests,)
+    print("  %-6s body, coalescing %-3s: %s packets, %.2f sends, "
+          "%.1f us per response" % (
+              later and "later" or "inline", coalesce and "on" or "off",
+              segments, server.sends / requests,
+              clientFactory.elapsed / requests * 1e6))
+
+
+
+def main(requests=20000, which=None):
+    if which is not None:
+        later, coalesce = [flag == "1" for flag in which]
+        run(requests, later, coalesce)
+    else:
+        # A reactor can only be run once per process, so run each case in
+        # a process of its own.
+        for which in ["00", "01", "10", "11"]:
+            subprocess.check_call(
+                [sys.executable, __file__, str(requests), which])
+
+
+
+if __name__ == '__main__':
+    types = [int, str]
+    main(*[t(arg) for t, arg in zip(types, sys.argv[1:])])
@@ -0,0 +1,99 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Measure loopback TCP receive throughput with and without a read budget (see
+L{twisted.internet.tcp.Connection.setReadBudget}).
+
+Usage: tcpread.py [megabytes [budget in bytes ...]]
+
+Each run is done in a separate process so that the reactor is fresh.
+"""
+
+from __future__ import print_function
+
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+
+
+def sender(port, total):
+    """
+    Connect to C{port} on the loopback interface and send C{total} bytes to
+    it as fast as possible from a separate thread.
+    """
+    client = socket.create_connection(('127.0.0.1', port))
+    chunk = b'x' * 2 ** 16
+    sent = 0
+    while sent < total:
+        client.sendall(chunk)
+        sent += len(chunk)
+    client.close()
+
+
+
+def run(megabytes, budget):
+    """
+    Receive C{megabytes} megabytes on a single connection and report the
+    throughput and number of read events.
+    """
+    from twisted.internet import reactor
+    from twisted.internet.protocol import Protocol, Factory
+
+    total = megabytes * 2 ** 20
+    if budget:
+        reactor.setReadBudget(budget)
+    state = {'received': 0, 'reads': 0}
+
+    class Sink(Protocol):
+        def connectionMade(self):
+            state['start'] = time.time()
+            originalDoRead = self.transport.doRead
+            def doRead():
+                state['reads'] += 1
+                return originalDoRead()
+            self.transport.doRead = doRead
+
+        def dataReceived(self, data):
+            state['received'] += len(data)
+
+        def connectionLost(self, reason):
+            state['end'] = time.time()
+            reactor.stop()
+
+    factory = Factory()
+    factory.protocol = Sink
+    port = reactor.listenTCP(0, factory, interface='127.0.0.1')
+    thread = threading.Thread(
+        target=sender, args=(port.getHost().port, total))
+    thread.start()
+    reactor.run()
+    thread.join()
+    elapsed = state['end'] - state['start']
+    print('budget: %10s  received: %5d MiB  %8.1f MiB/s  read events: %d' % (
+            budget or 'none', state['received'] // 2 ** 20,
+            state['received'] / 2 ** 20 / elapsed, state['reads']))
+
+
+
+def main(args):
+    if args and args[0] == '--run':
+        run(int(args[1]), int(args[2]))
+        return
+    megabytes = 512
+    budgets = [0, 2 ** 18, 2 ** 20, 2 ** 22]
+    if args:
+        megabytes = int(args[0])
+    if args[1:]:
+        budgets = [int(arg) for arg in args[1:]]
+    for budget in budgets:
+        subprocess.check_call([sys.executable, __file__, '--run',
+                               str(megabytes), str(budget)])
+
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,107 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Compare the cost of scheduling, resetting and cancelling delayed calls with
+L{twisted.internet.base.HeapTimerQueue} and
+L{twisted.internet.base.IndexedTimerQueue}.
+
+Usage: timerqueue.py [pending calls ...]
+
+The number of resets and cancellations is fixed, since each reset costs
+time linear in the number of pending calls with L{HeapTimerQueue}.
+"""
+
+from __future__ import print_function
+
+import random
+import sys
+import time
+
+from twisted.internet.base import HeapTimerQueue, IndexedTimerQueue
+from twisted.internet.selectreactor import SelectReactor
+
+
+
+class FakeTime(object):
+    """
+    A clock which only advances when told to.
+    """
+    now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+
+def measure(f):
+    """
+    Call C{f} and return the number of seconds it took.
+    """
+    before = time.time()
+    f()
+    return time.time() - before
+
+
+
+def benchmark(queueFactory, pending, operations):
+    """
+    Build a reactor using a timer queue created by C{queueFactory}, schedule
+    C{pending} calls on it, then time resetting C{operations} of them to an
+    earlier time, cancelling C{operations} more, and running the reactor
+    until every remaining call has fired.
+    """
+    reactor = SelectReactor()
+    reactor.seconds = FakeTime()
+    reactor.installTimerQueue(queueFactory())
+    noop = lambda: None
+    rand = random.Random(pending)
+
+    results = {}
+    def schedule():
+        calls = [reactor.callLater(rand.uniform(100, 200), noop)
+                 for i in range(pending)]
+        reactor.runUntilCurrent()
+        return calls
+    calls = []
+    results['schedule'] = measure(lambda: calls.extend(schedule()))
+
+    rand.shuffle(calls)
+    toReset = calls[:operations]
+    toCancel = calls[operations:2 * operations]
+    def reset():
+        for call in toReset:
+            call.reset(rand.uniform(10, 100))
+    results['reset'] = measure(reset)
+
+    def cancel():
+        for call in toCancel:
+            call.cancel()
+        reactor.runUntilCurrent()
+    results['cancel'] = measure(cancel)
+
+    def drain():
+        reactor.seconds.now = 1000
+        reactor.runUntilCurrent()
+    results['drain'] = measure(drain)
+    assert not reactor.getDelayedCalls()
+    return results
+
+
+
+def main(args):
+    sizes = [int(arg) for arg in args] or [10000, 100000, 1000000]
+    for pending in sizes:
+        operations = 100
+        for queueFactory in HeapTimerQueue, IndexedTimerQueue:
+            results = benchmark(queueFactory, pending, operations)
+            print('%-18s pending: %8d  ops: %6d  ' % (
+                    queueFactory.__name__, pending, operations) +
+                  '  '.join(['%s: %.3fs' % (name, results[name])
+                             for name in ['schedule', 'reset', 'cancel',
+                                          'drain']]))
+
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
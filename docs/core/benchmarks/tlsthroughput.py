@@ -0,0 +1,179 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Measure the number of TLS records sent and the throughput of a
+L{TLSMemoryBIOProtocol} writing data in pieces of various sizes, with and
+without write coalescing.
+
+Usage: tlsthroughput.py [megabytes]
+
+A server sends C{megabytes} megabytes (default 16) of data over a loopback
+TLS connection, written in pieces of 64, 1024 and 16384 bytes, to a client
+which discards it.  Each piece size is tried once with write coalescing
+disabled and once with it enabled.  The number of records the client
+received, the mean amount of application data each carried and the
+throughput are reported.
+"""
+
+from __future__ import division, print_function
+
+import struct
+import subprocess
+import sys
+import time
+
+import twisted.test
+from twisted.internet import reactor
+from twisted.internet.protocol import ClientFactory, Factory, Protocol
+from twisted.internet.ssl import CertificateOptions, PrivateCertificate
+from twisted.protocols.tls import TLSMemoryBIOFactory, TLSMemoryBIOProtocol
+from twisted.python.filepath import FilePath
+
+
+
+class RecordCountingTLSProtocol(TLSMemoryBIOProtocol):
+    """
+    Count the TLS records received, by parsing their headers out of the raw
+    bytes before decrypting them.
+
+    @ivar records: The number of records received so far.
+
+    @ivar _header: The bytes of an incomplete record header.
+
+    @ivar _skip: The number of bytes of the current record still to come.
+    """
+    records = 0
+    _header = b""
+    _skip = 0
+
+    def dataReceived(self, data):
+        offset = 0
+        while offset < len(data):
+            if self._skip:
+                used = min(self._skip, len(data) - offset)
+                self._skip -= used
+                offset += used
+                continue
+            needed = 5 - len(self._header)
+            self._header += data[offset:offset + needed]
+            offset += needed
+            if len(self._header) == 5:
+                self._skip = struct.unpack("!H", self._header[3:])[0]
+                self._header = b""
+                self.records += 1
+        TLSMemoryBIOProtocol.dataReceived(self, data)
+
+
+
+class Sender(Protocol):
+    """
+    Send C{factory.total} bytes in writes of C{factory.size} bytes, as fast
+    as the connection will take them.
+    """
+    def connectionMade(self):
+        if self.factory.coalesce:
+            self.transport.setWriteCoalescing(True)
+        self.remaining = self.factory.total
+        self.piece = b"x" * self.factory.size
+        self.paused = False
+        self.transport.registerProducer(self, True)
+        self.resumeProducing()
+
+
+    def pauseProducing(self):
+        self.paused = True
+
+
+    def resumeProducing(self):
+        self.paused = False
+        write = self.transport.write
+        piece = self.piece
+        size = len(piece)
+        while self.remaining > 0 and not self.paused:
+            write(piece)
+            self.remaining -= size
+        if self.remaining <= 0 and self.transport is not None:
+            self.transport.unregisterProducer()
+            self.transport.loseConnection()
+            self.transport = None
+
+
+    def stopProducing(self):
+        self.remaining = 0
+
+
+
+class Receiver(Protocol):
+    """
+    Count the bytes received, and the time taken to receive them.
+    """
+    def connectionMade(self):
+        self.received = 0
+        self.started = None
+
+
+    def dataReceived(self, data):
+        if self.started is None:
+            self.started = time.time()
+        self.received += len(data)
+
+
+    def connectionLost(self, reason):
+        self.factory.elapsed = time.time() - self.started
+        self.factory.received = self.received
+        reactor.stop()
+
+
+
+def run(total, size, coalesce):
+    pem = FilePath(twisted.test.__file__).sibling("server.pem").getContent()
+    serverOptions = PrivateCertificate.loadPEM(pem).options()
+
+    serverFactory = Factory.forProtocol(Sender)
+    serverFactory.total = total
+    serverFactory.size = size
+    serverFactory.coalesce = coalesce
+    port = reactor.listenTCP(
+        0, TLSMemoryBIOFactory(serverOptions, False, serverFactory),
+        interface="127.0.0.1")
+
+    clientFactory = ClientFactory.forProtocol(Receiver)
+    tlsClientFactory = TLSMemoryBIOFactory(
+        CertificateOptions(), True, clientFactory)
+    tlsClientFactory.protocol = RecordCountingTLSProtocol
+    connections = []
+    buildProtocol = tlsClientFactory.buildProtocol
+    def build(addr):
+        connections.append(buildProtocol(addr))
+        return connections[-1]
+    tlsClientFactory.buildProtocol = build
+    reactor.connectTCP("127.0.0.1", port.getHost().port, tlsClientFactory)
+    reactor.run()
+
+    records = connections[0].records
+    print("  %5d byte writes, coalescing %-3s: %7d records, "
+          "%7.1f bytes per record, %7.1f MB/s" % (
+              size, coalesce and "on" or "off", records,
+              clientFactory.received / records,
+              clientFactory.received / clientFactory.elapsed / 2 ** 20))
+
+
+
+def main(megabytes=16, size=None, coalesce=None):
+    if size is not None:
+        run(megabytes * 2 ** 20, size, coalesce == "1")
+    else:
+        # A reactor can only be run once per process, so run each case in
+        # a process of its own.
+        for size in [64, 1024, 16384]:
+            for coalesce in ["0", "1"]:
+                subprocess.check_call(
+                    [sys.executable, __file__, str(megabytes), str(size),
+                     coalesce])
+
+
+
+if __name__ == '__main__':
+    types = [int, int, str]
+    main(*[t(arg) for t, arg in zip(types, sys.argv[1:])])
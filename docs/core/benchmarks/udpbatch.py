@@ -0,0 +1,128 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Measure UDP datagrams per second sent and received by L{twisted.internet.udp}
+one at a time and in batches (see L{twisted.internet.udp.Port.setBatchSize}
+and L{twisted.internet.udp.Port.writeDatagrams}).
+
+Usage: udpbatch.py [seconds [batch size]]
+
+Each run is done in a separate process so that the reactor is fresh.  For
+the receive test, another process sends 64 byte datagrams as fast as it can
+for the given number of seconds; the datagrams the receiver has no time for
+are dropped by the kernel.
+"""
+
+from __future__ import print_function
+
+import socket
+import subprocess
+import sys
+import time
+
+
+
+def flood(port, seconds):
+    """
+    Send 64 byte datagrams to C{port} on the loopback interface for
+    C{seconds} seconds.
+    """
+    from twisted.python import _mmsg
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sender.connect(('127.0.0.1', port))
+    datagrams = [(b'x' * 64, None)] * 256
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        try:
+            if _mmsg.available:
+                _mmsg.sendDatagrams(sender.fileno(), socket.AF_INET, datagrams)
+            else:
+                for datagram, address in datagrams:
+                    sender.send(datagram)
+        except socket.error:
+            pass
+
+
+
+def receive(seconds, batchSize):
+    """
+    Count the datagrams received in C{seconds} seconds.
+    """
+    from twisted.internet import reactor
+    from twisted.internet.protocol import DatagramProtocol
+
+    state = {'received': 0}
+
+    class Counter(DatagramProtocol):
+        def datagramReceived(self, data, addr):
+            state['received'] += 1
+
+        def datagramsReceived(self, datagrams):
+            state['received'] += len(datagrams)
+
+    if not batchSize:
+        del Counter.datagramsReceived
+    port = reactor.listenUDP(0, Counter(), interface='127.0.0.1')
+    if batchSize:
+        port.setBatchSize(batchSize)
+    sender = subprocess.Popen(
+        [sys.executable, __file__, '--flood', str(port.getHost().port),
+         str(seconds)])
+    reactor.callLater(seconds, reactor.stop)
+    reactor.run()
+    sender.wait()
+    print('receive  batch %4s: %10.0f datagrams/s' % (
+            batchSize or 'none', state['received'] / seconds))
+
+
+
+def send(seconds, batchSize):
+    """
+    Count the datagrams written in C{seconds} seconds.
+    """
+    from twisted.internet import reactor
+    from twisted.internet.protocol import DatagramProtocol
+
+    sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sink.bind(('127.0.0.1', 0))
+    address = sink.getsockname()
+    port = reactor.listenUDP(0, DatagramProtocol(), interface='127.0.0.1')
+    datagrams = [(b'x' * 64, address)] * (batchSize or 256)
+    sent = 0
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        if batchSize:
+            port.writeDatagrams(datagrams)
+        else:
+            for datagram, address in datagrams:
+                port.write(datagram, address)
+        sent += len(datagrams)
+    print('send     batch %4s: %10.0f datagrams/s' % (
+            batchSize or 'none', sent / seconds))
+
+
+
+def main(args):
+    if args and args[0] == '--flood':
+        flood(int(args[1]), float(args[2]))
+        return
+    if args and args[0] == '--run':
+        function = {'send': send, 'receive': receive}[args[1]]
+        function(float(args[2]), int(args[3]))
+        return
+    seconds = 5
+    batchSize = 64
+    if args:
+        seconds = float(args[0])
+    if args[1:]:
+        batchSize = int(args[1])
+    for test in ['receive', 'send']:
+        for size in [0, batchSize]:
+            subprocess.check_call([sys.executable, __file__, '--run', test,
+                                   str(seconds), str(size)])
+
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
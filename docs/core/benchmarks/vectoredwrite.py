@@ -0,0 +1,125 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Compare the CPU time and memory used to send HTTP-style responses over
+loopback TCP, with and without vectored writes (see
+L{twisted.internet.abstract.FileDescriptor._writeSomeVectors}).
+
+Two workloads are measured: many responses made of small fragments, written
+by a streaming producer, and a few responses with large bodies, all written
+at once.
+
+Vectored writes need C{socket.sendmsg}, so run this with Python 3.
+
+Usage: vectoredwrite.py
+
+Each run is done in a separate process so that the reactor is fresh.
+"""
+
+from __future__ import print_function
+
+import resource
+import socket
+import subprocess
+import sys
+import threading
+
+
+
+def reader(port, expected):
+    """
+    Connect to C{port} on the loopback interface and read C{expected} bytes
+    from it in a separate thread.
+    """
+    client = socket.create_connection(('127.0.0.1', port))
+    received = 0
+    while received < expected:
+        data = client.recv(2 ** 16)
+        if not data:
+            break
+        received += len(data)
+    client.close()
+
+
+
+def run(responses, fragments, bodySize, vectored):
+    """
+    Write C{responses} responses, each made of C{fragments} header lines and
+    a body of C{bodySize} bytes, and report the resources used.  If the body
+    is smaller than the transport's buffer the responses are written by a
+    streaming producer, otherwise they are all written immediately.
+    """
+    from twisted.internet import reactor, tcp
+    from twisted.internet.protocol import Protocol, Factory
+
+    if not vectored:
+        tcp.Connection._writeSomeVectors = None
+
+    header = [b'X-Header-%d: some value\r\n' % (i,)
+              for i in range(fragments)]
+    body = b'x' * bodySize
+    responseSize = sum(map(len, header)) + len(body) + 2
+
+    class Responder(Protocol):
+        def connectionMade(self):
+            self.remaining = responses
+            if bodySize < self.transport.bufferSize:
+                self.transport.registerProducer(self, True)
+            self.resumeProducing()
+
+        def resumeProducing(self):
+            self.paused = False
+            while self.remaining and not self.paused:
+                self.remaining -= 1
+                self.transport.writeSequence(header)
+                self.transport.write(b'\r\n')
+                self.transport.write(body)
+            if not self.remaining:
+                if self.transport.producer is not None:
+                    self.transport.unregisterProducer()
+                self.transport.loseConnection()
+
+        def pauseProducing(self):
+            self.paused = True
+
+        def stopProducing(self):
+            pass
+
+        def connectionLost(self, reason):
+            reactor.stop()
+
+    factory = Factory()
+    factory.protocol = Responder
+    port = reactor.listenTCP(0, factory, interface='127.0.0.1')
+    before = resource.getrusage(resource.RUSAGE_SELF)
+    thread = threading.Thread(
+        target=reader, args=(port.getHost().port, responses * responseSize))
+    thread.start()
+    reactor.run()
+    thread.join()
+    after = resource.getrusage(resource.RUSAGE_SELF)
+    print('vectored: %-5s  responses: %7d  writes each: %3d  body: %8d  '
+          'cpu: %6.2fs  max rss: %7d KiB' % (
+            bool(vectored), responses, fragments + 2, bodySize,
+            (after.ru_utime + after.ru_stime) -
+            (before.ru_utime + before.ru_stime),
+            after.ru_maxrss))
+
+
+
+def main(args):
+    if args and args[0] == '--run':
+        run(*[int(arg) for arg in args[1:]])
+        return
+    for responses, fragments, bodySize in [(100000, 20, 200),
+                                           (200, 2, 2 ** 20)]:
+        for vectored in 0, 1:
+            subprocess.check_call(
+                [sys.executable, __file__, '--run', str(responses),
+                 str(fragments), str(bodySize), str(vectored)])
+
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,11 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Benchmarks of the reactor and of the protocols shipped with Twisted, for
+catching performance regressions.
+
+Run them with C{python -m twisted.benchmarks.runner}; see
+L{twisted.benchmarks.runner} for the options, and for how to compare two
+runs.
+"""
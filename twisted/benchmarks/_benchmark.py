@@ -0,0 +1,174 @@
+# -*- test-case-name: twisted.benchmarks.test.test_runner -*-
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Registration of benchmarks, and helpers for writing them.
+
+@var benchmarks: Every registered L{Benchmark}, in the order they were
+    registered.
+@type benchmarks: L{list}
+"""
+
+from __future__ import division, absolute_import
+
+import os
+import shutil
+import tempfile
+from timeit import default_timer as clock
+
+from twisted.internet import defer
+from twisted.internet.endpoints import TCP4ClientEndpoint, connectProtocol
+from twisted.internet.interfaces import IReactorUNIX
+
+
+
+benchmarks = []
+
+
+
+class Benchmark(object):
+    """
+    A single measurement of the performance of some part of Twisted.
+
+    @ivar name: The name of the benchmark, such as C{"tcp.latency"}.
+    @type name: L{str}
+
+    @ivar function: The function which runs the benchmark.  It is called with
+        the reactor if C{usesReactor} is true and with no arguments otherwise,
+        and returns the measurement, or a L{Deferred} which fires with it.
+
+    @ivar unit: The unit of the measurement, such as C{"ops/s"} or C{"us"}.
+    @type unit: L{str}
+
+    @ivar usesReactor: Whether the benchmark needs a running reactor, and so
+        is run once with each reactor being measured.
+    @type usesReactor: L{bool}
+    """
+
+    def __init__(self, name, function, unit, usesReactor):
+        self.name = name
+        self.function = function
+        self.unit = unit
+        self.usesReactor = usesReactor
+
+
+    @property
+    def higherIsBetter(self):
+        """
+        Whether a larger measurement is an improvement: true for rates, whose
+        units are per second, and false for durations.
+        """
+        return unitHigherIsBetter(self.unit)
+
+
+    def run(self, reactor=None):
+        """
+        Run the benchmark once.
+
+        @param reactor: The running reactor to pass to C{function}, if
+            C{usesReactor} is true.
+
+        @return: A L{Deferred} which fires with the measurement.
+        """
+        if self.usesReactor:
+            return defer.maybeDeferred(self.function, reactor)
+        return defer.maybeDeferred(self.function)
+
+
+
+def unitHigherIsBetter(unit):
+    """
+    Determine whether a larger measurement in C{unit} is an improvement.
+
+    @param unit: A unit, such as C{"MB/s"} or C{"us"}.
+    @type unit: L{str}
+
+    @rtype: L{bool}
+    """
+    return unit.endswith("/s")
+
+
+
+def benchmark(name, unit="ops/s", usesReactor=False):
+    """
+    Register a function as a benchmark.
+
+    @param name: See L{Benchmark.name}.
+
+    @param unit: See L{Benchmark.unit}.
+
+    @param usesReactor: See L{Benchmark.usesReactor}.
+
+    @return: A decorator which registers the function it decorates and
+        returns it unchanged.
+    """
+    def decorator(function):
+        benchmarks.append(Benchmark(name, function, unit, usesReactor))
+        return function
+    return decorator
+
+
+
+def rate(operations, function, *args):
+    """
+    Time a call to a function which performs some number of operations.
+
+    @param operations: The number of operations C{function} performs.
+
+    @param function: The function to call with C{args}.
+
+    @return: The number of operations per second.
+    @rtype: L{float}
+    """
+    before = clock()
+    function(*args)
+    return operations / (clock() - before)
+
+
+
+def overLoopback(reactor, serverFactory, client, measure, unix=False):
+    """
+    Listen on a loopback address, connect a client to the server and take a
+    measurement, then disconnect and stop listening.
+
+    @param reactor: The running reactor.
+
+    @param serverFactory: The factory for the server's protocol.
+
+    @param client: The client's protocol.
+
+    @param measure: A callable which is called with C{client} once it is
+        connected, and returns a L{Deferred} which fires with the measurement.
+
+    @param unix: If true, use a UNIX socket rather than TCP.
+
+    @return: A L{Deferred} which fires with the measurement.
+    """
+    if unix:
+        if not IReactorUNIX.providedBy(reactor):
+            return defer.fail(NotImplementedError(
+                "%r does not support UNIX sockets" % (reactor,)))
+        from twisted.internet.endpoints import UNIXClientEndpoint
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, "benchmark.sock")
+        port = reactor.listenUNIX(path, serverFactory)
+        endpoint = UNIXClientEndpoint(reactor, path)
+    else:
+        directory = None
+        port = reactor.listenTCP(0, serverFactory, interface="127.0.0.1")
+        endpoint = TCP4ClientEndpoint(
+            reactor, "127.0.0.1", port.getHost().port)
+
+    def cleanUp(result):
+        if client.transport is not None:
+            client.transport.loseConnection()
+        d = defer.maybeDeferred(port.stopListening)
+        if directory is not None:
+            d.addCallback(lambda ignored: shutil.rmtree(directory))
+        return d.addCallback(lambda ignored: result)
+
+    d = connectProtocol(endpoint, client)
+    d.addCallback(measure)
+    d.addBoth(cleanUp)
+    return d
@@ -0,0 +1,46 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Benchmarks of L{twisted.protocols.amp}.
+"""
+
+from __future__ import division, absolute_import
+
+from twisted.internet import defer, protocol
+from twisted.protocols import amp
+from twisted.benchmarks._benchmark import benchmark, clock, overLoopback
+
+
+
+class _Echo(amp.Command):
+    arguments = [(b"value", amp.String())]
+    response = [(b"value", amp.String())]
+
+
+
+class _EchoServer(amp.AMP):
+    @_Echo.responder
+    def echo(self, value):
+        return {"value": value}
+
+
+
+@benchmark("amp.roundTrip", "calls/s", usesReactor=True)
+def roundTrip(reactor):
+    """
+    Call a command on an AMP server over loopback TCP, wait for the response,
+    and repeat.
+    """
+    count = 2000
+
+    @defer.inlineCallbacks
+    def measure(client):
+        before = clock()
+        for i in range(count):
+            yield client.callRemote(_Echo, value=b"x" * 64)
+        defer.returnValue(count / (clock() - before))
+
+    return overLoopback(
+        reactor, protocol.Factory.forProtocol(_EchoServer), amp.AMP(),
+        measure)
@@ -0,0 +1,61 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Benchmarks of the reactor's scheduling primitives.
+"""
+
+from __future__ import division, absolute_import
+
+from twisted.internet import defer
+from twisted.benchmarks._benchmark import benchmark, clock
+
+
+
+@benchmark("reactor.callLater", "calls/s", usesReactor=True)
+def callLaterChurn(reactor):
+    """
+    Schedule timed calls with delays spread over a millisecond, cancel half
+    of them, and wait for the rest to run.
+    """
+    count = 20000
+    finished = defer.Deferred()
+    remaining = [count // 2]
+
+    def called():
+        remaining[0] -= 1
+        if not remaining[0]:
+            finished.callback(clock())
+
+    before = clock()
+    calls = [reactor.callLater((i % 10) / 10000, called)
+             for i in range(count)]
+    for call in calls[::2]:
+        call.cancel()
+    return finished.addCallback(lambda after: count / (after - before))
+
+
+
+@benchmark("reactor.callFromThread", "calls/s", usesReactor=True)
+def callFromThread(reactor):
+    """
+    Make calls into the reactor thread from another thread as fast as
+    possible, and wait for them all to run.
+    """
+    count = 20000
+    finished = defer.Deferred()
+    remaining = [count]
+
+    def called():
+        remaining[0] -= 1
+        if not remaining[0]:
+            finished.callback(clock())
+
+    def inThread():
+        callFromThread = reactor.callFromThread
+        for i in range(count):
+            callFromThread(called)
+
+    before = clock()
+    reactor.callInThread(inThread)
+    return finished.addCallback(lambda after: count / (after - before))
@@ -0,0 +1,85 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Benchmarks of L{Deferred} and L{inlineCallbacks}.
+"""
+
+from __future__ import division, absolute_import
+
+from twisted.internet import defer
+from twisted.benchmarks._benchmark import benchmark, rate
+
+
+
+def _identity(result):
+    return result
+
+
+
+@benchmark("deferred.succeed")
+def succeedAddCallback():
+    """
+    Create fired L{Deferred}s with L{defer.succeed} and add one callback to
+    each, the most common use of a L{Deferred}.
+    """
+    def run():
+        succeed = defer.succeed
+        for i in range(100000):
+            succeed(i).addCallback(_identity)
+    return rate(100000, run)
+
+
+
+@benchmark("deferred.callbackChain")
+def callbackChain():
+    """
+    Fire a L{Deferred} through a long chain of callbacks of every kind.
+    """
+    def run():
+        d = defer.Deferred()
+        for i in range(25000):
+            d.addCallback(_identity)
+            d.addErrback(_identity)
+            d.addBoth(_identity)
+            d.addCallbacks(_identity, _identity)
+        d.callback(None)
+    return rate(100000, run)
+
+
+
+@benchmark("deferred.inlineCallbacks.fired")
+def inlineCallbacksFired():
+    """
+    Run an L{inlineCallbacks} generator which yields L{Deferred}s which have
+    already fired.
+    """
+    @defer.inlineCallbacks
+    def run():
+        succeed = defer.succeed
+        for i in range(50000):
+            yield succeed(i)
+    return rate(50000, run)
+
+
+
+@benchmark("deferred.inlineCallbacks.unfired")
+def inlineCallbacksUnfired():
+    """
+    Run an L{inlineCallbacks} generator which yields L{Deferred}s which are
+    fired after it has started waiting for them.
+    """
+    pending = []
+
+    @defer.inlineCallbacks
+    def loop():
+        for i in range(50000):
+            d = defer.Deferred()
+            pending.append(d)
+            yield d
+
+    def run():
+        loop()
+        while pending:
+            pending.pop().callback(None)
+    return rate(50000, run)
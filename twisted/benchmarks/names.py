@@ -0,0 +1,64 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Benchmarks of the encoding and decoding of DNS messages by
+L{twisted.names.dns}.
+"""
+
+from __future__ import division, absolute_import
+
+from twisted.names import dns
+from twisted.benchmarks._benchmark import benchmark, rate
+
+
+
+def _response():
+    """
+    Make a typical response to a query, with a few answers of different
+    types, so that name compression is exercised.
+    """
+    name = b"www.example.com"
+    message = dns.Message(id=1234, answer=True, recDes=True, recAv=True)
+    message.queries = [dns.Query(name, dns.A)]
+    message.answers = [
+        dns.RRHeader(name, dns.CNAME, ttl=300,
+                     payload=dns.Record_CNAME(b"web.example.com")),
+        dns.RRHeader(b"web.example.com", dns.A, ttl=300,
+                     payload=dns.Record_A("192.0.2.1")),
+        dns.RRHeader(b"web.example.com", dns.A, ttl=300,
+                     payload=dns.Record_A("192.0.2.2")),
+        dns.RRHeader(b"web.example.com", dns.AAAA, ttl=300,
+                     payload=dns.Record_AAAA("2001:db8::1")),
+    ]
+    message.authority = [
+        dns.RRHeader(b"example.com", dns.NS, ttl=3600,
+                     payload=dns.Record_NS(b"ns1.example.com")),
+    ]
+    return message
+
+
+
+@benchmark("dns.encode", "messages/s")
+def encode():
+    """
+    Encode a response message.
+    """
+    message = _response()
+    def run():
+        for i in range(5000):
+            message.toStr()
+    return rate(5000, run)
+
+
+
+@benchmark("dns.decode", "messages/s")
+def decode():
+    """
+    Decode a response message.
+    """
+    encoded = _response().toStr()
+    def run():
+        for i in range(5000):
+            dns.Message().fromStr(encoded)
+    return rate(5000, run)
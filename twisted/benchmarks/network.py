@@ -0,0 +1,213 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Benchmarks of the throughput and latency of loopback TCP, UNIX and UDP
+connections through the reactor.
+"""
+
+from __future__ import division, absolute_import
+
+from twisted.internet import address, defer, protocol
+from twisted.benchmarks._benchmark import benchmark, clock, overLoopback
+
+
+
+def _noDelay(transport):
+    """
+    Send small writes on a TCP connection immediately, so that latency is not
+    measured in delayed acknowledgements.  UNIX socket transports have
+    C{setTcpNoDelay} too, but it fails.
+    """
+    if isinstance(transport.getHost(), address.IPv4Address):
+        transport.setTcpNoDelay(True)
+
+
+
+class _Echo(protocol.Protocol):
+    """
+    Send back everything received.
+    """
+    def connectionMade(self):
+        _noDelay(self.transport)
+
+
+    def dataReceived(self, data):
+        self.transport.write(data)
+
+
+
+class _EchoDatagram(protocol.DatagramProtocol):
+    """
+    Send every datagram received back to where it came from.
+    """
+    def datagramReceived(self, data, address):
+        self.transport.write(data, address)
+
+
+
+class _Throughput(protocol.Protocol):
+    """
+    Send C{total} bytes to an echo server as fast as possible, and time how
+    long it takes to get them all back.
+
+    @ivar finished: A L{Deferred} which fires with the throughput, in MB/s.
+    """
+    def __init__(self, total):
+        self.total = total
+        self.received = 0
+        self.finished = defer.Deferred()
+
+
+    def connectionMade(self):
+        self.started = clock()
+        chunk = b"x" * 2 ** 16
+        for i in range(self.total // len(chunk)):
+            self.transport.write(chunk)
+
+
+    def dataReceived(self, data):
+        self.received += len(data)
+        if self.received == self.total:
+            elapsed = clock() - self.started
+            self.finished.callback(self.total / elapsed / 2 ** 20)
+
+
+
+class _PingPong(protocol.Protocol):
+    """
+    Send a small message to an echo server, wait for it to come back, and
+    repeat, timing the round trips.
+
+    @ivar finished: A L{Deferred} which fires with the mean round trip time,
+        in microseconds.
+    """
+    message = b"x" * 64
+
+    def __init__(self, count):
+        self.count = count
+        self.remaining = count
+        self.received = 0
+        self.finished = defer.Deferred()
+
+
+    def connectionMade(self):
+        _noDelay(self.transport)
+        self.started = clock()
+        self.transport.write(self.message)
+
+
+    def dataReceived(self, data):
+        self.received += len(data)
+        if self.received < len(self.message):
+            return
+        self.received -= len(self.message)
+        self.remaining -= 1
+        if self.remaining:
+            self.transport.write(self.message)
+        else:
+            elapsed = clock() - self.started
+            self.finished.callback(elapsed / self.count * 1e6)
+
+
+
+class _PingPongDatagram(protocol.DatagramProtocol):
+    """
+    Like L{_PingPong}, for UDP.
+    """
+    message = b"x" * 64
+
+    def __init__(self, count, port):
+        self.count = count
+        self.remaining = count
+        self.port = port
+        self.finished = defer.Deferred()
+
+
+    def startProtocol(self):
+        self.transport.connect("127.0.0.1", self.port)
+        self.started = clock()
+        self.transport.write(self.message)
+
+
+    def datagramReceived(self, data, address):
+        self.remaining -= 1
+        if self.remaining:
+            self.transport.write(self.message)
+        else:
+            elapsed = clock() - self.started
+            self.finished.callback(elapsed / self.count * 1e6)
+
+
+
+def _finished(client):
+    return client.finished
+
+
+
+def _throughput(reactor, unix):
+    return overLoopback(
+        reactor, protocol.Factory.forProtocol(_Echo), _Throughput(2 ** 23),
+        _finished, unix)
+
+
+
+def _latency(reactor, unix):
+    return overLoopback(
+        reactor, protocol.Factory.forProtocol(_Echo), _PingPong(5000),
+        _finished, unix)
+
+
+
+@benchmark("tcp.throughput", "MB/s", usesReactor=True)
+def tcpThroughput(reactor):
+    """
+    Send 8MB to an echo server over loopback TCP and receive it back.
+    """
+    return _throughput(reactor, False)
+
+
+
+@benchmark("tcp.latency", "us", usesReactor=True)
+def tcpLatency(reactor):
+    """
+    Time round trips of a small message to an echo server over loopback TCP.
+    """
+    return _latency(reactor, False)
+
+
+
+@benchmark("unix.throughput", "MB/s", usesReactor=True)
+def unixThroughput(reactor):
+    """
+    Send 8MB to an echo server over a UNIX socket and receive it back.
+    """
+    return _throughput(reactor, True)
+
+
+
+@benchmark("unix.latency", "us", usesReactor=True)
+def unixLatency(reactor):
+    """
+    Time round trips of a small message to an echo server over a UNIX socket.
+    """
+    return _latency(reactor, True)
+
+
+
+@benchmark("udp.latency", "us", usesReactor=True)
+def udpLatency(reactor):
+    """
+    Time round trips of a small datagram to an echo server over loopback UDP.
+    """
+    server = reactor.listenUDP(0, _EchoDatagram(), interface="127.0.0.1")
+    client = _PingPongDatagram(5000, server.getHost().port)
+    clientPort = reactor.listenUDP(0, client, interface="127.0.0.1")
+
+    def cleanUp(result):
+        d = defer.gatherResults([
+            defer.maybeDeferred(clientPort.stopListening),
+            defer.maybeDeferred(server.stopListening)])
+        return d.addCallback(lambda ignored: result)
+
+    return client.finished.addBoth(cleanUp)
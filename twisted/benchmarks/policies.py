@@ -0,0 +1,51 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Benchmarks of the idle timeouts of L{twisted.protocols.policies}.
+"""
+
+from __future__ import division, absolute_import
+
+from twisted.internet import task
+from twisted.protocols import policies
+from twisted.benchmarks._benchmark import benchmark, rate
+
+
+
+def _resetTimeouts(clock):
+    """
+    Reset the timeouts of 1000 L{policies.TimeoutMixin} protocols scheduled
+    with C{clock} 100 times each, as receiving data on each of them would.
+    """
+    protocols = []
+    for i in range(1000):
+        proto = policies.TimeoutMixin()
+        proto.timeoutClock = clock
+        proto.setTimeout(30)
+        protocols.append(proto)
+
+    def run():
+        for i in range(100):
+            for proto in protocols:
+                proto.resetTimeout()
+    return rate(100 * len(protocols), run)
+
+
+
+@benchmark("timeout.reset", "resets/s")
+def resetDelayedCall():
+    """
+    Reset idle timeouts which are L{DelayedCall}s, as they are when scheduled
+    with the reactor.
+    """
+    return _resetTimeouts(task.Clock())
+
+
+
+@benchmark("timeout.reset.idleManager", "resets/s")
+def resetIdleTimeoutManager():
+    """
+    Reset idle timeouts scheduled with an L{policies.IdleTimeoutManager}.
+    """
+    return _resetTimeouts(policies.IdleTimeoutManager(task.Clock()))
@@ -0,0 +1,73 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Benchmarks of the parsing done by the protocols in
+L{twisted.protocols.basic}.
+"""
+
+from __future__ import division, absolute_import
+
+import struct
+
+from twisted.protocols import basic
+from twisted.test.proto_helpers import StringTransport
+from twisted.benchmarks._benchmark import benchmark, rate
+
+
+
+def _chunks(data, size):
+    """
+    Split C{data} into pieces of C{size} bytes, as though it had been read
+    from a socket.
+    """
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+
+def _deliver(protocol, chunks):
+    """
+    Give C{chunks} to a connected C{protocol}.
+    """
+    protocol.makeConnection(StringTransport())
+    for chunk in chunks:
+        protocol.dataReceived(chunk)
+
+
+
+class _CountingLineReceiver(basic.LineReceiver):
+    MAX_LENGTH = 2 ** 20
+    lines = 0
+
+    def lineReceived(self, line):
+        self.lines += 1
+
+
+
+class _CountingInt32StringReceiver(basic.Int32StringReceiver):
+    strings = 0
+
+    def stringReceived(self, string):
+        self.strings += 1
+
+
+
+@benchmark("basic.LineReceiver", "lines/s")
+def lineReceiver():
+    """
+    Parse 80 byte lines delivered in 4096 byte pieces with L{LineReceiver}.
+    """
+    chunks = _chunks((b"x" * 78 + b"\r\n") * 50000, 4096)
+    return rate(50000, _deliver, _CountingLineReceiver(), chunks)
+
+
+
+@benchmark("basic.Int32StringReceiver", "strings/s")
+def int32StringReceiver():
+    """
+    Parse 80 byte strings delivered in 4096 byte pieces with
+    L{Int32StringReceiver}.
+    """
+    data = (struct.pack("!I", 80) + b"x" * 80) * 50000
+    chunks = _chunks(data, 4096)
+    return rate(50000, _deliver, _CountingInt32StringReceiver(), chunks)
@@ -0,0 +1,436 @@
+# -*- test-case-name: twisted.benchmarks.test.test_runner -*-
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Run the benchmarks in L{twisted.benchmarks}, and compare the results of two
+runs.
+
+Run the benchmarks, saving the results as JSON::
+
+    python -m twisted.benchmarks.runner --output=before.json
+
+Benchmarks which do not use the reactor are run in this process.  Those which
+do are run once with each of the reactors given with C{--reactors} (by
+default, every one of select, poll and epoll available on the platform), in a
+process of its own for each reactor.  Each benchmark is run C{--repeat} times
+and the best result is kept.
+
+Compare two runs, listing every benchmark which got better or worse and
+exiting with status 1 if any got worse by more than C{--threshold} percent::
+
+    python -m twisted.benchmarks.runner --compare before.json after.json
+
+@var benchmarkModules: The modules defining benchmarks.  Those which cannot
+    be imported, because they need a part of Twisted not ported to the running
+    version of Python for example, are skipped.
+
+@var reactorModules: A L{dict} mapping the name of each reactor which can be
+    benchmarked to the module which installs it.
+"""
+
+from __future__ import division, absolute_import, print_function
+
+import fnmatch
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+from twisted import version
+from twisted.internet import defer
+from twisted.python import failure, reflect, usage
+from twisted.benchmarks import _benchmark
+
+
+
+benchmarkModules = [
+    "twisted.benchmarks.core",
+    "twisted.benchmarks.network",
+    "twisted.benchmarks.deferred",
+    "twisted.benchmarks.protocols",
+    "twisted.benchmarks.policies",
+    "twisted.benchmarks.amp",
+    "twisted.benchmarks.web",
+    "twisted.benchmarks.names",
+    "twisted.benchmarks.spread",
+]
+
+reactorModules = {
+    "select": "twisted.internet.selectreactor",
+    "poll": "twisted.internet.pollreactor",
+    "epoll": "twisted.internet.epollreactor",
+}
+
+
+
+def loadBenchmarks(moduleNames=benchmarkModules):
+    """
+    Import the modules defining benchmarks.
+
+    @param moduleNames: The names of the modules to import.
+
+    @return: A two-tuple of a L{list} of the L{_benchmark.Benchmark}s
+        registered, and a L{dict} mapping the name of each module which could
+        not be imported to the reason why.
+    """
+    unavailable = {}
+    for name in moduleNames:
+        try:
+            reflect.namedModule(name)
+        except Exception as e:
+            unavailable[name] = "%s: %s" % (e.__class__.__name__, e)
+    return list(_benchmark.benchmarks), unavailable
+
+
+
+def availableReactors():
+    """
+    Find the reactors in L{reactorModules} which can be used on this platform.
+
+    @return: Their names, sorted.
+    @rtype: L{list} of L{str}
+    """
+    available = []
+    for name, moduleName in reactorModules.items():
+        try:
+            reflect.namedModule(moduleName)
+        except ImportError:
+            continue
+        available.append(name)
+    return sorted(available)
+
+
+
+def selectBenchmarks(benchmarks, patterns):
+    """
+    Select the benchmarks whose names match any of some patterns.
+
+    @param benchmarks: The L{_benchmark.Benchmark}s to select from.
+
+    @param patterns: Comma-separated L{fnmatch} patterns, or L{None} to
+        select every benchmark.
+    @type patterns: L{str}
+
+    @rtype: L{list} of L{_benchmark.Benchmark}
+    """
+    if patterns is None:
+        return list(benchmarks)
+    patterns = patterns.split(",")
+    return [b for b in benchmarks
+            if any(fnmatch.fnmatchcase(b.name, p) for p in patterns)]
+
+
+
+def _withTimeout(d, reactor, seconds):
+    """
+    Fail a L{Deferred} with L{defer.TimeoutError} if it has not fired within
+    C{seconds} seconds.
+
+    @return: A L{Deferred} which fires with the result of C{d}.
+    """
+    result = defer.Deferred()
+    timer = reactor.callLater(
+        seconds, result.errback,
+        defer.TimeoutError("No result after %s seconds" % (seconds,)))
+
+    def fired(value):
+        if timer.active():
+            timer.cancel()
+            result.callback(value)
+
+    d.addBoth(fired)
+    return result
+
+
+
+@defer.inlineCallbacks
+def runBenchmarks(benchmarks, repeat, reactor=None, reactorName=None,
+                  timeout=60):
+    """
+    Run some benchmarks.
+
+    @param benchmarks: The L{_benchmark.Benchmark}s to run.
+
+    @param repeat: The number of times to run each benchmark.
+
+    @param reactor: The running reactor to pass to the benchmarks which use
+        one, or L{None} if there are none.
+
+    @param reactorName: The name of C{reactor}, which is added to the key of
+        each result measured with it.
+
+    @param timeout: The number of seconds to wait for each run of a benchmark
+        using the reactor before giving up on it.
+
+    @return: A L{Deferred} which fires with a L{dict} mapping a key for each
+        benchmark to a L{dict} of its C{unit} and either the best C{value} and
+        all the C{samples} measured, or the C{error} which stopped it.
+    """
+    results = {}
+    for benchmark in benchmarks:
+        key = benchmark.name
+        if benchmark.usesReactor:
+            key = "%s[%s]" % (key, reactorName)
+        result = {"unit": benchmark.unit}
+        samples = []
+        try:
+            for i in range(repeat):
+                d = benchmark.run(reactor)
+                if benchmark.usesReactor:
+                    d = _withTimeout(d, reactor, timeout)
+                samples.append((yield d))
+        except Exception as e:
+            result["error"] = "%s: %s" % (e.__class__.__name__, e)
+        else:
+            if benchmark.higherIsBetter:
+                result["value"] = max(samples)
+            else:
+                result["value"] = min(samples)
+            result["samples"] = samples
+        results[key] = result
+    defer.returnValue(results)
+
+
+
+def _runWithReactor(name, benchmarks, repeat):
+    """
+    Run benchmarks with the installed reactor and write their results to
+    standard output as JSON.
+
+    @param name: The name of the reactor, a key of L{reactorModules}.
+    """
+    from twisted.internet import reactor
+
+    outcome = []
+    def ran(result):
+        outcome.append(result)
+        reactor.stop()
+
+    reactor.callWhenRunning(
+        lambda: runBenchmarks(benchmarks, repeat, reactor, name).addBoth(ran))
+    reactor.run()
+    results = outcome[0]
+    if isinstance(results, failure.Failure):
+        results.raiseException()
+    sys.stdout.write(json.dumps(results))
+    sys.stdout.flush()
+
+
+
+def _runInChild(name, options):
+    """
+    Run the benchmarks which use the reactor with the named reactor, in a new
+    process.
+
+    @param name: The name of the reactor, a key of L{reactorModules}.
+
+    @param options: The L{Options} given to this process.
+
+    @return: The results written by the child, as returned by
+        L{runBenchmarks}.
+    """
+    args = [sys.executable, "-m", "twisted.benchmarks.runner",
+            "--child-reactor", name, "--repeat", str(options["repeat"])]
+    if options["only"] is not None:
+        args.extend(["--only", options["only"]])
+    env = os.environ.copy()
+    env["PYTHONPATH"] = os.pathsep.join(sys.path)
+    output = subprocess.check_output(args, env=env)
+    return json.loads(output.decode("utf-8"))
+
+
+
+def formatResults(results):
+    """
+    Format benchmark results for reading.
+
+    @param results: Results as returned by L{runBenchmarks}.
+
+    @return: One line for each result, sorted by key.
+    @rtype: L{list} of L{str}
+    """
+    lines = []
+    for key in sorted(results):
+        result = results[key]
+        if "error" in result:
+            lines.append("%-40s %s" % (key, result["error"]))
+        else:
+            lines.append("%-40s %14.1f %s" % (
+                key, result["value"], result["unit"]))
+    return lines
+
+
+
+def compare(old, new, threshold):
+    """
+    Compare the results of two runs.
+
+    @param old: The earlier run, as written by L{main}.
+    @type old: L{dict}
+
+    @param new: The later run, as written by L{main}.
+    @type new: L{dict}
+
+    @param threshold: The percentage by which a result must get worse to be
+        considered a regression.
+    @type threshold: L{float}
+
+    @return: A two-tuple of a L{list} of lines describing the differences,
+        and a L{list} of the keys of the results which regressed.
+    """
+    oldResults = old["results"]
+    newResults = new["results"]
+    lines = []
+    regressions = []
+    for key in sorted(set(oldResults) | set(newResults)):
+        before = oldResults.get(key, {}).get("value")
+        after = newResults.get(key, {}).get("value")
+        if before is None or after is None:
+            lines.append("%-40s %14s %14s" % (
+                key, _formatValue(before), _formatValue(after)))
+            continue
+        unit = newResults[key]["unit"]
+        if _benchmark.unitHigherIsBetter(unit):
+            change = (after - before) / before * 100
+        else:
+            change = (before - after) / before * 100
+        line = "%-40s %14.1f %14.1f %-10s %+7.1f%%" % (
+            key, before, after, unit, change)
+        if change < -threshold:
+            regressions.append(key)
+            line += "  REGRESSION"
+        lines.append(line)
+    return lines, regressions
+
+
+
+def _formatValue(value):
+    if value is None:
+        return "-"
+    return "%.1f" % (value,)
+
+
+
+class Options(usage.Options):
+    synopsis = ("[--reactors=NAMES] [--repeat=N] [--only=PATTERNS] "
+                "[--output=FILE] | --compare OLD NEW")
+
+    optFlags = [
+        ["compare", "c",
+         "Compare the results of two runs, saved with --output."],
+    ]
+
+    optParameters = [
+        ["reactors", "r", None,
+         "Comma-separated names of the reactors to run the benchmarks "
+         "which use one with (default: every one available of %s)." % (
+             ", ".join(sorted(reactorModules)),)],
+        ["repeat", "n", 3, "Run each benchmark this many times and keep the "
+         "best result.", int],
+        ["only", None, None, "Comma-separated patterns; only run the "
+         "benchmarks whose names match one of them."],
+        ["output", "o", None, "Save the results as JSON to this file."],
+        ["threshold", "t", 10.0, "When comparing, the percentage by which a "
+         "result must get worse to be reported as a regression.", float],
+        ["child-reactor", None, None, None],
+    ]
+
+
+    def parseArgs(self, *files):
+        if self["compare"]:
+            if len(files) != 2:
+                raise usage.UsageError(
+                    "--compare needs the results of two runs.")
+        elif files:
+            raise usage.UsageError("Unexpected arguments: %s" % (
+                " ".join(files),))
+        self["files"] = files
+
+
+    def postOptions(self):
+        if self["reactors"] is None:
+            self["reactors"] = availableReactors()
+        else:
+            self["reactors"] = self["reactors"].split(",")
+            for name in self["reactors"]:
+                if name not in reactorModules:
+                    raise usage.UsageError("Unknown reactor: %s" % (name,))
+
+
+
+def main(argv=None):
+    """
+    Run the benchmarks or compare two runs, as described by command line
+    arguments.
+
+    @param argv: The arguments, by default C{sys.argv[1:]}.
+
+    @return: The exit status.
+    @rtype: L{int}
+    """
+    options = Options()
+    try:
+        options.parseOptions(argv)
+    except usage.UsageError as e:
+        print(str(options))
+        print("%s: %s" % (sys.argv[0], e))
+        return 2
+
+    if options["compare"]:
+        runs = []
+        for path in options["files"]:
+            with open(path) as f:
+                runs.append(json.load(f))
+        lines, regressions = compare(runs[0], runs[1], options["threshold"])
+        for line in lines:
+            print(line)
+        return 1 if regressions else 0
+
+    if options["child-reactor"] is not None:
+        # Some of the benchmark modules import the reactor, so the one to
+        # measure has to be installed before they are loaded.
+        reflect.namedModule(reactorModules[options["child-reactor"]]).install()
+
+    benchmarks, unavailable = loadBenchmarks()
+    benchmarks = selectBenchmarks(benchmarks, options["only"])
+    withReactor = [b for b in benchmarks if b.usesReactor]
+
+    if options["child-reactor"] is not None:
+        _runWithReactor(options["child-reactor"], withReactor,
+                        options["repeat"])
+        return 0
+
+    results = []
+    runBenchmarks([b for b in benchmarks if not b.usesReactor],
+                  options["repeat"]).addCallback(results.append)
+    results = results[0]
+    if withReactor:
+        for name in options["reactors"]:
+            results.update(_runInChild(name, options))
+
+    for line in formatResults(results):
+        print(line)
+    for name in sorted(unavailable):
+        print("%s unavailable: %s" % (name, unavailable[name]))
+
+    if options["output"] is not None:
+        document = {
+            "python": "%s %s" % (platform.python_implementation(),
+                                 platform.python_version()),
+            "platform": platform.platform(),
+            "twisted": version.short(),
+            "time": time.time(),
+            "results": results,
+            "unavailable": unavailable,
+        }
+        with open(options["output"], "w") as f:
+            json.dump(document, f, indent=2, sort_keys=True)
+    return 0
+
+
+
+if __name__ == "__main__":
+    sys.exit(main())
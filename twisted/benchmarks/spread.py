@@ -0,0 +1,65 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Benchmarks of the serialization done by L{twisted.spread.banana} and
+L{twisted.spread.jelly}.
+"""
+
+from __future__ import division, absolute_import
+
+from twisted.spread import banana, jelly
+from twisted.benchmarks._benchmark import benchmark, rate
+
+
+
+def _structure():
+    """
+    Make a structure like the arguments of a typical remote call.
+    """
+    return [
+        b"someMethod", 12345, 3.25, None,
+        [b"a list", [1, 2, 3], {b"key": b"value", b"number": 17}],
+        (b"a", b"tuple"),
+        b"x" * 200,
+    ]
+
+
+
+@benchmark("banana.encode", "ops/s")
+def bananaEncode():
+    """
+    Encode an s-expression with L{banana.encode}.
+    """
+    expression = jelly.jelly(_structure())
+    def run():
+        for i in range(10000):
+            banana.encode(expression)
+    return rate(10000, run)
+
+
+
+@benchmark("banana.decode", "ops/s")
+def bananaDecode():
+    """
+    Decode an s-expression with L{banana.decode}.
+    """
+    encoded = banana.encode(jelly.jelly(_structure()))
+    def run():
+        for i in range(10000):
+            banana.decode(encoded)
+    return rate(10000, run)
+
+
+
+@benchmark("jelly.roundTrip", "ops/s")
+def jellyRoundTrip():
+    """
+    Jelly and then unjelly a structure with L{jelly.jelly} and
+    L{jelly.unjelly}.
+    """
+    structure = _structure()
+    def run():
+        for i in range(5000):
+            jelly.unjelly(jelly.jelly(structure))
+    return rate(5000, run)
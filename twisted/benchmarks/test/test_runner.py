@@ -0,0 +1,272 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Tests for L{twisted.benchmarks.runner} and L{twisted.benchmarks._benchmark}.
+"""
+
+from __future__ import division, absolute_import
+
+import json
+import sys
+
+from twisted.internet import defer, task
+from twisted.python import usage
+from twisted.trial.unittest import SynchronousTestCase
+from twisted.benchmarks import _benchmark, runner
+
+
+
+class BenchmarkTests(SynchronousTestCase):
+    """
+    Tests for L{_benchmark.Benchmark} and the helpers for writing benchmarks.
+    """
+    def test_register(self):
+        """
+        L{_benchmark.benchmark} registers the function it decorates as a
+        L{_benchmark.Benchmark} and returns it unchanged.
+        """
+        registered = []
+        self.patch(_benchmark, "benchmarks", registered)
+        def f():
+            pass
+        self.assertIs(_benchmark.benchmark("f", "us", True)(f), f)
+        [b] = registered
+        self.assertEqual(
+            (b.name, b.function, b.unit, b.usesReactor), ("f", f, "us", True))
+
+
+    def test_higherIsBetter(self):
+        """
+        Larger measurements are better for rates, with units per second, and
+        worse for anything else.
+        """
+        self.assertTrue(_benchmark.Benchmark("a", None, "MB/s", False)
+                        .higherIsBetter)
+        self.assertFalse(_benchmark.Benchmark("a", None, "us", False)
+                         .higherIsBetter)
+
+
+    def test_run(self):
+        """
+        L{_benchmark.Benchmark.run} passes the reactor to the function only if
+        the benchmark uses it, and returns a L{defer.Deferred} which fires with
+        its result.
+        """
+        reactor = object()
+        withReactor = _benchmark.Benchmark(
+            "a", lambda r: defer.succeed(r), "us", True)
+        self.assertIs(
+            self.successResultOf(withReactor.run(reactor)), reactor)
+        withoutReactor = _benchmark.Benchmark("a", lambda: 3, "us", False)
+        self.assertEqual(self.successResultOf(withoutReactor.run(reactor)), 3)
+
+
+    def test_rate(self):
+        """
+        L{_benchmark.rate} calls the function with the arguments given and
+        returns the number of operations per second it performed.
+        """
+        times = [10.0, 12.0]
+        self.patch(_benchmark, "clock", lambda: times.pop(0))
+        calls = []
+        self.assertEqual(
+            _benchmark.rate(100, lambda *args: calls.append(args), 1, 2), 50)
+        self.assertEqual(calls, [(1, 2)])
+
+
+
+class RunBenchmarksTests(SynchronousTestCase):
+    """
+    Tests for L{runner.runBenchmarks}.
+    """
+    def run(self, benchmarks, repeat, reactor=None):
+        return self.successResultOf(
+            runner.runBenchmarks(benchmarks, repeat, reactor, "fake"))
+
+    # The name "run" belongs to TestCase.
+    runBenchmarks = run
+    del run
+
+
+    def test_best(self):
+        """
+        Each benchmark is run C{repeat} times and the largest sample is kept
+        for rates, and the smallest for durations.
+        """
+        samples = [3, 5, 4]
+        rate = _benchmark.Benchmark(
+            "rate", lambda: samples.pop(0), "ops/s", False)
+        durations = [3, 5, 4]
+        duration = _benchmark.Benchmark(
+            "duration", lambda: durations.pop(0), "us", False)
+        self.assertEqual(self.runBenchmarks([rate, duration], 3), {
+            "rate": {"unit": "ops/s", "value": 5, "samples": [3, 5, 4]},
+            "duration": {"unit": "us", "value": 3, "samples": [3, 5, 4]},
+        })
+
+
+    def test_error(self):
+        """
+        If a benchmark fails, the error is recorded and the other benchmarks
+        are still run.
+        """
+        def fail():
+            raise ValueError("broken")
+        broken = _benchmark.Benchmark("broken", fail, "us", False)
+        working = _benchmark.Benchmark("working", lambda: 1, "us", False)
+        self.assertEqual(self.runBenchmarks([broken, working], 2), {
+            "broken": {"unit": "us", "error": "ValueError: broken"},
+            "working": {"unit": "us", "value": 1, "samples": [1, 1]},
+        })
+
+
+    def test_reactor(self):
+        """
+        Benchmarks which use the reactor are given it, and the name of the
+        reactor is added to the keys of their results.
+        """
+        clock = task.Clock()
+        b = _benchmark.Benchmark(
+            "timed", lambda reactor: reactor.seconds(), "us", True)
+        self.assertEqual(self.runBenchmarks([b], 1, clock), {
+            "timed[fake]": {"unit": "us", "value": 0, "samples": [0]},
+        })
+
+
+    def test_timeout(self):
+        """
+        A run of a benchmark which uses the reactor fails if it has not
+        finished after C{timeout} seconds.
+        """
+        clock = task.Clock()
+        b = _benchmark.Benchmark(
+            "slow", lambda reactor: defer.Deferred(), "us", True)
+        d = runner.runBenchmarks([b], 1, clock, "fake", timeout=10)
+        clock.advance(9)
+        self.assertNoResult(d)
+        clock.advance(1)
+        self.assertEqual(self.successResultOf(d), {
+            "slow[fake]": {"unit": "us",
+                           "error": "TimeoutError: No result after 10 "
+                                    "seconds"}})
+
+
+
+class _Output(object):
+    """
+    A file-like object which keeps everything written to it, be it bytes or
+    text.
+    """
+    def __init__(self):
+        self.written = []
+
+
+    def write(self, data):
+        self.written.append(data)
+
+
+    def getvalue(self):
+        return "".join(self.written)
+
+
+
+class RunnerTests(SynchronousTestCase):
+    """
+    Tests for the other parts of L{runner}.
+    """
+    def test_loadBenchmarks(self):
+        """
+        L{runner.loadBenchmarks} imports the modules given and returns the
+        registered benchmarks, along with the reasons any modules could not be
+        imported.
+        """
+        benchmarks, unavailable = runner.loadBenchmarks(
+            ["twisted.benchmarks.deferred", "twisted.benchmarks.missing"])
+        self.assertIn("deferred.succeed", [b.name for b in benchmarks])
+        self.assertEqual(list(unavailable), ["twisted.benchmarks.missing"])
+
+
+    def test_selectBenchmarks(self):
+        """
+        L{runner.selectBenchmarks} selects the benchmarks whose names match
+        any of the comma-separated patterns given, or all of them if there are
+        none.
+        """
+        benchmarks = [_benchmark.Benchmark(name, None, "us", False)
+                      for name in ["tcp.latency", "tcp.throughput", "dns"]]
+        self.assertEqual(
+            [b.name for b in runner.selectBenchmarks(
+                benchmarks, "*.latency,dns")], ["tcp.latency", "dns"])
+        self.assertEqual(runner.selectBenchmarks(benchmarks, None), benchmarks)
+
+
+    def test_compare(self):
+        """
+        L{runner.compare} reports the change in each result, and which got
+        worse by more than the threshold, taking into account whether larger
+        measurements are better.
+        """
+        old = {"results": {
+            "rate": {"unit": "ops/s", "value": 100.0},
+            "faster": {"unit": "us", "value": 100.0},
+            "slower": {"unit": "us", "value": 100.0},
+            "gone": {"unit": "us", "value": 1.0},
+        }}
+        new = {"results": {
+            "rate": {"unit": "ops/s", "value": 95.0},
+            "faster": {"unit": "us", "value": 50.0},
+            "slower": {"unit": "us", "value": 150.0},
+            "broken": {"unit": "us", "error": "ValueError: broken"},
+        }}
+        lines, regressions = runner.compare(old, new, 10)
+        self.assertEqual(regressions, ["slower"])
+        self.assertEqual(len(lines), 5)
+        self.assertIn("+50.0%", lines[1])
+        self.assertIn("-50.0%", lines[4])
+        self.assertIn("-5.0%", lines[3])
+        self.assertTrue(lines[4].endswith("REGRESSION"))
+        self.assertNotIn("REGRESSION", lines[3])
+
+
+    def test_formatResults(self):
+        """
+        L{runner.formatResults} makes a line for each result, sorted by key.
+        """
+        lines = runner.formatResults({
+            "b": {"unit": "us", "value": 1.25},
+            "a": {"unit": "us", "error": "ValueError: broken"},
+        })
+        self.assertEqual([line.split() for line in lines],
+                         [["a", "ValueError:", "broken"], ["b", "1.2", "us"]])
+
+
+    def test_compareMain(self):
+        """
+        Given C{--compare} and the files saved by two runs, L{runner.main}
+        prints their comparison and returns 1 if there were regressions.
+        """
+        old = self.mktemp()
+        new = self.mktemp()
+        for path, value in [(old, 100.0), (new, 200.0)]:
+            with open(path, "w") as f:
+                json.dump({"results": {"a": {"unit": "us", "value": value}}},
+                          f)
+        output = _Output()
+        self.patch(sys, "stdout", output)
+        self.assertEqual(runner.main(["--compare", old, new]), 1)
+        self.assertIn("REGRESSION", output.getvalue())
+        self.assertEqual(runner.main(["--compare", new, old]), 0)
+
+
+    def test_options(self):
+        """
+        L{runner.Options} needs two files with C{--compare} and none without
+        it, and only accepts known reactors.
+        """
+        for args in [["--compare", "a"], ["a"], ["--reactors", "kqueue"]]:
+            self.assertRaises(
+                usage.UsageError, runner.Options().parseOptions, args)
+        options = runner.Options()
+        options.parseOptions(["--reactors", "select,poll"])
+        self.assertEqual(options["reactors"], ["select", "poll"])
@@ -0,0 +1,76 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Benchmarks of L{twisted.web.server}.
+"""
+
+from __future__ import division, absolute_import
+
+from twisted.internet import defer, protocol
+from twisted.web import resource, server
+from twisted.benchmarks._benchmark import benchmark, clock, overLoopback
+
+
+
+class _Hello(resource.Resource):
+    isLeaf = True
+
+    def render_GET(self, request):
+        return b"hello"
+
+
+
+class _Requester(protocol.Protocol):
+    """
+    Make C{count} requests, one at a time, over a single persistent HTTP/1.1
+    connection.
+
+    @ivar finished: A L{Deferred} which fires with the number of requests
+        answered per second.
+    """
+    request = b"GET / HTTP/1.1\r\nHost: localhost\r\n\r\n"
+
+    def __init__(self, count):
+        self.count = count
+        self.remaining = count
+        self.buffer = b""
+        self.finished = defer.Deferred()
+
+
+    def connectionMade(self):
+        self.started = clock()
+        self.transport.write(self.request)
+
+
+    def dataReceived(self, data):
+        self.buffer += data
+        while True:
+            end = self.buffer.find(b"\r\n\r\n")
+            if end == -1:
+                return
+            length = 0
+            for line in self.buffer[:end].split(b"\r\n")[1:]:
+                name, value = line.split(b":", 1)
+                if name.strip().lower() == b"content-length":
+                    length = int(value)
+            if len(self.buffer) < end + 4 + length:
+                return
+            self.buffer = self.buffer[end + 4 + length:]
+            self.remaining -= 1
+            if self.remaining:
+                self.transport.write(self.request)
+            else:
+                elapsed = clock() - self.started
+                self.finished.callback(self.count / elapsed)
+
+
+
+@benchmark("web.Site", "requests/s", usesReactor=True)
+def site(reactor):
+    """
+    Make requests of a L{server.Site} over loopback TCP.
+    """
+    return overLoopback(
+        reactor, server.Site(_Hello()), _Requester(2000),
+        lambda client: client.finished)
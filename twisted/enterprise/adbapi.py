@@ -142,7 +142,7 @@ class ConnectionPool:
     @type _reactor: L{IReactorCore} provider
     """
 
-    CP_ARGS = "min max name noisy openfun reconnect good_sql".split()
+    CP_ARGS = "min max name noisy openfun reconnect good_sql max_queued".split()
 
     noisy = False # if true, generate informational log messages
     min = 3 # minimum number of connections in pool
@@ -151,6 +151,7 @@ class ConnectionPool:
     openfun = None # A function to call on new connections
     reconnect = False # reconnect when connections fail
     good_sql = 'select 1' # a query which should always succeed
+    max_queued = None # maximum number of queued operations, if any
 
     running = False # true when the pool is operating
     connectionFactory = Connection
@@ -191,6 +192,11 @@ class ConnectionPool:
         @param cp_good_sql: an sql query which should always succeed and change
                             no state (default 'select 1')
 
+        @param cp_max_queued: the maximum number of operations which may wait
+                              for a connection (default no limit).  Once
+                              reached, further operations fail with
+                              L{twisted.python.threadpool.ThreadPoolFull}.
+
         @param cp_reactor: use this reactor instead of the global reactor
             (added in Twisted 10.2).
         @type cp_reactor: L{IReactorCore} provider
@@ -229,7 +235,8 @@ class ConnectionPool:
         import thread
 
         self.threadID = thread.get_ident
-        self.threadpool = threadpool.ThreadPool(self.min, self.max)
+        self.threadpool = threadpool.ThreadPool(self.min, self.max,
+                                                maxQueued=self.max_queued)
         self.startID = self._reactor.callWhenRunning(self._start)
 
 
@@ -368,6 +375,16 @@ class ConnectionPool:
         return self.runInteraction(self._runOperation, *args, **kw)
 
 
+    def statistics(self):
+        """
+        Summarize the state and past activity of the pool's threads.
+
+        @return: The result of
+            L{twisted.python.threadpool.ThreadPool.statistics}.
+        """
+        return self.threadpool.statistics()
+
+
     def close(self):
         """
         Close all pool connections and shutdown the pool.
@@ -469,6 +486,7 @@ class ConnectionPool:
                 'noisy': self.noisy,
                 'reconnect': self.reconnect,
                 'good_sql': self.good_sql,
+                'max_queued': self.max_queued,
                 'connargs': self.connargs,
                 'connkw': self.connkw}
 
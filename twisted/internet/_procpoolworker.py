@@ -0,0 +1,48 @@
+# -*- test-case-name: twisted.internet.test.test_processpool -*-
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+The main program of the worker processes of
+L{twisted.internet.processpool.ProcessPool}.
+
+@since: 15.1
+"""
+
+import errno
+import os
+
+from twisted.internet.protocol import FileWrapper
+from twisted.internet.processpool import (
+    _WorkerProtocol, _WORKER_AMP_STDIN, _WORKER_AMP_STDOUT)
+
+
+
+def main(_fdopen=os.fdopen, _read=os.read):
+    """
+    Answer calls read from the AMP input pipe until it is closed.
+
+    @param _fdopen: If specified, the function to use in place of
+        C{os.fdopen}.
+    @param _read: If specified, the function to use in place of C{os.read}.
+    """
+    protocolOut = _fdopen(_WORKER_AMP_STDOUT, 'wb')
+    workerProtocol = _WorkerProtocol()
+    workerProtocol.makeConnection(FileWrapper(protocolOut))
+
+    while True:
+        try:
+            data = _read(_WORKER_AMP_STDIN, 65536)
+        except OSError as e:
+            if e.errno == errno.EINTR:
+                continue
+            raise
+        if not data:
+            break
+        workerProtocol.dataReceived(data)
+        protocolOut.flush()
+
+
+
+if __name__ == '__main__':
+    main()
@@ -6,9 +6,12 @@
 from __future__ import division, absolute_import
 
 import itertools
+import time
 import warnings
+import weakref
 
 from binascii import a2b_base64
+from collections import OrderedDict
 from hashlib import md5
 
 import OpenSSL
@@ -18,6 +21,10 @@ try:
 except ImportError:
     SSL_CB_HANDSHAKE_START = 0x10
     SSL_CB_HANDSHAKE_DONE = 0x20
+try:
+    from OpenSSL.SSL import SSL_CB_CONNECT_LOOP
+except ImportError:
+    SSL_CB_CONNECT_LOOP = 0x1001
 
 from twisted.python import log
 
@@ -57,6 +64,11 @@ else:
 
 
 
+# Sessions can only be resumed with pyOpenSSL 0.14 and later.
+_sessionsSupported = getattr(SSL.Connection, "set_session", None) is not None
+
+
+
 class SimpleVerificationError(Exception):
     """
     Not a very useful verification error.
@@ -1061,6 +1073,121 @@ def _tolerateErrors(wrapped):
 
 
 
+def _sessionReused(connection):
+    """
+    Determine whether the handshake on a connection resumed an earlier session
+    rather than negotiating a new one.
+
+    pyOpenSSL has no API for this, so, as L{_OpenSSLECCurve} does, this uses
+    cryptography's bindings directly if pyOpenSSL is based on them.
+
+    @param connection: A connection which has completed its handshake.
+    @type connection: L{OpenSSL.SSL.Connection}
+
+    @return: L{True} if the session was resumed, L{False} if it was not, or
+        L{None} if that cannot be determined.
+    """
+    try:
+        from OpenSSL._util import binding
+        return bool(binding.lib.SSL_session_reused(connection._ssl))
+    except (ImportError, AttributeError):
+        return None
+
+
+
+class OpenSSLSessionCache(object):
+    """
+    A cache of the TLS sessions established by clients, so that later
+    connections to the same server can resume them with an abbreviated
+    handshake rather than doing a full one, along with counts of how many
+    handshakes did each.
+
+    Pass one to L{optionsForClientTLS} (or to L{BrowserLikePolicyForHTTPS
+    <twisted.web.client.BrowserLikePolicyForHTTPS>}) to resume sessions as a
+    client.  A session is only ever offered to the host name and port it was
+    established with.  Pass one to L{OpenSSLCertificateOptions} to count the
+    sessions resumed by a server; the sessions themselves are then cached by
+    OpenSSL, or carried by the clients in session tickets.
+
+    @ivar maxSessions: The largest number of sessions to keep.  When there are
+        more, the least recently used are discarded.
+    @type maxSessions: L{int}
+
+    @ivar hits: The number of handshakes which resumed a session.
+    @type hits: L{int}
+
+    @ivar misses: The number of handshakes which negotiated a new session.
+    @type misses: L{int}
+
+    @ivar _sessions: An L{OrderedDict} mapping keys identifying servers to the
+        L{OpenSSL.SSL.Session} to resume with each, least recently used
+        first.
+
+    @ivar _sessionID: The session ID context shared by every context using
+        this cache.  OpenSSL refuses to resume a session in a context with a
+        different one, and clients make a new context for each server.
+    @type _sessionID: L{str}
+    """
+
+    def __init__(self, maxSessions=1000):
+        """
+        @param maxSessions: See L{OpenSSLSessionCache.maxSessions}.
+        """
+        self.maxSessions = maxSessions
+        self.hits = 0
+        self.misses = 0
+        self._sessions = OrderedDict()
+        name = "%s-%d" % (reflect.qual(self.__class__), _sessionCounter())
+        self._sessionID = md5(networkString(name)).hexdigest()
+
+
+    def _sessionFor(self, key):
+        """
+        Get the session to resume with a server.
+
+        @param key: The key identifying the server.
+
+        @return: The L{OpenSSL.SSL.Session}, or L{None} if there is none.
+        """
+        session = self._sessions.pop(key, None)
+        if session is not None:
+            self._sessions[key] = session
+        return session
+
+
+    def _storeSession(self, key, session):
+        """
+        Remember the session to resume with a server, replacing any earlier
+        one.
+
+        @param key: The key identifying the server.
+
+        @param session: The L{OpenSSL.SSL.Session}.  If it is L{None}, any
+            session remembered for the server is forgotten.
+        """
+        self._sessions.pop(key, None)
+        if session is not None:
+            self._sessions[key] = session
+            while len(self._sessions) > self.maxSessions:
+                self._sessions.popitem(last=False)
+
+
+    def _countHandshake(self, connection):
+        """
+        Count a completed handshake as a hit if it resumed a session or as a
+        miss if it did not.
+
+        @param connection: The connection which completed a handshake.
+        @type connection: L{OpenSSL.SSL.Connection}
+        """
+        reused = _sessionReused(connection)
+        if reused:
+            self.hits += 1
+        elif reused is not None:
+            self.misses += 1
+
+
+
 @implementer(IOpenSSLClientConnectionCreator)
 class ClientTLSOptions(object):
     """
@@ -1088,9 +1215,19 @@ class ClientTLSOptions(object):
         than working with Python's built-in (but sometimes broken) IDNA
         encoding.  ASCII values, however, will always work.
     @type _hostnameASCII: L{unicode}
+
+    @ivar _sessionCache: The cache of sessions to resume, or L{None}.
+    @type _sessionCache: L{OpenSSLSessionCache}
+
+    @ivar _sessionKey: The key identifying the server in C{_sessionCache}.
+
+    @ivar _verifiedConnections: The connections whose handshake has completed
+        and whose peer has been verified.  Sessions are only cached once they
+        have been.
+    @type _verifiedConnections: L{weakref.WeakSet}
     """
 
-    def __init__(self, hostname, ctx):
+    def __init__(self, hostname, ctx, sessionCache=None, sessionKey=None):
         """
         Initialize L{ClientTLSOptions}.
 
@@ -1099,11 +1236,20 @@ class ClientTLSOptions(object):
 
         @param ctx: an L{SSL.Context} to use for new connections.
         @type ctx: L{SSL.Context}.
+
+        @param sessionCache: The cache of sessions to resume, or L{None} to
+            not resume sessions.
+        @type sessionCache: L{OpenSSLSessionCache}
+
+        @param sessionKey: The key identifying the server in C{sessionCache}.
         """
         self._ctx = ctx
         self._hostname = hostname
         self._hostnameBytes = _idnaBytes(hostname)
         self._hostnameASCII = self._hostnameBytes.decode("ascii")
+        self._sessionCache = sessionCache
+        self._sessionKey = sessionKey
+        self._verifiedConnections = weakref.WeakSet()
         ctx.set_info_callback(
             _tolerateErrors(self._identityVerifyingInfoCallback)
         )
@@ -1128,6 +1274,10 @@ class ClientTLSOptions(object):
         context = self._ctx
         connection = SSL.Connection(context, None)
         connection.set_app_data(tlsProtocol)
+        if self._sessionCache is not None:
+            session = self._sessionCache._sessionFor(self._sessionKey)
+            if session is not None:
+                connection.set_session(session)
         return connection
 
 
@@ -1153,9 +1303,26 @@ class ClientTLSOptions(object):
             try:
                 verifyHostname(connection, self._hostnameASCII)
             except VerificationError:
+                if self._sessionCache is not None:
+                    self._sessionCache._storeSession(self._sessionKey, None)
                 f = Failure()
                 transport = connection.get_app_data()
                 transport.failVerification(f)
+            else:
+                if self._sessionCache is not None:
+                    self._verifiedConnections.add(connection)
+                    self._sessionCache._countHandshake(connection)
+                    self._sessionCache._storeSession(
+                        self._sessionKey, connection.get_session())
+        elif (where == SSL_CB_CONNECT_LOOP and
+              connection in self._verifiedConnections and
+              connection.get_state_string() ==
+                  b"SSLv3/TLS read server session ticket"):
+            # With TLS 1.3 the session can only be resumed using the tickets
+            # the server sends after the handshake, so cache it again each
+            # time one arrives.
+            self._sessionCache._storeSession(
+                self._sessionKey, connection.get_session())
 
 
 
@@ -1199,6 +1366,19 @@ def optionsForClientTLS(hostname, trustRoot=None, clientCertificate=None,
         interface.
     @type extraCertificateOptions: L{dict}
 
+    @param sessionCache: keyword-only argument; a cache of sessions to resume
+        with the server and to add the sessions established with it to, so
+        that repeated connections can use abbreviated handshakes.  If
+        unspecified, or if pyOpenSSL is too old to resume sessions, sessions
+        are not resumed.
+    @type sessionCache: L{OpenSSLSessionCache}
+
+    @param port: keyword-only argument; the port of the server, which
+        together with C{hostname} identifies it in C{sessionCache}.  Sessions
+        are only resumed under the same C{trustRoot} and C{clientCertificate}
+        they were established with.
+    @type port: L{int}
+
     @param kw: (Backwards compatibility hack to allow keyword-only arguments on
         Python 2.  Please ignore; arbitrary keyword arguments will be errors.)
     @type kw: L{dict}
@@ -1207,6 +1387,10 @@ def optionsForClientTLS(hostname, trustRoot=None, clientCertificate=None,
     @rtype: L{IOpenSSLClientConnectionCreator}
     """
     extraCertificateOptions = kw.pop('extraCertificateOptions', None) or {}
+    sessionCache = kw.pop('sessionCache', None)
+    if not _sessionsSupported:
+        sessionCache = None
+    port = kw.pop('port', None)
     if trustRoot is None:
         trustRoot = platformTrust()
     if kw:
@@ -1230,7 +1414,57 @@ def optionsForClientTLS(hostname, trustRoot=None, clientCertificate=None,
         trustRoot=trustRoot,
         **extraCertificateOptions
     )
-    return ClientTLSOptions(hostname, certificateOptions.getContext())
+    ctx = certificateOptions.getContext()
+    sessionKey = None
+    if sessionCache is not None:
+        ctx.set_session_id(sessionCache._sessionID)
+        # Resuming a session skips verifying the server's certificate chain
+        # and re-uses the client certificate it was established with, so a
+        # session may only be offered under the same trust and identity.
+        sessionKey = (hostname, port,
+                      _trustRootKey(certificateOptions.trustRoot),
+                      _certificateKey(clientCertificate))
+    return ClientTLSOptions(hostname, ctx, sessionCache, sessionKey)
+
+
+
+def _trustRootKey(trustRoot):
+    """
+    Identify the peers a trust root trusts, for keying the sessions verified
+    under it in an L{OpenSSLSessionCache}.
+
+    @param trustRoot: The trust root.
+    @type trustRoot: L{IOpenSSLTrustRoot}
+
+    @return: A hashable value which is equal for trust roots known to trust
+        the same certificate authorities: the digests of the certificates of
+        an L{OpenSSLCertificateAuthorities}, the L{OpenSSLDefaultPaths} type
+        for the platform's trust, and C{trustRoot} itself otherwise.
+    """
+    if isinstance(trustRoot, OpenSSLCertificateAuthorities):
+        return tuple(sorted(
+            caCert.digest("sha256") for caCert in trustRoot._caCerts))
+    if isinstance(trustRoot, OpenSSLDefaultPaths):
+        return OpenSSLDefaultPaths
+    return trustRoot
+
+
+
+def _certificateKey(certificate):
+    """
+    Identify the certificate a client authenticates with, for keying the
+    sessions established with it in an L{OpenSSLSessionCache}.
+
+    @param certificate: The client's certificate, or L{None} if it does not
+        authenticate.
+    @type certificate: L{PrivateCertificate} or L{None}
+
+    @return: The digest of C{certificate}, or L{None}.
+    @rtype: L{bytes} or L{None}
+    """
+    if not certificate:
+        return None
+    return certificate.original.digest("sha256")
 
 
 
@@ -1246,11 +1480,17 @@ class OpenSSLCertificateOptions(object):
 
     @ivar _cipherString: An OpenSSL-specific cipher string.
     @type _cipherString: L{unicode}
+
+    @ivar _contextCreated: The time at which C{_context} was made.
+    @type _contextCreated: L{float}
     """
 
     # Factory for creating contexts.  Configurable for testability.
     _contextFactory = SSL.Context
     _context = None
+    _contextCreated = None
+    # The current time.  Configurable for testability.
+    _now = staticmethod(time.time)
     # Some option constants may not be exposed by PyOpenSSL yet.
     _OP_ALL = getattr(SSL, 'OP_ALL', 0x0000FFFF)
     _OP_NO_TICKET = getattr(SSL, 'OP_NO_TICKET', 0x00004000)
@@ -1281,7 +1521,10 @@ class OpenSSLCertificateOptions(object):
                  extraCertChain=None,
                  acceptableCiphers=None,
                  dhParameters=None,
-                 trustRoot=None):
+                 trustRoot=None,
+                 sessionCache=None,
+                 sessionTimeout=None,
+                 sessionTicketKeyLifetime=None):
         """
         Create an OpenSSL context SSL connection context factory.
 
@@ -1372,6 +1615,26 @@ class OpenSSLCertificateOptions(object):
 
         @type trustRoot: L{IOpenSSLTrustRoot}
 
+        @param sessionCache: If not L{None}, count the handshakes done by
+            connections using these options in its C{hits} and C{misses},
+            according to whether or not they resumed a session.  To have a
+            client resume sessions, pass the cache to L{optionsForClientTLS}
+            instead.
+        @type sessionCache: L{OpenSSLSessionCache}
+
+        @param sessionTimeout: The number of seconds for which sessions
+            established using these options may be resumed.  If unspecified,
+            OpenSSL's default (300 seconds) is used.
+        @type sessionTimeout: L{int}
+
+        @param sessionTicketKeyLifetime: If not L{None}, the number of seconds
+            after which the keys used to encrypt session tickets are replaced
+            with new ones.  The keys belong to the L{OpenSSL.SSL.Context}, so
+            this is done by making a new context, which also starts a new
+            session cache; tickets and sessions from earlier contexts can then
+            no longer be resumed.  This requires C{enableSessionTickets}.
+        @type sessionTicketKeyLifetime: L{float}
+
         @raise ValueError: when C{privateKey} or C{certificate} are set without
             setting the respective other.
         @raise ValueError: when C{verify} is L{True} but C{caCerts} doesn't
@@ -1380,6 +1643,8 @@ class OpenSSLCertificateOptions(object):
             C{privateKey} or C{certificate}.
         @raise ValueError: when C{acceptableCiphers} doesn't yield any usable
             ciphers for the current platform.
+        @raise ValueError: when C{sessionTicketKeyLifetime} is passed without
+            enabling session tickets.
 
         @raise TypeError: if C{trustRoot} is passed in combination with
             C{caCert}, C{verify}, or C{requireCertificate}.  Please prefer
@@ -1436,6 +1701,12 @@ class OpenSSLCertificateOptions(object):
 
         if not enableSessionTickets:
             self._options |= self._OP_NO_TICKET
+        if sessionTicketKeyLifetime is not None and not enableSessionTickets:
+            raise ValueError("Session ticket keys can only be replaced when "
+                             "session tickets are enabled.")
+        self.sessionCache = sessionCache
+        self.sessionTimeout = sessionTimeout
+        self.sessionTicketKeyLifetime = sessionTicketKeyLifetime
         self.dhParameters = dhParameters
 
         try:
@@ -1484,9 +1755,21 @@ class OpenSSLCertificateOptions(object):
     def getContext(self):
         """
         Return an L{OpenSSL.SSL.Context} object.
-        """
+
+        The same context is returned each time, unless a
+        C{sessionTicketKeyLifetime} was given, in which case a new one is made
+        once the current one is that many seconds old.
+        """
+        now = None
+        if self.sessionTicketKeyLifetime is not None:
+            now = self._now()
+            if (self._context is not None and
+                    now - self._contextCreated >=
+                        self.sessionTicketKeyLifetime):
+                self._context = None
         if self._context is None:
             self._context = self._makeContext()
+            self._contextCreated = now
         return self._context
 
 
@@ -1521,11 +1804,25 @@ class OpenSSLCertificateOptions(object):
             ctx.set_verify_depth(self.verifyDepth)
 
         if self.enableSessions:
-            name = "%s-%d" % (reflect.qual(self.__class__), _sessionCounter())
-            sessionName = md5(networkString(name)).hexdigest()
+            if self.sessionCache is not None:
+                sessionName = self.sessionCache._sessionID
+            else:
+                name = "%s-%d" % (
+                    reflect.qual(self.__class__), _sessionCounter())
+                sessionName = md5(networkString(name)).hexdigest()
 
             ctx.set_session_id(sessionName)
 
+        if self.sessionTimeout is not None:
+            ctx.set_timeout(self.sessionTimeout)
+
+        if self.sessionCache is not None:
+            sessionCache = self.sessionCache
+            def _infoCallback(connection, where, ret):
+                if where & SSL_CB_HANDSHAKE_DONE:
+                    sessionCache._countHandshake(connection)
+            ctx.set_info_callback(_infoCallback)
+
         if self.dhParameters:
             ctx.load_tmp_dh(self.dhParameters._dhFile.path)
         ctx.set_cipher_list(nativeString(self._cipherString))
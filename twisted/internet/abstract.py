@@ -8,6 +8,7 @@ Support for generic select()able objects.
 
 from __future__ import division, absolute_import
 
+from collections import deque
 from socket import AF_INET6, inet_pton, error
 
 from zope.interface import implementer
@@ -164,6 +165,39 @@ class FileDescriptor(_ConsumerMixin, _LogOwner):
     This is an abstract superclass of all objects which may be notified when
     they are readable or writable; e.g. they have a file-descriptor that is
     valid to be passed to select(2).
+
+    @ivar _tempDataBuffer: A C{deque} of the C{bytes} passed to C{write} and
+        C{writeSequence} which have not yet been moved to C{dataBuffer}.  It
+        is only allocated when there is something to buffer, and is released
+        again once everything has been written, so that the many idle
+        connections of a busy server do not each hold on to one; until then
+        it is an empty C{tuple}.
+
+    @ivar _writeSomeVectors: C{None}, or a method which subclasses able to
+        write several buffers with one system call can define.  It has the
+        same contract as C{writeSomeData} except that it is given a C{list}
+        of buffers instead of one.  When it is defined, C{doWrite} hands it
+        the buffered data directly instead of first concatenating it, as long
+        as the buffers average at least C{_minimumVectorSize} bytes.  Copying
+        smaller buffers into one string is cheaper than keeping track of them
+        individually.
+
+    @ivar highWatermark: C{None}, or the number of unsent bytes above which a
+        registered streaming producer is paused.  If C{None}, C{bufferSize}
+        is used.  See L{setWriteBufferLimits}.
+
+    @ivar lowWatermark: The number of unsent bytes at or below which a
+        streaming producer paused because of the high watermark is resumed.
+        See L{setWriteBufferLimits}.
+
+    @ivar _readExhausted: C{None} if C{doRead} does not say whether it used
+        up the read readiness of the descriptor; otherwise set by C{doRead} to
+        C{True} if it found nothing more to read, or C{False} if there may be
+        more.  Reactors which track readiness themselves use this to decide
+        whether to wait for another notification.
+
+    @ivar _writeExhausted: Like C{_readExhausted}, for C{doWrite}: C{True} if
+        the last write was short or would have blocked.
     """
     connected = 0
     disconnected = 0
@@ -172,9 +206,20 @@ class FileDescriptor(_ConsumerMixin, _LogOwner):
     _writeDisconnected = False
     dataBuffer = b""
     offset = 0
+    _tempDataBuffer = ()
+    _tempDataLen = 0
+    highWatermark = None
+    lowWatermark = 0
+    _readExhausted = None
+    _writeExhausted = None
 
     SEND_LIMIT = 128*1024
 
+    # The most buffers passed to _writeSomeVectors at once (IOV_MAX on Linux).
+    _maximumVectors = 1024
+    _minimumVectorSize = 2 ** 14
+    _writeSomeVectors = None
+
     def __init__(self, reactor=None):
         """
         @param reactor: An L{IReactorFDSet} provider which this descriptor will
@@ -184,8 +229,6 @@ class FileDescriptor(_ConsumerMixin, _LogOwner):
         if not reactor:
             from twisted.internet import reactor
         self.reactor = reactor
-        self._tempDataBuffer = [] # will be added to dataBuffer in doWrite
-        self._tempDataLen = 0
 
 
     def connectionLost(self, reason):
@@ -240,32 +283,39 @@ class FileDescriptor(_ConsumerMixin, _LogOwner):
 
         @see: L{twisted.internet.interfaces.IWriteDescriptor.doWrite}.
         """
-        if len(self.dataBuffer) - self.offset < self.SEND_LIMIT:
-            # If there is currently less than SEND_LIMIT bytes left to send
-            # in the string, extend it with the array data.
-            self.dataBuffer = _concatenate(
-                self.dataBuffer, self.offset, self._tempDataBuffer)
-            self.offset = 0
-            self._tempDataBuffer = []
-            self._tempDataLen = 0
-
-        # Send as much data as you can.
-        if self.offset:
-            l = self.writeSomeData(lazyByteSlice(self.dataBuffer, self.offset))
+        if (self._writeSomeVectors is not None and self._tempDataLen >=
+                len(self._tempDataBuffer) * self._minimumVectorSize):
+            l = self._doVectoredWrite()
+            if isinstance(l, Exception) or l < 0:
+                return l
         else:
-            l = self.writeSomeData(self.dataBuffer)
-
-        # There is no writeSomeData implementation in Twisted which returns
-        # < 0, but the documentation for writeSomeData used to claim negative
-        # integers meant connection lost.  Keep supporting this here,
-        # although it may be worth deprecating and removing at some point.
-        if isinstance(l, Exception) or l < 0:
-            return l
-        self.offset += l
+            if (len(self.dataBuffer) - self.offset < self.SEND_LIMIT and
+                    self._tempDataLen):
+                # If there is currently less than SEND_LIMIT bytes left to send
+                # in the string, extend it with the array data.
+                self._refillDataBuffer()
+
+            # Send as much data as you can.
+            if self.offset:
+                l = self.writeSomeData(
+                    lazyByteSlice(self.dataBuffer, self.offset))
+            else:
+                l = self.writeSomeData(self.dataBuffer)
+
+            # There is no writeSomeData implementation in Twisted which returns
+            # < 0, but the documentation for writeSomeData used to claim
+            # negative integers meant connection lost.  Keep supporting this
+            # here, although it may be worth deprecating and removing at some
+            # point.
+            if isinstance(l, Exception) or l < 0:
+                return l
+            self.offset += l
         # If there is nothing left to send,
         if self.offset == len(self.dataBuffer) and not self._tempDataLen:
             self.dataBuffer = b""
             self.offset = 0
+            # Anything left in the buffer is empty strings from writeSequence.
+            self._tempDataBuffer = ()
             # stop writing.
             self.stopWriting()
             # If I've got a producer who is supposed to supply me with data,
@@ -286,8 +336,97 @@ class FileDescriptor(_ConsumerMixin, _LogOwner):
                 self._writeDisconnected = True
                 result = self._closeWriteConnection()
                 return result
+        elif (self.producerPaused and self.streamingProducer and
+              self.producer is not None and
+              self._bufferedLength() <= self.lowWatermark):
+            # Enough has been sent for a producer paused by write() to
+            # start again before the buffer runs dry.
+            self.producerPaused = False
+            self.producer.resumeProducing()
         return None
 
+
+    def _refillDataBuffer(self):
+        """
+        Replace C{dataBuffer} with its unsent part followed by buffers from
+        C{_tempDataBuffer}, up to about C{SEND_LIMIT} bytes.
+
+        Only that much is copied, however much is buffered, so a large
+        backlog is not copied all at once.  A buffer of C{SEND_LIMIT} bytes or
+        more becomes C{dataBuffer} as it is when the unsent part is empty, and
+        is not copied at all.
+        """
+        buffered = self._tempDataBuffer
+        size = len(self.dataBuffer) - self.offset
+        if not size and len(buffered[0]) >= self.SEND_LIMIT:
+            chunk = buffered.popleft()
+            self._tempDataLen -= len(chunk)
+            self.dataBuffer = chunk
+            self.offset = 0
+            return
+        chunks = []
+        while buffered:
+            chunkSize = len(buffered[0])
+            if chunks and size + chunkSize > self.SEND_LIMIT:
+                break
+            chunks.append(buffered.popleft())
+            size += chunkSize
+            self._tempDataLen -= chunkSize
+        self.dataBuffer = _concatenate(self.dataBuffer, self.offset, chunks)
+        self.offset = 0
+
+    def _doVectoredWrite(self):
+        """
+        Pass the unsent part of C{dataBuffer} and the buffers in
+        C{_tempDataBuffer}, up to about C{SEND_LIMIT} bytes, to
+        C{_writeSomeVectors}, then discard whatever it wrote.  If it wrote
+        part of a buffer from C{_tempDataBuffer}, that buffer becomes
+        C{dataBuffer}.
+
+        @return: The result of C{_writeSomeVectors}.
+        """
+        vectors = []
+        pending = len(self.dataBuffer) - self.offset
+        if pending:
+            vectors.append(memoryview(self.dataBuffer)[self.offset:])
+        size = pending
+        maximumVectors = self._maximumVectors
+        for chunk in self._tempDataBuffer:
+            if size >= self.SEND_LIMIT or len(vectors) >= maximumVectors:
+                break
+            vectors.append(chunk)
+            size += len(chunk)
+
+        if not vectors:
+            return 0
+        result = self._writeSomeVectors(vectors)
+        if isinstance(result, Exception) or result < 0:
+            return result
+
+        if result < pending:
+            self.offset += result
+            return result
+        written = result - pending
+        dataBuffer = b""
+        offset = 0
+        buffered = self._tempDataBuffer
+        while written:
+            chunk = buffered.popleft()
+            chunkSize = len(chunk)
+            self._tempDataLen -= chunkSize
+            if written < chunkSize:
+                dataBuffer = chunk
+                offset = written
+                break
+            written -= chunkSize
+        if not self._tempDataLen:
+            # Only empty strings from writeSequence can be left.
+            self._tempDataBuffer = ()
+        self.dataBuffer = dataBuffer
+        self.offset = offset
+        return result
+
+
     def _postLoseConnection(self):
         """Called after a loseConnection(), when all data has been written.
 
@@ -309,18 +448,62 @@ class FileDescriptor(_ConsumerMixin, _LogOwner):
         self.connectionLost(reason)
 
 
+    def setWriteBufferLimits(self, high=None, low=None):
+        """
+        Set the watermarks at which a registered streaming producer is paused
+        and resumed.
+
+        The producer is paused when more than C{high} bytes are waiting to be
+        sent, and resumed once no more than C{low} are, rather than only when
+        everything has been sent.  Resuming before the buffer is empty keeps
+        data flowing to a slow peer without buffering much for it.
+
+        @param high: The high watermark in bytes, or C{None} to use
+            C{bufferSize}.
+        @type high: C{int}
+
+        @param low: The low watermark in bytes, or C{None} for a quarter of
+            the high watermark.
+        @type low: C{int}
+
+        @raise ValueError: If C{low} is negative or greater than C{high}.
+        """
+        if high is None:
+            high = self.bufferSize
+        if low is None:
+            low = high // 4
+        if not 0 <= low <= high:
+            raise ValueError(
+                "Need 0 <= low <= high, not low=%r and high=%r" % (low, high))
+        self.highWatermark = high
+        self.lowWatermark = low
+
+
+    def _bufferedLength(self):
+        """
+        @return: The number of bytes written to this transport which have not
+            yet been sent.
+        @rtype: C{int}
+        """
+        return len(self.dataBuffer) - self.offset + self._tempDataLen
+
+
     def _isSendBufferFull(self):
         """
         Determine whether the user-space send buffer for this transport is full
         or not.
 
-        When the buffer contains more than C{self.bufferSize} bytes, it is
-        considered full.  This might be improved by considering the size of the
-        kernel send buffer and how much of it is free.
+        When the buffer contains more than C{self.highWatermark} unsent bytes,
+        or C{self.bufferSize} if that is C{None}, it is considered full.  This
+        might be improved by considering the size of the kernel send buffer and
+        how much of it is free.
 
         @return: C{True} if it is full, C{False} otherwise.
         """
-        return len(self.dataBuffer) + self._tempDataLen > self.bufferSize
+        high = self.highWatermark
+        if high is None:
+            high = self.bufferSize
+        return self._bufferedLength() > high
 
 
     def _maybePauseProducer(self):
@@ -349,7 +532,10 @@ class FileDescriptor(_ConsumerMixin, _LogOwner):
         if not self.connected or self._writeDisconnected:
             return
         if data:
-            self._tempDataBuffer.append(data)
+            buffered = self._tempDataBuffer
+            if not buffered:
+                buffered = self._tempDataBuffer = deque()
+            buffered.append(data)
             self._tempDataLen += len(data)
             self._maybePauseProducer()
             self.startWriting()
@@ -359,13 +545,14 @@ class FileDescriptor(_ConsumerMixin, _LogOwner):
         """
         Reliably write a sequence of data.
 
-        Currently, this is a convenience method roughly equivalent to::
+        This is roughly equivalent to::
 
             for chunk in iovec:
                 fd.write(chunk)
 
-        It may have a more efficient implementation at a later time or in a
-        different reactor.
+        For transports which can write several buffers at once (see
+        C{_writeSomeVectors}) the chunks are handed to the operating system
+        without being copied into a single string first.
 
         As with the C{write()} method, if a buffer size limit is reached and a
         streaming producer is registered, it will be paused until the buffered
@@ -376,7 +563,10 @@ class FileDescriptor(_ConsumerMixin, _LogOwner):
                 raise TypeError("Data must not be unicode")
         if not self.connected or not iovec or self._writeDisconnected:
             return
-        self._tempDataBuffer.extend(iovec)
+        buffered = self._tempDataBuffer
+        if not buffered:
+            buffered = self._tempDataBuffer = deque()
+        buffered.extend(iovec)
         for i in iovec:
             self._tempDataLen += len(i)
         self._maybePauseProducer()
@@ -13,7 +13,11 @@ from zope.interface import implementer, classImplements
 
 import sys
 import warnings
+import weakref
+from errno import ENOPROTOOPT
 from heapq import heappush, heappop, heapify
+from bisect import bisect_left
+from collections import deque, OrderedDict
 
 import traceback
 
@@ -31,7 +35,20 @@ from twisted.python import threadable
 
 
 @implementer(IDelayedCall)
-class DelayedCall:
+class DelayedCall(object):
+    """
+    A call scheduled with L{IReactorTime.callLater}.
+
+    Every timeout a server sets up is one of these, so they use C{__slots__}
+    to keep the memory each one takes down.  Attributes other than those
+    listed there, such as C{creator} when C{debug} is enabled, are still
+    allowed, and are kept in an instance dictionary which is only allocated
+    when the first of them is set.
+    """
+
+    __slots__ = ("time", "func", "args", "kw", "resetter", "canceller",
+                 "seconds", "cancelled", "called", "delayed_time",
+                 "_heapIndex", "__dict__", "__weakref__")
 
     # enable .debug to record creator call stack, and it will be logged if
     # an exception occurs while the function is being run
@@ -62,6 +79,7 @@ class DelayedCall:
         self.seconds = seconds
         self.cancelled = self.called = 0
         self.delayed_time = 0
+        self._heapIndex = None
         if self.debug:
             self.creator = traceback.format_stack()[:-2]
 
@@ -209,6 +227,531 @@ class DelayedCall:
 
 
 
+class HeapTimerQueue(object):
+    """
+    The default structure used by L{ReactorBase} to keep track of pending
+    L{DelayedCall}s: a binary heap ordered by L{DelayedCall.time}.
+
+    Cancelled calls are left in the heap and discarded when they reach the top
+    of it, or when enough of them have accumulated that rebuilding the heap is
+    worthwhile.  Moving a call sooner requires a linear search of the heap.
+
+    A timer queue is driven entirely by its reactor.  Newly created calls are
+    passed to C{schedule} and only become eligible to run once
+    C{insertScheduled} has been called; calls which are due are removed with
+    C{popDue}; C{push} puts a call which was removed back in place.
+
+    @ivar _heap: A C{list} of L{DelayedCall}s satisfying the heap invariant.
+
+    @ivar _scheduled: A C{list} of L{DelayedCall}s which have been scheduled
+        but not yet inserted into C{_heap}.
+
+    @ivar _cancellations: The number of cancelled L{DelayedCall}s in C{_heap}
+        and C{_scheduled}.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._scheduled = []
+        self._cancellations = 0
+
+
+    def schedule(self, call):
+        """
+        Add a newly created L{DelayedCall} to this queue.  It will not be
+        returned by C{popDue} until C{insertScheduled} is next called.
+
+        @param call: The L{DelayedCall} to add.
+        """
+        self._scheduled.append(call)
+
+
+    def insertScheduled(self):
+        """
+        Make all calls passed to C{schedule} since the last call to this method
+        eligible to run, discarding any which have been cancelled.
+        """
+        for call in self._scheduled:
+            if call.cancelled:
+                self._cancellations -= 1
+            else:
+                call.activate_delay()
+                heappush(self._heap, call)
+        self._scheduled = []
+
+        if (self._cancellations > 50 and
+            self._cancellations > len(self._heap) >> 1):
+            self._cancellations = 0
+            self._heap = [x for x in self._heap if not x.cancelled]
+            heapify(self._heap)
+
+
+    def push(self, call):
+        """
+        Put a L{DelayedCall} previously returned by C{popDue} back in this
+        queue, at the position given by its current C{time}.
+
+        @param call: The L{DelayedCall} to add.
+        """
+        heappush(self._heap, call)
+
+
+    def moveSooner(self, call):
+        """
+        Restore the ordering of this queue after the C{time} of C{call} has
+        been decreased.
+
+        @param call: A L{DelayedCall} in this queue.
+        """
+        # Linear time find: slow.
+        heap = self._heap
+        try:
+            pos = heap.index(call)
+
+            # Move elt up the heap until it rests at the right place.
+            elt = heap[pos]
+            while pos != 0:
+                parent = (pos-1) // 2
+                if heap[parent] <= elt:
+                    break
+                # move parent down
+                heap[pos] = heap[parent]
+                pos = parent
+            heap[pos] = elt
+        except ValueError:
+            # element was not found in heap - oh well...
+            pass
+
+
+    def cancel(self, call):
+        """
+        Note that C{call} is about to be cancelled and should never be returned
+        by C{popDue}.
+
+        @param call: A L{DelayedCall} in this queue.
+        """
+        self._cancellations += 1
+
+
+    def earliest(self):
+        """
+        @return: The L{DelayedCall} with the smallest C{time} in this queue
+            (possibly one which has been cancelled), or C{None} if the queue
+            is empty.
+        """
+        if self._heap:
+            return self._heap[0]
+        return None
+
+
+    def popDue(self, now):
+        """
+        Remove and return the earliest call which has not been cancelled, if
+        it is due.
+
+        @param now: The current time.
+        @type now: C{float}
+
+        @return: A L{DelayedCall} with a C{time} not greater than C{now}, or
+            C{None} if there is no such call.
+        """
+        heap = self._heap
+        while heap and heap[0].time <= now:
+            call = heappop(heap)
+            if call.cancelled:
+                self._cancellations -= 1
+                continue
+            return call
+        return None
+
+
+    def getCalls(self):
+        """
+        @return: A C{list} of all the L{DelayedCall}s in this queue which have
+            not been cancelled, in no particular order.
+        """
+        return [x for x in (self._heap + self._scheduled) if not x.cancelled]
+
+
+
+class IndexedTimerQueue(HeapTimerQueue):
+    """
+    A timer queue which records the position of each L{DelayedCall} in its
+    heap, so that moving a call sooner or cancelling it takes logarithmic
+    rather than linear time, and cancelled calls are removed immediately
+    instead of lingering in the heap.
+
+    This is worthwhile for applications which keep a very large number of
+    calls pending and frequently reset or cancel them, for example servers
+    with many connections using L{twisted.protocols.policies.TimeoutMixin}.
+    Install it with L{ReactorBase.installTimerQueue}.
+    """
+
+    def insertScheduled(self):
+        """
+        Make all calls passed to C{schedule} since the last call to this method
+        eligible to run, discarding any which have been cancelled.
+        """
+        scheduled = self._scheduled
+        if scheduled:
+            self._scheduled = []
+            for call in scheduled:
+                if not call.cancelled:
+                    call.activate_delay()
+                    self.push(call)
+
+
+    def push(self, call):
+        """
+        Put a L{DelayedCall} previously returned by C{popDue} back in this
+        queue, at the position given by its current C{time}.
+
+        @param call: The L{DelayedCall} to add.
+        """
+        heap = self._heap
+        heap.append(call)
+        self._siftUp(len(heap) - 1)
+
+
+    def moveSooner(self, call):
+        """
+        Restore the ordering of this queue after the C{time} of C{call} has
+        been decreased.
+
+        @param call: A L{DelayedCall} in this queue.
+        """
+        if call._heapIndex is not None:
+            self._siftUp(call._heapIndex)
+
+
+    def cancel(self, call):
+        """
+        Remove C{call} from this queue.  If it has been scheduled but not yet
+        inserted it is left to be discarded by C{insertScheduled}.
+
+        @param call: A L{DelayedCall} in this queue.
+        """
+        if call._heapIndex is not None:
+            self._removeAt(call._heapIndex)
+
+
+    def popDue(self, now):
+        """
+        Remove and return the earliest call, if it is due.
+
+        @param now: The current time.
+        @type now: C{float}
+
+        @return: A L{DelayedCall} with a C{time} not greater than C{now}, or
+            C{None} if there is no such call.
+        """
+        heap = self._heap
+        if heap and heap[0].time <= now:
+            return self._removeAt(0)
+        return None
+
+
+    def _removeAt(self, index):
+        """
+        Remove the call at C{index} in the heap, moving the last element of
+        the heap into its place.
+
+        @param index: A position in C{_heap}.
+        @type index: C{int}
+
+        @return: The removed L{DelayedCall}.
+        """
+        heap = self._heap
+        call = heap[index]
+        call._heapIndex = None
+        last = heap.pop()
+        if last is not call:
+            heap[index] = last
+            if index and last.time < heap[(index - 1) >> 1].time:
+                self._siftUp(index)
+            else:
+                self._siftDown(index)
+        return call
+
+
+    def _siftUp(self, index):
+        """
+        Move the call at C{index} towards the root of the heap until its
+        parent is not later than it, updating the recorded positions of every
+        call it passes.
+
+        @param index: A position in C{_heap}.
+        @type index: C{int}
+        """
+        heap = self._heap
+        call = heap[index]
+        time = call.time
+        while index:
+            parentIndex = (index - 1) >> 1
+            parent = heap[parentIndex]
+            if parent.time <= time:
+                break
+            heap[index] = parent
+            parent._heapIndex = index
+            index = parentIndex
+        heap[index] = call
+        call._heapIndex = index
+
+
+    def _siftDown(self, index):
+        """
+        Move the call at C{index} towards the leaves of the heap until neither
+        of its children is earlier than it, updating the recorded positions of
+        every call it passes.
+
+        @param index: A position in C{_heap}.
+        @type index: C{int}
+        """
+        heap = self._heap
+        size = len(heap)
+        call = heap[index]
+        time = call.time
+        while True:
+            childIndex = 2 * index + 1
+            if childIndex >= size:
+                break
+            child = heap[childIndex]
+            rightIndex = childIndex + 1
+            if rightIndex < size and heap[rightIndex].time < child.time:
+                childIndex = rightIndex
+                child = heap[rightIndex]
+            if time <= child.time:
+                break
+            heap[index] = child
+            child._heapIndex = index
+            index = childIndex
+        heap[index] = call
+        call._heapIndex = index
+
+
+
+def _callableName(f):
+    """
+    Name a callable for L{LoopInstrumentation} reports.
+
+    @return: The fully qualified name of C{f} if it has one, otherwise its
+        C{repr}.
+    @rtype: C{str}
+    """
+    try:
+        return reflect.fullyQualifiedName(f)
+    except Exception:
+        return reflect.safe_repr(f)
+
+
+
+class LoopInstrumentation(object):
+    """
+    Measures where a reactor spends its time, and reports calls which block
+    it for too long.
+
+    Install it with L{ReactorBase.installInstrumentation}.  The reactor then
+    measures each iteration of its loop and the time spent running calls
+    from C{callFromThread}, timed calls and, in poll-like reactors, C{doRead}
+    and C{doWrite}.  How late each timed call runs is recorded in a histogram
+    of loop lag.  Without instrumentation installed, the reactor makes one
+    attribute check per iteration and per event dispatched.
+
+    Each timed call, C{doRead} or C{doWrite} taking longer than C{threshold}
+    is logged with the keys C{slowCall} (the name of what was called),
+    C{kind} (C{"timed"}, C{"doRead"} or C{"doWrite"}) and C{duration}, and
+    kept in C{slowCalls}.  If C{reportInterval} is set, the result of
+    L{statistics} is also logged under the C{loopStatistics} key every
+    C{reportInterval} seconds, after which the statistics are reset.
+
+    @cvar lagBounds: The upper bounds, in seconds, of the buckets of
+        C{lagHistogram} except the last, which counts anything later.
+
+    @ivar threshold: The number of seconds a call may take before it is
+        reported as slow.
+
+    @ivar reportInterval: C{None}, or the number of seconds between logged
+        statistics.
+
+    @ivar iterations: The number of completed iterations of the loop.
+
+    @ivar iterationTime: The total wall time of those iterations, including
+        time spent waiting for events.
+
+    @ivar maxIterationTime: The longest of those iterations.
+
+    @ivar threadCallTime: The time spent running calls from
+        C{callFromThread}.
+
+    @ivar timedCallTime: The time spent running timed calls.
+
+    @ivar ioTime: The time spent in C{doRead} and C{doWrite}.
+
+    @ivar lagHistogram: A C{list} counting timed calls by how late they ran,
+        in buckets bounded by C{lagBounds}.
+
+    @ivar slowCalls: A C{deque} of the last C{maxSlowCalls} slow calls, as
+        C{(kind, name, duration)} tuples.
+
+    @ivar slowCallCount: The number of slow calls.
+    """
+
+    lagBounds = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5,
+                 1.0, 2.0, 5.0)
+    maxSlowCalls = 100
+
+    _iterationStarted = None
+    _lastReport = None
+
+    def __init__(self, threshold=0.1, reportInterval=None,
+                 seconds=runtimeSeconds):
+        """
+        @param threshold: See C{threshold}.
+        @type threshold: C{float}
+
+        @param reportInterval: See C{reportInterval}.
+        @type reportInterval: C{float} or C{NoneType}
+
+        @param seconds: A function returning the current time in seconds.
+        """
+        self.threshold = threshold
+        self.reportInterval = reportInterval
+        self._seconds = seconds
+        self.reset()
+
+
+    def reset(self):
+        """
+        Discard the statistics gathered so far.
+        """
+        self.iterations = 0
+        self.iterationTime = 0.0
+        self.maxIterationTime = 0.0
+        self.threadCallTime = 0.0
+        self.timedCallTime = 0.0
+        self.ioTime = 0.0
+        self.lagHistogram = [0] * (len(self.lagBounds) + 1)
+        self.slowCalls = deque(maxlen=self.maxSlowCalls)
+        self.slowCallCount = 0
+
+
+    def statistics(self):
+        """
+        Summarize the statistics gathered so far.
+
+        @return: A C{dict} with the values of the instance variables of the
+            same names, and C{lagBounds}.
+        """
+        return {
+            'iterations': self.iterations,
+            'iterationTime': self.iterationTime,
+            'maxIterationTime': self.maxIterationTime,
+            'threadCallTime': self.threadCallTime,
+            'timedCallTime': self.timedCallTime,
+            'ioTime': self.ioTime,
+            'lagBounds': self.lagBounds,
+            'lagHistogram': list(self.lagHistogram),
+            'slowCalls': list(self.slowCalls),
+            'slowCallCount': self.slowCallCount,
+            }
+
+
+    def startIteration(self):
+        """
+        Note the start of an iteration of the reactor loop, which is the end
+        of the previous one, and log statistics if they are due.
+
+        @return: The current time.
+        """
+        now = self._seconds()
+        started = self._iterationStarted
+        self._iterationStarted = now
+        if started is None:
+            self._lastReport = now
+            return now
+        elapsed = now - started
+        self.iterations += 1
+        self.iterationTime += elapsed
+        if elapsed > self.maxIterationTime:
+            self.maxIterationTime = elapsed
+        if (self.reportInterval is not None and
+                now - self._lastReport >= self.reportInterval):
+            self._lastReport = now
+            statistics = self.statistics()
+            log.msg(format="Reactor loop ran %(iterations)d iterations: "
+                           "%(ioTime).3fs in I/O, %(timedCallTime).3fs in "
+                           "timed calls, %(threadCallTime).3fs in thread "
+                           "calls, %(slowCallCount)d slow calls",
+                    loopStatistics=statistics, **statistics)
+            self.reset()
+        return now
+
+
+    def ranThreadCalls(self, started):
+        """
+        Record the time spent running calls from C{callFromThread}.
+
+        @param started: The time the reactor started running them.
+        """
+        self.threadCallTime += self._seconds() - started
+
+
+    def callTimed(self, call):
+        """
+        Run a timed call, recording how late it ran and how long it took.
+
+        @param call: A due L{DelayedCall}.
+
+        @return: The result of the call.
+        """
+        started = self._seconds()
+        lag = started - call.time
+        self.lagHistogram[bisect_left(self.lagBounds, lag)] += 1
+        try:
+            return call.func(*call.args, **call.kw)
+        finally:
+            elapsed = self._seconds() - started
+            self.timedCallTime += elapsed
+            if elapsed > self.threshold:
+                self._slowCall("timed", _callableName(call.func), elapsed)
+
+
+    def callIO(self, selectable, methodName):
+        """
+        Call C{doRead} or C{doWrite} on a selectable, recording how long it
+        took.
+
+        @param selectable: An L{IReadDescriptor} or L{IWriteDescriptor}.
+
+        @param methodName: C{"doRead"} or C{"doWrite"}.
+
+        @return: The result of the call.
+        """
+        started = self._seconds()
+        try:
+            return getattr(selectable, methodName)()
+        finally:
+            elapsed = self._seconds() - started
+            self.ioTime += elapsed
+            if elapsed > self.threshold:
+                self._slowCall(
+                    methodName,
+                    reflect.qual(selectable.__class__) + "." + methodName,
+                    elapsed)
+
+
+    def _slowCall(self, kind, name, duration):
+        """
+        Record and log a slow call.
+        """
+        self.slowCallCount += 1
+        self.slowCalls.append((kind, name, duration))
+        log.msg(format="Reactor blocked for %(duration).3f seconds by "
+                       "%(kind)s call to %(slowCall)s",
+                slowCall=name, kind=kind, duration=duration)
+
+
+
 @implementer(IResolverSimple)
 class ThreadedResolver(object):
     """
@@ -291,6 +834,214 @@ class BlockingResolver:
             return defer.succeed(address)
 
 
+
+@implementer(IResolverSimple)
+class CachingResolver(object):
+    """
+    L{CachingResolver} remembers the results of name lookups for a while, so
+    that repeated connections to the same host do not each need a lookup, and
+    runs a single lookup for all the requests for a name made while one is
+    already in progress.
+
+    It resolves names with L{getHostByName}, for L{IReactorPluggableResolver},
+    and with L{getAddressInfo}, for L{HostnameEndpoint
+    <twisted.internet.endpoints.HostnameEndpoint>}.  Install it with
+    L{installResolver <IReactorPluggableResolver.installResolver>} and both
+    the reactor's own connections and any L{HostnameEndpoint
+    <twisted.internet.endpoints.HostnameEndpoint>}s using the reactor will
+    share it.
+
+    @ivar positiveTTL: The number of seconds for which a successful lookup is
+        remembered.
+    @type positiveTTL: L{float}
+
+    @ivar negativeTTL: The number of seconds for which a failed lookup is
+        remembered.
+    @type negativeTTL: L{float}
+
+    @ivar maxEntries: The largest number of lookups to remember.  When there
+        are more, the least recently used are forgotten.
+    @type maxEntries: L{int}
+
+    @ivar hits: The number of requests answered from the cache.
+    @type hits: L{int}
+
+    @ivar coalesced: The number of requests answered by a lookup already in
+        progress for another request.
+    @type coalesced: L{int}
+
+    @ivar misses: The number of requests which needed a lookup of their own.
+    @type misses: L{int}
+
+    @ivar _reactor: The reactor whose clock is used to expire results, and
+        the threadpool of which is used to call L{socket.getaddrinfo}.
+
+    @ivar _resolver: The L{IResolverSimple} provider used for the lookups made
+        by L{getHostByName}.
+
+    @ivar _cache: An L{OrderedDict} mapping a key identifying a lookup to a
+        two-tuple of the time at which its result expires and the result, a
+        value or a L{failure.Failure}, least recently used first.
+
+    @ivar _pending: A L{dict} mapping a key identifying a lookup in progress
+        to a L{list} of the L{Deferred}s waiting for its result.
+
+    @ivar _getaddrinfo: A hook used for testing name resolution.
+    """
+    _getaddrinfo = staticmethod(socket.getaddrinfo)
+
+    def __init__(self, reactor, resolver=None, positiveTTL=300,
+                 negativeTTL=30, maxEntries=1000):
+        """
+        @param reactor: See L{CachingResolver._reactor}.
+
+        @param resolver: See L{CachingResolver._resolver}.  By default, a
+            L{ThreadedResolver} using C{reactor}.
+
+        @param positiveTTL: See L{CachingResolver.positiveTTL}.
+
+        @param negativeTTL: See L{CachingResolver.negativeTTL}.
+
+        @param maxEntries: See L{CachingResolver.maxEntries}.
+        """
+        if resolver is None:
+            resolver = ThreadedResolver(reactor)
+        self._reactor = reactor
+        self._resolver = resolver
+        self.positiveTTL = positiveTTL
+        self.negativeTTL = negativeTTL
+        self.maxEntries = maxEntries
+        self.hits = 0
+        self.coalesced = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._pending = {}
+
+
+    def hitRate(self):
+        """
+        Get the fraction of requests which did not need a lookup of their own.
+
+        @return: The number of requests answered from the cache or by a lookup
+            in progress, divided by the number of requests, or C{0.0} if there
+            have been none.
+        @rtype: L{float}
+        """
+        total = self.hits + self.coalesced + self.misses
+        if not total:
+            return 0.0
+        return (self.hits + self.coalesced) / total
+
+
+    def clear(self):
+        """
+        Forget the results of all lookups.  Lookups already in progress are
+        unaffected.
+        """
+        self._cache.clear()
+
+
+    def getHostByName(self, name, timeout=(1, 3, 11, 45)):
+        """
+        See L{twisted.internet.interfaces.IResolverSimple.getHostByName}.
+
+        A request made while a lookup for the same name is in progress gets the
+        result of that lookup, and so is subject to its C{timeout}.
+        """
+        return self._lookup(
+            ("name", name), self._resolver.getHostByName, name, timeout)
+
+
+    def getAddressInfo(self, host, port, family=0, socktype=0, proto=0,
+                       flags=0):
+        """
+        Look up the addresses of a host with L{socket.getaddrinfo} in the
+        reactor's threadpool.
+
+        The arguments are those of L{socket.getaddrinfo}.
+
+        @return: A L{Deferred} which fires with the L{list} of 5-tuples
+            returned by L{socket.getaddrinfo}, or fails with its exception.
+        """
+        return self._lookup(
+            ("addrinfo", host, port, family, socktype, proto, flags),
+            threads.deferToThreadPool, self._reactor,
+            self._reactor.getThreadPool(), self._getaddrinfo,
+            host, port, family, socktype, proto, flags)
+
+
+    def _lookup(self, key, lookup, *args):
+        """
+        Get the result of a lookup from the cache, from a lookup in progress
+        or from a new lookup.
+
+        @param key: The key identifying the lookup.
+
+        @param lookup: A callable returning a L{Deferred} which fires with the
+            result of a new lookup.
+
+        @param args: The arguments to pass to C{lookup}.
+
+        @return: A L{Deferred} which fires with a copy of the result.
+        """
+        entry = self._cache.pop(key, None)
+        if entry is not None:
+            expires, result = entry
+            if expires > self._reactor.seconds():
+                self._cache[key] = entry
+                self.hits += 1
+                return self._deliver(result)
+
+        waiting = Deferred()
+        if key in self._pending:
+            self.coalesced += 1
+            self._pending[key].append(waiting)
+        else:
+            self.misses += 1
+            self._pending[key] = [waiting]
+            d = defer.maybeDeferred(lookup, *args)
+            d.addBoth(self._lookedUp, key)
+        return waiting
+
+
+    def _lookedUp(self, result, key):
+        """
+        Remember the result of a lookup and give it to everything waiting for
+        it.
+
+        @param result: The result of the lookup.
+
+        @param key: The key identifying the lookup.
+        """
+        if isinstance(result, failure.Failure):
+            ttl = self.negativeTTL
+        else:
+            ttl = self.positiveTTL
+        if ttl > 0:
+            self._cache[key] = (self._reactor.seconds() + ttl, result)
+            while len(self._cache) > self.maxEntries:
+                self._cache.popitem(last=False)
+        for waiting in self._pending.pop(key):
+            self._deliver(result).chainDeferred(waiting)
+
+
+    def _deliver(self, result):
+        """
+        Make a L{Deferred} which has the result of a lookup, copying it so that
+        callers cannot change the cached result.
+
+        @param result: The result of the lookup.
+
+        @rtype: L{Deferred}
+        """
+        if isinstance(result, failure.Failure):
+            return defer.fail(result)
+        if isinstance(result, list):
+            result = list(result)
+        return defer.succeed(result)
+
+
+
 class _ThreePhaseEvent(object):
     """
     Collection of callables (with arguments) which can be invoked as a group in
@@ -460,9 +1211,26 @@ class ReactorBase(object):
     @ivar _registerAsIOThread: A flag controlling whether the reactor will
         register the thread it is running in as the I/O thread when it starts.
         If C{True}, registration will be done, otherwise it will not be.
+
+    @ivar _timerQueue: The timer queue (by default a L{HeapTimerQueue})
+        keeping track of the L{DelayedCall}s created by C{callLater}.
+
+    @ivar _instrumentation: C{None}, or the L{LoopInstrumentation} installed
+        with L{installInstrumentation}.
+
+    @ivar _wakeUpPending: C{True} if a call has been added to
+        C{threadCallQueue} and the waker written to since C{runUntilCurrent}
+        last started draining the queue.  Further calls queued meanwhile do
+        not need to wake the reactor again.
+
+    @ivar _afterTimedCalls: A C{list} of callables to call once the timed
+        calls being run by C{runUntilCurrent} have all been run.  See
+        L{_callAfterTimedCalls}.
     """
 
     _registerAsIOThread = True
+    _instrumentation = None
+    _wakeUpPending = False
 
     _stopped = True
     installed = False
@@ -473,10 +1241,9 @@ class ReactorBase(object):
 
     def __init__(self):
         self.threadCallQueue = []
+        self._afterTimedCalls = []
         self._eventTriggers = {}
-        self._pendingTimedCalls = []
-        self._newTimedCalls = []
-        self._cancellations = 0
+        self._timerQueue = HeapTimerQueue()
         self.running = False
         self._started = False
         self._justStopped = False
@@ -511,6 +1278,39 @@ class ReactorBase(object):
         self.resolver = resolver
         return oldResolver
 
+
+    def installTimerQueue(self, timerQueue):
+        """
+        Replace the structure used to keep track of pending L{DelayedCall}s,
+        moving any calls which are already pending into it.
+
+        @param timerQueue: A new, empty timer queue, such as an instance of
+            L{IndexedTimerQueue}.
+
+        @return: The previously installed timer queue.
+        """
+        oldQueue = self._timerQueue
+        oldQueue.insertScheduled()
+        for call in oldQueue.getCalls():
+            timerQueue.push(call)
+        self._timerQueue = timerQueue
+        return oldQueue
+
+
+    def installInstrumentation(self, instrumentation):
+        """
+        Start or stop measuring where the reactor spends its time.
+
+        @param instrumentation: A L{LoopInstrumentation} to record the
+            reactor's activity from now on, or C{None} to stop recording it.
+
+        @return: The previously installed instrumentation, or C{None}.
+        """
+        oldInstrumentation = self._instrumentation
+        self._instrumentation = instrumentation
+        return oldInstrumentation
+
+
     def wakeUp(self):
         """
         Wake up the event loop.
@@ -709,31 +1509,14 @@ class ReactorBase(object):
                            self._cancelCallLater,
                            self._moveCallLaterSooner,
                            seconds=self.seconds)
-        self._newTimedCalls.append(tple)
+        self._timerQueue.schedule(tple)
         return tple
 
     def _moveCallLaterSooner(self, tple):
-        # Linear time find: slow.
-        heap = self._pendingTimedCalls
-        try:
-            pos = heap.index(tple)
-
-            # Move elt up the heap until it rests at the right place.
-            elt = heap[pos]
-            while pos != 0:
-                parent = (pos-1) // 2
-                if heap[parent] <= elt:
-                    break
-                # move parent down
-                heap[pos] = heap[parent]
-                pos = parent
-            heap[pos] = elt
-        except ValueError:
-            # element was not found in heap - oh well...
-            pass
+        self._timerQueue.moveSooner(tple)
 
     def _cancelCallLater(self, tple):
-        self._cancellations+=1
+        self._timerQueue.cancel(tple)
 
 
     def getDelayedCalls(self):
@@ -741,16 +1524,10 @@ class ReactorBase(object):
         They are returned in no particular order.
         This method is not efficient -- it is really only meant for
         test cases."""
-        return [x for x in (self._pendingTimedCalls + self._newTimedCalls) if not x.cancelled]
+        return self._timerQueue.getCalls()
 
     def _insertNewDelayedCalls(self):
-        for call in self._newTimedCalls:
-            if call.cancelled:
-                self._cancellations-=1
-            else:
-                call.activate_delay()
-                heappush(self._pendingTimedCalls, call)
-        self._newTimedCalls = []
+        self._timerQueue.insertScheduled()
 
 
     def timeout(self):
@@ -765,10 +1542,11 @@ class ReactorBase(object):
         # insert new delayed calls to make sure to include them in timeout value
         self._insertNewDelayedCalls()
 
-        if not self._pendingTimedCalls:
+        earliest = self._timerQueue.earliest()
+        if earliest is None:
             return None
 
-        delay = self._pendingTimedCalls[0].time - self.seconds()
+        delay = earliest.time - self.seconds()
 
         # Pick a somewhat arbitrary maximum possible value for the timeout.
         # This value is 2 ** 31 / 1000, which is the number of seconds which can
@@ -783,9 +1561,30 @@ class ReactorBase(object):
         return max(0, min(longest, delay))
 
 
+    def _callAfterTimedCalls(self, f):
+        """
+        Call C{f} with no arguments once C{runUntilCurrent} has run all the
+        timed calls which are due, including those after the one calling this
+        method.
+
+        This lets a timed call arrange for something to be done last in this
+        iteration of the reactor.
+
+        @param f: The callable to call.
+        """
+        self._afterTimedCalls.append(f)
+
+
     def runUntilCurrent(self):
         """Run all pending timed calls.
         """
+        instrumentation = self._instrumentation
+        if instrumentation is not None:
+            started = instrumentation.startIteration()
+
+        # Clear this before looking at the queue: any call queued from now on
+        # will either be run below or wake the reactor up again.
+        self._wakeUpPending = False
         if self.threadCallQueue:
             # Keep track of how many calls we actually make, as we're
             # making them, in case another call is added to the queue
@@ -803,25 +1602,29 @@ class ReactorBase(object):
             del self.threadCallQueue[:count]
             if self.threadCallQueue:
                 self.wakeUp()
+            if instrumentation is not None:
+                instrumentation.ranThreadCalls(started)
 
         # insert new delayed calls now
         self._insertNewDelayedCalls()
 
         now = self.seconds()
-        while self._pendingTimedCalls and (self._pendingTimedCalls[0].time <= now):
-            call = heappop(self._pendingTimedCalls)
-            if call.cancelled:
-                self._cancellations-=1
-                continue
+        while True:
+            call = self._timerQueue.popDue(now)
+            if call is None:
+                break
 
             if call.delayed_time > 0:
                 call.activate_delay()
-                heappush(self._pendingTimedCalls, call)
+                self._timerQueue.push(call)
                 continue
 
             try:
                 call.called = 1
-                call.func(*call.args, **call.kw)
+                if instrumentation is None:
+                    call.func(*call.args, **call.kw)
+                else:
+                    instrumentation.callTimed(call)
             except:
                 log.deferr()
                 if hasattr(call, "creator"):
@@ -833,13 +1636,13 @@ class ReactorBase(object):
                     e += "\n"
                     log.msg(e)
 
-
-        if (self._cancellations > 50 and
-             self._cancellations > len(self._pendingTimedCalls) >> 1):
-            self._cancellations = 0
-            self._pendingTimedCalls = [x for x in self._pendingTimedCalls
-                                       if not x.cancelled]
-            heapify(self._pendingTimedCalls)
+        if self._afterTimedCalls:
+            afterTimedCalls, self._afterTimedCalls = self._afterTimedCalls, []
+            for f in afterTimedCalls:
+                try:
+                    f()
+                except:
+                    log.err()
 
         if self._justStopped:
             self._justStopped = False
@@ -945,7 +1748,35 @@ class ReactorBase(object):
             # this is probably a bug in Jython, but until fixed this code
             # won't work in Jython.
             self.threadCallQueue.append((f, args, kw))
-            self.wakeUp()
+            self._wakeUpForThreadCalls()
+
+
+        def callFromThreadMany(self, calls):
+            """
+            Run several calls in the reactor thread, in order, waking the
+            reactor up at most once.
+
+            This is equivalent to calling L{callFromThread} for each call, but
+            cheaper when a thread produces many results at a time.
+
+            @param calls: An iterable of C{(f, args, kwargs)} tuples.
+            """
+            calls = list(calls)
+            for (f, args, kw) in calls:
+                assert callable(f), "%s is not callable" % (f,)
+            if calls:
+                self.threadCallQueue.extend(calls)
+                self._wakeUpForThreadCalls()
+
+
+        def _wakeUpForThreadCalls(self):
+            """
+            Wake the reactor up to run the calls in C{threadCallQueue}, unless
+            that has already been done since it last started running them.
+            """
+            if not self._wakeUpPending:
+                self._wakeUpPending = True
+                self.wakeUp()
 
         def _initThreadPool(self):
             """
@@ -1008,10 +1839,103 @@ class ReactorBase(object):
             # See comment in the other callFromThread implementation.
             self.threadCallQueue.append((f, args, kw))
 
+        def callFromThreadMany(self, calls):
+            calls = list(calls)
+            for (f, args, kw) in calls:
+                assert callable(f), "%s is not callable" % (f,)
+            self.threadCallQueue.extend(calls)
+
 if platform.supportsThreads():
     classImplements(ReactorBase, IReactorThreads)
 
 
+class _WriteFlusher(object):
+    """
+    Flush the writes of connections with write coalescing enabled at the end
+    of the current reactor iteration, once its events have been dispatched
+    and the timed calls due have been run.
+
+    One timed call is used per iteration, however many connections wrote.
+    A connection is flushed by calling its C{_flushWrites} method; both
+    L{twisted.internet.tcp.Connection} and
+    L{twisted.protocols.tls.TLSMemoryBIOProtocol} use this.
+
+    @ivar _reactor: The reactor the connections belong to.
+
+    @ivar _pending: A C{list} of the connections to flush.
+
+    @ivar _call: The L{IDelayedCall} which will call L{_flush}, or C{None}.
+    """
+    def __init__(self, reactor):
+        self._reactor = reactor
+        self._pending = []
+        self._call = None
+
+
+    def add(self, connection):
+        """
+        Flush C{connection} at the end of this iteration.
+        """
+        self._pending.append(connection)
+        if self._call is None:
+            self._call = self._reactor.callLater(0, self._flushLast)
+
+
+    def _flushLast(self):
+        """
+        Flush after any other timed calls due in this iteration, if the
+        reactor supports it, since they may write more.
+        """
+        callAfterTimedCalls = getattr(
+            self._reactor, "_callAfterTimedCalls", None)
+        if callAfterTimedCalls is None:
+            self._flush()
+        else:
+            callAfterTimedCalls(self._flush)
+
+
+    def _flush(self):
+        """
+        Flush all the connections added since the last flush, including any
+        added while flushing, such as a TCP connection written to by a TLS
+        layer above it.
+
+        Each connection is flushed at most once per pass, so that one which
+        is added again after being flushed cannot keep the reactor from its
+        other events; it is flushed in the next iteration instead.
+        """
+        flushed = set()
+        again = []
+        while self._pending:
+            pending, self._pending = self._pending, []
+            for connection in pending:
+                if id(connection) in flushed:
+                    again.append(connection)
+                    continue
+                flushed.add(id(connection))
+                try:
+                    log.callWithLogger(connection, connection._flushWrites)
+                except:
+                    log.err()
+        self._call = None
+        for connection in again:
+            self.add(connection)
+
+
+
+_flushers = weakref.WeakKeyDictionary()
+
+def _flusherFor(reactor):
+    """
+    Get the L{_WriteFlusher} for C{reactor}, creating it if needed.
+    """
+    flusher = _flushers.get(reactor)
+    if flusher is None:
+        flusher = _flushers[reactor] = _WriteFlusher(reactor)
+    return flusher
+
+
+
 @implementer(IConnector)
 class BaseConnector:
     """Basic implementation of connector.
@@ -1099,15 +2023,31 @@ class BasePort(abstract.FileDescriptor):
     """Basic implementation of a ListeningPort.
 
     Note: This does not actually implement IListeningPort.
+
+    @ivar reusePort: If C{True}, sockets created by L{createInternetSocket}
+        have C{SO_REUSEPORT} set, so that several sockets (usually in
+        different processes) can be bound to the same address and have the
+        kernel distribute connections or datagrams among them.
+    @type reusePort: C{bool}
     """
 
     addressFamily = None
     socketType = None
+    reusePort = False
 
     def createInternetSocket(self):
         s = socket.socket(self.addressFamily, self.socketType)
         s.setblocking(0)
         fdesc._setCloseOnExec(s.fileno())
+        if self.reusePort:
+            try:
+                if getattr(socket, "SO_REUSEPORT", None) is None:
+                    raise socket.error(
+                        ENOPROTOOPT, "SO_REUSEPORT is not supported")
+                s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            except socket.error:
+                s.close()
+                raise
         return s
 
 
@@ -21,6 +21,7 @@ from __future__ import division, absolute_import
 import traceback
 import types
 import warnings
+from collections import deque
 from sys import exc_info
 from functools import wraps
 
@@ -75,7 +76,12 @@ def succeed(result):
     @rtype: L{Deferred}
     """
     d = Deferred()
-    d.callback(result)
+    if Deferred.debug or isinstance(result, (Deferred, failure.Failure)):
+        d.callback(result)
+    else:
+        # There are no callbacks to run yet, so just record the result.
+        d.called = True
+        d.result = result
     return d
 
 
@@ -184,7 +190,7 @@ _CONTINUE = object()
 
 
 
-class Deferred:
+class Deferred(object):
     """
     This is a callback which will be put off until later.
 
@@ -226,24 +232,26 @@ class Deferred:
 
     @ivar _chainedTo: If this Deferred is waiting for the result of another
         Deferred, this is a reference to the other Deferred.  Otherwise, C{None}.
-    """
 
-    called = False
-    paused = 0
-    _debugInfo = None
-    _suppressAlreadyCalled = False
+    @ivar callbacks: The pending callback and errback pairs.  Each entry is a
+        pair of C{(callable, args, keywords)} triples, the first used when the
+        result is not a L{failure.Failure} and the second when it is.
+        C{args} and C{keywords} may be C{None} or empty.
+    @type callbacks: C{list}
+    """
 
-    # Are we currently running a user-installed callback?  Meant to prevent
-    # recursive running of callbacks when a reentrant call to add a callback is
-    # used.
-    _runningCallbacks = False
+    # Most Deferreds live for a very short time, so keep them small and
+    # their attributes quick to reach.  A __dict__ slot is still provided
+    # for subclasses and for code which stores its own attributes on a
+    # Deferred.
+    __slots__ = ('callbacks', 'called', 'paused', 'result', '_canceller',
+                 '_debugInfo', '_suppressAlreadyCalled', '_runningCallbacks',
+                 '_chainedTo', '__dict__', '__weakref__')
 
     # Keep this class attribute for now, for compatibility with code that
     # sets it directly.
     debug = False
 
-    _chainedTo = None
-
     def __init__(self, canceller=None):
         """
         Initialize a L{Deferred}.
@@ -269,7 +277,16 @@ class Deferred:
             return result is ignored.
         """
         self.callbacks = []
+        self.called = False
+        self.paused = 0
         self._canceller = canceller
+        self._suppressAlreadyCalled = False
+        # Are we currently running a user-installed callback?  Meant to
+        # prevent recursive running of callbacks when a reentrant call to add
+        # a callback is used.
+        self._runningCallbacks = False
+        self._chainedTo = None
+        self._debugInfo = None
         if self.debug:
             self._debugInfo = DebugInfo()
             self._debugInfo.creator = traceback.format_stack()[:-1]
@@ -303,8 +320,11 @@ class Deferred:
 
         See L{addCallbacks}.
         """
-        return self.addCallbacks(callback, callbackArgs=args,
-                                 callbackKeywords=kw)
+        assert callable(callback)
+        self.callbacks.append(((callback, args, kw), (passthru, None, None)))
+        if self.called:
+            self._runCallbacks()
+        return self
 
 
     def addErrback(self, errback, *args, **kw):
@@ -313,9 +333,11 @@ class Deferred:
 
         See L{addCallbacks}.
         """
-        return self.addCallbacks(passthru, errback,
-                                 errbackArgs=args,
-                                 errbackKeywords=kw)
+        assert callable(errback)
+        self.callbacks.append(((passthru, None, None), (errback, args, kw)))
+        if self.called:
+            self._runCallbacks()
+        return self
 
 
     def addBoth(self, callback, *args, **kw):
@@ -325,9 +347,12 @@ class Deferred:
 
         See L{addCallbacks}.
         """
-        return self.addCallbacks(callback, callback,
-                                 callbackArgs=args, errbackArgs=args,
-                                 callbackKeywords=kw, errbackKeywords=kw)
+        assert callable(callback)
+        call = (callback, args, kw)
+        self.callbacks.append((call, call))
+        if self.called:
+            self._runCallbacks()
+        return self
 
 
     def chainDeferred(self, d):
@@ -536,6 +561,7 @@ class Deferred:
         # and then that second Deferred being fired.  ie, if ever had _chainedTo
         # set to something other than None, you might end up on this stack.
         chain = [self]
+        Failure = failure.Failure
 
         while chain:
             current = chain[-1]
@@ -548,12 +574,15 @@ class Deferred:
 
             finished = True
             current._chainedTo = None
-            while current.callbacks:
-                item = current.callbacks.pop(0)
-                callback, args, kw = item[
-                    isinstance(current.result, failure.Failure)]
-                args = args or ()
-                kw = kw or {}
+            # Walk the callbacks by index and discard the ones which have run
+            # afterwards; removing them one at a time from the front of the
+            # list would make long chains quadratic.
+            callbacks = current.callbacks
+            index = 0
+            while index < len(callbacks):
+                item = callbacks[index]
+                index += 1
+                callback, args, kw = item[isinstance(current.result, Failure)]
 
                 # Avoid recursion if we can.
                 if callback is _CONTINUE:
@@ -575,7 +604,15 @@ class Deferred:
                 try:
                     current._runningCallbacks = True
                     try:
-                        current.result = callback(current.result, *args, **kw)
+                        # Most callbacks take no extra arguments; don't build
+                        # empty argument tuples and dictionaries for them.
+                        if kw:
+                            current.result = callback(
+                                current.result, *(args or ()), **kw)
+                        elif args:
+                            current.result = callback(current.result, *args)
+                        else:
+                            current.result = callback(current.result)
                         if current.result is current:
                             warnAboutFunction(
                                 callback,
@@ -588,7 +625,7 @@ class Deferred:
                 except:
                     # Including full frame information in the Failure is quite
                     # expensive, so we avoid it unless self.debug is set.
-                    current.result = failure.Failure(captureVars=self.debug)
+                    current.result = Failure(captureVars=self.debug)
                 else:
                     if isinstance(current.result, Deferred):
                         # The result is another Deferred.  If it has a result,
@@ -611,13 +648,14 @@ class Deferred:
                             if current.result._debugInfo is not None:
                                 current.result._debugInfo.failResult = None
                             current.result = resultResult
+            del callbacks[:index]
 
             if finished:
                 # As much of the callback chain - perhaps all of it - as can be
                 # processed right now has been.  The current Deferred is waiting on
                 # another Deferred or for more callbacks.  Before finishing with it,
                 # make sure its _debugInfo is in the proper state.
-                if isinstance(current.result, failure.Failure):
+                if isinstance(current.result, Failure):
                     # Stash the Failure in the _debugInfo for unhandled error
                     # reporting.
                     current.result.cleanFailure()
@@ -1097,6 +1135,13 @@ def _inlineCallbacks(result, g, deferred):
     waiting = [True, # waiting for result?
                None] # result
 
+    def gotResult(r):
+        if waiting[0]:
+            waiting[0] = False
+            waiting[1] = r
+        else:
+            _inlineCallbacks(r, g, deferred)
+
     while 1:
         try:
             # Send the last result back as the result of the yield expression.
@@ -1155,12 +1200,17 @@ def _inlineCallbacks(result, g, deferred):
 
         if isinstance(result, Deferred):
             # a deferred was yielded, get the result.
-            def gotResult(r):
-                if waiting[0]:
-                    waiting[0] = False
-                    waiting[1] = r
-                else:
-                    _inlineCallbacks(r, g, deferred)
+            if (result.called and not result.paused and
+                    not result._runningCallbacks and not result.callbacks):
+                # It already has a result and nothing else is waiting for
+                # it: take the result just as gotResult would, without adding
+                # a callback.
+                r = result.result
+                result.result = None
+                if result._debugInfo is not None:
+                    result._debugInfo.failResult = None
+                result = r
+                continue
 
             result.addBoth(gotResult)
             if waiting[0]:
@@ -1519,6 +1569,219 @@ class DeferredQueue(object):
 
 
 
+class DeferredFanOut(object):
+    """
+    Run calls which may return L{Deferred}s, at most a fixed number at a time,
+    and deliver their results as they complete.
+
+    Calls are taken from an iterable only as capacity allows, so the iterable
+    may be a generator producing a very large number of them.  A call's
+    capacity is given back when its result is retrieved with L{get}, not when
+    it completes, so at most C{concurrency} results are ever held, however
+    slowly they are consumed.
+
+    When a call fails, no further calls are started and the calls still
+    running are cancelled.  Results which had already completed are still
+    delivered, followed by a L{FirstError} wrapping the failure.
+
+    @ivar _calls: An iterator of C{(index, callable)} pairs for the calls
+        which have not been started yet.
+    @ivar _running: A C{dict} mapping the index of each running call to its
+        L{Deferred}.
+    @ivar _ready: A C{deque} of C{(index, result)} pairs for the calls which
+        have completed but whose results have not been retrieved.
+    @ivar _waiting: A C{deque} of the L{Deferred}s returned by L{get} which
+        are waiting for a result.
+    @ivar _failure: C{None}, or the L{failure.Failure} which ended this
+        fan-out.
+    @ivar _exhausted: C{True} once C{_calls} has no more calls.
+    @ivar _updating: C{True} while L{_update} is running, to stop it being
+        re-entered by calls or callbacks which fire synchronously.
+    """
+
+    def __init__(self, calls, concurrency):
+        """
+        Start the first C{concurrency} calls.
+
+        @param calls: An iterable of callables taking no arguments.  Each may
+            return a L{Deferred} or a plain result, or raise an exception.
+
+        @param concurrency: The maximum number of calls which may be running
+            or holding an unretrieved result at any one time.
+        @type concurrency: C{int}
+
+        @raise ValueError: If C{concurrency} is less than 1.
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        self._calls = enumerate(calls)
+        self._concurrency = concurrency
+        self._running = {}
+        self._ready = deque()
+        self._waiting = deque()
+        self._failure = None
+        self._exhausted = False
+        self._updating = False
+        self._update()
+
+
+    def get(self):
+        """
+        Retrieve the result of the next call to complete.
+
+        @return: A L{Deferred} which fires with an C{(index, result)} pair,
+            where C{index} is the position of the call in the iterable it was
+            taken from, or with C{None} once every call has completed and its
+            result has been retrieved.  If a call failed, it fails with a
+            L{FirstError} wrapping that call's failure once the results which
+            completed before it have been retrieved.  If this fan-out was
+            cancelled, it fails with L{CancelledError}.
+        """
+        if self._ready:
+            d = succeed(self._ready.popleft())
+            self._update()
+            return d
+        elif self._failure is not None:
+            return fail(self._failure)
+        elif self._exhausted and not self._running:
+            return succeed(None)
+        d = Deferred(self._waiting.remove)
+        self._waiting.append(d)
+        return d
+
+
+    def cancel(self):
+        """
+        Start no further calls and cancel the ones which are running.
+
+        Results which have already completed can still be retrieved; after
+        them, L{get} fails with L{CancelledError}.
+        """
+        self._stop(failure.Failure(CancelledError()))
+
+
+    def _start(self, index, call):
+        """
+        Start one call and arrange for its result to be collected.
+        """
+        d = maybeDeferred(call)
+        self._running[index] = d
+        d.addBoth(self._completed, index)
+
+
+    def _completed(self, result, index):
+        """
+        Collect the result of a call, consuming it.
+        """
+        del self._running[index]
+        if isinstance(result, failure.Failure):
+            # Calls cancelled by _stop end up here too, and are ignored.
+            if self._failure is None:
+                self._stop(failure.Failure(FirstError(result, index)))
+        else:
+            self._ready.append((index, result))
+            self._update()
+
+
+    def _stop(self, reason):
+        """
+        Record C{reason} as the end of this fan-out and cancel the calls
+        which are running, unless it has already been stopped.
+        """
+        if self._failure is not None:
+            return
+        self._failure = reason
+        self._calls = None
+        for d in list(self._running.values()):
+            d.cancel()
+        self._update()
+
+
+    def _update(self):
+        """
+        Hand completed results to waiting L{get} callers and start as many
+        calls as capacity allows, until neither is possible.
+        """
+        if self._updating:
+            return
+        self._updating = True
+        try:
+            while True:
+                while self._waiting and self._ready:
+                    self._waiting.popleft().callback(self._ready.popleft())
+                if self._waiting and not self._ready:
+                    if self._failure is not None:
+                        self._waiting.popleft().errback(self._failure)
+                        continue
+                    elif self._exhausted and not self._running:
+                        self._waiting.popleft().callback(None)
+                        continue
+                if (self._failure is not None or self._exhausted or
+                        len(self._running) + len(self._ready) >=
+                        self._concurrency):
+                    break
+                try:
+                    index, call = next(self._calls)
+                except StopIteration:
+                    self._exhausted = True
+                except:
+                    self._updating = False
+                    self._stop(failure.Failure())
+                    return
+                else:
+                    self._start(index, call)
+        finally:
+            self._updating = False
+
+
+
+def gatherBounded(calls, concurrency):
+    """
+    Run calls from an iterable, at most C{concurrency} at a time, and gather
+    their results.
+
+    This is like L{gatherResults}, but for calls rather than L{Deferred}s
+    which have already been started, so that a very large number of them does
+    not mean a very large number of operations in progress at once.  See
+    L{DeferredFanOut}.
+
+    @param calls: An iterable of callables taking no arguments.  Each may
+        return a L{Deferred} or a plain result, or raise an exception.
+
+    @param concurrency: The maximum number of calls to run at once.
+    @type concurrency: C{int}
+
+    @return: A L{Deferred} which fires with a C{list} of the results of the
+        calls, in the order of C{calls}.  If a call fails, the calls still
+        running are cancelled and the L{Deferred} fails with a L{FirstError}
+        wrapping that call's failure.  Cancelling the L{Deferred} cancels the
+        calls which are running and starts no more.
+    """
+    fanOut = DeferredFanOut(calls, concurrency)
+    gathered = Deferred(lambda ignored: fanOut.cancel())
+    _gatherFanOut(fanOut).chainDeferred(gathered)
+    return gathered
+
+
+
+@inlineCallbacks
+def _gatherFanOut(fanOut):
+    """
+    Retrieve every result from a L{DeferredFanOut} and return them in the
+    order of the calls which produced them.
+    """
+    results = []
+    while True:
+        completed = yield fanOut.get()
+        if completed is None:
+            returnValue(results)
+        index, result = completed
+        if index >= len(results):
+            results.extend([None] * (index + 1 - len(results)))
+        results[index] = result
+
+
+
 class AlreadyTryingToLockError(Exception):
     """
     Raised when L{DeferredFilesystemLock.deferUntilLocked} is called twice on a
@@ -1635,5 +1898,6 @@ __all__ = ["Deferred", "DeferredList", "succeed", "fail", "FAILURE", "SUCCESS",
            "waitForDeferred", "deferredGenerator", "inlineCallbacks",
            "returnValue",
            "DeferredLock", "DeferredSemaphore", "DeferredQueue",
+           "DeferredFanOut", "gatherBounded",
            "DeferredFilesystemLock", "AlreadyTryingToLockError",
           ]
@@ -438,7 +438,7 @@ class _TCPServerEndpoint(object):
     A TCP server endpoint interface
     """
 
-    def __init__(self, reactor, port, backlog, interface):
+    def __init__(self, reactor, port, backlog, interface, reusePort=False):
         """
         @param reactor: An L{IReactorTCP} provider.
 
@@ -450,11 +450,17 @@ class _TCPServerEndpoint(object):
 
         @param interface: The hostname to bind to
         @type interface: str
+
+        @param reusePort: Whether to set C{SO_REUSEPORT} on the listening
+            socket.  Only reactors whose C{listenTCP} accepts a C{reusePort}
+            argument support this.
+        @type reusePort: bool
         """
         self._reactor = reactor
         self._port = port
         self._backlog = backlog
         self._interface = interface
+        self._reusePort = reusePort
 
 
     def listen(self, protocolFactory):
@@ -462,11 +468,15 @@ class _TCPServerEndpoint(object):
         Implement L{IStreamServerEndpoint.listen} to listen on a TCP
         socket
         """
+        kwargs = {}
+        if self._reusePort:
+            kwargs['reusePort'] = True
         return defer.execute(self._reactor.listenTCP,
                              self._port,
                              protocolFactory,
                              backlog=self._backlog,
-                             interface=self._interface)
+                             interface=self._interface,
+                             **kwargs)
 
 
 
@@ -474,7 +484,8 @@ class TCP4ServerEndpoint(_TCPServerEndpoint):
     """
     Implements TCP server endpoint with an IPv4 configuration
     """
-    def __init__(self, reactor, port, backlog=50, interface=''):
+    def __init__(self, reactor, port, backlog=50, interface='',
+                 reusePort=False):
         """
         @param reactor: An L{IReactorTCP} provider.
 
@@ -486,8 +497,13 @@ class TCP4ServerEndpoint(_TCPServerEndpoint):
 
         @param interface: The hostname to bind to, defaults to '' (all)
         @type interface: str
+
+        @param reusePort: Whether to set C{SO_REUSEPORT} on the listening
+            socket.
+        @type reusePort: bool
         """
-        _TCPServerEndpoint.__init__(self, reactor, port, backlog, interface)
+        _TCPServerEndpoint.__init__(self, reactor, port, backlog, interface,
+                                    reusePort)
 
 
 
@@ -495,7 +511,8 @@ class TCP6ServerEndpoint(_TCPServerEndpoint):
     """
     Implements TCP server endpoint with an IPv6 configuration
     """
-    def __init__(self, reactor, port, backlog=50, interface='::'):
+    def __init__(self, reactor, port, backlog=50, interface='::',
+                 reusePort=False):
         """
         @param reactor: An L{IReactorTCP} provider.
 
@@ -507,8 +524,13 @@ class TCP6ServerEndpoint(_TCPServerEndpoint):
 
         @param interface: The hostname to bind to, defaults to '' (all)
         @type interface: str
+
+        @param reusePort: Whether to set C{SO_REUSEPORT} on the listening
+            socket.
+        @type reusePort: bool
         """
-        _TCPServerEndpoint.__init__(self, reactor, port, backlog, interface)
+        _TCPServerEndpoint.__init__(self, reactor, port, backlog, interface,
+                                    reusePort)
 
 
 
@@ -778,7 +800,15 @@ class HostnameEndpoint(object):
         """
         Resolve the hostname string into a tuple containig the host
         address.
+
+        If the reactor's resolver can look up address information itself, as
+        L{twisted.internet.base.CachingResolver} can, it is used; otherwise
+        L{socket.getaddrinfo} is called in a thread.
         """
+        resolver = getattr(self._reactor, "resolver", None)
+        getAddressInfo = getattr(resolver, "getAddressInfo", None)
+        if getAddressInfo is not None:
+            return getAddressInfo(host, port, 0, socket.SOCK_STREAM)
         return self._deferToThread(self._getaddrinfo, host, port, 0,
                 socket.SOCK_STREAM)
 
@@ -1004,7 +1034,7 @@ class AdoptedStreamServerEndpoint(object):
 
 
 
-def _parseTCP(factory, port, interface="", backlog=50):
+def _parseTCP(factory, port, interface="", backlog=50, reusePort=False):
     """
     Internal parser function for L{_parseServer} to convert the string
     arguments for a TCP(IPv4) stream endpoint into the structured arguments.
@@ -1022,12 +1052,21 @@ def _parseTCP(factory, port, interface="", backlog=50):
     @param backlog: the length of the listen queue
     @type backlog: C{str}
 
+    @param reusePort: A string '0' or '1', mapping to C{False} and C{True}
+        respectively.  See the C{reusePort} parameter of
+        L{TCP4ServerEndpoint}.
+    @type reusePort: C{str}
+
     @return: a 2-tuple of (args, kwargs), describing  the parameters to
         L{IReactorTCP.listenTCP} (or, modulo argument 2, the factory, arguments
         to L{TCP4ServerEndpoint}.
     """
-    return (int(port), factory), {'interface': interface,
-                                  'backlog': int(backlog)}
+    kw = {'interface': interface, 'backlog': int(backlog)}
+    if bool(int(reusePort)):
+        # Only passed when asked for, since listenTCP only accepts it on some
+        # reactors.
+        kw['reusePort'] = True
+    return (int(port), factory), kw
 
 
 
@@ -1234,7 +1273,8 @@ class _TCP6ServerParser(object):
     """
     prefix = "tcp6"     # Used in _parseServer to identify the plugin with the endpoint type
 
-    def _parseServer(self, reactor, port, backlog=50, interface='::'):
+    def _parseServer(self, reactor, port, backlog=50, interface='::',
+                     reusePort=False):
         """
         Internal parser function for L{_parseServer} to convert the string
         arguments into structured arguments for the L{TCP6ServerEndpoint}
@@ -1249,10 +1289,15 @@ class _TCP6ServerParser(object):
 
         @param interface: The hostname to bind to
         @type interface: str
+
+        @param reusePort: A string '0' or '1', mapping to C{False} and C{True}
+            respectively.
+        @type reusePort: str
         """
         port = int(port)
         backlog = int(backlog)
-        return TCP6ServerEndpoint(reactor, port, backlog, interface)
+        reusePort = bool(int(reusePort))
+        return TCP6ServerEndpoint(reactor, port, backlog, interface, reusePort)
 
 
     def parseStreamServer(self, reactor, *args, **kwargs):
@@ -1436,6 +1481,13 @@ def serverFromString(reactor, description):
 
         serverFromString(reactor, b"tcp:80:interface=127.0.0.1")
 
+    On reactors which support it, the C{reusePort} argument sets
+    C{SO_REUSEPORT} on the listening socket, so that several processes (for
+    example the workers started by C{twistd --workers}) can listen on the same
+    port::
+
+        serverFromString(reactor, b"tcp:80:reusePort=1")
+
     SSL server endpoints may be specified with the 'ssl' prefix, and the
     private key and certificate files may be specified by the C{privateKey} and
     C{certKey} arguments::
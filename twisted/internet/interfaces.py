@@ -2133,6 +2133,43 @@ class IUNIXTransport(ITransport):
 
 
 
+class ISendFileTransport(ITransport):
+    """
+    A transport which can send the contents of a file directly from the
+    operating system's file cache, without copying them into the process.
+    """
+    def sendFile(fileObject, offset, count):
+        """
+        Send part of a file over this connection.
+
+        The file is sent after any data already written to the transport.
+        Data written to the transport before the returned L{Deferred} fires
+        is sent after the file.  No producer may be registered with the
+        transport until then.
+
+        If the contents of the file cannot be sent directly over this
+        connection (for example because TLS has been started on it, or the
+        file object has no file descriptor), the file is read and written
+        in the ordinary way instead.
+
+        @param fileObject: A file object open for reading.  Its position is
+            ignored, and is changed if the file has to be read.
+
+        @param offset: The position in the file of the first byte to send.
+        @type offset: C{int}
+
+        @param count: The number of bytes to send, or C{None} to send
+            everything up to the end of the file.
+        @type count: C{int} or C{NoneType}
+
+        @return: A L{Deferred} which fires with the number of bytes sent
+            once they have all been handed to the operating system, which may
+            be fewer than C{count} if the end of the file is reached first, or
+            which fails if the connection is lost first.
+        """
+
+
+
 class IOpenSSLServerConnectionCreator(Interface):
     """
     A provider of L{IOpenSSLServerConnectionCreator} can create
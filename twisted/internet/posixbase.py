@@ -11,6 +11,7 @@ from __future__ import division, absolute_import
 import socket
 import errno
 import os
+import struct
 import sys
 
 from zope.interface import implementer, classImplements
@@ -25,6 +26,7 @@ from twisted.internet import error, udp, tcp
 
 from twisted.python import log, failure, util
 from twisted.python.runtime import platformType, platform
+from twisted.python._eventfd import eventfd
 
 from twisted.internet.base import ReactorBase, _SignalReactorMixin
 from twisted.internet.main import CONNECTION_DONE, CONNECTION_LOST
@@ -187,8 +189,71 @@ class _UnixWaker(_FDWaker):
 
 
 
+class _EventFDWaker(_FDWaker):
+    """
+    A waker which uses a single Linux C{eventfd} descriptor instead of a
+    pipe.
+
+    Writes to an eventfd add to a counter held by the kernel rather than
+    queueing bytes, so any number of wake-ups before the reactor reads the
+    descriptor cost one 8 byte read, and only one descriptor is needed.
+    """
+
+    def __init__(self, reactor):
+        """
+        Initialize.
+        """
+        self.reactor = reactor
+        self.i = self.o = eventfd(0, 0)
+        fdesc.setNonBlocking(self.i)
+        fdesc._setCloseOnExec(self.i)
+        self.fileno = lambda: self.i
+
+
+    def wakeUp(self):
+        """
+        Add one to the eventfd counter.
+        """
+        if self.o is not None:
+            try:
+                util.untilConcludes(os.write, self.o, struct.pack("@Q", 1))
+            except OSError as e:
+                # The counter is about to overflow; the reactor has a wake
+                # up pending anyway.
+                if e.errno != errno.EAGAIN:
+                    raise
+
+
+    def doRead(self):
+        """
+        Read and reset the eventfd counter.
+        """
+        try:
+            util.untilConcludes(os.read, self.i, 8)
+        except OSError as e:
+            if e.errno != errno.EAGAIN:
+                raise
+
+
+    def connectionLost(self, reason):
+        """
+        Close the eventfd.
+        """
+        if self.i is None:
+            return
+        try:
+            os.close(self.i)
+        except OSError:
+            pass
+        self.i = self.o = None
+
+
+
 if platformType == 'posix':
-    _Waker = _UnixWaker
+    if eventfd is not None:
+        _Waker = _EventFDWaker
+    else:
+        _Waker = _UnixWaker
 else:
     # Primarily Windows and Jython.
     _Waker = _SocketWaker
@@ -272,12 +337,47 @@ class PosixReactorBase(_SignalReactorMixin, _DisconnectSelectableMixin,
 
     @ivar _childWaker: C{None} or a reference to the L{_SIGCHLDWaker}
         which is used to properly notice child process termination.
+
+    @ivar _readBudget: C{None} or the two-tuple set with L{setReadBudget}.
     """
 
     # Callable that creates a waker, overrideable so that subclasses can
     # substitute their own implementation:
     _wakerFactory = _Waker
 
+    _readBudget = None
+
+    def setReadBudget(self, maxBytes, maxSeconds=None):
+        """
+        Set the read budget used by TCP and UNIX stream connections which have
+        not been given one with their own C{setReadBudget} method.  Such
+        connections keep reading from their socket each time it becomes
+        readable until it has no more data or the budget is spent.
+
+        @param maxBytes: The number of bytes a connection may read before
+            other connections are serviced, or C{None} to have connections
+            read at most their C{bufferSize} bytes per event.
+        @type maxBytes: C{int} or C{NoneType}
+
+        @param maxSeconds: The number of seconds a connection may spend
+            reading before other connections are serviced, or C{None} for no
+            time limit.
+        @type maxSeconds: C{float} or C{NoneType}
+        """
+        if maxBytes is None:
+            self._readBudget = None
+        else:
+            self._readBudget = (maxBytes, maxSeconds)
+
+
+    def getReadBudget(self):
+        """
+        @return: The budget set with L{setReadBudget}, as a two-tuple of
+            maximum bytes and maximum seconds, or C{None} if there is none.
+        """
+        return self._readBudget
+
+
     def installWaker(self):
         """
         Install a `waker' to allow threads and signals to wake up the IO thread.
@@ -365,12 +465,18 @@ class PosixReactorBase(_SignalReactorMixin, _DisconnectSelectableMixin,
 
     # IReactorUDP
 
-    def listenUDP(self, port, protocol, interface='', maxPacketSize=8192):
+    def listenUDP(self, port, protocol, interface='', maxPacketSize=8192,
+                  reusePort=False):
         """Connects a given L{DatagramProtocol} to the given numeric UDP port.
 
+        @param reusePort: If C{True}, set C{SO_REUSEPORT} on the socket, so
+            that other processes can bind the same port and have datagrams
+            distributed among them.
+
         @returns: object conforming to L{IListeningPort}.
         """
-        p = udp.Port(port, protocol, interface, maxPacketSize, self)
+        p = udp.Port(port, protocol, interface, maxPacketSize, self,
+                     reusePort=reusePort)
         p.startListening()
         return p
 
@@ -490,8 +596,18 @@ class PosixReactorBase(_SignalReactorMixin, _DisconnectSelectableMixin,
 
     # IReactorTCP
 
-    def listenTCP(self, port, factory, backlog=50, interface=''):
-        p = tcp.Port(port, factory, backlog, interface, self)
+    def listenTCP(self, port, factory, backlog=50, interface='',
+                  reusePort=False):
+        """
+        Implement L{IReactorTCP.listenTCP}.
+
+        @param reusePort: If C{True}, set C{SO_REUSEPORT} on the listening
+            socket, so that other processes can listen on the same port and
+            have connections distributed among them.
+        @type reusePort: C{bool}
+        """
+        p = tcp.Port(port, factory, backlog, interface, self,
+                     reusePort=reusePort)
         p.startListening()
         return p
 
@@ -564,6 +680,9 @@ class _PollLikeMixin(object):
         lost.
       - _POLL_IN - Bitmask for events indicating there is input to read.
       - _POLL_OUT - Bitmask for events indicating output can be written.
+      - _instrumentation - C{None}, or a L{LoopInstrumentation
+        <twisted.internet.base.LoopInstrumentation>} to time C{doRead} and
+        C{doWrite} calls with.
 
     Must be mixed in to a subclass of PosixReactorBase (for
     _disconnectSelectable).
@@ -576,6 +695,7 @@ class _PollLikeMixin(object):
         """
         why = None
         inRead = False
+        instrumentation = self._instrumentation
         if event & self._POLL_DISCONNECTED and not (event & self._POLL_IN):
             # Handle disconnection.  But only if we finished processing all
             # the pending input.
@@ -611,12 +731,19 @@ class _PollLikeMixin(object):
                 else:
                     if event & self._POLL_IN:
                         # Handle a read event.
-                        why = selectable.doRead()
+                        if instrumentation is None:
+                            why = selectable.doRead()
+                        else:
+                            why = instrumentation.callIO(selectable, "doRead")
                         inRead = True
                     if not why and event & self._POLL_OUT:
                         # Handle a write event, as long as doRead didn't
                         # disconnect us.
-                        why = selectable.doWrite()
+                        if instrumentation is None:
+                            why = selectable.doWrite()
+                        else:
+                            why = instrumentation.callIO(
+                                selectable, "doWrite")
                         inRead = False
             except:
                 # Any exception from application code gets logged and will
@@ -27,6 +27,7 @@ from zope.interface import implements
 
 from twisted.python import log, failure
 from twisted.python.util import switchUID
+from twisted.python._closerange import closeRange
 from twisted.internet import fdesc, abstract, error
 from twisted.internet.main import CONNECTION_LOST, CONNECTION_DONE
 from twisted.internet._baseprocess import BaseProcess
@@ -588,6 +589,36 @@ def _listOpenFDs():
     return detector._listOpenFDs()
 
 
+
+def _closeDescriptorsExcept(keep):
+    """
+    Close all the file descriptors of this process except those in C{keep}.
+
+    Where L{closeRange} is available the gaps between the kept descriptors
+    are closed with one system call each, however many descriptors are
+    open.  Otherwise each descriptor listed by L{_listOpenFDs} is closed in
+    turn.
+
+    @param keep: The descriptors to leave open.
+    @type keep: C{list} of C{int}
+    """
+    if closeRange is not None:
+        first = 0
+        for fd in sorted(set(keep)):
+            if fd > first:
+                closeRange(first, fd - 1)
+            first = fd + 1
+        closeRange(first, None)
+        return
+    for fd in _listOpenFDs():
+        if fd in keep:
+            continue
+        try:
+            os.close(fd)
+        except:
+            pass
+
+
 class Process(_BaseProcess):
     """
     An operating-system Process.
@@ -727,8 +758,9 @@ class Process(_BaseProcess):
         This is accomplished in two steps::
 
             1. close all file descriptors that aren't values of fdmap.  This
-               means 0 .. maxfds (or just the open fds within that range, if
-               the platform supports '/proc/<pid>/fd').
+               means 0 .. maxfds (with close_range or closefrom, or just the
+               open fds within that range, if the platform supports
+               '/proc/<pid>/fd').
 
             2. for each childFD::
 
@@ -752,15 +784,9 @@ class Process(_BaseProcess):
             errfd.write("starting _setupChild\n")
 
         destList = fdmap.values()
-        for fd in _listOpenFDs():
-            if fd in destList:
-                continue
-            if debug and fd == errfd.fileno():
-                continue
-            try:
-                os.close(fd)
-            except:
-                pass
+        if debug:
+            destList.append(errfd.fileno())
+        _closeDescriptorsExcept(destList)
 
         # at this point, the only fds still open are the ones that need to
         # be moved to their appropriate positions in the child (the targets
@@ -992,8 +1018,8 @@ class PTYProcess(abstract.FileDescriptor, _BaseProcess):
 
             - duplicating C{slavefd} to standard input, output, and error
 
-            - closing all other open file descriptors (according to
-              L{_listOpenFDs})
+            - closing all other open file descriptors (see
+              L{_closeDescriptorsExcept})
 
             - re-setting all signal handlers to C{SIG_DFL}
 
@@ -1016,12 +1042,7 @@ class PTYProcess(abstract.FileDescriptor, _BaseProcess):
         os.dup2(slavefd, 1) # stdout
         os.dup2(slavefd, 2) # stderr
 
-        for fd in _listOpenFDs():
-            if fd > 2:
-                try:
-                    os.close(fd)
-                except:
-                    pass
+        _closeDescriptorsExcept([0, 1, 2])
 
         self._resetSignalDisposition()
 
@@ -0,0 +1,679 @@
+# -*- test-case-name: twisted.internet.test.test_processpool -*-
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Run functions in a pool of child Python processes, for CPU-bound work which
+threads cannot run in parallel.
+
+L{ProcessPool} keeps a number of worker processes running, started with
+L{IReactorProcess.spawnProcess}, and talks to each of them over a pair of
+pipes with L{twisted.protocols.amp}, the arrangement used by the distributed
+trial runner in L{twisted.trial._dist}.  Each worker runs one call at a time.
+
+The function to call is sent by its fully qualified name, and must be
+importable by that name in the worker.  Its arguments, result and any
+exception it raises are sent with L{pickle}.
+
+@since: 15.1
+"""
+
+from __future__ import division, absolute_import
+
+import os
+import sys
+from collections import deque
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from zope.interface import implementer
+
+from twisted.internet.defer import CancelledError, Deferred, fail
+from twisted.internet.defer import DeferredList
+from twisted.internet.error import ProcessExitedAlready
+from twisted.internet.interfaces import ITransport
+from twisted.internet.protocol import ProcessProtocol
+from twisted.protocols import amp
+from twisted.python import log, reflect
+from twisted.python.failure import Failure
+
+__all__ = ['ProcessPool', 'deferToProcess', 'ProcessPoolFull',
+           'CallTimedOut', 'RemoteCallError']
+
+# File descriptor numbers used to set up the AMP pipes with the workers.
+_WORKER_AMP_STDIN = 3
+
+_WORKER_AMP_STDOUT = 4
+
+
+
+class ProcessPoolFull(Exception):
+    """
+    A call could not be queued because the L{ProcessPool} was created with a
+    C{maxQueued} limit and that many calls are already waiting for a worker.
+    """
+
+
+
+class CallTimedOut(Exception):
+    """
+    A call did not finish within the L{ProcessPool}'s C{timeout}, and the
+    worker running it was killed.
+    """
+
+
+
+class RemoteCallError(Exception):
+    """
+    A call raised an exception which could not be sent back from the worker.
+
+    @ivar typeName: The fully qualified name of the type of the exception.
+    @ivar message: The result of calling C{str} on the exception.
+    """
+
+    def __init__(self, typeName, message):
+        Exception.__init__(self, typeName, message)
+        self.typeName = typeName
+        self.message = message
+
+
+    def __str__(self):
+        return "%s: %s" % (self.typeName, self.message)
+
+
+
+class _BigString(amp.Argument):
+    """
+    A byte string argument which may be longer than the limit on the length
+    of AMP values.  It is sent as a count of chunks under its own name,
+    followed by each chunk under its name with C{.0}, C{.1} and so on
+    appended.
+    """
+
+    def toBox(self, name, strings, objects, proto):
+        value = self.retrieve(objects, name, proto)
+        size = amp.MAX_VALUE_LENGTH
+        chunks = [value[i:i + size] for i in range(0, len(value), size)]
+        strings[name] = str(len(chunks)).encode('ascii')
+        for i, chunk in enumerate(chunks):
+            strings[name + b'.' + str(i).encode('ascii')] = chunk
+
+
+    def fromBox(self, name, strings, objects, proto):
+        count = int(self.retrieve(strings, name, proto))
+        objects[name] = b''.join([
+                self.retrieve(strings, name + b'.' + str(i).encode('ascii'),
+                              proto)
+                for i in range(count)])
+
+
+
+class _Call(amp.Command):
+    """
+    Call a function in a worker.
+
+    The arguments are the fully qualified name of the function, and the
+    pickled tuple of its positional arguments and dictionary of its keyword
+    arguments.  The response says whether the call raised an exception, and
+    has the pickled result or exception and a formatted traceback.
+    """
+    arguments = [('function', amp.String()),
+                 ('arguments', _BigString())]
+    response = [('failed', amp.Boolean()),
+                ('result', _BigString()),
+                ('traceback', _BigString())]
+
+
+
+class _WorkerProtocol(amp.AMP):
+    """
+    The worker side of the process pool protocol.
+    """
+
+    def call(self, function, arguments):
+        """
+        Run a call and send back its result or exception.
+        """
+        try:
+            args, kwargs = pickle.loads(arguments)
+            result = reflect.namedAny(function)(*args, **kwargs)
+            return {'failed': False,
+                    'result': pickle.dumps(result, 2),
+                    'traceback': b''}
+        except:
+            f = Failure()
+            try:
+                error = pickle.dumps(f.value, 2)
+                pickle.loads(error)
+            except:
+                error = pickle.dumps(
+                    RemoteCallError(reflect.qual(f.type), str(f.value)), 2)
+            return {'failed': True,
+                    'result': error,
+                    'traceback': f.getTraceback().encode('utf-8', 'replace')}
+
+    _Call.responder(call)
+
+
+
+@implementer(ITransport)
+class _WorkerTransport(object):
+    """
+    A transport for the manager side of the protocol which writes to a
+    worker's AMP input pipe.
+    """
+
+    def __init__(self, transport):
+        self._transport = transport
+
+
+    def write(self, data):
+        """
+        Write data to the worker's AMP input pipe.
+        """
+        self._transport.writeToChild(_WORKER_AMP_STDIN, data)
+
+
+    def writeSequence(self, sequence):
+        """
+        Write each string in C{sequence} to the worker's AMP input pipe.
+        """
+        for data in sequence:
+            self.write(data)
+
+
+    def loseConnection(self):
+        """
+        Close the worker's input pipes, which makes it exit.
+        """
+        self._transport.closeChildFD(_WORKER_AMP_STDIN)
+        self._transport.closeStdin()
+
+
+    def getHost(self):
+        return None
+
+
+    def getPeer(self):
+        return None
+
+
+
+class _PendingCall(object):
+    """
+    A call waiting for or running in a worker.
+
+    @ivar function: The fully qualified name of the function to call.
+    @ivar arguments: The pickled positional and keyword arguments.
+    @ivar deferred: The L{Deferred} returned for the call.
+    @ivar worker: The L{_Worker} running the call, or C{None}.
+    @ivar timer: The L{IDelayedCall} which will time the call out, or
+        C{None}.
+    """
+    worker = None
+    timer = None
+
+    def __init__(self, function, arguments, canceller):
+        self.function = function
+        self.arguments = arguments
+        self.deferred = Deferred(lambda d: canceller(self))
+
+
+
+class _Worker(ProcessProtocol):
+    """
+    The manager side of a worker process.
+
+    @ivar pool: The L{ProcessPool} this worker belongs to.
+    @ivar amp: The L{amp.AMP} protocol talking to the worker.
+    @ivar call: The L{_PendingCall} running in the worker, or C{None}.
+    @ivar tasks: The number of calls the worker has been given.
+    @ivar retiring: C{True} once the worker has been told to exit.
+    @ivar ended: A L{Deferred} fired when the process has exited.
+    """
+    call = None
+    tasks = 0
+    retiring = False
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.amp = amp.AMP()
+        self.ended = Deferred()
+
+
+    def connectionMade(self):
+        self.amp.makeConnection(_WorkerTransport(self.transport))
+        self.pool._workerReady(self)
+
+
+    def childDataReceived(self, childFD, data):
+        """
+        Pass data from the AMP output pipe to L{amp}, and log anything the
+        worker writes to its standard output or error.
+        """
+        if childFD == _WORKER_AMP_STDOUT:
+            self.amp.dataReceived(data)
+        else:
+            log.msg(format="Process pool worker %(pid)s wrote: %(data)r",
+                    pid=self.transport.pid, data=data)
+
+
+    def processEnded(self, reason):
+        self.pool._workerEnded(self, reason)
+        self.amp.connectionLost(reason)
+        self.ended.callback(None)
+
+
+    def kill(self):
+        """
+        Kill the worker process, if it is still running.
+        """
+        try:
+            self.transport.signalProcess('KILL')
+        except ProcessExitedAlready:
+            pass
+
+
+
+def _cpuCount():
+    """
+    @return: The number of CPUs, or C{1} if it cannot be determined.
+    """
+    try:
+        import multiprocessing
+        return multiprocessing.cpu_count()
+    except (ImportError, NotImplementedError):
+        return 1
+
+
+
+class ProcessPool(object):
+    """
+    A pool of Python worker processes which run calls and return the results
+    as L{Deferred}s.
+
+    Calls made before L{start} or while all workers are busy are queued.
+    Workers which crash are replaced.  While the pool is running it keeps
+    C{size} workers.
+
+    @ivar size: The number of worker processes.
+    @ivar maxTasksPerWorker: If not C{None}, a worker is replaced after it
+        has run this many calls, to bound the effect of leaks in the called
+        code.
+    @ivar timeout: If not C{None}, the number of seconds a call may run
+        before its worker is killed and it fails with L{CallTimedOut}.
+    @ivar maxQueued: If not C{None}, the largest number of calls which may
+        wait for a worker; further calls fail with L{ProcessPoolFull}.
+    @ivar restartDelay: The number of seconds to wait before replacing a
+        worker which exited without running any call, so that a worker
+        which cannot start is not restarted continuously.
+    @ivar started: Whether the pool is running.
+    """
+    started = False
+    restartDelay = 1.0
+
+    def __init__(self, reactor, size=None, maxTasksPerWorker=None,
+                 timeout=None, maxQueued=None, executable=sys.executable,
+                 env=None):
+        """
+        @param reactor: The L{IReactorProcess} and L{IReactorTime} provider
+            used to run the workers.
+        @param size: The number of worker processes; by default the number
+            of CPUs.
+        @param maxTasksPerWorker: See L{maxTasksPerWorker}.
+        @param timeout: See L{timeout}.
+        @param maxQueued: See L{maxQueued}.
+        @param executable: The Python interpreter to run the workers with.
+        @param env: The environment for the workers, by default that of this
+            process.  C{PYTHONPATH} is set to this process's C{sys.path} so
+            that the same modules can be imported.
+        """
+        if size is None:
+            size = _cpuCount()
+        self._reactor = reactor
+        self.size = size
+        self.maxTasksPerWorker = maxTasksPerWorker
+        self.timeout = timeout
+        self.maxQueued = maxQueued
+        self.executable = executable
+        self.env = env
+        self._workers = set()
+        self._idle = []
+        self._queue = deque()
+        self._notFull = []
+        self._completed = 0
+        self._timedOut = 0
+        self._crashed = 0
+        self._replaced = 0
+
+
+    def start(self):
+        """
+        Start the worker processes.
+        """
+        if self.started:
+            return
+        self.started = True
+        for i in range(self.size - len(self._workers)):
+            self._spawn()
+
+
+    def stop(self):
+        """
+        Stop the pool.  Queued calls, and the L{Deferred}s returned by
+        L{whenNotFull} which are waiting for room in the queue, fail with
+        L{CancelledError}; running calls are allowed to finish, and then the
+        workers exit.
+
+        @return: A L{Deferred} which fires when all workers have exited.
+        """
+        self.started = False
+        notFull, self._notFull = self._notFull, []
+        for d in notFull:
+            d.errback(CancelledError())
+        queued = list(self._queue)
+        self._queue.clear()
+        for call in queued:
+            call.deferred.cancel()
+        for worker in self._idle[:]:
+            self._retire(worker)
+        d = DeferredList([worker.ended for worker in self._workers])
+        d.addCallback(lambda ignored: None)
+        return d
+
+
+    def full(self):
+        """
+        @return: C{True} if C{maxQueued} calls are already waiting for a
+            worker.
+        """
+        return (self.maxQueued is not None and
+                len(self._queue) >= self.maxQueued)
+
+
+    def whenNotFull(self):
+        """
+        @return: A L{Deferred} which fires with C{None} when there is room
+            in the queue for another call.
+        """
+        d = Deferred()
+        if self.full():
+            self._notFull.append(d)
+        else:
+            d.callback(None)
+        return d
+
+
+    def callInProcess(self, f, *args, **kwargs):
+        """
+        Call a function in a worker process.
+
+        @param f: A function which the workers can import by its fully
+            qualified name, or that name.
+        @param *args: Positional arguments for C{f}, which must be picklable.
+        @param **kwargs: Keyword arguments for C{f}, which must be
+            picklable.
+
+        @return: A L{Deferred} which fires with the result of C{f}, or fails
+            with the exception it raised, L{RemoteCallError} if that could not
+            be sent back, L{CallTimedOut}, L{ProcessPoolFull}, or the
+            L{twisted.internet.error.ProcessTerminated} failure if the worker
+            crashed.  Cancelling it removes a queued call from the queue, or
+            kills the worker running it.
+        """
+        if not isinstance(f, str):
+            f = reflect.fullyQualifiedName(f)
+        if self.full():
+            return fail(ProcessPoolFull(
+                    "%d calls are already queued" % (self.maxQueued,)))
+        try:
+            arguments = pickle.dumps((args, kwargs), 2)
+        except:
+            return fail()
+        call = _PendingCall(f, arguments, self._cancel)
+        self._queue.append(call)
+        self._dispatch()
+        return call.deferred
+
+
+    def statistics(self):
+        """
+        Summarize the current state and past activity of the pool.
+
+        @return: A C{dict} with these keys:
+            - C{'workers'}: the number of worker processes.
+            - C{'busy'}: the number of workers running calls.
+            - C{'queued'}: the number of calls waiting for a worker.
+            - C{'maxQueued'}: the limit on C{'queued'}, or C{None}.
+            - C{'completed'}: the number of calls which returned or raised.
+            - C{'timedOut'}: the number of calls which timed out.
+            - C{'crashed'}: the number of calls whose worker exited.
+            - C{'replaced'}: the number of workers replaced after
+              C{maxTasksPerWorker} calls.
+        """
+        return {
+            'workers': len(self._workers),
+            'busy': len([w for w in self._workers if w.call is not None]),
+            'queued': len(self._queue),
+            'maxQueued': self.maxQueued,
+            'completed': self._completed,
+            'timedOut': self._timedOut,
+            'crashed': self._crashed,
+            'replaced': self._replaced,
+            }
+
+
+    def _spawn(self):
+        """
+        Start a new worker process.
+        """
+        worker = _Worker(self)
+        self._workers.add(worker)
+        if self.env is None:
+            env = os.environ.copy()
+        else:
+            env = self.env.copy()
+        env['PYTHONPATH'] = os.pathsep.join(sys.path)
+        self._reactor.spawnProcess(
+            worker, self.executable,
+            [self.executable, '-m', 'twisted.internet._procpoolworker'],
+            env=env,
+            childFDs={0: 'w', 1: 'r', 2: 'r',
+                      _WORKER_AMP_STDIN: 'w', _WORKER_AMP_STDOUT: 'r'})
+
+
+    def _workerReady(self, worker):
+        """
+        A worker's pipes have been set up; give it a call.
+        """
+        self._idle.append(worker)
+        self._dispatch()
+
+
+    def _dispatch(self):
+        """
+        Give queued calls to idle workers.
+        """
+        while self._queue and self._idle:
+            self._run(self._idle.pop(), self._queue.popleft())
+        while self._notFull and not self.full():
+            self._notFull.pop(0).callback(None)
+
+
+    def _run(self, worker, call):
+        """
+        Run C{call} in C{worker}.
+        """
+        worker.call = call
+        worker.tasks += 1
+        call.worker = worker
+        if self.timeout is not None:
+            call.timer = self._reactor.callLater(
+                self.timeout, self._timeOut, call)
+        d = worker.amp.callRemote(_Call, function=call.function,
+                                  arguments=call.arguments)
+        d.addCallbacks(self._response, self._error,
+                       callbackArgs=(call,), errbackArgs=(call,))
+
+
+    def _response(self, response, call):
+        """
+        The worker has responded to C{call}; fire its L{Deferred}.
+        """
+        if call.worker is None or call.worker.call is not call:
+            return
+        self._finish(call)
+        self._completed += 1
+        try:
+            result = pickle.loads(response['result'])
+        except:
+            call.deferred.errback()
+            return
+        if response['failed']:
+            call.deferred.errback(Failure(result))
+        else:
+            call.deferred.callback(result)
+
+
+    def _error(self, reason, call):
+        """
+        Sending C{call} to the worker failed, other than because it exited.
+        """
+        if call.worker is None or call.worker.call is not call:
+            return
+        self._finish(call)
+        call.deferred.errback(reason)
+
+
+    def _finish(self, call):
+        """
+        C{call} is no longer running; make its worker available for
+        another, or replace it.
+        """
+        worker = call.worker
+        worker.call = None
+        call.worker = None
+        if call.timer is not None:
+            if call.timer.active():
+                call.timer.cancel()
+            call.timer = None
+        if not self.started:
+            self._retire(worker)
+        elif (self.maxTasksPerWorker is not None and
+              worker.tasks >= self.maxTasksPerWorker):
+            self._replaced += 1
+            self._retire(worker)
+            self._spawn()
+        else:
+            self._idle.append(worker)
+            self._dispatch()
+
+
+    def _retire(self, worker):
+        """
+        Tell C{worker} to exit once it has read everything sent to it.
+        """
+        worker.retiring = True
+        if worker in self._idle:
+            self._idle.remove(worker)
+        worker.amp.transport.loseConnection()
+
+
+    def _abandon(self, call):
+        """
+        Stop waiting for the running C{call}, and kill its worker, which will
+        be replaced.
+        """
+        worker = call.worker
+        worker.call = None
+        call.worker = None
+        if call.timer is not None:
+            if call.timer.active():
+                call.timer.cancel()
+            call.timer = None
+        worker.kill()
+
+
+    def _timeOut(self, call):
+        """
+        C{call} has run for too long; kill its worker and fail it.
+        """
+        call.timer = None
+        self._timedOut += 1
+        self._abandon(call)
+        call.deferred.errback(CallTimedOut(
+                "%s did not finish within %s seconds" % (
+                    call.function, self.timeout)))
+
+
+    def _cancel(self, call):
+        """
+        Cancel C{call}, removing it from the queue or killing its worker.
+        """
+        if call.worker is not None:
+            self._abandon(call)
+        elif call in self._queue:
+            self._queue.remove(call)
+            self._dispatch()
+
+
+    def _workerEnded(self, worker, reason):
+        """
+        C{worker} has exited; fail the call it was running, if any, and
+        replace it unless it was told to exit.
+        """
+        self._workers.discard(worker)
+        if worker in self._idle:
+            self._idle.remove(worker)
+        call = worker.call
+        if call is not None:
+            self._crashed += 1
+            worker.call = None
+            call.worker = None
+            if call.timer is not None and call.timer.active():
+                call.timer.cancel()
+            call.deferred.errback(reason)
+        if self.started and not worker.retiring:
+            if worker.tasks:
+                self._spawn()
+            else:
+                self._reactor.callLater(self.restartDelay, self._respawn)
+
+
+    def _respawn(self):
+        """
+        Start a worker to replace one which exited, if the pool is still
+        running and short of workers.
+        """
+        if self.started and len(self._workers) < self.size:
+            self._spawn()
+
+
+
+_defaultPool = None
+
+def deferToProcess(f, *args, **kwargs):
+    """
+    Call a function in a worker process of a L{ProcessPool} shared by the
+    global reactor, and return the result as a L{Deferred}.
+
+    The pool is created on first use with one worker per CPU.  It starts
+    when the reactor does and stops when it shuts down.
+
+    @param f: A function which the workers can import by its fully
+        qualified name, or that name.
+    @param *args: Picklable positional arguments for C{f}.
+    @param **kwargs: Picklable keyword arguments for C{f}.
+
+    @return: See L{ProcessPool.callInProcess}.
+    """
+    global _defaultPool
+    if _defaultPool is None:
+        from twisted.internet import reactor
+        _defaultPool = ProcessPool(reactor)
+        reactor.callWhenRunning(_defaultPool.start)
+        reactor.addSystemEventTrigger('during', 'shutdown', _defaultPool.stop)
+    return _defaultPool.callInProcess(f, *args, **kwargs)
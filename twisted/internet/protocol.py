@@ -25,10 +25,17 @@ class Factory:
 
     By default, buildProtocol will create a protocol of the class given in
     self.protocol.
+
+    @ivar writeBufferLimits: C{None}, or a C{(high, low)} tuple of write
+        buffer watermarks in bytes, passed to the C{setWriteBufferLimits}
+        method of the transport of each protocol built by this factory when
+        it is connected, if the transport has one.  Either may be C{None} to
+        use the transport's default.
     """
 
     # put a subclass of Protocol here:
     protocol = None
+    writeBufferLimits = None
 
     numPorts = 0
     noisy = True
@@ -479,11 +486,19 @@ class BaseProtocol:
     def makeConnection(self, transport):
         """Make a connection to a transport and a server.
 
-        This sets the 'transport' attribute of this Protocol, and calls the
-        connectionMade() callback.
+        This sets the 'transport' attribute of this Protocol, applies the
+        writeBufferLimits of this Protocol's factory, if it has any, to the
+        transport, and calls the connectionMade() callback.
         """
         self.connected = 1
         self.transport = transport
+        limits = getattr(getattr(self, 'factory', None),
+                         'writeBufferLimits', None)
+        if limits is not None:
+            setWriteBufferLimits = getattr(
+                transport, 'setWriteBufferLimits', None)
+            if setWriteBufferLimits is not None:
+                setWriteBufferLimits(*limits)
         self.connectionMade()
 
     def connectionMade(self):
@@ -659,6 +674,12 @@ class ProcessProtocol(BaseProtocol):
 class AbstractDatagramProtocol:
     """
     Abstract protocol for datagram-oriented transports, e.g. IP, ICMP, ARP, UDP.
+
+    Transports which read datagrams in batches (see
+    L{twisted.internet.udp.Port.setBatchSize}) deliver each batch to a
+    C{datagramsReceived} method, taking a C{list} of C{(datagram, addr)}
+    tuples, if the protocol defines one, and otherwise call
+    L{datagramReceived} for each datagram.
     """
 
     transport = None
@@ -317,8 +317,10 @@ class NotPaused(SchedulerError):
 
 class _Timer(object):
     MAX_SLICE = 0.01
-    def __init__(self):
-        self.end = time.time() + self.MAX_SLICE
+    def __init__(self, budget=None):
+        if budget is None:
+            budget = self.MAX_SLICE
+        self.end = time.time() + budget
 
 
     def __call__(self):
@@ -358,6 +360,23 @@ class CooperativeTask(object):
 
     @type _pauseCount: C{int}
 
+    @ivar priority: The priority class of this task.  Whenever any task of a
+        higher priority class is able to run, tasks of lower ones do not.
+    @type priority: C{int}
+
+    @ivar weight: The number of work units this task performs in a row each
+        time its turn comes, relative to the other tasks of its priority class.
+    @type weight: C{int}
+
+    @ivar workUnits: The number of work units this task has performed.
+    @type workUnits: C{int}
+
+    @ivar workTime: The number of seconds this task has spent performing work
+        units.  Since the L{Cooperator} runs tasks one at a time in the
+        reactor thread, this is the processor time it has taken from the
+        reactor.
+    @type workTime: C{float}
+
     @ivar _completionState: The completion-state of this L{CooperativeTask}.
         C{None} if the task is not yet completed, an instance of L{TaskStopped}
         if C{stop} was called to stop this task early, of L{TaskFailed} if the
@@ -368,13 +387,19 @@ class CooperativeTask(object):
     @type _completionState: L{TaskFinished}
     """
 
-    def __init__(self, iterator, cooperator):
+    def __init__(self, iterator, cooperator, priority=0, weight=1):
         """
         A private constructor: to create a new L{CooperativeTask}, see
         L{Cooperator.cooperate}.
         """
+        if weight < 1:
+            raise ValueError("weight must be at least 1")
         self._iterator = iterator
         self._cooperator = cooperator
+        self.priority = priority
+        self.weight = weight
+        self.workUnits = 0
+        self.workTime = 0.0
         self._deferreds = []
         self._pauseCount = 0
         self._completionState = None
@@ -480,8 +505,14 @@ class CooperativeTask(object):
         iterator, stopping if there are no further items in the iterator, and
         pausing if the result was a L{defer.Deferred}.
         """
+        seconds = self._cooperator._seconds
+        started = seconds()
         try:
-            result = next(self._iterator)
+            try:
+                result = next(self._iterator)
+            finally:
+                self.workUnits += 1
+                self.workTime += seconds() - started
         except StopIteration:
             self._completeWith(TaskDone(), self._iterator)
         except:
@@ -525,14 +556,32 @@ class Cooperator(object):
         doing the next thing, repeat (i.e. serializing a sequence of
         asynchronous tasks)
 
+    Tasks may be given a priority class and a weight.  Only the tasks of the
+    highest priority class which has any tasks able to run are run; within a
+    class, each task performs as many work units in a row as its weight each
+    time its turn comes.
+
     Multiple L{Cooperator}s do not cooperate with each other, so for most
     cases you should use the L{global cooperator<task.cooperate>}.
+
+    @cvar minimumBudget: The smallest time budget, in seconds, that a lagging
+        reactor will reduce a step to when C{lagTarget} is set.
+
+    @ivar timeBudget: The time budget, in seconds, passed to the termination
+        predicate factory for each step when C{lagTarget} is set.
+
+    @ivar lag: The number of seconds by which the last step started later
+        than it was scheduled for, or C{None} before the first step.
     """
 
+    minimumBudget = _Timer.MAX_SLICE / 10
+
     def __init__(self,
                  terminationPredicateFactory=_Timer,
                  scheduler=_defaultScheduler,
-                 started=True):
+                 started=True,
+                 lagTarget=None,
+                 seconds=time.time):
         """
         Create a scheduler-like object to which iterators may be added.
 
@@ -549,17 +598,35 @@ class Cooperator(object):
         @param started: A boolean which indicates whether iterators should be
         stepped as soon as they are added, or if they will be queued up until
         L{Cooperator.start} is called.
+
+        @param lagTarget: If not C{None}, the number of seconds by which a step
+        may start later than it was scheduled for before the reactor is
+        considered busy.  The time budget of each step is then halved, down
+        to C{minimumBudget}, after a step which started later than this, and
+        grown back towards C{_Timer.MAX_SLICE} after one which started less
+        than half as late, so that background tasks give way to I/O.  The
+        budget is passed to C{terminationPredicateFactory} as its only
+        argument.
+
+        @param seconds: A no-argument callable returning the current time in
+        seconds, used to measure lag and the time tasks spend working.
         """
         self._tasks = []
+        self._priorities = {}
         self._metarator = iter(())
         self._terminationPredicateFactory = terminationPredicateFactory
         self._scheduler = scheduler
         self._delayedCall = None
         self._stopped = False
         self._started = started
+        self._lagTarget = lagTarget
+        self._seconds = seconds
+        self._scheduledAt = None
+        self.timeBudget = _Timer.MAX_SLICE
+        self.lag = None
 
 
-    def coiterate(self, iterator, doneDeferred=None):
+    def coiterate(self, iterator, doneDeferred=None, priority=0, weight=1):
         """
         Add an iterator to the list of iterators this L{Cooperator} is
         currently running.
@@ -571,36 +638,53 @@ class Cooperator(object):
             the completion deferred.  It is suggested that you use the default,
             which creates a new Deferred for you.
 
+        @param priority: See L{cooperate}.
+
+        @param weight: See L{cooperate}.
+
         @return: a Deferred that will fire when the iterator finishes.
         """
         if doneDeferred is None:
             doneDeferred = defer.Deferred()
-        CooperativeTask(iterator, self).whenDone().chainDeferred(doneDeferred)
+        CooperativeTask(iterator, self, priority, weight
+                        ).whenDone().chainDeferred(doneDeferred)
         return doneDeferred
 
 
-    def cooperate(self, iterator):
+    def cooperate(self, iterator, priority=0, weight=1):
         """
         Start running the given iterator as a long-running cooperative task, by
         calling next() on it as a periodic timed event.
 
         @param iterator: the iterator to invoke.
 
+        @param priority: The priority class of the task.  While any task of a
+            higher priority class is able to run, this one is not run.
+        @type priority: C{int}
+
+        @param weight: The number of work units the task performs in a row
+            each time its turn comes, relative to the other tasks of its
+            priority class.
+        @type weight: C{int}
+
+        @raise ValueError: If C{weight} is less than 1.
+
         @return: a L{CooperativeTask} object representing this task.
         """
-        return CooperativeTask(iterator, self)
+        return CooperativeTask(iterator, self, priority, weight)
 
 
     def _addTask(self, task):
         """
         Add a L{CooperativeTask} object to this L{Cooperator}.
         """
+        self._tasks.append(task)
+        self._priorities[task.priority] = (
+            self._priorities.get(task.priority, 0) + 1)
         if self._stopped:
-            self._tasks.append(task) # XXX silly, I know, but _completeWith
-                                     # does the inverse
+            # XXX silly, I know, but _completeWith does the inverse
             task._completeWith(SchedulerStopped(), Failure(SchedulerStopped()))
         else:
-            self._tasks.append(task)
             self._reschedule()
 
 
@@ -609,6 +693,9 @@ class Cooperator(object):
         Remove a L{CooperativeTask} from this L{Cooperator}.
         """
         self._tasks.remove(task)
+        self._priorities[task.priority] -= 1
+        if not self._priorities[task.priority]:
+            del self._priorities[task.priority]
         # If no work left to do, cancel the delayed call:
         if not self._tasks and self._delayedCall:
             self._delayedCall.cancel()
@@ -620,13 +707,48 @@ class Cooperator(object):
         Yield all L{CooperativeTask} objects in a loop as long as this
         L{Cooperator}'s termination condition has not been met.
         """
-        terminator = self._terminationPredicateFactory()
+        if self._lagTarget is None:
+            terminator = self._terminationPredicateFactory()
+        else:
+            terminator = self._terminationPredicateFactory(self.timeBudget)
         while self._tasks:
             for t in self._metarator:
                 yield t
                 if terminator():
                     return
-            self._metarator = iter(self._tasks)
+            self._metarator = self._round()
+
+
+    def _round(self):
+        """
+        Yield the tasks of the highest priority class with tasks able to run,
+        each as many times in a row as its weight, ending early if a task of a
+        higher priority class becomes able to run.
+        """
+        priority = max(self._priorities)
+        for t in self._tasks:
+            if t.priority != priority:
+                continue
+            for i in range(t.weight):
+                if max(self._priorities or [priority]) > priority:
+                    return
+                if t._pauseCount or t._completionState is not None:
+                    break
+                yield t
+
+
+    def _updateBudget(self):
+        """
+        Measure how late this step started, and adjust C{timeBudget} if a
+        C{lagTarget} was given.
+        """
+        self.lag = max(0.0, self._seconds() - self._scheduledAt)
+        if self._lagTarget is None:
+            return
+        if self.lag > self._lagTarget:
+            self.timeBudget = max(self.minimumBudget, self.timeBudget / 2)
+        elif self.lag < self._lagTarget / 2:
+            self.timeBudget = min(_Timer.MAX_SLICE, self.timeBudget * 1.25)
 
 
     def _tick(self):
@@ -634,6 +756,9 @@ class Cooperator(object):
         Run one scheduler tick.
         """
         self._delayedCall = None
+        if self._scheduledAt is not None:
+            self._updateBudget()
+            self._scheduledAt = None
         for taskObj in self._tasksWhileNotStopped():
             taskObj._oneWorkUnit()
         self._reschedule()
@@ -645,6 +770,7 @@ class Cooperator(object):
             self._mustScheduleOnStart = True
             return
         if self._delayedCall is None and self._tasks:
+            self._scheduledAt = self._seconds()
             self._delayedCall = self._scheduler(self._tick)
 
 
@@ -669,6 +795,7 @@ class Cooperator(object):
             taskObj._completeWith(SchedulerStopped(),
                                   Failure(SchedulerStopped()))
         self._tasks = []
+        self._priorities = {}
         if self._delayedCall is not None:
             self._delayedCall.cancel()
             self._delayedCall = None
@@ -688,7 +815,7 @@ class Cooperator(object):
 
 _theCooperator = Cooperator()
 
-def coiterate(iterator):
+def coiterate(iterator, priority=0, weight=1):
     """
     Cooperatively iterate over the given iterator, dividing runtime between it
     and all other iterators which have been passed to this function and not yet
@@ -696,13 +823,17 @@ def coiterate(iterator):
 
     @param iterator: the iterator to invoke.
 
+    @param priority: See L{Cooperator.cooperate}.
+
+    @param weight: See L{Cooperator.cooperate}.
+
     @return: a Deferred that will fire when the iterator finishes.
     """
-    return _theCooperator.coiterate(iterator)
+    return _theCooperator.coiterate(iterator, priority=priority, weight=weight)
 
 
 
-def cooperate(iterator):
+def cooperate(iterator, priority=0, weight=1):
     """
     Start running the given iterator as a long-running cooperative task, by
     calling next() on it as a periodic timed event.
@@ -715,9 +846,13 @@ def cooperate(iterator):
 
     @param iterator: the iterator to invoke.
 
+    @param priority: See L{Cooperator.cooperate}.
+
+    @param weight: See L{Cooperator.cooperate}.
+
     @return: a L{CooperativeTask} object representing this task.
     """
-    return _theCooperator.cooperate(iterator)
+    return _theCooperator.cooperate(iterator, priority, weight)
 
 
 
@@ -804,6 +939,172 @@ class Clock:
 
 
 
+class _TimerBatch(object):
+    """
+    The timed calls of a L{CoalescingClock} which fall due in one window.
+
+    @ivar key: The number of the window, counted in multiples of the slack
+        of the L{CoalescingClock} from the epoch.
+    @ivar calls: The C{set} of L{base.DelayedCall}s in this batch.
+    @ivar timer: The L{IDelayedCall} on the underlying clock which will run
+        this batch, or C{None} if the L{CoalescingClock} runs its batches
+        some other way.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.calls = set()
+        self.timer = None
+
+
+
+@implementer(IReactorTime)
+class CoalescingClock(object):
+    """
+    An L{IReactorTime} provider which groups timed calls falling due within
+    the same window of C{slack} seconds into a single timed call on another
+    clock.
+
+    Large numbers of periodic calls, such as per-connection L{LoopingCall}s
+    or timeouts, then cost the underlying clock one timed call per window
+    rather than one per call.  A timed call runs at the end of the window it
+    falls due in, so up to C{slack} seconds late but never early, and the
+    calls in one window run in no particular order.  Postponing a call with
+    C{reset} or C{delay} does not move it between windows until its original
+    window comes around.
+
+    Use it by passing it wherever an L{IReactorTime} provider is expected,
+    for example as the C{clock} of a L{LoopingCall}.
+
+    @ivar clock: The underlying L{IReactorTime} provider.
+    @ivar slack: The length of a window, in seconds.
+    @ivar _batches: A C{dict} mapping window numbers to the L{_TimerBatch}es
+        with calls due in them.
+    @ivar _batchOf: A C{dict} mapping each pending call to its
+        L{_TimerBatch}.
+    """
+
+    def __init__(self, clock=None, slack=0.1):
+        """
+        @param clock: The L{IReactorTime} provider to schedule batches on.
+            The default is the global reactor.
+
+        @param slack: The length of a window, in seconds.
+        @type slack: C{float}
+
+        @raise ValueError: If C{slack} is not positive.
+        """
+        if slack <= 0:
+            raise ValueError("slack must be positive")
+        if clock is None:
+            from twisted.internet import reactor as clock
+        self.clock = clock
+        self.slack = slack
+        self._batches = {}
+        self._batchOf = {}
+        # Bound once, rather than for every call.
+        self._callHooks = (self._remove, self._reset, self.seconds)
+
+
+    def seconds(self):
+        """
+        See L{twisted.internet.interfaces.IReactorTime.seconds}.
+        """
+        return self.clock.seconds()
+
+
+    def callLater(self, delay, f, *args, **kw):
+        """
+        See L{twisted.internet.interfaces.IReactorTime.callLater}.
+        """
+        call = base.DelayedCall(self.clock.seconds() + delay, f, args, kw,
+                                *self._callHooks)
+        self._add(call)
+        return call
+
+
+    def getDelayedCalls(self):
+        """
+        See L{twisted.internet.interfaces.IReactorTime.getDelayedCalls}.
+        """
+        return list(self._batchOf)
+
+
+    def _add(self, call):
+        """
+        Add C{call} to the batch of the window it falls due in.
+        """
+        key = -(-call.getTime() // self.slack)
+        batch = self._batches.get(key)
+        if batch is None:
+            batch = self._batches[key] = _TimerBatch(key)
+            self._scheduleBatch(batch)
+        batch.calls.add(call)
+        self._batchOf[call] = batch
+
+
+    def _scheduleBatch(self, batch):
+        """
+        Arrange for the new C{batch} to be run at the end of its window.
+        """
+        batch.timer = self.clock.callLater(
+            max(0, batch.key * self.slack - self.seconds()),
+            self._runBatch, batch)
+
+
+    def _cancelBatch(self, batch):
+        """
+        Stop C{batch}, which has been left empty, from being run.
+        """
+        batch.timer.cancel()
+
+
+    def _remove(self, call):
+        """
+        Remove C{call} from its batch, cancelling the batch if it is left
+        empty.
+        """
+        batch = self._batchOf.pop(call)
+        batch.calls.discard(call)
+        if not batch.calls and self._batches.get(batch.key) is batch:
+            del self._batches[batch.key]
+            self._cancelBatch(batch)
+
+
+    def _reset(self, call):
+        """
+        Move C{call}, which has been rescheduled for an earlier time, to the
+        batch of its new window.
+        """
+        self._remove(call)
+        self._add(call)
+
+
+    def _runBatch(self, batch):
+        """
+        Run the calls of C{batch}, except those which have been postponed,
+        which are added to the batches of their new windows instead.
+        """
+        del self._batches[batch.key]
+        calls, batch.calls = batch.calls, set()
+        for call in calls:
+            # A call run earlier in this batch may have cancelled or
+            # rescheduled this one.
+            if self._batchOf.get(call) is not batch:
+                continue
+            del self._batchOf[call]
+            if call.delayed_time:
+                call.activate_delay()
+                self._add(call)
+                continue
+            call.called = 1
+            try:
+                call.func(*call.args, **call.kw)
+            except:
+                log.err(None, "Unhandled error in coalesced timed call")
+
+
+
 def deferLater(clock, delay, callable, *args, **kw):
     """
     Call the given function after a certain period of time has passed.
@@ -907,7 +1208,7 @@ def react(main, argv=(), _reactor=None):
 __all__ = [
     'LoopingCall',
 
-    'Clock',
+    'Clock', 'CoalescingClock',
 
     'SchedulerStopped', 'Cooperator', 'coiterate',
 
@@ -79,12 +79,13 @@ else:
     from os import strerror
 
 
-from errno import errorcode
+from errno import errorcode, ENOSYS
 
 # Twisted Imports
 from twisted.internet import base, address, fdesc
+from twisted.internet.defer import Deferred
 from twisted.internet.task import deferLater
-from twisted.python import log, failure, reflect
+from twisted.python import log, failure, reflect, _sendfile
 from twisted.python.util import untilConcludes
 from twisted.internet.error import CannotListenError
 from twisted.internet import abstract, main, interfaces, error
@@ -93,6 +94,9 @@ from twisted.internet.protocol import Protocol
 # Not all platforms have, or support, this flag.
 _AI_NUMERICSERV = getattr(socket, "AI_NUMERICSERV", 0)
 
+# Nor this one, which tells the kernel more data is about to be sent.
+_MSG_MORE = getattr(socket, "MSG_MORE", 0)
+
 
 # The type for service names passed to socket.getservbyname:
 if _PY3:
@@ -163,7 +167,219 @@ class _AbortingMixin(object):
 
 
 
-@implementer(interfaces.ITCPTransport, interfaces.ISystemHandle)
+@implementer(interfaces.IPullProducer)
+class _FileTransfer(object):
+    """
+    A pull producer which sends part of a file over a L{Connection}, using
+    C{sendfile} if possible and otherwise reading the file and writing what
+    it reads.
+
+    While the transfer is in progress, data written to the connection by
+    anything else is held back and written once the file has been sent.
+
+    @ivar transport: The L{Connection} the file is sent over.
+
+    @ivar fileObject: The file being sent.
+
+    @ivar offset: The position in the file of the next byte to send.
+    @type offset: C{int}
+
+    @ivar remaining: The number of bytes still to send, or C{None} to send
+        until the end of the file.
+    @type remaining: C{int} or C{NoneType}
+
+    @ivar sent: The number of bytes sent so far.
+    @type sent: C{int}
+
+    @ivar deferred: The L{Deferred} returned by L{start}, or C{None} once it
+        has been fired.
+
+    @ivar sendLimit: The largest number of bytes to pass to one C{sendfile}
+        call.
+    @type sendLimit: C{int}
+
+    @ivar chunkSize: The number of bytes to read from the file at a time when
+        C{sendfile} is not being used.
+    @type chunkSize: C{int}
+
+    @ivar _sendfile: A function with the signature of L{os.sendfile}, or
+        C{None} to read the file and write it instead.
+
+    @ivar _held: A C{list} of the data written to the transport while the
+        transfer is in progress.
+
+    @ivar _write: The C{write} method of the transport before the transfer
+        started.
+
+    @ivar _writeSequence: The C{writeSequence} method of the transport before
+        the transfer started.
+    """
+    sendLimit = 2 ** 20
+    chunkSize = 2 ** 16
+
+    def __init__(self, transport, fileObject, offset, count, sendfile):
+        self.transport = transport
+        self.fileObject = fileObject
+        self.offset = offset
+        self.remaining = count
+        self.sent = 0
+        self.deferred = Deferred()
+        self._sendfile = sendfile
+        self._held = []
+        self._write = transport.write
+        self._writeSequence = transport.writeSequence
+
+
+    def start(self):
+        """
+        Begin sending the file.
+
+        @return: A L{Deferred} which fires with the number of bytes sent.
+        """
+        deferred = self.deferred
+        self.transport.write = self._held.append
+        self.transport.writeSequence = self._held.extend
+        self.transport.registerProducer(self, False)
+        return deferred
+
+
+    def resumeProducing(self):
+        """
+        Send the next part of the file.
+        """
+        if self.deferred is None:
+            return
+        if self._sendfile is None:
+            self._copy()
+        else:
+            self._send()
+
+
+    def stopProducing(self):
+        """
+        Give up sending the file because the connection has been lost.
+        """
+        if self.deferred is None:
+            return
+        deferred, self.deferred = self.deferred, None
+        self._release()
+        deferred.errback(failure.Failure(error.ConnectionLost(
+                    "Connection lost before the file was sent.")))
+
+
+    def _send(self):
+        """
+        Send as much of the file as the socket will take with one
+        C{sendfile} call, once everything previously written to the transport
+        has been sent.
+        """
+        transport = self.transport
+        if (len(transport.dataBuffer) - transport.offset or
+                transport._tempDataLen):
+            # Data written before the file has to go first.  This producer
+            # is resumed again once it has.
+            transport.startWriting()
+            return
+
+        size = self.sendLimit
+        if self.remaining is not None:
+            size = min(size, self.remaining)
+        try:
+            sent = untilConcludes(
+                self._sendfile, transport.fileno(), self.fileObject.fileno(),
+                self.offset, size)
+        except (IOError, OSError) as e:
+            if e.errno in (EAGAIN, EWOULDBLOCK):
+                transport._writeExhausted = True
+                transport.startWriting()
+            elif e.errno in (EINVAL, ENOSYS) and not self.sent:
+                # This kind of file or socket is not supported.
+                self._sendfile = None
+                self._copy()
+            else:
+                self._fail(failure.Failure())
+            return
+
+        # The socket may well have room for more.
+        transport._writeExhausted = False
+        self._advance(sent)
+        if sent == 0 or self.remaining == 0:
+            self._finish()
+        else:
+            transport.startWriting()
+
+
+    def _copy(self):
+        """
+        Read the next chunk of the file and write it to the transport.
+        """
+        size = self.chunkSize
+        if self.remaining is not None:
+            size = min(size, self.remaining)
+        try:
+            self.fileObject.seek(self.offset)
+            data = self.fileObject.read(size)
+        except (IOError, OSError):
+            self._fail(failure.Failure())
+            return
+
+        if data:
+            self._advance(len(data))
+            self._write(data)
+        if not data or self.remaining == 0:
+            self._finish()
+
+
+    def _advance(self, size):
+        """
+        Account for C{size} more bytes of the file having been sent.
+        """
+        self.offset += size
+        self.sent += size
+        if self.remaining is not None:
+            self.remaining -= size
+
+
+    def _release(self):
+        """
+        Restore the transport's write methods and write whatever was held
+        back while the file was being sent.
+        """
+        del self.transport.write
+        del self.transport.writeSequence
+        if self._held:
+            self.transport.writeSequence(self._held)
+            self._held = []
+
+
+    def _finish(self):
+        """
+        The whole file has been sent: stop producing and fire C{deferred}.
+        """
+        deferred, self.deferred = self.deferred, None
+        self._release()
+        self.transport.unregisterProducer()
+        deferred.callback(self.sent)
+
+
+    def _fail(self, reason):
+        """
+        Reading the file or sending it failed part way through, so the data
+        sent over the connection can no longer be interpreted: fail
+        C{deferred} and abort the connection.
+
+        @param reason: A L{failure.Failure} describing the problem.
+        """
+        deferred, self.deferred = self.deferred, None
+        self._release()
+        self.transport.unregisterProducer()
+        self.transport.abortConnection()
+        deferred.errback(reason)
+
+
+
+@implementer(interfaces.ITCPTransport, interfaces.ISystemHandle,
+             interfaces.ISendFileTransport)
 class Connection(_TLSConnectionMixin, abstract.FileDescriptor, _SocketCloser,
                  _AbortingMixin):
     """
@@ -174,8 +390,45 @@ class Connection(_TLSConnectionMixin, abstract.FileDescriptor, _SocketCloser,
 
     @ivar logstr: prefix used when logging events related to this connection.
     @type logstr: C{str}
+
+    @ivar minimumReadSize: The smallest number of bytes a single C{recv} will
+        ask for when this connection has a read budget.
+    @type minimumReadSize: C{int}
+
+    @ivar maximumReadSize: The largest number of bytes a single C{recv} will
+        ask for when this connection has a read budget.
+    @type maximumReadSize: C{int}
+
+    @ivar _readBudget: C{None} to use the read budget of the reactor,
+        otherwise a two-tuple of the maximum number of bytes and the maximum
+        number of seconds (or C{None} for no time limit) to spend reading
+        each time the socket becomes readable.
+
+    @ivar _readSize: The number of bytes the next C{recv} will ask for when
+        this connection has a read budget, adjusted according to the amount of
+        data returned by previous calls.
+    @type _readSize: C{int}
+
+    @ivar _readInterrupted: Set to C{True} by C{stopReading} so that a read
+        loop in progress notices it should not read any more.
+    @type _readInterrupted: C{bool}
+
+    @ivar _coalesceWrites: Whether write coalescing is enabled.  See
+        L{setWriteCoalescing}.
+    @type _coalesceWrites: C{bool}
+
+    @ivar _flushPending: C{True} while this connection is waiting to be
+        flushed by its L{base._WriteFlusher}.
+    @type _flushPending: C{bool}
     """
 
+    minimumReadSize = 2 ** 12
+    maximumReadSize = 2 ** 20
+    _readBudget = None
+    _readSize = None
+    _readInterrupted = False
+    _coalesceWrites = False
+    _flushPending = False
 
     def __init__(self, skt, protocol, reactor=None):
         abstract.FileDescriptor.__init__(self, reactor=reactor)
@@ -190,6 +443,57 @@ class Connection(_TLSConnectionMixin, abstract.FileDescriptor, _SocketCloser,
         return self.socket
 
 
+    def setReadBudget(self, maxBytes, maxSeconds=None):
+        """
+        Read repeatedly from the socket each time it becomes readable, until
+        it has no more data or the given budget is spent, instead of reading
+        at most C{self.bufferSize} bytes.
+
+        While a budget is in effect, the size of each read grows when reads
+        fill the buffer and shrinks when they return much less, between
+        C{minimumReadSize} and C{maximumReadSize}.
+
+        @param maxBytes: The number of bytes after which to stop reading and
+            let other connections be serviced, or C{None} to use the budget
+            set with the reactor's C{setReadBudget}, if any.  A budget of C{1}
+            makes this connection read once per event, regardless of the
+            reactor's budget.
+        @type maxBytes: C{int} or C{NoneType}
+
+        @param maxSeconds: The number of seconds after which to stop reading,
+            or C{None} for no time limit.
+        @type maxSeconds: C{float} or C{NoneType}
+        """
+        if maxBytes is None:
+            self._readBudget = None
+        else:
+            self._readBudget = (maxBytes, maxSeconds)
+
+
+    def getReadBudget(self):
+        """
+        @return: C{None} if reads from this connection are not budgeted,
+            otherwise a two-tuple of the maximum number of bytes and the
+            maximum number of seconds (or C{None}) to spend reading for each
+            read event.
+        """
+        budget = self._readBudget
+        if budget is None:
+            getReactorBudget = getattr(self.reactor, 'getReadBudget', None)
+            if getReactorBudget is not None:
+                budget = getReactorBudget()
+        return budget
+
+
+    def stopReading(self):
+        """
+        Stop waiting for read availability, and stop any read loop which is in
+        progress.
+        """
+        self._readInterrupted = True
+        abstract.FileDescriptor.stopReading(self)
+
+
     def doRead(self):
         """Calls self.protocol.dataReceived with all available data.
 
@@ -197,18 +501,71 @@ class Connection(_TLSConnectionMixin, abstract.FileDescriptor, _SocketCloser,
         calls self.dataReceived(data) to process it.  If the connection is not
         lost through an error in the physical recv(), this function will return
         the result of the dataReceived call.
+
+        If a read budget has been set, see L{setReadBudget}, reading continues
+        until the socket has no more data or the budget is spent.
         """
+        budget = self.getReadBudget()
+        if budget is not None:
+            return self._doBudgetedRead(*budget)
+
         try:
             data = self.socket.recv(self.bufferSize)
         except socket.error as se:
             if se.args[0] == EWOULDBLOCK:
+                self._readExhausted = True
                 return
             else:
                 return main.CONNECTION_LOST
 
+        self._readExhausted = len(data) < self.bufferSize
         return self._dataReceived(data)
 
 
+    def _doBudgetedRead(self, maxBytes, maxSeconds):
+        """
+        Read from the socket and deliver the data to the protocol until the
+        socket has no more data, the protocol stops this connection from
+        reading, or C{maxBytes} bytes or C{maxSeconds} seconds have been
+        spent.
+
+        @see: L{setReadBudget}
+        """
+        if maxSeconds is not None:
+            deadline = self.reactor.seconds() + maxSeconds
+        readSize = self._readSize or self.bufferSize
+        received = 0
+        self._readInterrupted = False
+        while True:
+            try:
+                data = self.socket.recv(readSize)
+            except socket.error as se:
+                if se.args[0] in (EWOULDBLOCK, EAGAIN):
+                    self._readExhausted = True
+                    return
+                else:
+                    return main.CONNECTION_LOST
+
+            size = len(data)
+            # A short read means the socket had no more data.
+            self._readExhausted = size < readSize
+            if size == readSize:
+                readSize = min(readSize * 2, self.maximumReadSize)
+            elif size < readSize // 4:
+                readSize = max(readSize // 2, self.minimumReadSize)
+            self._readSize = readSize
+
+            rval = self._dataReceived(data)
+            if rval is not None:
+                return rval
+            received += size
+            if (self._readInterrupted or self.disconnecting or
+                    not self.connected or received >= maxBytes):
+                return
+            if maxSeconds is not None and self.reactor.seconds() >= deadline:
+                return
+
+
     def _dataReceived(self, data):
         if not data:
             return main.CONNECTION_DONE
@@ -225,6 +582,79 @@ class Connection(_TLSConnectionMixin, abstract.FileDescriptor, _SocketCloser,
         return rval
 
 
+    def setWriteCoalescing(self, enabled):
+        """
+        Enable or disable write coalescing.
+
+        Normally, data written to the connection is buffered until the reactor
+        reports that the socket is writable, in a later iteration.  With write
+        coalescing, everything written during one reactor iteration, while
+        its events are dispatched or its timed calls run, is sent at the end
+        of that iteration with as few sends as possible.  This saves
+        registering the socket for writing and waiting for another iteration.
+        Data which cannot be sent at once is sent when the socket becomes
+        writable, as usual.  Where the platform supports C{MSG_MORE}, sends which are
+        followed by more buffered data are flagged with it, so the kernel
+        does not send a short segment for each of them.
+
+        @param enabled: C{True} to enable write coalescing, C{False} to disable
+            it.
+        @type enabled: C{bool}
+        """
+        self._coalesceWrites = bool(enabled)
+
+
+    def getWriteCoalescing(self):
+        """
+        @return: C{True} if write coalescing is enabled, C{False} otherwise.
+        """
+        return self._coalesceWrites
+
+
+    def startWriting(self):
+        """
+        Start waiting for write availability, or, if write coalescing is
+        enabled and data is buffered, arrange for it to be sent at the end of
+        this reactor iteration.
+
+        A producer which calls this with nothing buffered, such as the one
+        used by L{sendFile} when C{sendfile} would block, is waiting for the
+        socket to become writable, so that is what it waits for.
+        """
+        if (self._coalesceWrites and not self.disconnecting and
+                not self._writeDisconnecting and self._bufferedLength()):
+            if not self._flushPending:
+                self._flushPending = True
+                base._flusherFor(self.reactor).add(self)
+        else:
+            abstract.FileDescriptor.startWriting(self)
+
+
+    def _flushWrites(self):
+        """
+        Send as much buffered data as possible, as though the socket had been
+        reported writable, and wait for write availability if any is left.
+        """
+        self._flushPending = False
+        if not self.connected:
+            return
+        if self.disconnecting:
+            # Leave the rest, and closing the connection, to the reactor.
+            abstract.FileDescriptor.startWriting(self)
+            return
+        try:
+            why = self.doWrite()
+        except:
+            why = sys.exc_info()[1]
+            log.err()
+        if why:
+            self.stopReading()
+            self.stopWriting()
+            self.connectionLost(failure.Failure(why))
+        elif self._bufferedLength():
+            abstract.FileDescriptor.startWriting(self)
+
+
     def writeSomeData(self, data):
         """
         Write as much as possible of the given data to this TCP connection.
@@ -238,12 +668,68 @@ class Connection(_TLSConnectionMixin, abstract.FileDescriptor, _SocketCloser,
         limitedData = lazyByteSlice(data, 0, self.SEND_LIMIT)
 
         try:
-            return untilConcludes(self.socket.send, limitedData)
+            if self._coalesceWrites and (
+                    self._tempDataLen or len(data) > self.SEND_LIMIT):
+                sent = untilConcludes(
+                    self.socket.send, limitedData, _MSG_MORE)
+            else:
+                sent = untilConcludes(self.socket.send, limitedData)
         except socket.error as se:
             if se.args[0] in (EWOULDBLOCK, ENOBUFS):
+                self._writeExhausted = True
                 return 0
             else:
                 return main.CONNECTION_LOST
+        self._writeExhausted = sent < len(limitedData)
+        return sent
+
+
+    if getattr(socket.socket, "sendmsg", None) is not None:
+        def _writeSomeVectors(self, vectors):
+            """
+            Write as much as possible of the given buffers to this TCP
+            connection with one C{sendmsg} call.
+
+            @param vectors: A C{list} of C{bytes} or buffers to send, in
+                order.
+
+            @return: The number of bytes written, or an exception if the
+                connection was lost.
+            """
+            size = sum([len(vector) for vector in vectors])
+            try:
+                if self._coalesceWrites and self._bufferedLength() > size:
+                    sent = untilConcludes(
+                        self.socket.sendmsg, vectors, [], _MSG_MORE)
+                else:
+                    sent = untilConcludes(self.socket.sendmsg, vectors)
+            except socket.error as se:
+                if se.args[0] in (EWOULDBLOCK, ENOBUFS):
+                    self._writeExhausted = True
+                    return 0
+                else:
+                    return main.CONNECTION_LOST
+            self._writeExhausted = sent < size
+            return sent
+
+
+    def sendFile(self, fileObject, offset, count):
+        """
+        Send part of a file over this connection, with C{sendfile} if the
+        platform has it, TLS has not been started, and C{fileObject} has a
+        file descriptor.
+
+        @see: L{interfaces.ISendFileTransport.sendFile}
+        """
+        sendfile = _sendfile.sendfile
+        if self.TLS:
+            sendfile = None
+        elif sendfile is not None:
+            try:
+                fileObject.fileno()
+            except (AttributeError, ValueError, IOError, OSError):
+                sendfile = None
+        return _FileTransfer(self, fileObject, offset, count, sendfile).start()
 
 
     def _closeWriteConnection(self):
@@ -892,6 +1378,11 @@ class Port(base.BasePort, _SocketCloser):
         was created and initialized outside of the reactor and will be used to
         listen for connections (instead of a new socket being created by this
         L{Port}).
+
+    @ivar _acceptInterrupted: Set to C{True} by C{stopReading} so that an
+        accept loop in progress, for instance one whose factory has just
+        decided to stop admitting connections, accepts no more of them.
+    @type _acceptInterrupted: C{bool}
     """
 
     socketType = socket.SOCK_STREAM
@@ -913,14 +1404,21 @@ class Port(base.BasePort, _SocketCloser):
 
     addressFamily = socket.AF_INET
     _addressType = address.IPv4Address
+    _acceptInterrupted = False
 
-    def __init__(self, port, factory, backlog=50, interface='', reactor=None):
+    def __init__(self, port, factory, backlog=50, interface='', reactor=None,
+                 reusePort=False):
         """Initialize with a numeric port to listen on.
+
+        @param reusePort: If C{True}, set C{SO_REUSEPORT} on the listening
+            socket (see L{base.BasePort.reusePort}).
+        @type reusePort: C{bool}
         """
         base.BasePort.__init__(self, reactor=reactor)
         self.port = port
         self.factory = factory
         self.backlog = backlog
+        self.reusePort = reusePort
         if abstract.isIPv6Address(interface):
             self.addressFamily = socket.AF_INET6
             self._addressType = address.IPv6Address
@@ -1026,16 +1524,19 @@ class Port(base.BasePort, _SocketCloser):
                 # win32 event loop breaks if we do more than one accept()
                 # in an iteration of the event loop.
                 numAccepts = 1
+            self._acceptInterrupted = False
+            self._readExhausted = False
             for i in range(numAccepts):
                 # we need this so we can deal with a factory's buildProtocol
-                # calling our loseConnection
-                if self.disconnecting:
+                # calling our loseConnection or stopReading
+                if self.disconnecting or self._acceptInterrupted:
                     return
                 try:
                     skt, addr = self.socket.accept()
                 except socket.error as e:
                     if e.args[0] in (EWOULDBLOCK, EAGAIN):
                         self.numberAccepts = i
+                        self._readExhausted = True
                         break
                     elif e.args[0] == EPERM:
                         # Netfilter on Linux may have rejected the
@@ -1084,6 +1585,16 @@ class Port(base.BasePort, _SocketCloser):
             # and return, so handling it here works just as well.
             log.deferr()
 
+
+    def stopReading(self):
+        """
+        Stop waiting for connections, and stop any accept loop which is in
+        progress.
+        """
+        self._acceptInterrupted = True
+        base.BasePort.stopReading(self)
+
+
     def loseConnection(self, connDone=failure.Failure(main.CONNECTION_DONE)):
         """
         Stop accepting connections on this port.
@@ -6,6 +6,8 @@ Tests for L{twisted.internet.base}.
 """
 
 import socket
+import sys
+import weakref
 try:
     from Queue import Queue
 except ImportError:
@@ -15,8 +17,14 @@ from zope.interface import implementer
 
 from twisted.python.threadpool import ThreadPool
 from twisted.internet.interfaces import IReactorTime, IReactorThreads
+from twisted.internet.interfaces import IResolverSimple
 from twisted.internet.error import DNSLookupError
-from twisted.internet.base import ThreadedResolver, DelayedCall
+from twisted.internet.base import ThreadedResolver, CachingResolver
+from twisted.internet.base import DelayedCall
+from twisted.internet.base import HeapTimerQueue, IndexedTimerQueue
+from twisted.internet.base import LoopInstrumentation, _WriteFlusher
+from twisted.python import log
+from twisted.internet.defer import Deferred, CancelledError
 from twisted.internet.task import Clock
 from twisted.trial.unittest import TestCase
 
@@ -31,6 +39,7 @@ class FakeReactor(object):
     def __init__(self):
         self._clock = Clock()
         self.callLater = self._clock.callLater
+        self.seconds = self._clock.seconds
 
         self._threadpool = ThreadPool()
         self._threadpool.start()
@@ -162,6 +171,180 @@ def nothing():
     """
 
 
+@implementer(IResolverSimple)
+class ControlledResolver(object):
+    """
+    A resolver whose lookups are finished by the test using it.
+
+    @ivar lookups: A L{list} of two-tuples of the name and the L{Deferred}
+        returned for each call to L{getHostByName}.
+    """
+    def __init__(self):
+        self.lookups = []
+
+
+    def getHostByName(self, name, timeout=(1, 3, 11, 45)):
+        d = Deferred()
+        self.lookups.append((name, d))
+        return d
+
+
+
+class CachingResolverTests(TestCase):
+    """
+    Tests for L{CachingResolver}.
+    """
+    def setUp(self):
+        self.clock = Clock()
+        self.lookups = ControlledResolver()
+        self.resolver = CachingResolver(
+            self.clock, self.lookups, positiveTTL=60, negativeTTL=10,
+            maxEntries=2)
+
+
+    def test_lookup(self):
+        """
+        L{CachingResolver.getHostByName} looks names up with the wrapped
+        resolver and returns a L{Deferred} which fires with the result.
+        """
+        results = []
+        self.resolver.getHostByName("example.com").addCallback(results.append)
+        [(name, d)] = self.lookups.lookups
+        self.assertEqual(name, "example.com")
+        d.callback("10.0.0.1")
+        self.assertEqual(results, ["10.0.0.1"])
+        self.assertEqual(
+            (self.resolver.hits, self.resolver.coalesced,
+             self.resolver.misses), (0, 0, 1))
+
+
+    def test_positiveCache(self):
+        """
+        The result of a successful lookup is returned for the same name without
+        another lookup until C{positiveTTL} seconds have passed.
+        """
+        self.resolver.getHostByName("example.com")
+        self.lookups.lookups[0][1].callback("10.0.0.1")
+        self.clock.advance(59)
+        results = []
+        self.resolver.getHostByName("example.com").addCallback(results.append)
+        self.assertEqual(results, ["10.0.0.1"])
+        self.assertEqual(len(self.lookups.lookups), 1)
+        self.assertEqual(self.resolver.hits, 1)
+
+        self.clock.advance(1)
+        self.resolver.getHostByName("example.com")
+        self.assertEqual(len(self.lookups.lookups), 2)
+        self.assertEqual(self.resolver.misses, 2)
+
+
+    def test_negativeCache(self):
+        """
+        The failure of a lookup is returned for the same name without another
+        lookup until C{negativeTTL} seconds have passed.
+        """
+        d = self.resolver.getHostByName("example.com")
+        self.lookups.lookups[0][1].errback(DNSLookupError("example.com"))
+        self.failureResultOf(d, DNSLookupError)
+        self.clock.advance(9)
+        self.failureResultOf(
+            self.resolver.getHostByName("example.com"), DNSLookupError)
+        self.assertEqual(len(self.lookups.lookups), 1)
+
+        self.clock.advance(1)
+        self.resolver.getHostByName("example.com")
+        self.assertEqual(len(self.lookups.lookups), 2)
+
+
+    def test_coalesced(self):
+        """
+        Requests for a name made while a lookup for it is in progress get the
+        result of that lookup rather than starting another, and cancelling one
+        of them does not affect the others.
+        """
+        first = self.resolver.getHostByName("example.com")
+        second = self.resolver.getHostByName("example.com")
+        third = self.resolver.getHostByName("example.com")
+        self.assertEqual(len(self.lookups.lookups), 1)
+        second.cancel()
+        self.lookups.lookups[0][1].callback("10.0.0.1")
+        self.assertEqual(self.successResultOf(first), "10.0.0.1")
+        self.failureResultOf(second, CancelledError)
+        self.assertEqual(self.successResultOf(third), "10.0.0.1")
+        self.assertEqual(
+            (self.resolver.hits, self.resolver.coalesced,
+             self.resolver.misses), (0, 2, 1))
+        self.assertEqual(self.resolver.hitRate(), 2.0 / 3)
+
+
+    def test_leastRecentlyUsedForgotten(self):
+        """
+        When there are more than C{maxEntries} results, the least recently used
+        are forgotten.
+        """
+        for name in ["a", "b"]:
+            self.resolver.getHostByName(name)
+            self.lookups.lookups[-1][1].callback(name)
+        self.resolver.getHostByName("a")
+        self.resolver.getHostByName("c")
+        self.lookups.lookups[-1][1].callback("c")
+        self.assertEqual(len(self.lookups.lookups), 3)
+        self.resolver.getHostByName("a")
+        self.assertEqual(len(self.lookups.lookups), 3)
+        self.resolver.getHostByName("b")
+        self.assertEqual(len(self.lookups.lookups), 4)
+
+
+    def test_clear(self):
+        """
+        L{CachingResolver.clear} forgets the results of earlier lookups.
+        """
+        self.resolver.getHostByName("example.com")
+        self.lookups.lookups[0][1].callback("10.0.0.1")
+        self.resolver.clear()
+        self.resolver.getHostByName("example.com")
+        self.assertEqual(len(self.lookups.lookups), 2)
+
+
+    def test_hitRateWithoutRequests(self):
+        """
+        L{CachingResolver.hitRate} is C{0.0} before any requests are made.
+        """
+        self.assertEqual(self.resolver.hitRate(), 0.0)
+
+
+    def test_getAddressInfo(self):
+        """
+        L{CachingResolver.getAddressInfo} calls L{socket.getaddrinfo} in the
+        reactor's threadpool and caches the result by all of its arguments.
+        """
+        reactor = FakeReactor()
+        self.addCleanup(reactor._stop)
+        calls = []
+        result = [(socket.AF_INET, socket.SOCK_STREAM, 6, '',
+                   ('10.0.0.1', 80))]
+        def fakeGetAddrInfo(*args):
+            calls.append(args)
+            return result
+
+        resolver = CachingResolver(reactor)
+        resolver._getaddrinfo = fakeGetAddrInfo
+        d = resolver.getAddressInfo("example.com", 80, 0, socket.SOCK_STREAM)
+        reactor._runThreadCalls()
+        self.assertEqual(self.successResultOf(d), result)
+        self.assertEqual(
+            calls, [("example.com", 80, 0, socket.SOCK_STREAM, 0, 0)])
+
+        self.assertEqual(
+            self.successResultOf(resolver.getAddressInfo(
+                "example.com", 80, 0, socket.SOCK_STREAM)), result)
+        self.assertEqual(len(calls), 1)
+        resolver.getAddressInfo("example.com", 443, 0, socket.SOCK_STREAM)
+        reactor._runThreadCalls()
+        self.assertEqual(len(calls), 2)
+
+
+
 class DelayedCallTests(TestCase):
     """
     Tests for L{DelayedCall}.
@@ -270,3 +453,529 @@ class DelayedCallTests(TestCase):
         self.assertTrue(self.zero != self.one)
         self.assertFalse(self.zero != self.zero)
         self.assertFalse(self.one != self.one)
+
+
+    def test_slots(self):
+        """
+        L{DelayedCall} instances keep their attributes in C{__slots__} and so
+        take much less memory than they would with an instance dictionary,
+        which is only allocated once some other attribute is set.
+        """
+        self.assertTrue(sys.getsizeof(self.zero) <= 256)
+        self.zero.extra = 1
+        self.assertEqual(self.zero.extra, 1)
+        self.assertEqual(vars(self.zero), {"extra": 1})
+
+
+    def test_weakref(self):
+        """
+        L{DelayedCall} instances can be weakly referenced.
+        """
+        self.assertIs(weakref.ref(self.zero)(), self.zero)
+
+
+    def test_debug(self):
+        """
+        With C{debug} enabled, a L{DelayedCall} records the stack it was
+        created from, and keeps the description of the function it was to
+        call once it is cancelled.
+        """
+        self.patch(DelayedCall, "debug", True)
+        cancelled = []
+        dc = DelayedCall(1, nothing, (), {}, cancelled.append, None,
+                         lambda: 0)
+        self.assertIsInstance(dc.creator, list)
+        dc.cancel()
+        self.assertEqual(cancelled, [dc])
+        self.assertFalse(hasattr(dc, "func"))
+        self.assertIn("cancelled=1 nothing()", str(dc))
+
+
+
+class TimerQueueTestsMixin:
+    """
+    Tests for timer queue implementations.
+
+    @ivar queueFactory: A no-argument callable returning a new, empty timer
+        queue.
+    """
+
+    def setUp(self):
+        self.queue = self.queueFactory()
+
+
+    def _schedule(self, time):
+        """
+        Create a L{DelayedCall} at a given C{time} which uses C{self.queue} to
+        cancel and reschedule itself, and add it to the queue.
+
+        @param time: The absolute time at which the returned L{DelayedCall}
+            will be scheduled.
+        """
+        call = DelayedCall(time, lambda: None, (), {}, self.queue.cancel,
+                           self.queue.moveSooner, lambda: 0)
+        self.queue.schedule(call)
+        return call
+
+
+    def _drain(self, now):
+        """
+        Remove every call due at C{now} from C{self.queue}.
+
+        @return: A C{list} of the removed calls, in the order in which they
+            were returned by C{popDue}.
+        """
+        result = []
+        while True:
+            call = self.queue.popDue(now)
+            if call is None:
+                return result
+            result.append(call)
+
+
+    def test_scheduledNotDue(self):
+        """
+        A call passed to C{schedule} is not returned by C{popDue} until
+        C{insertScheduled} is called.
+        """
+        call = self._schedule(1)
+        self.assertIdentical(self.queue.popDue(5), None)
+        self.queue.insertScheduled()
+        self.assertIdentical(self.queue.popDue(5), call)
+
+
+    def test_popDueOrder(self):
+        """
+        C{popDue} returns calls in the order of their C{time}, and only those
+        which are due.
+        """
+        calls = [self._schedule(t) for t in [5, 3, 9, 1, 7, 2, 8]]
+        self.queue.insertScheduled()
+        self.assertEqual([c.time for c in self._drain(5)], [1, 2, 3, 5])
+        self.assertEqual(
+            sorted([c.time for c in self.queue.getCalls()]), [7, 8, 9])
+        self.assertEqual(len(calls), 7)
+
+
+    def test_earliest(self):
+        """
+        C{earliest} returns the call with the smallest C{time}, or C{None} if
+        there are no calls.
+        """
+        self.assertIdentical(self.queue.earliest(), None)
+        self._schedule(3)
+        first = self._schedule(2)
+        self.queue.insertScheduled()
+        self.assertIdentical(self.queue.earliest(), first)
+
+
+    def test_cancel(self):
+        """
+        A cancelled call is not returned by C{popDue} or C{getCalls}.
+        """
+        calls = [self._schedule(t) for t in range(10)]
+        self.queue.insertScheduled()
+        calls[0].cancel()
+        calls[4].cancel()
+        calls[9].cancel()
+        self.assertEqual(
+            [c.time for c in self._drain(10)], [1, 2, 3, 5, 6, 7, 8])
+        self.assertEqual(self.queue.getCalls(), [])
+
+
+    def test_cancelScheduled(self):
+        """
+        A call cancelled before C{insertScheduled} is never returned by
+        C{popDue}.
+        """
+        call = self._schedule(1)
+        call.cancel()
+        self.queue.insertScheduled()
+        self.assertEqual(self._drain(5), [])
+
+
+    def test_moveSooner(self):
+        """
+        After a call is reset to an earlier time, C{popDue} returns it in its
+        new position.
+        """
+        calls = [self._schedule(t) for t in range(10, 20)]
+        self.queue.insertScheduled()
+        calls[7].reset(1)
+        calls[3].reset(2)
+        self.assertEqual(self._drain(12), [calls[7], calls[3]] + calls[:3])
+
+
+    def test_push(self):
+        """
+        C{push} puts a call removed by C{popDue} back in the queue according
+        to its current C{time}.
+        """
+        calls = [self._schedule(t) for t in [1, 2, 3]]
+        self.queue.insertScheduled()
+        call = self.queue.popDue(1)
+        call.time = 2.5
+        self.queue.push(call)
+        self.assertEqual(self._drain(3), [calls[1], calls[0], calls[2]])
+
+
+    def test_getCalls(self):
+        """
+        C{getCalls} includes calls which have been scheduled but not yet
+        inserted.
+        """
+        first = self._schedule(1)
+        self.queue.insertScheduled()
+        second = self._schedule(2)
+        self.assertEqual(set(self.queue.getCalls()), set([first, second]))
+
+
+
+class HeapTimerQueueTests(TimerQueueTestsMixin, TestCase):
+    """
+    Tests for L{HeapTimerQueue}.
+    """
+    queueFactory = HeapTimerQueue
+
+
+    def test_compaction(self):
+        """
+        Once more than half of the calls in the heap have been cancelled, they
+        are discarded by C{insertScheduled}.
+        """
+        calls = [self._schedule(t) for t in range(100)]
+        self.queue.insertScheduled()
+        for call in calls[:60]:
+            call.cancel()
+        self.assertEqual(len(self.queue._heap), 100)
+        self.queue.insertScheduled()
+        self.assertEqual(self.queue._heap, calls[60:])
+        self.assertEqual(self.queue._cancellations, 0)
+
+
+
+class IndexedTimerQueueTests(TimerQueueTestsMixin, TestCase):
+    """
+    Tests for L{IndexedTimerQueue}.
+    """
+    queueFactory = IndexedTimerQueue
+
+
+    def _assertIndexed(self):
+        """
+        Assert that every call in the heap records its own position and that
+        the heap invariant holds.
+        """
+        heap = self.queue._heap
+        for index, call in enumerate(heap):
+            self.assertEqual(call._heapIndex, index)
+            if index:
+                self.assertTrue(heap[(index - 1) // 2].time <= call.time)
+
+
+    def test_cancelRemoves(self):
+        """
+        Cancelling a call removes it from the heap immediately.
+        """
+        calls = [self._schedule(t) for t in [4, 8, 1, 6, 3, 9, 2]]
+        self.queue.insertScheduled()
+        calls[3].cancel()
+        calls[2].cancel()
+        self.assertNotIn(calls[3], self.queue._heap)
+        self.assertNotIn(calls[2], self.queue._heap)
+        self.assertIdentical(calls[3]._heapIndex, None)
+        self._assertIndexed()
+
+
+    def test_indexesMaintained(self):
+        """
+        The recorded positions of calls stay correct across an arbitrary mix
+        of insertions, resets, cancellations and removals.
+        """
+        times = [(i * 7919) % 101 for i in range(200)]
+        calls = [self._schedule(t + 100) for t in times]
+        self.queue.insertScheduled()
+        self._assertIndexed()
+        for call in calls[::3]:
+            call.reset(call.time % 50)
+        self._assertIndexed()
+        for call in calls[1::4]:
+            if call.active():
+                call.cancel()
+        self._assertIndexed()
+        due = self._drain(120)
+        self._assertIndexed()
+        self.assertEqual([c.time for c in due], sorted([c.time for c in due]))
+        self.assertEqual(
+            len(due) + len(self.queue._heap),
+            len([c for c in calls if not c.cancelled]))
+
+
+
+class SlowSelectable(object):
+    """
+    A selectable whose C{doRead} and C{doWrite} advance a clock.
+
+    @ivar clock: The L{Clock} to advance.
+
+    @ivar duration: How far to advance it.
+    """
+    def __init__(self, clock, duration):
+        self.clock = clock
+        self.duration = duration
+
+
+    def doRead(self):
+        self.clock.advance(self.duration)
+        return "read"
+
+
+    def doWrite(self):
+        self.clock.advance(self.duration)
+
+
+
+class LoopInstrumentationTests(TestCase):
+    """
+    Tests for L{LoopInstrumentation}.
+    """
+
+    def setUp(self):
+        self.clock = Clock()
+        self.instrumentation = LoopInstrumentation(
+            threshold=0.5, seconds=self.clock.seconds)
+        self.events = []
+        log.addObserver(self.events.append)
+        self.addCleanup(log.removeObserver, self.events.append)
+
+
+    def _call(self, time, f, *args):
+        """
+        Create a L{DelayedCall} of C{f} due at C{time}.
+        """
+        return DelayedCall(time, f, args, {}, None, None, self.clock.seconds)
+
+
+    def test_iterations(self):
+        """
+        L{LoopInstrumentation.startIteration} counts the iterations which
+        have finished, and records their total and longest wall time.
+        """
+        self.instrumentation.startIteration()
+        self.clock.advance(1)
+        self.instrumentation.startIteration()
+        self.clock.advance(3)
+        self.instrumentation.startIteration()
+        statistics = self.instrumentation.statistics()
+        self.assertEqual(statistics['iterations'], 2)
+        self.assertEqual(statistics['iterationTime'], 4)
+        self.assertEqual(statistics['maxIterationTime'], 3)
+
+
+    def test_threadCalls(self):
+        """
+        L{LoopInstrumentation.ranThreadCalls} adds the time since the given
+        start time to C{threadCallTime}.
+        """
+        started = self.instrumentation.startIteration()
+        self.clock.advance(2)
+        self.instrumentation.ranThreadCalls(started)
+        self.assertEqual(self.instrumentation.threadCallTime, 2)
+
+
+    def test_callTimed(self):
+        """
+        L{LoopInstrumentation.callTimed} runs a L{DelayedCall}, adds the time
+        it took to C{timedCallTime} and counts how late it ran in
+        C{lagHistogram}.
+        """
+        result = []
+        call = self._call(-0.003, result.append, 1)
+        self.instrumentation.callTimed(call)
+        self.assertEqual(result, [1])
+        self.assertEqual(self.instrumentation.timedCallTime, 0)
+        histogram = [0] * (len(LoopInstrumentation.lagBounds) + 1)
+        histogram[2] = 1
+        self.assertEqual(self.instrumentation.lagHistogram, histogram)
+        self.assertEqual(self.events, [])
+
+
+    def test_slowTimedCall(self):
+        """
+        A timed call taking longer than the threshold is recorded in
+        C{slowCalls} with its fully qualified name, and logged.
+        """
+        call = self._call(0, self.clock.advance, 0.75)
+        self.instrumentation.callTimed(call)
+        name = "twisted.internet.task.Clock.advance"
+        self.assertEqual(self.instrumentation.timedCallTime, 0.75)
+        self.assertEqual(
+            list(self.instrumentation.slowCalls), [("timed", name, 0.75)])
+        self.assertEqual(self.instrumentation.slowCallCount, 1)
+        self.assertEqual(len(self.events), 1)
+        self.assertEqual(self.events[0]['slowCall'], name)
+        self.assertEqual(self.events[0]['kind'], "timed")
+        self.assertEqual(self.events[0]['duration'], 0.75)
+
+
+    def test_slowCallRaises(self):
+        """
+        A timed call which raises an exception is still measured.
+        """
+        def fail():
+            self.clock.advance(1)
+            raise ZeroDivisionError()
+        self.assertRaises(
+            ZeroDivisionError, self.instrumentation.callTimed,
+            self._call(0, fail))
+        self.assertEqual(self.instrumentation.timedCallTime, 1)
+        self.assertEqual(self.instrumentation.slowCallCount, 1)
+
+
+    def test_callIO(self):
+        """
+        L{LoopInstrumentation.callIO} calls the named method of a selectable
+        and returns its result, adding the time it took to C{ioTime}, and
+        reports it by the selectable's class and the method name if it was
+        slow.
+        """
+        selectable = SlowSelectable(self.clock, 0.25)
+        self.assertEqual(
+            self.instrumentation.callIO(selectable, "doRead"), "read")
+        selectable.duration = 1
+        self.instrumentation.callIO(selectable, "doWrite")
+        self.assertEqual(self.instrumentation.ioTime, 1.25)
+        self.assertEqual(
+            list(self.instrumentation.slowCalls),
+            [("doWrite", __name__ + ".SlowSelectable.doWrite", 1)])
+
+
+    def test_report(self):
+        """
+        If C{reportInterval} is set, L{LoopInstrumentation.startIteration}
+        logs the statistics under the C{loopStatistics} key once that many
+        seconds have passed since the last report, and resets them.
+        """
+        self.instrumentation.reportInterval = 10
+        self.instrumentation.startIteration()
+        self.clock.advance(6)
+        self.instrumentation.startIteration()
+        self.assertEqual(self.events, [])
+        self.clock.advance(4)
+        self.instrumentation.startIteration()
+        self.assertEqual(len(self.events), 1)
+        statistics = self.events[0]['loopStatistics']
+        self.assertEqual(statistics['iterations'], 2)
+        self.assertEqual(statistics['iterationTime'], 10)
+        self.assertEqual(self.instrumentation.iterations, 0)
+        self.assertEqual(self.instrumentation.iterationTime, 0)
+
+
+
+class FlushedConnection(object):
+    """
+    A connection which records when it is flushed by a L{_WriteFlusher}.
+
+    @ivar flushed: A C{list} to which this connection appends itself each
+        time it is flushed.
+
+    @ivar next: A connection to add to the flusher when this one is flushed,
+        or C{None}.
+    """
+    next = None
+
+    def __init__(self, flusher, flushed):
+        self.flusher = flusher
+        self.flushed = flushed
+
+
+    def logPrefix(self):
+        return "FlushedConnection"
+
+
+    def _flushWrites(self):
+        self.flushed.append(self)
+        if self.next is not None:
+            self.flusher.add(self.next)
+
+
+
+class WriteFlusherTests(TestCase):
+    """
+    Tests for L{_WriteFlusher}.
+    """
+    def setUp(self):
+        self.clock = Clock()
+        self.flusher = _WriteFlusher(self.clock)
+        self.flushed = []
+
+
+    def test_oneCallPerIteration(self):
+        """
+        However many connections are added, L{_WriteFlusher} uses one timed
+        call to flush them all, in the order they were added.
+        """
+        first = FlushedConnection(self.flusher, self.flushed)
+        second = FlushedConnection(self.flusher, self.flushed)
+        self.flusher.add(first)
+        self.flusher.add(second)
+        self.assertEqual(len(self.clock.getDelayedCalls()), 1)
+        self.clock.advance(0)
+        self.assertEqual(self.flushed, [first, second])
+        self.assertEqual(self.clock.getDelayedCalls(), [])
+
+
+    def test_addedWhileFlushing(self):
+        """
+        A connection added while another is being flushed, such as the TCP
+        connection underneath a TLS connection, is flushed in the same pass.
+        """
+        upper = FlushedConnection(self.flusher, self.flushed)
+        lower = FlushedConnection(self.flusher, self.flushed)
+        upper.next = lower
+        self.flusher.add(upper)
+        self.clock.advance(0)
+        self.assertEqual(self.flushed, [upper, lower])
+        self.assertEqual(self.clock.getDelayedCalls(), [])
+
+
+    def test_readdedFlushedNextIteration(self):
+        """
+        A connection added again after it has been flushed is not flushed
+        again in the same pass, but in the next iteration, so that it cannot
+        keep the reactor from its other events.
+        """
+        passes = []
+        class GreedyConnection(FlushedConnection):
+            def _flushWrites(self):
+                passes.append(self.flusher._call)
+                if len(passes) < 3:
+                    self.next = self
+                else:
+                    self.next = None
+                FlushedConnection._flushWrites(self)
+
+        greedy = GreedyConnection(self.flusher, self.flushed)
+        self.flusher.add(greedy)
+        # Clock runs the timed calls scheduled while advancing by zero, so
+        # every pass happens here.
+        self.clock.advance(0)
+        self.assertEqual(self.flushed, [greedy, greedy, greedy])
+        self.assertEqual(len(set(map(id, passes))), 3)
+        self.assertEqual(self.clock.getDelayedCalls(), [])
+
+
+    def test_flushErrorLogged(self):
+        """
+        An exception raised while flushing one connection is logged, and the
+        other connections are still flushed.
+        """
+        broken = FlushedConnection(self.flusher, None)
+        working = FlushedConnection(self.flusher, self.flushed)
+        self.flusher.add(broken)
+        self.flusher.add(working)
+        self.clock.advance(0)
+        self.assertEqual(self.flushed, [working])
+        self.assertEqual(len(self.flushLoggedErrors(AttributeError)), 1)
+        self.flusher.add(working)
+        self.assertEqual(len(self.clock.getDelayedCalls()), 1)
@@ -1799,6 +1799,30 @@ class HostnameEndpointsOneIPv4TestCase(ClientEndpointTestCaseMixin,
                 {})], calls)
 
 
+    def test_nameResolutionWithReactorResolver(self):
+        """
+        If the reactor's resolver has a C{getAddressInfo} method, as
+        L{twisted.internet.base.CachingResolver} does, L{HostnameEndpoint}
+        resolves names with it rather than calling C{getaddrinfo} in a thread
+        itself.
+        """
+        calls = []
+
+        class AddressInfoResolver(object):
+            def getAddressInfo(self, *args):
+                calls.append(args)
+                return defer.Deferred()
+
+        mreactor = MemoryReactor()
+        mreactor.resolver = AddressInfoResolver()
+        endpoint = endpoints.HostnameEndpoint(mreactor, b'ipv4.example.com',
+            1234)
+        endpoint._deferToThread = lambda *args: self.fail("Used a thread")
+        endpoint.connect(object())
+        self.assertEqual(
+            [(b"ipv4.example.com", 1234, 0, SOCK_STREAM)], calls)
+
+
 
 class HostnameEndpointsOneIPv6TestCase(ClientEndpointTestCaseMixin,
                                 unittest.TestCase):
@@ -2470,6 +2494,28 @@ class ServerStringTests(unittest.TestCase):
         self.assertEqual(server._port, 1234)
         self.assertEqual(server._backlog, 12)
         self.assertEqual(server._interface, b"10.0.0.1")
+        self.assertEqual(server._reusePort, False)
+
+
+    def test_tcpReusePort(self):
+        """
+        The C{reusePort} argument of a TCP strports description is passed to
+        the L{TCP4ServerEndpoint}, which passes it on to
+        L{IReactorTCP.listenTCP}.
+        """
+        calls = []
+        class ReusePortReactor(object):
+            def listenTCP(self, *args, **kwargs):
+                calls.append((args, kwargs))
+        server = endpoints.serverFromString(
+            ReusePortReactor(), b"tcp:1234:reusePort=1")
+        self.assertEqual(server._reusePort, True)
+        factory = object()
+        server.listen(factory)
+        self.assertEqual(
+            calls,
+            [((1234, factory),
+              {'backlog': 50, 'interface': b'', 'reusePort': True})])
 
 
     def test_ssl(self):
@@ -3260,6 +3306,17 @@ class TCP6ServerEndpointPluginTests(unittest.TestCase):
         self.assertEqual(ep._port, 8080)
         self.assertEqual(ep._backlog, 12)
         self.assertEqual(ep._interface, b'::1')
+        self.assertEqual(ep._reusePort, False)
+
+
+    def test_stringDescriptionReusePort(self):
+        """
+        The C{reusePort} argument of a 'tcp6' endpoint string description is
+        passed to the L{TCP6ServerEndpoint}.
+        """
+        ep = endpoints.serverFromString(
+            MemoryReactor(), b"tcp6:8080:reusePort=1")
+        self.assertEqual(ep._reusePort, True)
 
 
 
@@ -9,9 +9,11 @@ from __future__ import division, absolute_import
 
 from twisted.trial.unittest import TestCase
 try:
-    from twisted.internet.epollreactor import _ContinuousPolling
+    from select import EPOLLIN, EPOLLOUT, EPOLLET, EPOLLHUP
+    from twisted.internet.epollreactor import (
+        _ContinuousPolling, EPollReactor, EPOLLRDHUP)
 except ImportError:
-    _ContinuousPolling = None
+    _ContinuousPolling = EPollReactor = None
 from twisted.internet.task import Clock
 from twisted.internet.error import ConnectionDone
 
@@ -246,3 +248,285 @@ class ContinuousPollingTests(TestCase):
 
     if _ContinuousPolling is None:
         skip = "epoll not supported in this environment."
+
+
+
+if EPollReactor is not None:
+    class EdgeTriggeredEPollReactor(EPollReactor):
+        """
+        An L{EPollReactor} in edge-triggered mode, so that the reactor tests
+        can be run against that mode too.
+        """
+        def __init__(self):
+            EPollReactor.__init__(self, edgeTriggered=True)
+
+
+
+class FakePoller(object):
+    """
+    Records the calls made to it, as if it were an C{epoll} object.
+
+    @ivar calls: A C{list} of tuples of the name and arguments of each call
+        to C{register}, C{modify} and C{unregister}.
+
+    @ivar events: The events the next call to C{poll} returns.
+
+    @ivar timeouts: The timeouts passed to C{poll}.
+    """
+
+    def __init__(self):
+        self.calls = []
+        self.events = []
+        self.timeouts = []
+
+
+    def register(self, fd, flags):
+        self.calls.append(("register", fd, flags))
+
+
+    def modify(self, fd, flags):
+        self.calls.append(("modify", fd, flags))
+
+
+    def unregister(self, fd):
+        self.calls.append(("unregister", fd))
+
+
+    def poll(self, timeout, maxevents):
+        self.timeouts.append(timeout)
+        events, self.events = self.events, []
+        return events
+
+
+
+class EdgeTriggeredDescriptor(Descriptor):
+    """
+    A L{Descriptor} which can stop writing once its C{doWrite} is called, as
+    it would after writing all of its buffered data, and which says whether
+    its reads and writes used up the readiness of its descriptor.
+
+    @ivar reactor: The reactor it was added to.
+
+    @ivar finishWriting: Whether C{doWrite} removes it as a writer.
+
+    @ivar _readExhausted: See L{FileDescriptor._readExhausted}.
+
+    @ivar _writeExhausted: See L{FileDescriptor._writeExhausted}.
+    """
+
+    def __init__(self, reactor):
+        Descriptor.__init__(self)
+        self.reactor = reactor
+        self.finishWriting = True
+        self._readExhausted = True
+        self._writeExhausted = False
+
+
+    def logPrefix(self):
+        return "EdgeTriggeredDescriptor"
+
+
+    def doWrite(self):
+        Descriptor.doWrite(self)
+        if self.finishWriting:
+            self.reactor.removeWriter(self)
+
+
+
+class EdgeTriggeredTests(TestCase):
+    """
+    Tests for L{EPollReactor} in edge-triggered mode.
+    """
+
+    def setUp(self):
+        self.reactor = EPollReactor(edgeTriggered=True)
+        # Get rid of the waker, so that only the descriptors added by the
+        # tests are registered with the fake poller.
+        for reader in list(self.reactor._internalReaders):
+            self.reactor.removeReader(reader)
+            reader.connectionLost(None)
+        self.reactor._internalReaders.clear()
+        self.reactor._poller.close()
+        self.poller = self.reactor._poller = FakePoller()
+        self.descriptor = EdgeTriggeredDescriptor(self.reactor)
+
+
+    def test_registerOnce(self):
+        """
+        A descriptor is registered for edge-triggered read and write
+        notifications when it starts reading, and starting and stopping
+        writing makes no further system call.
+        """
+        self.reactor.addReader(self.descriptor)
+        self.reactor.addWriter(self.descriptor)
+        self.reactor.removeWriter(self.descriptor)
+        self.reactor.addWriter(self.descriptor)
+        self.assertEqual(
+            self.poller.calls,
+            [("register", 1, EPOLLET | EPOLLIN | EPOLLOUT | EPOLLRDHUP)])
+
+
+    def test_startWritingWhenWritable(self):
+        """
+        Starting to write to a descriptor known to be writable makes no
+        system call, and the next iteration dispatches C{doWrite} without
+        blocking.
+        """
+        self.reactor.addWriter(self.descriptor)
+        self.reactor.addReader(self.descriptor)
+        self.poller.events = [(1, EPOLLOUT)]
+        self.reactor.doPoll(1)
+        self.assertEqual(self.descriptor.events, ["write"])
+        del self.poller.calls[:]
+
+        self.reactor.addWriter(self.descriptor)
+        self.reactor.doPoll(1)
+        self.assertEqual(self.poller.timeouts, [1, 0])
+        self.assertEqual(self.descriptor.events, ["write", "write"])
+        self.assertEqual(self.poller.calls, [])
+
+
+    def test_stillReadable(self):
+        """
+        A descriptor whose C{doRead} did not use up its read readiness stays
+        readable, and is read from again on the next iteration without
+        waiting for a notification or making any system call.
+        """
+        self.descriptor._readExhausted = False
+        self.reactor.addReader(self.descriptor)
+        del self.poller.calls[:]
+        self.poller.events = [(1, EPOLLIN)]
+        self.reactor.doPoll(1)
+        self.reactor.doPoll(1)
+        self.assertEqual(self.poller.timeouts, [1, 0])
+        self.assertEqual(self.descriptor.events, ["read", "read"])
+        self.assertEqual(self.poller.calls, [])
+        self.assertIn(1, self.reactor._readable)
+
+
+    def test_readExhausted(self):
+        """
+        A descriptor whose C{doRead} used up its read readiness is no longer
+        considered readable, and the reactor waits for the next notification
+        without making any system call.
+        """
+        self.reactor.addReader(self.descriptor)
+        del self.poller.calls[:]
+        self.poller.events = [(1, EPOLLIN)]
+        self.reactor.doPoll(1)
+        self.reactor.doPoll(1)
+        self.assertEqual(self.poller.timeouts, [1, 1])
+        self.assertEqual(self.descriptor.events, ["read"])
+        self.assertEqual(self.poller.calls, [])
+        self.assertNotIn(1, self.reactor._readable)
+
+
+    def test_writeExhausted(self):
+        """
+        A descriptor whose C{doWrite} wrote less than it wanted to is no
+        longer considered writable, and the reactor waits for the next
+        notification without making any system call.
+        """
+        self.descriptor.finishWriting = False
+        self.descriptor._writeExhausted = True
+        self.reactor.addWriter(self.descriptor)
+        del self.poller.calls[:]
+        self.poller.events = [(1, EPOLLOUT)]
+        self.reactor.doPoll(1)
+        self.reactor.doPoll(1)
+        self.assertEqual(self.poller.timeouts, [1, 1])
+        self.assertEqual(self.descriptor.events, ["write"])
+        self.assertEqual(self.poller.calls, [])
+        self.assertNotIn(1, self.reactor._writable)
+
+
+    def test_hungUpStillReadable(self):
+        """
+        A descriptor whose other end hung up stays readable even if
+        C{doRead} says it used up its read readiness, since the kernel will
+        not report the end of file again.
+        """
+        self.reactor.addReader(self.descriptor)
+        self.poller.events = [(1, EPOLLIN | EPOLLRDHUP)]
+        self.reactor.doPoll(1)
+        self.reactor.doPoll(1)
+        self.assertEqual(self.poller.timeouts, [1, 0])
+        self.assertEqual(self.descriptor.events, ["read", "read"])
+        self.assertIn(1, self.reactor._readable)
+
+
+    def test_rearmUnknown(self):
+        """
+        A descriptor which does not say whether C{doRead} used up its read
+        readiness, and is still reading, is no longer considered readable and
+        is re-armed, so that the kernel reports it again if it is.
+        """
+        self.descriptor._readExhausted = None
+        self.reactor.addReader(self.descriptor)
+        del self.poller.calls[:]
+        self.poller.events = [(1, EPOLLIN)]
+        self.reactor.doPoll(1)
+        self.assertEqual(self.descriptor.events, ["read"])
+        self.assertEqual(
+            self.poller.calls,
+            [("modify", 1, EPOLLET | EPOLLIN | EPOLLOUT | EPOLLRDHUP)])
+        self.assertNotIn(1, self.reactor._readable)
+
+
+    def test_dispatchOncePerIteration(self):
+        """
+        A descriptor which is still readable from the previous iteration and
+        is reported readable again is only read from once.
+        """
+        self.descriptor._readExhausted = False
+        self.reactor.addReader(self.descriptor)
+        self.poller.events = [(1, EPOLLIN)]
+        self.reactor.doPoll(1)
+        self.poller.events = [(1, EPOLLIN)]
+        self.reactor.doPoll(1)
+        self.assertEqual(self.descriptor.events, ["read", "read"])
+
+
+    def test_pendingRead(self):
+        """
+        A descriptor which became readable while it was not reading has
+        C{doRead} called on the next iteration after it starts reading.
+        """
+        self.reactor.addWriter(self.descriptor)
+        self.poller.events = [(1, EPOLLIN)]
+        self.reactor.doPoll(1)
+        self.assertEqual(self.descriptor.events, [])
+        self.reactor.addReader(self.descriptor)
+        self.reactor.doPoll(1)
+        self.assertEqual(self.poller.timeouts, [1, 0])
+        self.assertEqual(self.descriptor.events, ["read"])
+
+
+    def test_unregister(self):
+        """
+        A descriptor is unregistered once it is neither reading nor writing,
+        and no longer considered ready.
+        """
+        self.reactor.addReader(self.descriptor)
+        self.reactor.addWriter(self.descriptor)
+        self.poller.events = [(1, EPOLLOUT)]
+        self.reactor.doPoll(1)
+        self.reactor.removeReader(self.descriptor)
+        self.assertEqual(self.poller.calls[-1], ("unregister", 1))
+        self.assertEqual(self.reactor._selectables, {})
+        self.assertEqual(self.reactor._writable, set())
+        self.assertEqual(self.reactor.getReaders(), [])
+
+
+    def test_disconnected(self):
+        """
+        A hang-up reported for a reading descriptor disconnects it.
+        """
+        self.reactor.addReader(self.descriptor)
+        self.poller.events = [(1, EPOLLHUP)]
+        self.reactor.doPoll(1)
+        self.assertEqual(self.descriptor.events, ["lost"])
+        self.assertEqual(self.poller.calls[-1], ("unregister", 1))
+
+    if EPollReactor is None:
+        skip = "epoll not supported in this environment."
@@ -97,3 +97,315 @@ class WriteDescriptorTests(SynchronousTestCase):
         descriptor = MemoryFile()
         descriptor.write(b"hello, world")
         self.assertIs(None, descriptor.doWrite())
+
+
+    def test_bufferAllocatedOnWrite(self):
+        """
+        L{FileDescriptor} only allocates a buffer for the data passed to
+        C{write} when there is some.
+        """
+        descriptor = MemoryFile()
+        self.assertNotIn("_tempDataBuffer", vars(descriptor))
+        descriptor.write(b"hello, world")
+        self.assertEqual(list(descriptor._tempDataBuffer), [b"hello, world"])
+
+
+    def test_bufferReleasedWhenWritten(self):
+        """
+        Once everything passed to C{write} and C{writeSequence} has been
+        written, including empty strings, L{FileDescriptor} drops its buffer,
+        and allocates a new one for the next write.
+        """
+        descriptor = MemoryFile()
+        descriptor._freeSpace = 100
+        descriptor.writeSequence([b"hello", b"", b"world"])
+        self.assertIs(None, descriptor.doWrite())
+        self.assertEqual(b"".join(descriptor._written), b"helloworld")
+        self.assertEqual(descriptor._tempDataBuffer, ())
+        descriptor.write(b"!")
+        self.assertEqual(list(descriptor._tempDataBuffer), [b"!"])
+
+
+
+class VectoredMemoryFile(MemoryFile):
+    """
+    A L{MemoryFile} which also accepts several buffers at once.
+
+    @ivar vectors: A C{list} of the C{list}s of buffers passed to
+        C{_writeSomeVectors}.
+    """
+    _minimumVectorSize = 0
+
+    def __init__(self):
+        MemoryFile.__init__(self)
+        self.vectors = []
+
+
+    def _writeSomeVectors(self, vectors):
+        """
+        Copy at most C{self._freeSpace} bytes from C{vectors} into
+        C{self._written}.
+
+        @return: A C{int} indicating how many bytes were copied.
+        """
+        vectors = [memoryview(vector).tobytes() for vector in vectors]
+        self.vectors.append(vectors)
+        accepted = 0
+        for vector in vectors:
+            accepted += self.writeSomeData(vector)
+        return accepted
+
+
+
+class VectoredWriteTests(SynchronousTestCase):
+    """
+    Tests for L{FileDescriptor.doWrite} with a C{_writeSomeVectors}
+    implementation.
+    """
+    def test_buffersNotJoined(self):
+        """
+        The buffers passed to C{write} and C{writeSequence} are handed to
+        C{_writeSomeVectors} individually.
+        """
+        descriptor = VectoredMemoryFile()
+        descriptor._freeSpace = 100
+        descriptor.write(b"abc")
+        descriptor.writeSequence([b"de", b"f"])
+        self.assertIs(None, descriptor.doWrite())
+        self.assertEqual(descriptor.vectors, [[b"abc", b"de", b"f"]])
+        self.assertEqual(b"".join(descriptor._written), b"abcdef")
+        self.assertEqual(descriptor.dataBuffer, b"")
+        self.assertEqual(len(descriptor._tempDataBuffer), 0)
+        self.assertEqual(descriptor._tempDataLen, 0)
+
+
+    def test_smallBuffersJoined(self):
+        """
+        If the buffered strings average less than C{_minimumVectorSize} bytes,
+        they are joined and passed to C{writeSomeData} instead.
+        """
+        descriptor = VectoredMemoryFile()
+        descriptor._minimumVectorSize = 3
+        descriptor._freeSpace = 100
+        descriptor.writeSequence([b"abcd", b"e"])
+        descriptor.doWrite()
+        self.assertEqual(descriptor.vectors, [])
+        self.assertEqual(descriptor._written, [b"abcde"])
+
+        descriptor.writeSequence([b"fgh", b"ijk"])
+        descriptor.doWrite()
+        self.assertEqual(descriptor.vectors, [[b"fgh", b"ijk"]])
+
+
+    def test_partialWrite(self):
+        """
+        If C{_writeSomeVectors} writes only part of a buffer, the remainder of
+        that buffer is sent first by the next C{doWrite}, followed by the
+        buffers after it.
+        """
+        descriptor = VectoredMemoryFile()
+        descriptor._freeSpace = 4
+        descriptor.writeSequence([b"abc", b"def", b"ghi"])
+        descriptor.doWrite()
+        self.assertEqual(descriptor._tempDataLen, 3)
+        descriptor._freeSpace = 3
+        descriptor.doWrite()
+        descriptor._freeSpace = 100
+        descriptor.doWrite()
+        self.assertEqual(
+            descriptor.vectors,
+            [[b"abc", b"def", b"ghi"], [b"ef", b"ghi"], [b"hi"]])
+        self.assertEqual(b"".join(descriptor._written), b"abcdefghi")
+
+
+    def test_sendLimit(self):
+        """
+        Buffers are added to the vectors passed to C{_writeSomeVectors} until
+        at least C{SEND_LIMIT} bytes have been gathered.
+        """
+        descriptor = VectoredMemoryFile()
+        descriptor.SEND_LIMIT = 4
+        descriptor._freeSpace = 100
+        descriptor.writeSequence([b"ab", b"cd", b"ef"])
+        descriptor.doWrite()
+        self.assertEqual(descriptor.vectors, [[b"ab", b"cd"]])
+        self.assertEqual(descriptor._tempDataLen, 2)
+
+
+    def test_maximumVectors(self):
+        """
+        At most C{_maximumVectors} buffers are passed to C{_writeSomeVectors}
+        at once.
+        """
+        descriptor = VectoredMemoryFile()
+        descriptor._maximumVectors = 2
+        descriptor._freeSpace = 100
+        descriptor.writeSequence([b"a", b"b", b"c"])
+        descriptor.doWrite()
+        descriptor.doWrite()
+        self.assertEqual(descriptor.vectors, [[b"a", b"b"], [b"c"]])
+
+
+    def test_emptyBuffers(self):
+        """
+        Empty strings passed to C{writeSequence} do not prevent the buffer
+        from being considered empty once everything else has been written.
+        """
+        descriptor = VectoredMemoryFile()
+        descriptor._freeSpace = 100
+        descriptor.writeSequence([b"a", b""])
+        stopped = []
+        descriptor.stopWriting = lambda: stopped.append(True)
+        descriptor.doWrite()
+        self.assertEqual(stopped, [True])
+        self.assertEqual(len(descriptor._tempDataBuffer), 0)
+
+
+    def test_connectionLost(self):
+        """
+        If C{_writeSomeVectors} returns an exception, C{doWrite} returns it.
+        """
+        descriptor = VectoredMemoryFile()
+        lost = Exception("lost")
+        descriptor._writeSomeVectors = lambda vectors: lost
+        descriptor.write(b"abc")
+        self.assertIs(lost, descriptor.doWrite())
+
+
+
+class StreamingProducer(object):
+    """
+    A streaming producer which records whether it is paused.
+
+    @ivar paused: C{True} if L{pauseProducing} has been called more recently
+        than L{resumeProducing}.
+    """
+    paused = False
+
+    def pauseProducing(self):
+        self.paused = True
+
+
+    def resumeProducing(self):
+        self.paused = False
+
+
+    def stopProducing(self):
+        pass
+
+
+
+class WriteBufferLimitsTests(SynchronousTestCase):
+    """
+    Tests for L{FileDescriptor.setWriteBufferLimits} and the way the write
+    buffer is managed.
+    """
+    def producing(self, high, low):
+        """
+        Create a L{MemoryFile} with the given watermarks and a registered
+        L{StreamingProducer}.
+        """
+        descriptor = MemoryFile()
+        descriptor.setWriteBufferLimits(high, low)
+        producer = StreamingProducer()
+        descriptor.registerProducer(producer, True)
+        return descriptor, producer
+
+
+    def test_defaults(self):
+        """
+        Without arguments, L{FileDescriptor.setWriteBufferLimits} sets the
+        high watermark to C{bufferSize} and the low watermark to a quarter of
+        that.
+        """
+        descriptor = MemoryFile()
+        descriptor.bufferSize = 100
+        descriptor.setWriteBufferLimits()
+        self.assertEqual(
+            (descriptor.highWatermark, descriptor.lowWatermark), (100, 25))
+
+
+    def test_invalid(self):
+        """
+        L{FileDescriptor.setWriteBufferLimits} raises L{ValueError} if the low
+        watermark is negative or above the high watermark.
+        """
+        descriptor = MemoryFile()
+        self.assertRaises(ValueError, descriptor.setWriteBufferLimits, 10, 11)
+        self.assertRaises(ValueError, descriptor.setWriteBufferLimits, 10, -1)
+
+
+    def test_pauseAboveHigh(self):
+        """
+        A streaming producer is paused when more bytes than the high watermark
+        are waiting to be sent.
+        """
+        descriptor, producer = self.producing(10, 4)
+        descriptor.write(b"x" * 10)
+        self.assertFalse(producer.paused)
+        descriptor.write(b"x")
+        self.assertTrue(producer.paused)
+
+
+    def test_resumeAtLow(self):
+        """
+        A paused streaming producer is resumed once no more bytes than the low
+        watermark are waiting to be sent, before the buffer is empty.
+        """
+        descriptor, producer = self.producing(10, 4)
+        descriptor.write(b"x" * 12)
+        descriptor._freeSpace = 7
+        descriptor.doWrite()
+        self.assertTrue(producer.paused)
+        descriptor._freeSpace = 1
+        descriptor.doWrite()
+        self.assertFalse(producer.paused)
+        self.assertEqual(b"".join(descriptor._written), b"x" * 8)
+
+
+    def test_sentBytesNotCounted(self):
+        """
+        Bytes which have already been sent from the buffer do not count
+        towards the high watermark.
+        """
+        descriptor, producer = self.producing(10, 0)
+        descriptor.write(b"x" * 10)
+        descriptor._freeSpace = 5
+        descriptor.doWrite()
+        descriptor.write(b"x" * 5)
+        self.assertFalse(producer.paused)
+
+
+    def test_boundedRefill(self):
+        """
+        Only about C{SEND_LIMIT} bytes of the buffered data are joined
+        together to be sent at once.
+        """
+        descriptor = MemoryFile()
+        descriptor.SEND_LIMIT = 10
+        for i in range(5):
+            descriptor.write(b"abcd")
+        descriptor._freeSpace = 100
+        descriptor.doWrite()
+        self.assertEqual(descriptor._written, [b"abcdabcd"])
+        self.assertEqual(descriptor._tempDataLen, 12)
+        descriptor.doWrite()
+        descriptor.doWrite()
+        self.assertEqual(
+            b"".join(descriptor._written), b"abcd" * 5)
+        self.assertEqual(descriptor._tempDataLen, 0)
+
+
+    def test_largeBufferNotCopied(self):
+        """
+        A buffer of at least C{SEND_LIMIT} bytes is sent as it is when nothing
+        else is waiting ahead of it.
+        """
+        descriptor = MemoryFile()
+        descriptor.SEND_LIMIT = 10
+        data = b"x" * 20
+        descriptor.write(data)
+        descriptor.write(b"y")
+        descriptor._freeSpace = 100
+        descriptor.doWrite()
+        self.assertIs(descriptor._written[0], data)
@@ -11,7 +11,12 @@ from twisted.python.compat import _PY3
 from twisted.trial.unittest import TestCase
 from twisted.internet.defer import Deferred
 from twisted.internet.posixbase import PosixReactorBase, _Waker
+from twisted.internet.posixbase import _EventFDWaker
+from twisted.internet.posixbase import _PollLikeMixin
+from twisted.internet.base import LoopInstrumentation
+from twisted.internet.task import Clock
 from twisted.internet.protocol import ServerFactory
+from twisted.python._eventfd import eventfd
 
 skipSockets = None
 if _PY3:
@@ -106,6 +111,226 @@ class PosixReactorBaseTests(TestCase):
 
 
 
+    def test_readBudget(self):
+        """
+        L{PosixReactorBase.getReadBudget} returns the budget set with
+        L{PosixReactorBase.setReadBudget}, or C{None} if there is none.
+        """
+        reactor = TrivialReactor()
+        self.assertIdentical(reactor.getReadBudget(), None)
+        reactor.setReadBudget(2 ** 20, 0.01)
+        self.assertEqual(reactor.getReadBudget(), (2 ** 20, 0.01))
+        reactor.setReadBudget(None)
+        self.assertIdentical(reactor.getReadBudget(), None)
+
+
+
+class CountingWaker(object):
+    """
+    A waker which counts how many times it is woken up.
+    """
+    wakeUps = 0
+
+    def wakeUp(self):
+        self.wakeUps += 1
+
+
+
+class WakeUpCoalescingTests(TestCase):
+    """
+    Tests for the coalescing of wake-ups caused by
+    L{PosixReactorBase.callFromThread} and
+    L{PosixReactorBase.callFromThreadMany}.
+    """
+
+    def setUp(self):
+        self.reactor = TrivialReactor()
+        self.addCleanup(self.reactor.waker.connectionLost, None)
+        self.waker = self.reactor.waker = CountingWaker()
+
+
+    def test_callFromThread(self):
+        """
+        Only the first call queued with C{callFromThread} after
+        C{runUntilCurrent} starts draining the queue wakes the reactor up.
+        """
+        calls = []
+        self.reactor.callFromThread(calls.append, 1)
+        self.reactor.callFromThread(calls.append, 2)
+        self.assertEqual(self.waker.wakeUps, 1)
+        self.reactor.runUntilCurrent()
+        self.assertEqual(calls, [1, 2])
+        self.reactor.callFromThread(calls.append, 3)
+        self.assertEqual(self.waker.wakeUps, 2)
+
+
+    def test_callQueuedWhileRunning(self):
+        """
+        A call queued while C{runUntilCurrent} is running the queue wakes the
+        reactor up, so that it is run on the next iteration.
+        """
+        calls = []
+        def queue():
+            self.reactor.callFromThread(calls.append, 1)
+        self.reactor.callFromThread(queue)
+        self.reactor.runUntilCurrent()
+        self.assertEqual(calls, [])
+        self.assertEqual(self.waker.wakeUps, 3)
+        self.reactor.runUntilCurrent()
+        self.assertEqual(calls, [1])
+
+
+    def test_callFromThreadMany(self):
+        """
+        C{callFromThreadMany} queues all of the given calls, in order, and
+        wakes the reactor up once.
+        """
+        calls = []
+        self.reactor.callFromThreadMany([
+                (calls.append, (1,), {}),
+                (calls.extend, ([2, 3],), {})])
+        self.assertEqual(self.waker.wakeUps, 1)
+        self.reactor.runUntilCurrent()
+        self.assertEqual(calls, [1, 2, 3])
+
+
+    def test_callFromThreadManyEmpty(self):
+        """
+        C{callFromThreadMany} with no calls does not wake the reactor up.
+        """
+        self.reactor.callFromThreadMany(iter([]))
+        self.assertEqual(self.waker.wakeUps, 0)
+        self.assertEqual(self.reactor.threadCallQueue, [])
+
+
+
+class EventFDWakerTests(TestCase):
+    """
+    Tests for L{_EventFDWaker}.
+    """
+    if eventfd is None:
+        skip = "eventfd is not available on this platform."
+
+    def setUp(self):
+        self.waker = _EventFDWaker(None)
+        self.addCleanup(self.waker.connectionLost, None)
+
+
+    def test_wakerIsDefault(self):
+        """
+        L{_EventFDWaker} is the default waker where C{eventfd} is available.
+        """
+        self.assertIdentical(_Waker, _EventFDWaker)
+
+
+    def test_singleDescriptor(self):
+        """
+        L{_EventFDWaker} reads and writes the same descriptor.
+        """
+        self.assertEqual(self.waker.fileno(), self.waker.o)
+
+
+    def test_wakeUp(self):
+        """
+        L{_EventFDWaker.wakeUp} makes the descriptor readable, and
+        L{_EventFDWaker.doRead} resets it however many times it was woken.
+        """
+        import select
+        fd = self.waker.fileno()
+        self.assertEqual(select.select([fd], [], [], 0)[0], [])
+        self.waker.wakeUp()
+        self.waker.wakeUp()
+        self.assertEqual(select.select([fd], [], [], 0)[0], [fd])
+        self.waker.doRead()
+        self.assertEqual(select.select([fd], [], [], 0)[0], [])
+        # Reading again when not woken up does not raise.
+        self.waker.doRead()
+
+
+    def test_connectionLost(self):
+        """
+        L{_EventFDWaker.connectionLost} closes the descriptor, after which
+        L{_EventFDWaker.wakeUp} does nothing.
+        """
+        import os
+        fd = self.waker.fileno()
+        self.waker.connectionLost(None)
+        self.assertRaises(OSError, os.fstat, fd)
+        self.waker.wakeUp()
+        self.waker.connectionLost(None)
+
+
+
+class InstrumentationTests(TestCase):
+    """
+    Tests for the use of L{LoopInstrumentation} by L{PosixReactorBase}.
+    """
+
+    def setUp(self):
+        self.reactor = TrivialReactor()
+        self.clock = Clock()
+        self.instrumentation = LoopInstrumentation(
+            threshold=1, seconds=self.clock.seconds)
+
+
+    def test_installInstrumentation(self):
+        """
+        L{PosixReactorBase.installInstrumentation} returns the previously
+        installed instrumentation.
+        """
+        self.assertIdentical(
+            self.reactor.installInstrumentation(self.instrumentation), None)
+        self.assertIdentical(
+            self.reactor.installInstrumentation(None), self.instrumentation)
+
+
+    def test_runUntilCurrent(self):
+        """
+        With instrumentation installed, L{PosixReactorBase.runUntilCurrent}
+        starts an iteration and times calls from threads and timed calls.
+        """
+        self.reactor.installInstrumentation(self.instrumentation)
+        self.reactor.callFromThread(self.clock.advance, 2)
+        self.reactor.callLater(0, self.clock.advance, 3)
+        self.reactor.runUntilCurrent()
+        self.reactor.runUntilCurrent()
+        self.assertEqual(self.instrumentation.iterations, 1)
+        self.assertEqual(self.instrumentation.threadCallTime, 2)
+        self.assertEqual(self.instrumentation.timedCallTime, 3)
+        self.assertEqual(sum(self.instrumentation.lagHistogram), 1)
+        self.assertEqual(
+            [kind for (kind, name, duration)
+             in self.instrumentation.slowCalls], ["timed"])
+
+
+    def test_doReadOrWrite(self):
+        """
+        With instrumentation installed, L{_PollLikeMixin._doReadOrWrite}
+        times C{doRead} and C{doWrite}.
+        """
+        class PollLike(_PollLikeMixin):
+            _POLL_DISCONNECTED = 1
+            _POLL_IN = 2
+            _POLL_OUT = 4
+            _reads = ()
+            _instrumentation = self.instrumentation
+
+        class Selectable(object):
+            def fileno(self):
+                return 3
+
+            def doRead(self):
+                clock.advance(0.25)
+
+            def doWrite(self):
+                clock.advance(0.5)
+
+        clock = self.clock
+        PollLike()._doReadOrWrite(Selectable(), 3, 2 | 4)
+        self.assertEqual(self.instrumentation.ioTime, 0.75)
+
+
+
 class TCPPortTests(TestCase):
     """
     Tests for L{twisted.internet.tcp.Port}.
@@ -338,3 +338,40 @@ class FileDescriptorTests(TestCase):
             os.close(fd)
         # And it should not appear in the result.
         self.assertNotIn(fd, process._listOpenFDs())
+
+
+
+class CloseDescriptorsTests(TestCase):
+    """
+    Tests for L{twisted.internet.process._closeDescriptorsExcept}.
+    """
+    skip = platformSkip
+
+    def test_closeRange(self):
+        """
+        If L{process.closeRange} is available, the gaps between the
+        descriptors to keep are closed with one call each.
+        """
+        calls = []
+        self.patch(process, "closeRange",
+                   lambda first, last: calls.append((first, last)))
+        process._closeDescriptorsExcept([5, 3, 9, 3, 0])
+        self.assertEqual(calls, [(1, 2), (4, 4), (6, 8), (10, None)])
+
+
+    def test_listOpenFDs(self):
+        """
+        If L{process.closeRange} is not available, each descriptor listed by
+        L{process._listOpenFDs} which is not to be kept is closed.
+        """
+        closed = []
+        class FakeOS(object):
+            def close(self, fd):
+                closed.append(fd)
+                if fd == 4:
+                    raise OSError(errno.EBADF, "Bad file descriptor")
+        self.patch(process, "closeRange", None)
+        self.patch(process, "os", FakeOS())
+        self.patch(process, "_listOpenFDs", lambda: [0, 1, 2, 3, 4, 5])
+        process._closeDescriptorsExcept([1, 3])
+        self.assertEqual(closed, [0, 2, 4, 5])
@@ -0,0 +1,324 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Tests for L{twisted.internet.processpool}.
+"""
+
+import os
+import time
+
+from twisted.trial.unittest import TestCase
+from twisted.internet import reactor, interfaces
+from twisted.internet.defer import CancelledError, inlineCallbacks
+from twisted.internet.error import ProcessTerminated
+from twisted.internet.task import Clock
+from twisted.internet.processpool import (
+    ProcessPool, ProcessPoolFull, CallTimedOut, RemoteCallError, _BigString)
+from twisted.protocols import amp
+
+
+
+def add(x, y=0):
+    return x + y
+
+
+
+def getpid():
+    return os.getpid()
+
+
+
+def sleep(seconds):
+    time.sleep(seconds)
+
+
+
+def crash():
+    os._exit(3)
+
+
+
+def raiseValueError():
+    raise ValueError("bad value")
+
+
+
+class UnpicklableError(Exception):
+    def __init__(self, first, second):
+        Exception.__init__(self, first + second)
+
+
+
+def raiseUnpicklable():
+    raise UnpicklableError("un", "picklable")
+
+
+
+class BigStringTests(TestCase):
+    """
+    Tests for L{_BigString}.
+    """
+
+    def test_roundTrip(self):
+        """
+        L{_BigString} sends values longer than the AMP value limit as several
+        chunks, and reassembles them.
+        """
+        argument = _BigString()
+        value = b'x' * (amp.MAX_VALUE_LENGTH * 2 + 10)
+        strings = {}
+        argument.toBox(b'value', strings, {b'value': value}, None)
+        self.assertEqual(strings[b'value'], b'3')
+        self.assertEqual(
+            [len(strings[b'value.%d' % (i,)]) for i in range(3)],
+            [amp.MAX_VALUE_LENGTH, amp.MAX_VALUE_LENGTH, 10])
+        objects = {}
+        argument.fromBox(b'value', strings, objects, None)
+        self.assertEqual(objects, {b'value': value})
+        self.assertEqual(strings, {})
+
+
+    def test_empty(self):
+        """
+        L{_BigString} can send an empty string.
+        """
+        argument = _BigString()
+        strings = {}
+        argument.toBox(b'value', strings, {b'value': b''}, None)
+        objects = {}
+        argument.fromBox(b'value', strings, objects, None)
+        self.assertEqual(objects, {b'value': b''})
+
+
+
+class QueueTests(TestCase):
+    """
+    Tests for the queue of a L{ProcessPool} which has not been started.
+    """
+
+    def setUp(self):
+        self.pool = ProcessPool(Clock(), size=1, maxQueued=2)
+
+
+    def test_maxQueued(self):
+        """
+        Once C{maxQueued} calls are queued, L{ProcessPool.callInProcess}
+        fails with L{ProcessPoolFull}.
+        """
+        self.pool.callInProcess(add, 1)
+        self.assertFalse(self.pool.full())
+        self.pool.callInProcess(add, 2)
+        self.assertTrue(self.pool.full())
+        self.failureResultOf(self.pool.callInProcess(add, 3), ProcessPoolFull)
+        self.assertEqual(self.pool.statistics()['queued'], 2)
+
+
+    def test_whenNotFull(self):
+        """
+        L{ProcessPool.whenNotFull} returns a L{Deferred} which fires when the
+        queue has room.
+        """
+        self.successResultOf(self.pool.whenNotFull())
+        first = self.pool.callInProcess(add, 1)
+        self.pool.callInProcess(add, 2)
+        d = self.pool.whenNotFull()
+        self.assertNoResult(d)
+        first.cancel()
+        self.failureResultOf(first, CancelledError)
+        self.successResultOf(d)
+
+
+    def test_cancelQueued(self):
+        """
+        Cancelling the L{Deferred} of a queued call removes it from the
+        queue.
+        """
+        d = self.pool.callInProcess(add, 1)
+        d.cancel()
+        self.failureResultOf(d, CancelledError)
+        self.assertEqual(self.pool.statistics()['queued'], 0)
+
+
+    def test_stop(self):
+        """
+        L{ProcessPool.stop} fails queued calls with L{CancelledError}.
+        """
+        d = self.pool.callInProcess(add, 1)
+        self.successResultOf(self.pool.stop())
+        self.failureResultOf(d, CancelledError)
+
+
+    def test_stopFailsWhenNotFull(self):
+        """
+        L{ProcessPool.stop} fails the L{Deferred}s returned by
+        L{ProcessPool.whenNotFull} which are still waiting for room in the
+        queue with L{CancelledError}.
+        """
+        queued = [self.pool.callInProcess(add, 1),
+                  self.pool.callInProcess(add, 2)]
+        d = self.pool.whenNotFull()
+        self.successResultOf(self.pool.stop())
+        self.failureResultOf(d, CancelledError)
+        for call in queued:
+            self.failureResultOf(call, CancelledError)
+        self.assertEqual(self.pool._notFull, [])
+
+
+    def test_unpicklableArguments(self):
+        """
+        If the arguments cannot be pickled, L{ProcessPool.callInProcess}
+        returns a failed L{Deferred}.
+        """
+        d = self.pool.callInProcess(add, lambda: None)
+        self.assertIsInstance(self.failureResultOf(d).value, Exception)
+        self.assertEqual(self.pool.statistics()['queued'], 0)
+
+
+
+class ProcessPoolTests(TestCase):
+    """
+    Tests for L{ProcessPool} running real worker processes.
+    """
+    if not interfaces.IReactorProcess.providedBy(reactor):
+        skip = "Reactor does not support processes."
+
+    def makePool(self, **kwargs):
+        """
+        Create and start a L{ProcessPool}, to be stopped after the test.
+        """
+        pool = ProcessPool(reactor, **kwargs)
+        pool.start()
+        self.addCleanup(pool.stop)
+        return pool
+
+
+    @inlineCallbacks
+    def test_call(self):
+        """
+        L{ProcessPool.callInProcess} calls the function in another process
+        with the given arguments and fires with its result.
+        """
+        pool = self.makePool(size=2)
+        result = yield pool.callInProcess(add, 1, y=2)
+        self.assertEqual(result, 3)
+        pid = yield pool.callInProcess(getpid)
+        self.assertNotEqual(pid, os.getpid())
+        self.assertEqual(pool.statistics()['completed'], 2)
+
+
+    @inlineCallbacks
+    def test_name(self):
+        """
+        The function may be given by its fully qualified name.
+        """
+        pool = self.makePool(size=1)
+        result = yield pool.callInProcess(__name__ + '.add', 2, 3)
+        self.assertEqual(result, 5)
+
+
+    @inlineCallbacks
+    def test_largeValues(self):
+        """
+        Arguments and results may be larger than the AMP value limit.
+        """
+        pool = self.makePool(size=1)
+        value = b'x' * (amp.MAX_VALUE_LENGTH * 3)
+        result = yield pool.callInProcess(add, value, value)
+        self.assertEqual(result, value * 2)
+
+
+    @inlineCallbacks
+    def test_exception(self):
+        """
+        An exception raised by the function is raised by the L{Deferred}.
+        """
+        pool = self.makePool(size=1)
+        try:
+            yield pool.callInProcess(raiseValueError)
+        except ValueError as e:
+            self.assertEqual(str(e), "bad value")
+        else:
+            self.fail("ValueError not raised")
+
+
+    @inlineCallbacks
+    def test_unpicklableException(self):
+        """
+        An exception which cannot be sent back is replaced by a
+        L{RemoteCallError} describing it.
+        """
+        pool = self.makePool(size=1)
+        try:
+            yield pool.callInProcess(raiseUnpicklable)
+        except RemoteCallError as e:
+            self.assertEqual(e.typeName, __name__ + '.UnpicklableError')
+            self.assertEqual(e.message, 'unpicklable')
+        else:
+            self.fail("RemoteCallError not raised")
+
+
+    @inlineCallbacks
+    def test_crash(self):
+        """
+        If a worker exits while running a call, the call fails with the
+        reason and the worker is replaced.
+        """
+        pool = self.makePool(size=1)
+        yield pool.callInProcess(add, 0)
+        try:
+            yield pool.callInProcess(crash)
+        except ProcessTerminated as e:
+            self.assertEqual(e.exitCode, 3)
+        else:
+            self.fail("ProcessTerminated not raised")
+        self.assertEqual(pool.statistics()['crashed'], 1)
+        result = yield pool.callInProcess(add, 1, 1)
+        self.assertEqual(result, 2)
+
+
+    @inlineCallbacks
+    def test_timeout(self):
+        """
+        A call which runs for longer than the pool's C{timeout} fails with
+        L{CallTimedOut}, and its worker is replaced.
+        """
+        pool = self.makePool(size=1, timeout=0.5)
+        try:
+            yield pool.callInProcess(sleep, 30)
+        except CallTimedOut:
+            pass
+        else:
+            self.fail("CallTimedOut not raised")
+        self.assertEqual(pool.statistics()['timedOut'], 1)
+        result = yield pool.callInProcess(add, 1, 1)
+        self.assertEqual(result, 2)
+
+
+    @inlineCallbacks
+    def test_maxTasksPerWorker(self):
+        """
+        A worker is replaced after running C{maxTasksPerWorker} calls.
+        """
+        pool = self.makePool(size=1, maxTasksPerWorker=2)
+        pids = []
+        for i in range(3):
+            pid = yield pool.callInProcess(getpid)
+            pids.append(pid)
+        self.assertEqual(pids[0], pids[1])
+        self.assertNotEqual(pids[1], pids[2])
+        self.assertEqual(pool.statistics()['replaced'], 1)
+
+
+    @inlineCallbacks
+    def test_stop(self):
+        """
+        L{ProcessPool.stop} lets running calls finish, and fires when all the
+        workers have exited.
+        """
+        pool = ProcessPool(reactor, size=1)
+        pool.start()
+        running = pool.callInProcess(add, 1, 2)
+        yield pool.stop()
+        self.assertEqual(self.successResultOf(running), 3)
+        self.assertEqual(pool.statistics()['workers'], 0)
@@ -11,21 +11,27 @@ from __future__ import division, absolute_import
 __metaclass__ = type
 
 import errno
+import os
 import socket
+import sys
+
+from collections import deque
 
 from functools import wraps
+from io import BytesIO
 
 from zope.interface import implementer
 from zope.interface.verify import verifyClass
 
 from twisted.python.runtime import platform
+from twisted.python.filepath import FilePath
 from twisted.python.failure import Failure
-from twisted.python import log
+from twisted.python import log, _sendfile
 
 from twisted.trial.unittest import SkipTest, TestCase
 from twisted.internet.error import (
     ConnectionLost, UserError, ConnectionRefusedError, ConnectionDone,
-    ConnectionAborted, DNSLookupError, NoProtocol)
+    ConnectionAborted, DNSLookupError, NoProtocol, CannotListenError)
 from twisted.internet.test.connectionmixins import (
     LogObserverMixin, ConnectionTestsMixin, StreamClientTestsMixin,
     findFreePort, ConnectableProtocol, EndpointCreator,
@@ -41,9 +47,12 @@ from twisted.internet.defer import (
 from twisted.internet.endpoints import TCP4ServerEndpoint, TCP4ClientEndpoint
 from twisted.internet.protocol import ServerFactory, ClientFactory, Protocol
 from twisted.internet.interfaces import (
-    IPushProducer, IPullProducer, IHalfCloseableProtocol)
-from twisted.internet.tcp import Connection, Server, _resolveIPv6
+    IPushProducer, IPullProducer, IHalfCloseableProtocol, ISendFileTransport)
+from twisted.internet.tcp import Connection, Server, Port, _resolveIPv6
 from twisted.internet.test.test_core import ObjectModelIntegrationMixin
+from twisted.internet.test.test_posixbase import TrivialReactor
+from twisted.internet import main, tcp
+from twisted.internet.task import Clock
 from twisted.test.test_tcp import MyClientFactory, MyServerFactory
 from twisted.test.test_tcp import ClosingFactory, ClientStartStopFactory
 
@@ -178,6 +187,29 @@ class FakeSocket(object):
 
 
 
+class ChunkedFakeSocket(FakeSocket):
+    """
+    A fake for L{socket.socket} objects which returns a sequence of chunks
+    from successive calls to C{recv} and then fails with C{EWOULDBLOCK}.
+
+    @ivar chunks: A C{list} of C{bytes} remaining to be returned by C{recv}.
+
+    @ivar requested: A C{list} of the sizes passed to C{recv}.
+    """
+    def __init__(self, chunks):
+        FakeSocket.__init__(self, b"")
+        self.chunks = list(chunks)
+        self.requested = []
+
+
+    def recv(self, size):
+        self.requested.append(size)
+        if not self.chunks:
+            raise socket.error(errno.EWOULDBLOCK, "Would block")
+        return self.chunks.pop(0)
+
+
+
 class TestFakeSocket(TestCase):
     """
     Test that the FakeSocket can be used by the doRead method of L{Connection}
@@ -329,6 +361,155 @@ class TCPServerTests(TestCase):
 
 
 
+def _footprint(transport):
+    """
+    Measure the memory taken by a transport: the object itself, its instance
+    dictionary, and the strings and containers that dictionary refers to.
+    Objects shared with other connections or owned by someone else, such as
+    the reactor, the socket and the protocol, are not counted.
+
+    @return: The number of bytes.
+    """
+    attributes = vars(transport)
+    size = sys.getsizeof(transport) + sys.getsizeof(attributes)
+    for value in attributes.values():
+        if isinstance(value, (bytes, str, tuple, list, deque)):
+            size += sys.getsizeof(value)
+    return size
+
+
+
+class TCPServerMemoryTests(TestCase):
+    """
+    Tests for the memory taken by each L{twisted.internet.tcp.Server}, of
+    which a server handling many connections has one per connection.
+
+    @ivar budget: The most bytes an idle connection's L{Server} may take, as
+        measured by L{_footprint}.  Most of it is the instance dictionary,
+        which is largest on Python 2, and on Python 3 when the dictionaries
+        of a class's instances stop sharing their keys.
+    """
+    budget = 1536
+
+    def setUp(self):
+        class FakePort(object):
+            _realPortNumber = 3
+        self.protocol = Protocol()
+        self.server = Server(
+            FakeSocket(b""), self.protocol, ("127.0.0.1", 12345), FakePort(),
+            1, _FakeFDSetReactor())
+        self.protocol.makeConnection(self.server)
+
+
+    def test_idleBudget(self):
+        """
+        A connection which has not written anything stays within C{budget}.
+        """
+        self.assertTrue(
+            _footprint(self.server) <= self.budget,
+            "%d bytes is over budget" % (_footprint(self.server),))
+
+
+    def test_budgetAfterWriting(self):
+        """
+        A connection which has written everything it was given is back within
+        C{budget}, its write buffer having been released.
+        """
+        self.server.write(b"x" * 100)
+        self.server.writeSequence([b"y" * 100, b""])
+        self.assertIsInstance(self.server._tempDataBuffer, deque)
+        self.server.doWrite()
+        self.assertEqual(
+            b"".join(bytes(data) for data in self.server.socket.sendBuffer),
+            b"x" * 100 + b"y" * 100)
+        self.assertEqual(self.server._tempDataBuffer, ())
+        self.assertTrue(
+            _footprint(self.server) <= self.budget,
+            "%d bytes is over budget" % (_footprint(self.server),))
+
+
+
+class TCPPortReusePortTests(TestCase):
+    """
+    Tests for the C{reusePort} argument of L{twisted.internet.tcp.Port}.
+    """
+    if getattr(socket, "SO_REUSEPORT", None) is None:
+        skip = "SO_REUSEPORT is not supported on this platform."
+
+    def listen(self, port=0, **kwargs):
+        """
+        Create a L{Port} listening on C{port} on the loopback interface.
+
+        @return: The listening L{Port}.
+        """
+        listening = Port(port, ServerFactory(), interface="127.0.0.1",
+                         reactor=_FakeFDSetReactor(), **kwargs)
+        listening.startListening()
+        self.addCleanup(listening.socket.close)
+        return listening
+
+
+    def test_reusePort(self):
+        """
+        Ports created with C{reusePort=True} set C{SO_REUSEPORT}, so that
+        another one can listen on the same port.
+        """
+        first = self.listen(reusePort=True)
+        second = self.listen(first.getHost().port, reusePort=True)
+        self.assertEqual(first.getHost(), second.getHost())
+        self.assertTrue(second.socket.getsockopt(
+            socket.SOL_SOCKET, socket.SO_REUSEPORT))
+
+
+    def test_noReusePort(self):
+        """
+        By default, C{SO_REUSEPORT} is not set and a second port cannot
+        listen on the same port.
+        """
+        first = self.listen()
+        self.assertFalse(first.socket.getsockopt(
+            socket.SOL_SOCKET, socket.SO_REUSEPORT))
+        self.assertRaises(CannotListenError, self.listen, first.getHost().port)
+
+
+
+class TCPPortAcceptTests(TestCase):
+    """
+    Tests for the accept loop of L{twisted.internet.tcp.Port}.
+    """
+    if platform.getType() != "posix":
+        skip = "Only one connection is accepted per event on this platform."
+
+    def test_stopReadingStopsAccepting(self):
+        """
+        If L{Port.stopReading} is called while connections are being
+        accepted, L{Port.doRead} accepts no more of them.
+        """
+        accepted = []
+        class StoppingFactory(ServerFactory):
+            protocol = Protocol
+            def buildProtocol(self, addr):
+                accepted.append(addr)
+                listening.stopReading()
+                return None
+
+        listening = Port(0, StoppingFactory(), interface="127.0.0.1",
+                         reactor=_FakeFDSetReactor())
+        listening.startListening()
+        self.addCleanup(listening.socket.close)
+        for i in range(3):
+            client = socket.socket()
+            self.addCleanup(client.close)
+            client.connect(("127.0.0.1", listening.getHost().port))
+
+        listening.doRead()
+        self.assertEqual(len(accepted), 1)
+        listening.startReading()
+        listening.doRead()
+        self.assertEqual(len(accepted), 2)
+
+
+
 class TCPConnectionTests(TestCase):
     """
     Whitebox tests for L{twisted.internet.tcp.Connection}.
@@ -378,6 +559,717 @@ class TCPConnectionTests(TestCase):
         test_tlsAfterStartTLS.skip = "No SSL support available"
 
 
+    def test_writeExhausted(self):
+        """
+        L{Connection.writeSomeData} sets C{_writeExhausted} to C{True} if the
+        socket took less than it was given or would have blocked, and to
+        C{False} if it took everything.
+        """
+        skt = FakeSocket(b"")
+        conn = Connection(skt, FakeProtocol())
+        self.assertEqual(conn.writeSomeData(b"abc"), 3)
+        self.assertFalse(conn._writeExhausted)
+
+        skt.send = lambda data: 1
+        self.assertEqual(conn.writeSomeData(b"abc"), 1)
+        self.assertTrue(conn._writeExhausted)
+
+        def send(data):
+            raise socket.error(errno.EWOULDBLOCK, "Would block")
+        skt.send = send
+        conn._writeExhausted = False
+        self.assertEqual(conn.writeSomeData(b"abc"), 0)
+        self.assertTrue(conn._writeExhausted)
+
+
+
+class AccumulatingProtocol(Protocol):
+    """
+    An L{IProtocol} which records the data it receives.
+
+    @ivar received: A C{list} of C{bytes} passed to C{dataReceived}.
+    """
+    def __init__(self):
+        self.received = []
+
+
+    def dataReceived(self, data):
+        self.received.append(data)
+
+
+
+class _SteppingFakeFDSetReactor(_FakeFDSetReactor):
+    """
+    A L{_FakeFDSetReactor} whose clock advances by one second each time it is
+    read.
+    """
+    now = 0
+
+    def seconds(self):
+        self.now += 1
+        return self.now
+
+
+
+class TCPConnectionBudgetedReadTests(TestCase):
+    """
+    Tests for L{Connection.setReadBudget} and the reading it enables.
+    """
+    def _connect(self, chunks, reactor=None, protocol=None):
+        """
+        Create a L{Connection} reading the given chunks from a
+        L{ChunkedFakeSocket}.
+        """
+        if reactor is None:
+            reactor = _FakeFDSetReactor()
+        if protocol is None:
+            protocol = AccumulatingProtocol()
+        skt = ChunkedFakeSocket(chunks)
+        conn = Connection(skt, protocol, reactor)
+        conn.connected = True
+        protocol.makeConnection(conn)
+        return conn
+
+
+    def test_noBudgetReadsOnce(self):
+        """
+        Without a read budget, L{Connection.doRead} reads once, with
+        C{bufferSize}.
+        """
+        conn = self._connect([b"a", b"b"])
+        conn.doRead()
+        self.assertEqual(conn.protocol.received, [b"a"])
+        self.assertEqual(conn.socket.requested, [conn.bufferSize])
+        self.assertIdentical(conn.getReadBudget(), None)
+
+
+    def test_readExhausted(self):
+        """
+        L{Connection.doRead} sets C{_readExhausted} to C{True} if C{recv}
+        returned less than it asked for or would have blocked, and to
+        C{False} if it filled the buffer.
+        """
+        conn = self._connect([b"abcd", b"ef"])
+        conn.bufferSize = 4
+        conn.doRead()
+        self.assertFalse(conn._readExhausted)
+        conn.doRead()
+        self.assertTrue(conn._readExhausted)
+        conn._readExhausted = False
+        conn.doRead()
+        self.assertTrue(conn._readExhausted)
+
+
+    def test_budgetReadExhausted(self):
+        """
+        With a read budget, C{_readExhausted} is C{False} if the budget ran
+        out after a read which filled the buffer, and C{True} if the last
+        read was short.
+        """
+        conn = self._connect([b"abcd", b"efgh"])
+        conn.bufferSize = 4
+        conn.setReadBudget(4)
+        conn.doRead()
+        self.assertEqual(conn.protocol.received, [b"abcd"])
+        self.assertFalse(conn._readExhausted)
+        conn.doRead()
+        self.assertEqual(conn.protocol.received, [b"abcd", b"efgh"])
+        self.assertTrue(conn._readExhausted)
+
+
+    def test_drainsSocket(self):
+        """
+        With a read budget, L{Connection.doRead} keeps reading until the socket
+        has no more data.
+        """
+        conn = self._connect([b"a", b"b", b"c"])
+        conn.setReadBudget(1000)
+        self.assertEqual(conn.getReadBudget(), (1000, None))
+        self.assertIdentical(conn.doRead(), None)
+        self.assertEqual(conn.protocol.received, [b"a", b"b", b"c"])
+        self.assertEqual(len(conn.socket.requested), 4)
+
+
+    def test_byteBudget(self):
+        """
+        L{Connection.doRead} stops reading once the byte budget is spent.
+        """
+        conn = self._connect([b"ab", b"cd", b"ef"])
+        conn.setReadBudget(3)
+        conn.doRead()
+        self.assertEqual(conn.protocol.received, [b"ab", b"cd"])
+        conn.doRead()
+        self.assertEqual(conn.protocol.received, [b"ab", b"cd", b"ef"])
+
+
+    def test_timeBudget(self):
+        """
+        L{Connection.doRead} stops reading once the time budget is spent.
+        """
+        conn = self._connect(
+            [b"a", b"b", b"c", b"d"], reactor=_SteppingFakeFDSetReactor())
+        conn.setReadBudget(1000, 2)
+        conn.doRead()
+        self.assertEqual(conn.protocol.received, [b"a", b"b"])
+
+
+    def test_connectionDone(self):
+        """
+        L{Connection.doRead} returns L{main.CONNECTION_DONE} if the socket
+        reaches end of file while it is reading.
+        """
+        conn = self._connect([b"a", b""])
+        conn.setReadBudget(1000)
+        self.assertIdentical(conn.doRead(), main.CONNECTION_DONE)
+        self.assertEqual(conn.protocol.received, [b"a"])
+
+
+    def test_recvError(self):
+        """
+        L{Connection.doRead} returns L{main.CONNECTION_LOST} if C{recv} fails
+        with an error other than C{EWOULDBLOCK}.
+        """
+        conn = self._connect([])
+        def recv(size):
+            raise socket.error(errno.ECONNRESET, "Reset")
+        conn.socket.recv = recv
+        conn.setReadBudget(1000)
+        self.assertIdentical(conn.doRead(), main.CONNECTION_LOST)
+
+
+    def test_stopReadingInterrupts(self):
+        """
+        If the protocol pauses the transport while it is reading, no more data
+        is read.
+        """
+        class PausingProtocol(AccumulatingProtocol):
+            def dataReceived(self, data):
+                AccumulatingProtocol.dataReceived(self, data)
+                self.transport.pauseProducing()
+        conn = self._connect([b"a", b"b"], protocol=PausingProtocol())
+        conn.setReadBudget(1000)
+        conn.doRead()
+        self.assertEqual(conn.protocol.received, [b"a"])
+
+
+    def test_loseConnectionInterrupts(self):
+        """
+        If the protocol calls C{loseConnection} while the transport is reading,
+        no more data is read.
+        """
+        class LosingProtocol(AccumulatingProtocol):
+            def dataReceived(self, data):
+                AccumulatingProtocol.dataReceived(self, data)
+                self.transport.loseConnection()
+        conn = self._connect([b"a", b"b"], protocol=LosingProtocol())
+        conn.setReadBudget(1000)
+        conn.doRead()
+        self.assertEqual(conn.protocol.received, [b"a"])
+
+
+    def test_adaptiveReadSize(self):
+        """
+        Reads which fill the buffer double the size of the next read, up to
+        C{maximumReadSize}, and reads which return less than a quarter of it
+        halve it, down to C{minimumReadSize}.
+        """
+        conn = self._connect([])
+        conn.bufferSize = 8
+        conn.minimumReadSize = 4
+        conn.maximumReadSize = 32
+        conn.socket.chunks = [b"x" * 8, b"x" * 16, b"x" * 32, b"x" * 32,
+                              b"x", b"x", b"x", b"x"]
+        conn.setReadBudget(1000)
+        conn.doRead()
+        self.assertEqual(
+            conn.socket.requested, [8, 16, 32, 32, 32, 16, 8, 4, 4])
+
+
+    def test_reactorBudget(self):
+        """
+        A L{Connection} without a read budget of its own uses the one set on
+        its reactor with C{setReadBudget}, unless a budget is then set on the
+        connection.
+        """
+        reactor = TrivialReactor()
+        reactor.setReadBudget(1000)
+        conn = self._connect([b"a", b"b", b"c"], reactor=reactor)
+        self.assertEqual(conn.getReadBudget(), (1000, None))
+        conn.doRead()
+        self.assertEqual(conn.protocol.received, [b"a", b"b", b"c"])
+
+        conn.socket.chunks = [b"d", b"e"]
+        conn.setReadBudget(1)
+        conn.doRead()
+        self.assertEqual(conn.protocol.received, [b"a", b"b", b"c", b"d"])
+
+
+
+class _FakeSendfile(object):
+    """
+    A fake for L{os.sendfile} which reads what it is asked to send from the
+    input file descriptor and records it.
+
+    @ivar calls: A C{list} of C{(outFile, offset, count)} tuples, one for
+        each call.
+
+    @ivar sent: A C{list} of the C{bytes} I{sent} by each successful call.
+
+    @ivar errors: A C{list} of exceptions to raise from the next calls,
+        instead of sending anything.
+
+    @ivar limit: The largest number of bytes to send in one call, or C{None}.
+    """
+    def __init__(self, limit=None):
+        self.calls = []
+        self.sent = []
+        self.errors = []
+        self.limit = limit
+
+
+    def __call__(self, outFile, inFile, offset, count):
+        self.calls.append((outFile, offset, count))
+        if self.errors:
+            raise self.errors.pop(0)
+        if self.limit is not None:
+            count = min(count, self.limit)
+        os.lseek(inFile, offset, os.SEEK_SET)
+        data = os.read(inFile, count)
+        self.sent.append(data)
+        return len(data)
+
+
+
+class _TimedFakeFDSetReactor(_FakeFDSetReactor):
+    """
+    A L{_FakeFDSetReactor} which can also schedule calls, using a L{Clock}.
+    """
+    def __init__(self):
+        _FakeFDSetReactor.__init__(self)
+        self.clock = Clock()
+        self.callLater = self.clock.callLater
+
+
+
+_realSendfile = _sendfile.sendfile
+
+class TCPConnectionSendFileTests(TestCase):
+    """
+    Tests for L{Connection.sendFile}.
+    """
+    def setUp(self):
+        self.sendfile = _FakeSendfile()
+        self.patch(_sendfile, "sendfile", self.sendfile)
+        self.reactor = _TimedFakeFDSetReactor()
+        self.protocol = AccumulatingProtocol()
+        self.conn = Connection(FakeSocket(b""), self.protocol, self.reactor)
+        self.conn.connected = True
+        self.protocol.makeConnection(self.conn)
+
+
+    def _sent(self):
+        """
+        Return everything written to the fake socket.
+        """
+        return b"".join(bytes(data) for data in self.conn.socket.sendBuffer)
+
+
+    def test_interface(self):
+        """
+        L{Server} implements L{ISendFileTransport}.
+        """
+        self.assertTrue(verifyClass(ISendFileTransport, Server))
+
+
+    def test_sendWholeFile(self):
+        """
+        L{Connection.sendFile} with a count of C{None} passes the socket and
+        the file to C{sendfile} until it reaches the end of the file, then
+        fires the L{Deferred} it returned with the number of bytes sent.
+        """
+        path = FilePath(self.mktemp())
+        path.setContent(b"0123456789")
+        fObj = path.open()
+        self.addCleanup(fObj.close)
+        d = self.conn.sendFile(fObj, 0, None)
+        self.assertEqual(self.sendfile.sent, [b"0123456789"])
+        self.assertNoResult(d)
+        self.assertIn(self.conn, self.reactor.getWriters())
+
+        self.conn.doWrite()
+        self.assertEqual(self.sendfile.sent, [b"0123456789", b""])
+        self.assertEqual(self.successResultOf(d), 10)
+        self.assertIdentical(self.conn.producer, None)
+        self.assertEqual(self.reactor.getWriters(), [])
+        self.assertEqual(self.sendfile.calls[0][0], 1)
+
+
+    def test_offsetAndCount(self):
+        """
+        L{Connection.sendFile} sends C{count} bytes starting at C{offset},
+        calling C{sendfile} again each time the socket is writeable until it
+        has sent them all, and does not change the position of the file.
+        """
+        self.sendfile.limit = 3
+        path = FilePath(self.mktemp())
+        path.setContent(b"0123456789")
+        fObj = path.open()
+        self.addCleanup(fObj.close)
+        d = self.conn.sendFile(fObj, 2, 5)
+        self.assertNoResult(d)
+        self.conn.doWrite()
+        self.assertEqual(self.successResultOf(d), 5)
+        self.assertEqual(self.sendfile.calls, [(1, 2, 5), (1, 5, 2)])
+        self.assertEqual(self.sendfile.sent, [b"234", b"56"])
+
+
+    def test_waitsForBufferedData(self):
+        """
+        L{Connection.sendFile} does not call C{sendfile} until data written to
+        the connection before it has been sent.
+        """
+        self.conn.write(b"head")
+        path = FilePath(self.mktemp())
+        path.setContent(b"abc")
+        fObj = path.open()
+        self.addCleanup(fObj.close)
+        d = self.conn.sendFile(fObj, 0, 3)
+        self.assertEqual(self.sendfile.calls, [])
+        self.conn.doWrite()
+        self.assertEqual(self._sent(), b"head")
+        self.assertEqual(self.sendfile.sent, [b"abc"])
+        self.assertEqual(self.successResultOf(d), 3)
+
+
+    def test_wouldBlock(self):
+        """
+        If C{sendfile} fails with C{EAGAIN}, L{Connection.sendFile} tries again
+        when the socket becomes writeable.
+        """
+        self.sendfile.errors.append(OSError(errno.EAGAIN, "Would block"))
+        path = FilePath(self.mktemp())
+        path.setContent(b"abc")
+        fObj = path.open()
+        self.addCleanup(fObj.close)
+        d = self.conn.sendFile(fObj, 0, 3)
+        self.assertNoResult(d)
+        self.assertIn(self.conn, self.reactor.getWriters())
+        self.conn.doWrite()
+        self.assertEqual(self.successResultOf(d), 3)
+
+
+    def test_writesHeld(self):
+        """
+        Data written to the connection while a file is being sent is written
+        after the file has been sent.
+        """
+        self.sendfile.errors.append(OSError(errno.EAGAIN, "Would block"))
+        path = FilePath(self.mktemp())
+        path.setContent(b"abc")
+        fObj = path.open()
+        self.addCleanup(fObj.close)
+        d = self.conn.sendFile(fObj, 0, 3)
+        self.conn.write(b"tail")
+        self.conn.writeSequence([b"a", b"b"])
+        self.assertEqual(self.conn._tempDataLen, 0)
+
+        self.conn.doWrite()
+        self.assertEqual(self.successResultOf(d), 3)
+        self.assertNotIn("write", vars(self.conn))
+        self.assertNotIn("writeSequence", vars(self.conn))
+        self.conn.doWrite()
+        self.assertEqual(self._sent(), b"tailab")
+
+
+    def test_fallbackWithoutFileno(self):
+        """
+        L{Connection.sendFile} reads a file without a file descriptor and
+        writes its contents to the connection.
+        """
+        d = self.conn.sendFile(BytesIO(b"abcdef"), 1, None)
+        self.conn.doWrite()
+        self.assertEqual(self.successResultOf(d), 5)
+        self.assertEqual(self.sendfile.calls, [])
+        self.assertEqual(self._sent(), b"bcdef")
+
+
+    def test_fallbackOnEINVAL(self):
+        """
+        If the first C{sendfile} call fails with C{EINVAL}, because the file
+        or socket does not support it, L{Connection.sendFile} reads the file
+        and writes its contents to the connection instead.
+        """
+        self.sendfile.errors.append(OSError(errno.EINVAL, "Invalid argument"))
+        path = FilePath(self.mktemp())
+        path.setContent(b"abcdef")
+        fObj = path.open()
+        self.addCleanup(fObj.close)
+        d = self.conn.sendFile(fObj, 0, 4)
+        self.conn.doWrite()
+        self.assertEqual(self.successResultOf(d), 4)
+        self.assertEqual(self._sent(), b"abcd")
+        self.assertEqual(len(self.sendfile.calls), 1)
+
+
+    def test_error(self):
+        """
+        If C{sendfile} fails for some other reason, the L{Deferred} returned
+        by L{Connection.sendFile} fails and the connection is aborted.
+        """
+        self.sendfile.errors.append(OSError(errno.EIO, "I/O error"))
+        path = FilePath(self.mktemp())
+        path.setContent(b"abc")
+        fObj = path.open()
+        self.addCleanup(fObj.close)
+        d = self.conn.sendFile(fObj, 0, 3)
+        self.failureResultOf(d, OSError)
+        self.assertIdentical(self.conn.producer, None)
+        self.assertTrue(self.conn._aborting)
+
+
+    def test_connectionLost(self):
+        """
+        If the connection is lost while a file is being sent, the
+        L{Deferred} returned by L{Connection.sendFile} fails with
+        L{ConnectionLost}.
+        """
+        self.sendfile.errors.append(OSError(errno.EAGAIN, "Would block"))
+        path = FilePath(self.mktemp())
+        path.setContent(b"abc")
+        fObj = path.open()
+        self.addCleanup(fObj.close)
+        d = self.conn.sendFile(fObj, 0, 3)
+        self.conn.connectionLost(Failure(ConnectionDone()))
+        self.failureResultOf(d, ConnectionLost)
+        self.assertNotIn("write", vars(self.conn))
+
+
+    def test_realSendfile(self):
+        """
+        L{Connection.sendFile} sends a file over a real socket with the
+        platform's C{sendfile}.
+        """
+        self.patch(_sendfile, "sendfile", _realSendfile)
+        content = os.urandom(2 ** 20)
+        client, server = socket.socketpair()
+        self.addCleanup(client.close)
+        self.addCleanup(server.close)
+        server.setblocking(False)
+        conn = Connection(client, self.protocol, self.reactor)
+        conn.connected = True
+
+        path = FilePath(self.mktemp())
+        path.setContent(content)
+        fObj = path.open()
+        self.addCleanup(fObj.close)
+        d = conn.sendFile(fObj, 0, None)
+        received = []
+        while True:
+            try:
+                received.append(server.recv(2 ** 16))
+            except socket.error:
+                if conn not in self.reactor.getWriters():
+                    break
+                conn.doWrite()
+        self.assertEqual(self.successResultOf(d), len(content))
+        self.assertEqual(b"".join(received), content)
+    if _realSendfile is None:
+        test_realSendfile.skip = "sendfile is not available on this platform"
+
+
+
+class FlaggedFakeSocket(FakeSocket):
+    """
+    A L{FakeSocket} which records the flags passed to C{send} and C{sendmsg}
+    and accepts at most a given number of bytes from each call.
+
+    @ivar flags: A C{list} of the flags passed to each call.
+
+    @ivar limit: The most bytes accepted by each call.
+    """
+    limit = 2 ** 20
+
+    def __init__(self):
+        FakeSocket.__init__(self, b"")
+        self.flags = []
+
+
+    def send(self, bytes, flags=0):
+        self.flags.append(flags)
+        return FakeSocket.send(self, bytes[:self.limit])
+
+
+    def sendmsg(self, buffers, ancdata=(), flags=0):
+        return self.send(b"".join(buffers), flags)
+
+
+
+class TCPConnectionWriteCoalescingTests(TestCase):
+    """
+    Tests for L{Connection.setWriteCoalescing} and the writing it enables.
+    """
+    def setUp(self):
+        self.reactor = _TimedFakeFDSetReactor()
+        self.conn = self._connect()
+
+
+    def _connect(self):
+        """
+        Create a L{Connection} writing to a L{FlaggedFakeSocket}, with write
+        coalescing enabled.
+        """
+        protocol = AccumulatingProtocol()
+        conn = Connection(FlaggedFakeSocket(), protocol, self.reactor)
+        conn.connected = True
+        protocol.makeConnection(conn)
+        conn.setWriteCoalescing(True)
+        return conn
+
+
+    def _sent(self, conn):
+        """
+        Return everything written to the fake socket of C{conn}.
+        """
+        return b"".join(bytes(data) for data in conn.socket.sendBuffer)
+
+
+    def test_disabledByDefault(self):
+        """
+        Write coalescing is disabled by default, and data written to a
+        connection is sent when the reactor reports it writable.
+        """
+        conn = Connection(FakeSocket(b""), Protocol(), self.reactor)
+        conn.connected = True
+        self.assertFalse(conn.getWriteCoalescing())
+        conn.write(b"x")
+        self.assertIn(conn, self.reactor.getWriters())
+        self.assertEqual(self.reactor.clock.getDelayedCalls(), [])
+
+
+    def test_enable(self):
+        """
+        L{Connection.getWriteCoalescing} returns C{True} after write
+        coalescing has been enabled with L{Connection.setWriteCoalescing}.
+        """
+        self.assertTrue(self.conn.getWriteCoalescing())
+        self.conn.setWriteCoalescing(False)
+        self.assertFalse(self.conn.getWriteCoalescing())
+
+
+    def test_flushedAtEndOfIteration(self):
+        """
+        With write coalescing, everything written during one reactor
+        iteration is sent with one C{send} at the end of the iteration,
+        without waiting for the socket to become writable.
+        """
+        self.conn.write(b"HTTP/1.1 200 OK\r\n")
+        self.conn.writeSequence([b"Content-Length: 2\r\n", b"\r\n"])
+        self.conn.write(b"ok")
+        self.assertEqual(self.conn.socket.sendBuffer, [])
+        self.reactor.clock.advance(0)
+        self.assertEqual(
+            self.conn.socket.sendBuffer,
+            [b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok"])
+        self.assertEqual(self.reactor.getWriters(), [])
+
+
+    def test_oneCallPerIteration(self):
+        """
+        All the connections written to during one reactor iteration are
+        flushed by a single timed call.
+        """
+        other = self._connect()
+        self.conn.write(b"a")
+        other.write(b"b")
+        self.conn.write(b"c")
+        self.assertEqual(len(self.reactor.clock.getDelayedCalls()), 1)
+        self.reactor.clock.advance(0)
+        self.assertEqual(self._sent(self.conn), b"ac")
+        self.assertEqual(self._sent(other), b"b")
+
+
+    def test_partialSend(self):
+        """
+        If not everything can be sent at the end of the iteration, the rest
+        is sent when the socket becomes writable.
+        """
+        self.conn.socket.limit = 2
+        self.conn.write(b"abc")
+        self.reactor.clock.advance(0)
+        self.assertEqual(self._sent(self.conn), b"ab")
+        self.assertEqual(self.reactor.getWriters(), [self.conn])
+        self.conn.doWrite()
+        self.assertEqual(self._sent(self.conn), b"abc")
+        self.assertEqual(self.reactor.getWriters(), [])
+
+
+    def test_moreFlag(self):
+        """
+        A C{send} which is followed by more buffered data is flagged with
+        C{MSG_MORE}, and the last one is not.
+        """
+        self.conn.SEND_LIMIT = 2
+        self.conn.write(b"abc")
+        self.reactor.clock.advance(0)
+        self.conn.doWrite()
+        self.assertEqual(self._sent(self.conn), b"abc")
+        self.assertEqual(self.conn.socket.flags, [tcp._MSG_MORE, 0])
+
+
+    def test_loseConnection(self):
+        """
+        After L{Connection.loseConnection}, buffered data is sent when the
+        socket becomes writable, after which the connection is closed.
+        """
+        self.conn.write(b"abc")
+        self.conn.loseConnection()
+        self.reactor.clock.advance(0)
+        self.assertEqual(self._sent(self.conn), b"")
+        self.assertIn(self.conn, self.reactor.getWriters())
+        self.assertEqual(self.conn.doWrite(), main.CONNECTION_DONE)
+        self.assertEqual(self._sent(self.conn), b"abc")
+
+
+    def test_sendFailure(self):
+        """
+        If sending fails at the end of the iteration, the connection is lost.
+        """
+        lost = []
+        self.conn.protocol.connectionLost = lost.append
+        def send(data, flags=0):
+            raise socket.error(errno.ECONNRESET, "Connection reset")
+        self.conn.socket.send = send
+        self.conn.write(b"abc")
+        self.reactor.clock.advance(0)
+        self.assertEqual(len(lost), 1)
+        lost[0].trap(ConnectionLost)
+        self.assertFalse(self.conn.connected)
+
+
+    def test_sendFileWouldBlock(self):
+        """
+        If C{sendfile} fails with C{EAGAIN} while write coalescing is
+        enabled, L{Connection.sendFile} waits for the socket to become
+        writable rather than retrying at the end of every iteration.
+        """
+        sendfile = _FakeSendfile()
+        sendfile.errors.append(OSError(errno.EAGAIN, "Would block"))
+        self.patch(_sendfile, "sendfile", sendfile)
+        path = FilePath(self.mktemp())
+        path.setContent(b"abc")
+        fObj = path.open()
+        self.addCleanup(fObj.close)
+        d = self.conn.sendFile(fObj, 0, 3)
+        self.assertEqual(len(sendfile.calls), 1)
+        self.assertEqual(self.reactor.getWriters(), [self.conn])
+        self.assertEqual(self.reactor.clock.getDelayedCalls(), [])
+        self.reactor.clock.advance(0)
+        self.assertEqual(len(sendfile.calls), 1)
+        self.conn.doWrite()
+        self.assertEqual(self.successResultOf(d), 3)
+        self.assertEqual(sendfile.sent, [b"abc"])
+
+
 
 class TCPCreator(EndpointCreator):
     """
@@ -1417,6 +2309,43 @@ def assertNotReading(testCase, reactor, transport):
 
 
 
+class CoalescingWriter(ConnectableProtocol):
+    """
+    A protocol which enables write coalescing, if its transport supports it,
+    and writes L{CoalescingWriter.data} in several pieces when connected, the
+    last of them from a timed call.
+    """
+    data = b"x" * 2 ** 20 + b"yz!"
+
+    def connectionMade(self):
+        setWriteCoalescing = getattr(
+            self.transport, "setWriteCoalescing", None)
+        if setWriteCoalescing is not None:
+            setWriteCoalescing(True)
+        self.transport.write(self.data[:-3])
+        self.transport.writeSequence([self.data[-3:-2], self.data[-2:-1]])
+        self.reactor.callLater(0, self.transport.write, self.data[-1:])
+
+
+
+class ReceivingThenClosing(ConnectableProtocol):
+    """
+    A protocol which records the data it receives, and closes the connection
+    once it has received as much as L{CoalescingWriter} sends.
+    """
+    def connectionMade(self):
+        self.received = []
+        self.length = 0
+
+
+    def dataReceived(self, data):
+        self.received.append(data)
+        self.length += len(data)
+        if self.length == len(CoalescingWriter.data):
+            self.transport.loseConnection()
+
+
+
 class TCPConnectionTestsBuilder(ReactorBuilder):
     """
     Builder defining tests relating to L{twisted.internet.tcp.Connection}.
@@ -1473,6 +2402,17 @@ class TCPConnectionTestsBuilder(ReactorBuilder):
         self.runReactor(reactor)
 
 
+    def test_writeCoalescing(self):
+        """
+        All the data written to a connection with write coalescing enabled is
+        received by its peer.
+        """
+        server = CoalescingWriter()
+        client = ReceivingThenClosing()
+        runProtocolsWithReactor(self, server, client, TCPCreator())
+        self.assertEqual(b"".join(client.received), CoalescingWriter.data)
+
+
     @oneTransportTest
     def test_resumeProducing(self, reactor, server):
         """
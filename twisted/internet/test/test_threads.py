@@ -127,6 +127,27 @@ class ThreadTestsBuilder(ReactorBuilder):
         self.assertEqual(result, [threading.currentThread()])
 
 
+    def test_callFromThreadMany(self):
+        """
+        Functions scheduled together with C{callFromThreadMany} from another
+        thread are run in order in the reactor thread.
+        """
+        reactor = self.buildReactor()
+        result = []
+
+        def threadCall(value):
+            result.append((value, threading.currentThread()))
+            if value == 2:
+                reactor.stop()
+        reactor.callLater(0, reactor.callInThread,
+                          reactor.callFromThreadMany,
+                          [(threadCall, (1,), {}), (threadCall, (2,), {})])
+        self.runReactor(reactor, 5)
+
+        self.assertEqual(result, [(1, threading.currentThread()),
+                                  (2, threading.currentThread())])
+
+
     def test_stopThreadPool(self):
         """
         When the reactor stops, L{ReactorBase._stopThreadPool} drops the
@@ -13,6 +13,7 @@ from twisted.python.runtime import platform
 from twisted.trial.unittest import SkipTest
 from twisted.internet.test.reactormixins import ReactorBuilder
 from twisted.internet.interfaces import IReactorTime, IReactorThreads
+from twisted.internet.base import IndexedTimerQueue
 
 
 class TimeTestsBuilder(ReactorBuilder):
@@ -71,6 +72,84 @@ class TimeTestsBuilder(ReactorBuilder):
         self.assertIn(delayedCall, reactor.getDelayedCalls())
 
 
+    def _buildTimerQueueReactor(self):
+        """
+        Build a reactor, skipping the test if it does not support replacing
+        its timer queue.
+        """
+        reactor = self.buildReactor()
+        if getattr(reactor, 'installTimerQueue', None) is None:
+            raise SkipTest("%r does not support installTimerQueue" % (
+                    reactor,))
+        return reactor
+
+
+    def test_installTimerQueuePreservesCalls(self):
+        """
+        Delayed calls which are pending when a new timer queue is installed
+        are moved into it and still run.
+        """
+        reactor = self._buildTimerQueueReactor()
+        result = []
+        reactor.callLater(0, result.append, 1)
+        cancelled = reactor.callLater(0, result.append, 2)
+        cancelled.cancel()
+        reactor.callLater(0.01, reactor.stop)
+        reactor.installTimerQueue(IndexedTimerQueue())
+        self.assertEqual(len(reactor.getDelayedCalls()), 2)
+        self.runReactor(reactor)
+        self.assertEqual(result, [1])
+
+
+    def test_indexedTimerQueueOrder(self):
+        """
+        With an L{IndexedTimerQueue} installed, delayed calls which are reset,
+        delayed or cancelled run in the order of their final scheduled times.
+        """
+        reactor = self._buildTimerQueueReactor()
+        reactor.installTimerQueue(IndexedTimerQueue())
+        result = []
+        first = reactor.callLater(0.3, result.append, 'first')
+        second = reactor.callLater(0.1, result.append, 'second')
+        third = reactor.callLater(0.2, result.append, 'third')
+        dropped = reactor.callLater(0.05, result.append, 'dropped')
+        reactor.callLater(0.4, reactor.stop)
+
+        def rearrange():
+            first.reset(0.01)
+            second.delay(0.15)
+            dropped.cancel()
+        reactor.callWhenRunning(rearrange)
+        self.runReactor(reactor)
+        self.assertEqual(result, ['first', 'third', 'second'])
+        self.assertTrue(third.called)
+
+
+    def test_callAfterTimedCalls(self):
+        """
+        A function passed to C{_callAfterTimedCalls} by a timed call is called
+        once all the timed calls due at the same time have been run.
+        """
+        reactor = self.buildReactor()
+        if getattr(reactor, '_callAfterTimedCalls', None) is None:
+            raise SkipTest("%r does not support _callAfterTimedCalls" % (
+                    reactor,))
+        result = []
+        def first():
+            result.append('first')
+            reactor._callAfterTimedCalls(lambda: result.append('last'))
+        def schedule():
+            reactor.callLater(0, first)
+            reactor.callLater(0, result.append, 'second')
+            reactor.callLater(0, result.append, 'third')
+            reactor.callLater(0.01, reactor.stop)
+        reactor.callWhenRunning(schedule)
+        self.runReactor(reactor)
+        self.assertEqual(
+            sorted(result[:-1]), ['first', 'second', 'third'])
+        self.assertEqual(result[-1], 'last')
+
+
 
 class GlibTimeTestsBuilder(ReactorBuilder):
     """
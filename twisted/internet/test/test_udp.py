@@ -371,6 +371,41 @@ class UDPPortTestsMixin(object):
         self.assertTrue(port.getBroadcastAllowed())
 
 
+    def test_batchedDatagrams(self):
+        """
+        Datagrams written with C{writeDatagrams} are delivered to the
+        C{datagramsReceived} method of the protocol of a port with a batch
+        size.
+        """
+        reactor = self.buildReactor()
+        received = []
+
+        class BatchServer(DatagramProtocol):
+            def datagramsReceived(self, datagrams):
+                received.extend(datagrams)
+                if len(received) == 3:
+                    reactor.stop()
+
+        server = self.getListeningPort(
+            reactor, BatchServer(), interface="127.0.0.1")
+        if getattr(server, "setBatchSize", None) is None:
+            raise SkipTest("%r does not read batches of datagrams" % (
+                    server,))
+        server.setBatchSize(10)
+        client = self.getListeningPort(
+            reactor, DatagramProtocol(), interface="127.0.0.1")
+        serverAddress = ("127.0.0.1", server.getHost().port)
+        clientAddress = ("127.0.0.1", client.getHost().port)
+        client.writeDatagrams(
+            [(b"a", serverAddress), (b"b", serverAddress),
+             (b"c", serverAddress)])
+        self.runReactor(reactor)
+
+        self.assertEqual(received, [(b"a", clientAddress),
+                                    (b"b", clientAddress),
+                                    (b"c", clientAddress)])
+
+
 
 class UDPServerTestsBuilder(ReactorBuilder,
                             UDPPortTestsMixin, DatagramTransportTestsMixin):
@@ -11,13 +11,15 @@ import socket
 
 from twisted.trial import unittest
 from twisted.internet.protocol import DatagramProtocol
-from twisted.internet import udp
+from twisted.internet import udp, error
 from twisted.python.runtime import platformType
+from twisted.python import _mmsg
 
 if platformType == 'win32':
     from errno import WSAEWOULDBLOCK as EWOULDBLOCK
+    from errno import WSAEMSGSIZE as EMSGSIZE
 else:
-    from errno import EWOULDBLOCK
+    from errno import EWOULDBLOCK, EMSGSIZE
 
 
 
@@ -51,6 +53,33 @@ class StringUDPSocket(object):
 
 
 
+class SendingUDPSocket(StringUDPSocket):
+    """
+    A L{StringUDPSocket} which records the datagrams sent with it.
+
+    @ivar sent: A C{list} of C{(datagram, addr)} tuples.
+
+    @ivar sendErrors: A C{list} of exceptions to raise from the next calls to
+        C{sendto}.
+    """
+    def __init__(self, retvals):
+        StringUDPSocket.__init__(self, retvals)
+        self.sent = []
+        self.sendErrors = []
+
+
+    def sendto(self, datagram, addr):
+        if self.sendErrors:
+            raise self.sendErrors.pop(0)
+        self.sent.append((datagram, addr))
+        return len(datagram)
+
+
+    def fileno(self):
+        return -1
+
+
+
 class KeepReads(DatagramProtocol):
     """
     Accumulate reads in a list.
@@ -163,3 +192,230 @@ class ErrorsTestCase(unittest.SynchronousTestCase):
         port.socket = StringUDPSocket([b"good", socket.error(-1337)])
         self.assertRaises(socket.error, port.doRead)
         self.assertEqual(protocol.reads, [b"good"])
+
+
+
+class KeepBatches(DatagramProtocol):
+    """
+    Accumulate batches of reads in a list.
+    """
+
+    def __init__(self):
+        self.batches = []
+
+
+    def datagramsReceived(self, datagrams):
+        self.batches.append(datagrams)
+
+
+
+class BatchTestCase(unittest.SynchronousTestCase):
+    """
+    Tests for reading and writing batches of datagrams with C{udp.Port}.
+    """
+
+    def setUp(self):
+        # Read with recvfrom from the fake socket.
+        self.patch(_mmsg, "available", False)
+
+
+    def test_batchSize(self):
+        """
+        L{udp.Port.getBatchSize} returns the batch size set with
+        L{udp.Port.setBatchSize}, which is C{None} by default.
+        """
+        port = udp.Port(None, KeepReads())
+        self.assertIdentical(port.getBatchSize(), None)
+        port.setBatchSize(10)
+        self.assertEqual(port.getBatchSize(), 10)
+        port.setBatchSize(None)
+        self.assertIdentical(port.getBatchSize(), None)
+
+
+    def test_datagramsReceived(self):
+        """
+        With a batch size set, L{udp.Port.doRead} delivers datagrams to the
+        protocol's C{datagramsReceived} in lists of up to that many.
+        """
+        protocol = KeepBatches()
+        port = udp.Port(None, protocol)
+        port.setBatchSize(2)
+        port.socket = StringUDPSocket(
+            [b"a", b"b", b"c", socket.error(EWOULDBLOCK)])
+        port.doRead()
+        self.assertEqual(protocol.batches,
+                         [[(b"a", None), (b"b", None)], [(b"c", None)]])
+
+
+    def test_datagramReceived(self):
+        """
+        With a batch size set, L{udp.Port.doRead} calls the
+        C{datagramReceived} method of a protocol without a
+        C{datagramsReceived} method for each datagram.
+        """
+        protocol = KeepReads()
+        port = udp.Port(None, protocol)
+        port.setBatchSize(2)
+        port.socket = StringUDPSocket(
+            [b"a", b"b", b"c", socket.error(EWOULDBLOCK)])
+        port.doRead()
+        self.assertEqual(protocol.reads, [b"a", b"b", b"c"])
+
+
+    def test_incompleteBatch(self):
+        """
+        L{udp.Port.doRead} stops reading after a batch with fewer datagrams
+        than the batch size.
+        """
+        protocol = KeepBatches()
+        port = udp.Port(None, protocol)
+        port.setBatchSize(5)
+        port.socket = StringUDPSocket(
+            [b"a", socket.error(EWOULDBLOCK), b"b", socket.error(EWOULDBLOCK)])
+        port.doRead()
+        self.assertEqual(protocol.batches, [[(b"a", None)]])
+        port.doRead()
+        self.assertEqual(protocol.batches, [[(b"a", None)], [(b"b", None)]])
+
+
+    def test_errorAfterDatagrams(self):
+        """
+        An error which interrupts a batch is handled after the datagrams read
+        before it have been delivered.
+        """
+        udp._sockErrReadRefuse.append(-6000)
+        self.addCleanup(udp._sockErrReadRefuse.remove, -6000)
+
+        protocol = KeepBatches()
+        refused = []
+        protocol.connectionRefused = lambda: refused.append(True)
+        port = udp.Port(None, protocol)
+        port.setBatchSize(5)
+        port.socket = StringUDPSocket([b"a", socket.error(-6000), b"b",
+                                       socket.error(EWOULDBLOCK)])
+        port.connect("127.0.0.1", 9999)
+
+        port.doRead()
+        self.assertEqual(protocol.batches, [[(b"a", None)]])
+        self.assertEqual(refused, [True])
+        port.doRead()
+        self.assertEqual(protocol.batches, [[(b"a", None)], [(b"b", None)]])
+
+
+    def test_readUnknownError(self):
+        """
+        An unknown error raised while reading a batch is raised once the
+        datagrams read before it have been delivered.
+        """
+        protocol = KeepReads()
+        port = udp.Port(None, protocol)
+        port.setBatchSize(5)
+        port.socket = StringUDPSocket([b"good", socket.error(-1337)])
+        self.assertRaises(socket.error, port.doRead)
+        self.assertEqual(protocol.reads, [b"good"])
+
+
+    def test_writeDatagramsFallback(self):
+        """
+        Without C{sendmmsg}, L{udp.Port.writeDatagrams} writes each datagram
+        with C{sendto}.
+        """
+        port = udp.Port(None, KeepReads())
+        port.socket = SendingUDPSocket([])
+        datagrams = [(b"a", ("127.0.0.1", 1)), (b"b", ("127.0.0.1", 2))]
+        port.writeDatagrams(datagrams)
+        self.assertEqual(port.socket.sent, datagrams)
+
+
+    def test_writeDatagrams(self):
+        """
+        With C{sendmmsg}, L{udp.Port.writeDatagrams} passes all the datagrams
+        to it, until they have all been sent.
+        """
+        calls = []
+        def sendDatagrams(fileno, family, datagrams):
+            calls.append(datagrams)
+            return 1
+        self.patch(_mmsg, "available", True)
+        self.patch(_mmsg, "sendDatagrams", sendDatagrams)
+        port = udp.Port(None, KeepReads())
+        port.socket = SendingUDPSocket([])
+        datagrams = [(b"a", ("127.0.0.1", 1)), (b"b", ("127.0.0.1", 2))]
+        port.writeDatagrams(datagrams)
+        self.assertEqual(calls, [datagrams, datagrams[1:]])
+
+
+    def test_writeDatagramsInvalidAddress(self):
+        """
+        L{udp.Port.writeDatagrams} raises L{error.InvalidAddressError}
+        without writing anything if any of the addresses is not an IP
+        address.
+        """
+        calls = []
+        self.patch(_mmsg, "available", True)
+        self.patch(_mmsg, "sendDatagrams", lambda *args: calls.append(args))
+        port = udp.Port(None, KeepReads())
+        port.socket = SendingUDPSocket([])
+        self.assertRaises(
+            error.InvalidAddressError, port.writeDatagrams,
+            [(b"a", ("127.0.0.1", 1)), (b"b", ("example.com", 2))])
+        self.assertEqual(calls, [])
+
+
+    def test_writeDatagramsError(self):
+        """
+        If C{sendmmsg} fails to send a datagram, L{udp.Port.writeDatagrams}
+        writes it with L{udp.Port.write}, which reports the error.
+        """
+        def sendDatagrams(fileno, family, datagrams):
+            raise socket.error(EMSGSIZE, "Message too long")
+        self.patch(_mmsg, "available", True)
+        self.patch(_mmsg, "sendDatagrams", sendDatagrams)
+        port = udp.Port(None, KeepReads())
+        port.socket = SendingUDPSocket([])
+        port.socket.sendErrors.append(socket.error(EMSGSIZE, "Too long"))
+        self.assertRaises(
+            error.MessageLengthError, port.writeDatagrams,
+            [(b"a", ("127.0.0.1", 1))])
+
+
+
+class ReusePortTestCase(unittest.SynchronousTestCase):
+    """
+    Tests for the C{reusePort} argument of C{udp.Port}.
+    """
+    if getattr(socket, "SO_REUSEPORT", None) is None:
+        skip = "SO_REUSEPORT is not supported on this platform."
+
+    def bind(self, port=0, **kwargs):
+        """
+        Create a C{udp.Port} bound to C{port} on the loopback interface.
+        """
+        bound = udp.Port(port, DatagramProtocol(), "127.0.0.1", **kwargs)
+        bound._bindSocket()
+        self.addCleanup(bound.socket.close)
+        return bound
+
+
+    def test_reusePort(self):
+        """
+        Ports created with C{reusePort=True} set C{SO_REUSEPORT}, so that
+        another one can bind the same port.
+        """
+        first = self.bind(reusePort=True)
+        second = self.bind(first.getHost().port, reusePort=True)
+        self.assertEqual(first.getHost(), second.getHost())
+        self.assertTrue(second.socket.getsockopt(
+            socket.SOL_SOCKET, socket.SO_REUSEPORT))
+
+
+    def test_noReusePort(self):
+        """
+        By default, C{SO_REUSEPORT} is not set and a second port cannot bind
+        the same port.
+        """
+        first = self.bind()
+        self.assertFalse(first.socket.getsockopt(
+            socket.SOL_SOCKET, socket.SO_REUSEPORT))
+        self.assertRaises(
+            error.CannotListenError, self.bind, first.getHost().port)
@@ -16,6 +16,7 @@ else:
     import queue as Queue
 
 from twisted.python import failure
+from twisted.python.threadpool import ThreadPoolFull
 from twisted.internet import defer
 
 
@@ -40,10 +41,66 @@ def deferToThreadPool(reactor, threadpool, f, *args, **kwargs):
 
     @return: A Deferred which fires a callback with the result of f, or an
         errback with a L{twisted.python.failure.Failure} if f throws an
-        exception.
+        exception.  If the threadpool has a C{maxQueued} limit which has been
+        reached, the Deferred fails immediately with
+        L{twisted.python.threadpool.ThreadPoolFull}; see
+        L{deferToThreadPoolWhenReady} for an alternative.
     """
     d = defer.Deferred()
+    try:
+        _callInThreadPool(reactor, threadpool, d, f, args, kwargs)
+    except ThreadPoolFull:
+        d.errback()
+    return d
+
+
+
+def deferToThreadPoolWhenReady(reactor, threadpool, f, *args, **kwargs):
+    """
+    Like L{deferToThreadPool}, but if the threadpool's queue is full, wait
+    until there is room in it instead of failing.
+
+    The caller can tell how far behind the threadpool is by how long the
+    returned Deferred takes to fire, and stop producing work until it does.
+
+    @param reactor: The reactor in whose main thread the Deferred will be
+        invoked.
+
+    @param threadpool: A L{twisted.python.threadpool.ThreadPool}.
+
+    @param f: The function to call.
+    @param *args: positional arguments to pass to f.
+    @param **kwargs: keyword arguments to pass to f.
 
+    @return: A Deferred which fires a callback with the result of f, or an
+        errback with a L{twisted.python.failure.Failure} if f throws an
+        exception.  If the threadpool is stopped while waiting for room, it
+        fails with L{defer.CancelledError}.
+    """
+    d = defer.Deferred()
+
+    def attempt():
+        if threadpool.joined:
+            d.errback(defer.CancelledError())
+            return
+        try:
+            _callInThreadPool(reactor, threadpool, d, f, args, kwargs)
+        except ThreadPoolFull:
+            threadpool.callWhenNotFull(
+                lambda: reactor.callFromThread(attempt))
+
+    attempt()
+    return d
+
+
+
+def _callInThreadPool(reactor, threadpool, d, f, args, kwargs):
+    """
+    Call C{f} in C{threadpool}, firing C{d} in the reactor thread with the
+    result.
+
+    @raise ThreadPoolFull: If C{threadpool} refuses the call.
+    """
     def onResult(success, result):
         if success:
             reactor.callFromThread(d.callback, result)
@@ -52,8 +109,6 @@ def deferToThreadPool(reactor, threadpool, f, *args, **kwargs):
 
     threadpool.callInThreadWithCallback(onResult, f, *args, **kwargs)
 
-    return d
-
 
 def deferToThread(f, *args, **kwargs):
     """
@@ -123,5 +178,5 @@ def blockingCallFromThread(reactor, f, *a, **kw):
     return result
 
 
-__all__ = ["deferToThread", "deferToThreadPool", "callMultipleInThread",
-           "blockingCallFromThread"]
+__all__ = ["deferToThread", "deferToThreadPool", "deferToThreadPoolWhenReady",
+           "callMultipleInThread", "blockingCallFromThread"]
@@ -51,7 +51,7 @@ else:
 
 # Twisted Imports
 from twisted.internet import base, defer, address
-from twisted.python import log, failure
+from twisted.python import log, failure, _mmsg
 from twisted.internet import abstract, error, interfaces
 
 
@@ -76,6 +76,16 @@ class Port(base.BasePort):
         was created and initialized outside of the reactor and will be used to
         listen for connections (instead of a new socket being created by this
         L{Port}).
+
+    @ivar _batchSize: C{None}, or the largest number of datagrams to read at
+        once and deliver to the protocol together (see L{setBatchSize}).
+
+    @ivar _receiver: The L{_mmsg.DatagramReceiver} used to read batches of
+        datagrams, or C{None} to read them one at a time.
+
+    @ivar _pendingReadError: A L{socket.error} raised while reading a batch
+        of datagrams one at a time after some had already been read, to be
+        handled by the next read.
     """
 
     addressFamily = socket.AF_INET
@@ -84,8 +94,12 @@ class Port(base.BasePort):
 
     _realPortNumber = None
     _preexistingSocket = None
+    _batchSize = None
+    _receiver = None
+    _pendingReadError = None
 
-    def __init__(self, port, proto, interface='', maxPacketSize=8192, reactor=None):
+    def __init__(self, port, proto, interface='', maxPacketSize=8192, reactor=None,
+                 reusePort=False):
         """
         @param port: A port number on which to listen.
         @type port: C{int}
@@ -105,12 +119,17 @@ class Port(base.BasePort):
             its socket is ready for reading or writing. Defaults to
             C{None}, ie the default global reactor.
         @type reactor: L{interfaces.IReactorFDSet}
+
+        @param reusePort: If C{True}, set C{SO_REUSEPORT} on the socket (see
+            L{base.BasePort.reusePort}).
+        @type reusePort: C{bool}
         """
         base.BasePort.__init__(self, reactor)
         self.port = port
         self.protocol = proto
         self.maxPacketSize = maxPacketSize
         self.interface = interface
+        self.reusePort = reusePort
         self.setLogStr()
         self._connectedAddr = None
         self._setAddressFamily()
@@ -217,21 +236,69 @@ class Port(base.BasePort):
         self.startReading()
 
 
+    def setBatchSize(self, count):
+        """
+        Read up to C{count} datagrams at a time, and deliver them together to
+        the protocol's C{datagramsReceived} method, if it has one.
+
+        C{datagramsReceived} is called with a C{list} of C{(datagram, addr)}
+        tuples, each as would have been passed to C{datagramReceived}.
+        Protocols without it still have C{datagramReceived} called for each
+        datagram.
+
+        Where the platform supports it (Linux), a batch is read with a single
+        C{recvmmsg} system call.
+
+        @param count: The largest number of datagrams in a batch, or C{None}
+            to read and deliver datagrams one at a time.
+        @type count: C{int} or C{NoneType}
+        """
+        self._batchSize = count
+        if count is not None and _mmsg.available:
+            self._receiver = _mmsg.DatagramReceiver(count, self.maxPacketSize)
+        else:
+            self._receiver = None
+
+
+    def getBatchSize(self):
+        """
+        @return: The largest number of datagrams read and delivered together,
+            or C{None} if they are read one at a time.
+        @see: L{setBatchSize}
+        """
+        return self._batchSize
+
+
+    def _readFailed(self, no):
+        """
+        Handle an error from reading the socket.
+
+        @param no: The C{errno} of the error.
+
+        @return: C{True} if the error was handled, C{False} if it should be
+            raised.
+        """
+        if no in _sockErrReadIgnore:
+            return True
+        if no in _sockErrReadRefuse:
+            if self._connectedAddr:
+                self.protocol.connectionRefused()
+            return True
+        return False
+
+
     def doRead(self):
         """
         Called when my socket is ready for reading.
         """
+        if self._batchSize is not None:
+            return self._doBatchedRead()
         read = 0
         while read < self.maxThroughput:
             try:
                 data, addr = self.socket.recvfrom(self.maxPacketSize)
             except socket.error as se:
-                no = se.args[0]
-                if no in _sockErrReadIgnore:
-                    return
-                if no in _sockErrReadRefuse:
-                    if self._connectedAddr:
-                        self.protocol.connectionRefused()
+                if self._readFailed(se.args[0]):
                     return
                 raise
             else:
@@ -250,6 +317,70 @@ class Port(base.BasePort):
                     log.err()
 
 
+    def _doBatchedRead(self):
+        """
+        Read batches of datagrams and deliver them to the protocol, until the
+        socket has no more or C{maxThroughput} bytes have been read.
+        """
+        read = 0
+        while read < self.maxThroughput:
+            try:
+                datagrams = self._readDatagrams()
+            except socket.error as se:
+                if self._readFailed(se.args[0]):
+                    return
+                raise
+            for data, addr in datagrams:
+                read += len(data)
+
+            datagramsReceived = getattr(
+                self.protocol, 'datagramsReceived', None)
+            if datagramsReceived is not None:
+                try:
+                    datagramsReceived(datagrams)
+                except:
+                    log.err()
+            else:
+                for data, addr in datagrams:
+                    try:
+                        self.protocol.datagramReceived(data, addr)
+                    except:
+                        log.err()
+            if (len(datagrams) < self._batchSize and
+                    self._pendingReadError is None):
+                return
+
+
+    def _readDatagrams(self):
+        """
+        Read up to C{_batchSize} datagrams.
+
+        @return: A non-empty C{list} of C{(datagram, addr)} tuples.
+
+        @raise socket.error: If no datagram could be read.
+        """
+        if self._pendingReadError is not None:
+            pending, self._pendingReadError = self._pendingReadError, None
+            raise pending
+        if self._receiver is not None:
+            return self._receiver.receive(self.socket.fileno())
+
+        datagrams = []
+        while len(datagrams) < self._batchSize:
+            try:
+                data, addr = self.socket.recvfrom(self.maxPacketSize)
+            except socket.error as se:
+                if not datagrams:
+                    raise
+                if se.args[0] not in _sockErrReadIgnore:
+                    self._pendingReadError = se
+                break
+            if self.addressFamily == socket.AF_INET6:
+                addr = addr[:2]
+            datagrams.append((data, addr))
+        return datagrams
+
+
     def write(self, datagram, addr=None):
         """
         Write a datagram.
@@ -277,22 +408,7 @@ class Port(base.BasePort):
                 else:
                     raise
         else:
-            assert addr != None
-            if (not abstract.isIPAddress(addr[0])
-                    and not abstract.isIPv6Address(addr[0])
-                    and addr[0] != "<broadcast>"):
-                raise error.InvalidAddressError(
-                    addr[0],
-                    "write() only accepts IP addresses, not hostnames")
-            if ((abstract.isIPAddress(addr[0]) or addr[0] == "<broadcast>")
-                    and self.addressFamily == socket.AF_INET6):
-                raise error.InvalidAddressError(
-                    addr[0],
-                    "IPv6 port write() called with IPv4 or broadcast address")
-            if (abstract.isIPv6Address(addr[0])
-                    and self.addressFamily == socket.AF_INET):
-                raise error.InvalidAddressError(
-                    addr[0], "IPv4 port write() called with IPv6 address")
+            self._checkAddress(addr)
             try:
                 return self.socket.sendto(datagram, addr)
             except socket.error as se:
@@ -309,9 +425,79 @@ class Port(base.BasePort):
                 else:
                     raise
 
+    def _checkAddress(self, addr):
+        """
+        Check that datagrams can be written to C{addr} from this port.
+
+        @raise error.InvalidAddressError: If C{addr} is not an IP address of
+            the same family as this port.
+        """
+        assert addr != None
+        if (not abstract.isIPAddress(addr[0])
+                and not abstract.isIPv6Address(addr[0])
+                and addr[0] != "<broadcast>"):
+            raise error.InvalidAddressError(
+                addr[0],
+                "write() only accepts IP addresses, not hostnames")
+        if ((abstract.isIPAddress(addr[0]) or addr[0] == "<broadcast>")
+                and self.addressFamily == socket.AF_INET6):
+            raise error.InvalidAddressError(
+                addr[0],
+                "IPv6 port write() called with IPv4 or broadcast address")
+        if (abstract.isIPv6Address(addr[0])
+                and self.addressFamily == socket.AF_INET):
+            raise error.InvalidAddressError(
+                addr[0], "IPv4 port write() called with IPv6 address")
+
+
     def writeSequence(self, seq, addr):
         self.write("".join(seq), addr)
 
+
+    def writeDatagrams(self, datagrams):
+        """
+        Write several datagrams.
+
+        Where the platform supports it (Linux), they are written with as few
+        C{sendmmsg} system calls as possible.  Otherwise this is the same as
+        calling L{write} for each one.
+
+        @param datagrams: A C{list} of C{(datagram, addr)} tuples, with
+            C{datagram} and C{addr} as for L{write}.
+
+        @raise error.InvalidAddressError: If any of the addresses is invalid,
+            in which case nothing is written.
+        @raise error.MessageLengthError: If a datagram is too long, in which
+            case the datagrams after it are not written.
+        """
+        if not _mmsg.available:
+            for datagram, addr in datagrams:
+                self.write(datagram, addr)
+            return
+
+        if self._connectedAddr:
+            for datagram, addr in datagrams:
+                assert addr in (None, self._connectedAddr)
+            datagrams = [(datagram, None) for datagram, addr in datagrams]
+        else:
+            for addr in set([addr for datagram, addr in datagrams]):
+                self._checkAddress(addr)
+
+        fileno = self.socket.fileno()
+        sent = 0
+        while sent < len(datagrams):
+            try:
+                sent += _mmsg.sendDatagrams(
+                    fileno, self.addressFamily, datagrams[sent:])
+            except socket.error as se:
+                if se.args[0] == EINTR:
+                    continue
+                # Let write report the problem with this datagram the usual
+                # way, then carry on after it.
+                datagram, addr = datagrams[sent]
+                self.write(datagram, addr)
+                sent += 1
+
     def connect(self, host, port):
         """
         'Connect' to remote server.
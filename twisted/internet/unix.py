@@ -65,6 +65,9 @@ class _SendmsgMixin(object):
     _writeSomeDataBase = None
     _fileDescriptorBufferSize = 64
 
+    # File descriptors are sent by writeSomeData, so always use it.
+    _writeSomeVectors = None
+
     def __init__(self):
         self._sendmsgQueue = []
 
@@ -128,6 +131,7 @@ class _SendmsgMixin(object):
                         _ancillaryDescriptor(fd))
                 except socket.error, se:
                     if se.args[0] in (EWOULDBLOCK, ENOBUFS):
+                        self._writeExhausted = True
                         return index
                     else:
                         return main.CONNECTION_LOST
@@ -888,6 +888,11 @@ class FileSender:
     This is a helper for protocols that, at some point, will take a
     file-like object, read its contents, and write them out to the network,
     optionally performing some transformation on the bytes in between.
+
+    If there is no transformation, the consumer provides
+    L{interfaces.ISendFileTransport} and the file has a file descriptor, the
+    consumer is asked to send the file itself, which it may do without
+    copying its contents into the process.
     """
 
     CHUNK_SIZE = 2 ** 14
@@ -919,10 +924,61 @@ class FileSender:
         self.transform = transform
 
         self.deferred = deferred = defer.Deferred()
-        self.consumer.registerProducer(self, False)
+        if self._canSendFile():
+            start = file.tell()
+            sending = consumer.sendFile(file, start, None)
+            sending.addCallbacks(self._fileSent, self._fileNotSent,
+                                 callbackArgs=(start,))
+        else:
+            self.consumer.registerProducer(self, False)
         return deferred
 
 
+    def _canSendFile(self):
+        """
+        Determine whether the file can be handed to the consumer's
+        C{sendFile} method instead of being read by this producer.
+
+        @rtype: C{bool}
+        """
+        if self.transform is not None:
+            return False
+        if not interfaces.ISendFileTransport.providedBy(self.consumer):
+            return False
+        try:
+            self.file.fileno()
+        except (AttributeError, ValueError, IOError, OSError):
+            return False
+        return True
+
+
+    def _fileSent(self, sent, start):
+        """
+        The consumer has sent the file: leave the file positioned at the end
+        of what was sent, as if this producer had read it, and fire
+        C{deferred} with the last byte sent.
+        """
+        if sent:
+            self.file.seek(start + sent - 1)
+            self.lastSent = self.file.read(1)
+        else:
+            self.file.seek(start)
+        self.file = None
+        if self.deferred:
+            self.deferred.callback(self.lastSent)
+            self.deferred = None
+
+
+    def _fileNotSent(self, reason):
+        """
+        The consumer failed to send the file: fail C{deferred}.
+        """
+        self.file = None
+        if self.deferred:
+            self.deferred.errback(reason)
+            self.deferred = None
+
+
     def resumeProducing(self):
         chunk = ''
         if self.file:
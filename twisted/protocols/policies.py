@@ -12,13 +12,15 @@ from __future__ import division, absolute_import
 
 # system imports
 import sys
+from heapq import heappop, heappush
 
 from zope.interface import directlyProvides, providedBy
 
 # twisted imports
 from twisted.internet.protocol import ServerFactory, Protocol, ClientFactory
 from twisted.internet import error
-from twisted.internet.interfaces import ILoggingContext
+from twisted.internet.interfaces import ILoggingContext, ISendFileTransport
+from twisted.internet.task import CoalescingClock
 from twisted.python import log
 
 
@@ -36,6 +38,25 @@ def _wrappedLogPrefix(wrapper, wrapped):
 
 
 
+def _wrapperInterfaces(transport):
+    """
+    Compute the interfaces a wrapper around a transport provides: those of
+    the transport, except L{ISendFileTransport}.  A file sent with the
+    transport's C{sendFile} would bypass whatever the wrapper does to the
+    data written through it, such as encrypting it.
+
+    @return: A C{list} of interfaces.
+    """
+    interfaces = []
+    for interface in providedBy(transport):
+        if interface.isOrExtends(ISendFileTransport):
+            interfaces.extend(interface.__bases__)
+        else:
+            interfaces.append(interface)
+    return interfaces
+
+
+
 class ProtocolWrapper(Protocol):
     """
     Wraps protocol instances and acts as their transport as well.
@@ -69,7 +90,7 @@ class ProtocolWrapper(Protocol):
         save the real transport, and connect the wrapped protocol to this
         L{ProtocolWrapper} to intercept any transport calls it makes.
         """
-        directlyProvides(self, providedBy(transport))
+        directlyProvides(self, _wrapperInterfaces(transport))
         Protocol.makeConnection(self, transport)
         self.factory.registerProtocol(self)
         self.wrappedProtocol.makeConnection(self)
@@ -110,6 +131,19 @@ class ProtocolWrapper(Protocol):
         self.transport.stopConsuming()
 
 
+    def sendFile(self, fileObject, offset, count):
+        """
+        Refuse to send a file: the wrapped transport's C{sendFile} would send
+        it past this wrapper.  A wrapper does not provide
+        L{ISendFileTransport}, so its users read the file and write it
+        instead.
+
+        @raise NotImplementedError: Always.
+        """
+        raise NotImplementedError(
+            "%s cannot send files directly" % (self.__class__.__name__,))
+
+
     def __getattr__(self, name):
         return getattr(self.transport, name)
 
@@ -456,6 +490,252 @@ class LimitTotalConnectionsFactory(ServerFactory):
 
 
 
+class AdmissionControlFactory(WrappingFactory):
+    """
+    Turn new connections away while the server is overloaded.
+
+    The server is considered overloaded when the reactor is running timed
+    calls more than C{maxLag} seconds late, when C{maxConnections}
+    connections are open, or when more than C{maxBuffered} bytes are waiting
+    to be sent on them, whichever limits are given.  The lag is measured by a
+    timed call repeated every C{probeInterval} seconds, which is also when the
+    lag and buffered bytes are checked.
+
+    While overloaded, the ports added with L{addPort} stop accepting
+    connections, so they wait in the listen queue, and connections accepted
+    anyway are given a C{rejectProtocol} or closed immediately.  To avoid
+    flapping, new connections are admitted again only once every measure is
+    at or below C{resumeRatio} times its limit.
+
+    @ivar lag: The number of seconds by which the last lag probe was late.
+    @type lag: C{float}
+
+    @ivar overloaded: C{True} while new connections are being turned away.
+    @type overloaded: C{bool}
+
+    @ivar rejected: The number of connections turned away after being
+        accepted.
+    @type rejected: C{int}
+
+    @ivar ports: The L{IListeningPort}s added with L{addPort}.
+    @type ports: C{list}
+    """
+
+    lag = 0
+    overloaded = False
+    rejected = 0
+
+    def __init__(self, wrappedFactory, maxLag=None, maxConnections=None,
+                 maxBuffered=None, resumeRatio=0.5, rejectProtocol=None,
+                 probeInterval=0.1, clock=None):
+        """
+        @param wrappedFactory: The factory building the protocols for the
+            connections which are admitted.
+
+        @param maxLag: The lag, in seconds, at which the server is overloaded,
+            or C{None}.
+        @type maxLag: C{float}
+
+        @param maxConnections: The number of open connections at which the
+            server is overloaded, or C{None}.
+        @type maxConnections: C{int}
+
+        @param maxBuffered: The number of bytes waiting to be sent on all
+            connections above which the server is overloaded, or C{None}.
+        @type maxBuffered: C{int}
+
+        @param resumeRatio: The fraction of each limit every measure must be
+            back at or below before new connections are admitted again.
+        @type resumeRatio: C{float}
+
+        @param rejectProtocol: C{None}, or a callable with no arguments
+            returning the protocol to give connections accepted while
+            overloaded, for example one which sends a protocol-specific "try
+            again later" response and closes the connection.  If C{None},
+            those connections are closed immediately.
+
+        @param probeInterval: The number of seconds between lag probes.
+        @type probeInterval: C{float}
+
+        @param clock: The L{IReactorTime} provider to measure the lag of, or
+            C{None} to use the global reactor.
+
+        @raise ValueError: If C{resumeRatio} is not between 0 and 1.
+        """
+        WrappingFactory.__init__(self, wrappedFactory)
+        if not 0 <= resumeRatio <= 1:
+            raise ValueError(
+                "resumeRatio must be between 0 and 1, not %r" % (resumeRatio,))
+        if clock is None:
+            from twisted.internet import reactor as clock
+        self.maxLag = maxLag
+        self.maxConnections = maxConnections
+        self.maxBuffered = maxBuffered
+        self.resumeRatio = resumeRatio
+        self.rejectProtocol = rejectProtocol
+        self.probeInterval = probeInterval
+        self.clock = clock
+        self.ports = []
+        self._probeCall = None
+        self._probeTime = None
+
+
+    def addPort(self, port):
+        """
+        Stop C{port} from accepting connections while the server is
+        overloaded.
+
+        @param port: An L{IListeningPort} provider with C{startReading} and
+            C{stopReading} methods, such as the result of
+            L{IReactorTCP.listenTCP}, which was given this factory.
+        """
+        self.ports.append(port)
+        if self.overloaded:
+            port.stopReading()
+
+
+    def startFactory(self):
+        """
+        Start probing the lag of the reactor.
+        """
+        self._scheduleProbe()
+
+
+    def stopFactory(self):
+        """
+        Stop probing the lag of the reactor.
+        """
+        if self._probeCall is not None:
+            self._probeCall.cancel()
+            self._probeCall = None
+
+
+    def _scheduleProbe(self):
+        """
+        Arrange for L{_probe} to be called in C{probeInterval} seconds.
+        """
+        self._probeTime = self.clock.seconds() + self.probeInterval
+        self._probeCall = self.clock.callLater(self.probeInterval, self._probe)
+
+
+    def _probe(self):
+        """
+        Measure how late this call is, and check whether the server is
+        overloaded.
+        """
+        self.lag = max(0, self.clock.seconds() - self._probeTime)
+        self._scheduleProbe()
+        self._check()
+
+
+    def bufferedBytes(self):
+        """
+        @return: The number of bytes waiting to be sent on the connections
+            admitted by this factory, as far as their transports tell.
+        @rtype: C{int}
+        """
+        total = 0
+        for p in self.protocols:
+            bufferedLength = getattr(p.transport, '_bufferedLength', None)
+            if bufferedLength is not None:
+                total += bufferedLength()
+        return total
+
+
+    def _measures(self):
+        """
+        @return: A C{list} of two-tuples of the value and the limit of each
+            measure with a limit.
+        """
+        measures = []
+        if self.maxLag is not None:
+            measures.append((self.lag, self.maxLag))
+        if self.maxConnections is not None:
+            # One more connection is about to be accepted.
+            measures.append((len(self.protocols) + 1, self.maxConnections))
+        if self.maxBuffered is not None:
+            measures.append((self.bufferedBytes(), self.maxBuffered))
+        return measures
+
+
+    def _check(self):
+        """
+        Start or stop turning connections away, according to the measures.
+        """
+        if self.overloaded:
+            ratio = self.resumeRatio
+            if all(value <= limit * ratio
+                   for (value, limit) in self._measures()):
+                self._admit()
+        elif any(value > limit for (value, limit) in self._measures()):
+            self._shed()
+
+
+    def _shed(self):
+        """
+        Start turning new connections away.
+        """
+        self.overloaded = True
+        log.msg("%s overloaded (lag %.3fs, %d connections), "
+                "turning connections away" % (
+                    self.logPrefix(), self.lag, len(self.protocols)))
+        for port in self.ports:
+            port.stopReading()
+
+
+    def _admit(self):
+        """
+        Start admitting new connections again.
+        """
+        self.overloaded = False
+        log.msg("%s no longer overloaded, admitting connections" % (
+                self.logPrefix(),))
+        for port in self.ports:
+            if port.connected:
+                port.startReading()
+
+
+    def buildProtocol(self, addr):
+        """
+        Build a protocol wrapping one from the wrapped factory, unless the
+        server is overloaded, in which case build a C{rejectProtocol} or
+        return C{None}.
+        """
+        if (not self.overloaded and self.maxConnections is not None and
+                len(self.protocols) >= self.maxConnections):
+            self._shed()
+        if self.overloaded:
+            self.rejected += 1
+            if self.rejectProtocol is None:
+                return None
+            p = self.rejectProtocol()
+            p.factory = self
+            return p
+        return WrappingFactory.buildProtocol(self, addr)
+
+
+    def registerProtocol(self, p):
+        """
+        Keep track of a new connection, and stop accepting more if that
+        makes C{maxConnections}.
+        """
+        WrappingFactory.registerProtocol(self, p)
+        if (not self.overloaded and self.maxConnections is not None and
+                len(self.protocols) >= self.maxConnections):
+            self._shed()
+
+
+    def unregisterProtocol(self, p):
+        """
+        Forget about a connection which was lost, and admit new connections
+        again if that brings the server back below its limits.
+        """
+        WrappingFactory.unregisterProtocol(self, p)
+        if self.overloaded:
+            self._check()
+
+
+
 class TimeoutProtocol(ProtocolWrapper):
     """
     Protocol that automatically disconnects when the connection is idle.
@@ -546,12 +826,19 @@ class TimeoutProtocol(ProtocolWrapper):
 class TimeoutFactory(WrappingFactory):
     """
     Factory for TimeoutWrapper.
+
+    @ivar timeoutClock: C{None}, or the L{IReactorTime} provider to schedule
+        the timeouts of the connections with instead of the reactor, such as
+        an L{IdleTimeoutManager}.
     """
     protocol = TimeoutProtocol
+    timeoutClock = None
 
 
-    def __init__(self, wrappedFactory, timeoutPeriod=30*60):
+    def __init__(self, wrappedFactory, timeoutPeriod=30*60,
+                 timeoutClock=None):
         self.timeoutPeriod = timeoutPeriod
+        self.timeoutClock = timeoutClock
         WrappingFactory.__init__(self, wrappedFactory)
 
 
@@ -564,6 +851,8 @@ class TimeoutFactory(WrappingFactory):
         """
         Wrapper around L{reactor.callLater} for test purpose.
         """
+        if self.timeoutClock is not None:
+            return self.timeoutClock.callLater(period, func)
         from twisted.internet import reactor
         return reactor.callLater(period, func)
 
@@ -674,8 +963,15 @@ class TimeoutMixin:
     default, closes the connection.
 
     @cvar timeOut: The number of seconds after which to timeout the connection.
+
+    @cvar timeoutClock: C{None}, or the L{IReactorTime} provider to schedule
+        the timeout with instead of the reactor.  Set it to an
+        L{IdleTimeoutManager} or a
+        L{CoalescingClock<twisted.internet.task.CoalescingClock>} shared by
+        many connections to group their timeouts into fewer timed calls.
     """
     timeOut = None
+    timeoutClock = None
 
     __timeoutCall = None
 
@@ -683,6 +979,8 @@ class TimeoutMixin:
         """
         Wrapper around L{reactor.callLater} for test purpose.
         """
+        if self.timeoutClock is not None:
+            return self.timeoutClock.callLater(period, func)
         from twisted.internet import reactor
         return reactor.callLater(period, func)
 
@@ -735,3 +1033,121 @@ class TimeoutMixin:
         Override to define behavior other than dropping the connection.
         """
         self.transport.loseConnection()
+
+
+
+class IdleTimeoutManager(CoalescingClock):
+    """
+    A L{CoalescingClock} for the idle timeouts of many connections, which
+    are postponed far more often than they fall due.
+
+    As with any L{CoalescingClock}, timeouts are batched by the tick of
+    C{granularity} seconds they fall due in, and postponing one, as
+    L{TimeoutMixin} and L{TimeoutProtocol} do whenever data arrives, only
+    records its new time until its batch comes around.  Rather than one
+    timed call per batch, though, the underlying clock is only asked for a
+    single timed call at a time, for the end of the earliest tick with
+    timeouts due, which then sweeps every batch that has fallen due.  None
+    is made while there are no timeouts.
+
+    A timeout runs up to C{granularity} seconds later than it was asked to,
+    never earlier.
+
+    Share one by passing it as the C{timeoutClock} of a L{TimeoutFactory},
+    or an L{HTTPFactory<twisted.web.http.HTTPFactory>}, or by setting it as
+    the C{timeoutClock} of the L{TimeoutMixin} protocols a factory builds.
+
+    @ivar _keys: A heap of the numbers of the ticks with batches of timeouts.
+        Numbers whose batch has since been left empty are only removed once
+        they reach the top.
+
+    @ivar _tickCall: The L{IDelayedCall} for the next sweep, or C{None}
+        while there are no timeouts or a sweep is in progress.
+
+    @ivar _sweeping: C{True} while a sweep is in progress.
+    """
+    _sweeping = False
+
+    def __init__(self, clock=None, granularity=1.0):
+        """
+        @param clock: The L{IReactorTime} provider to sweep with.  The default
+            is the global reactor.
+
+        @param granularity: The length of a tick, in seconds.
+        @type granularity: C{float}
+
+        @raise ValueError: If C{granularity} is not positive.
+        """
+        if granularity <= 0:
+            raise ValueError("granularity must be positive")
+        CoalescingClock.__init__(self, clock, granularity)
+        self._keys = []
+        self._tickCall = None
+
+
+    @property
+    def granularity(self):
+        """
+        The length of a tick, in seconds; the C{slack} of this clock.
+        """
+        return self.slack
+
+
+    def _scheduleBatch(self, batch):
+        """
+        Add the new C{batch} to those to sweep, sweeping sooner if it is due
+        before the next sweep.
+        """
+        heappush(self._keys, batch.key)
+        if self._sweeping:
+            return
+        when = batch.key * self.slack
+        if self._tickCall is None:
+            self._scheduleTick()
+        elif when < self._tickCall.getTime():
+            self._tickCall.reset(max(0, when - self.seconds()))
+
+
+    def _cancelBatch(self, batch):
+        """
+        Stop sweeping once the last batch has been left empty.
+        """
+        if not self._batches:
+            del self._keys[:]
+            if self._tickCall is not None:
+                self._tickCall.cancel()
+                self._tickCall = None
+
+
+    def _scheduleTick(self):
+        """
+        Arrange for L{_tick} to be called at the end of the earliest tick
+        with timeouts due, if there is one.
+        """
+        keys = self._keys
+        while keys and keys[0] not in self._batches:
+            heappop(keys)
+        if keys:
+            self._tickCall = self.clock.callLater(
+                max(0, keys[0] * self.slack - self.seconds()), self._tick)
+
+
+    def _tick(self):
+        """
+        Run the batches of every tick which has ended since the last sweep,
+        in order, and schedule the next sweep.
+        """
+        self._tickCall = None
+        self._sweeping = True
+        now = self.seconds()
+        keys = self._keys
+        try:
+            while keys and keys[0] * self.slack <= now:
+                batch = self._batches.get(heappop(keys))
+                # A timeout run earlier in this sweep may have cancelled all
+                # those in this batch, taking it away.
+                if batch is not None:
+                    self._runBatch(batch)
+        finally:
+            self._sweeping = False
+        self._scheduleTick()
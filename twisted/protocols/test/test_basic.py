@@ -11,13 +11,16 @@ import sys
 import struct
 from io import BytesIO
 
+from zope.interface import implementer
 from zope.interface.verify import verifyObject
 
 from twisted.python.compat import _PY3, iterbytes
+from twisted.python.filepath import FilePath
 from twisted.trial import unittest
-from twisted.protocols import basic
+from twisted.protocols import basic, policies
 from twisted.internet import protocol, error, task
-from twisted.internet.interfaces import IProducer
+from twisted.internet.defer import Deferred
+from twisted.internet.interfaces import IProducer, ISendFileTransport
 from twisted.test import proto_helpers
 
 _PY3NEWSTYLESKIP = "All classes are new style on Python 3."
@@ -1205,6 +1208,26 @@ class ProducerTests(unittest.SynchronousTestCase):
 
 
 
+@implementer(ISendFileTransport)
+class SendFileTransport(proto_helpers.StringTransport):
+    """
+    A L{proto_helpers.StringTransport} which also provides
+    L{ISendFileTransport}.
+
+    @ivar sendFileCalls: A C{list} of C{(fileObject, offset, count,
+        deferred)} tuples, one for each call to C{sendFile}.
+    """
+    def __init__(self):
+        proto_helpers.StringTransport.__init__(self)
+        self.sendFileCalls = []
+
+
+    def sendFile(self, fileObject, offset, count):
+        d = Deferred()
+        self.sendFileCalls.append((fileObject, offset, count, d))
+        return d
+
+
 class FileSenderTests(unittest.TestCase):
     """
     Tests for L{basic.FileSender}.
@@ -1312,3 +1335,97 @@ class FileSenderTests(unittest.TestCase):
         failure.trap(Exception)
         self.assertEqual("Consumer asked us to stop producing",
                          str(failure.value))
+
+
+    def test_sendFile(self):
+        """
+        If the consumer provides L{ISendFileTransport} and the file has a file
+        descriptor, L{basic.FileSender.beginFileTransfer} asks the consumer to
+        send the rest of the file instead of registering itself as a
+        producer.  Once it has, the file is left at the end of what was sent
+        and the L{Deferred} fires with the last byte sent.
+        """
+        path = FilePath(self.mktemp())
+        path.setContent(b"Test content")
+        source = path.open()
+        self.addCleanup(source.close)
+        source.seek(5)
+        consumer = SendFileTransport()
+        sender = basic.FileSender()
+        d = sender.beginFileTransfer(source, consumer)
+        self.assertEqual(consumer.producer, None)
+        [(fileObject, offset, count, sending)] = consumer.sendFileCalls
+        self.assertEqual((fileObject, offset, count), (source, 5, None))
+        self.assertNoResult(d)
+
+        sending.callback(7)
+        self.assertEqual(b"t", self.successResultOf(d))
+        self.assertEqual(source.tell(), 12)
+
+
+    def test_sendFileWithTransform(self):
+        """
+        L{basic.FileSender.beginFileTransfer} does not use C{sendFile} if it
+        has been given a C{transform}.
+        """
+        consumer = SendFileTransport()
+        sender = basic.FileSender()
+        path = FilePath(self.mktemp())
+        path.setContent(b"Test content")
+        source = path.open()
+        self.addCleanup(source.close)
+        sender.beginFileTransfer(source, consumer, lambda data: data)
+        self.assertEqual(consumer.sendFileCalls, [])
+        self.assertEqual(consumer.producer, sender)
+
+
+    def test_sendFileWithoutFileno(self):
+        """
+        L{basic.FileSender.beginFileTransfer} does not use C{sendFile} for a
+        file object without a file descriptor.
+        """
+        consumer = SendFileTransport()
+        sender = basic.FileSender()
+        sender.beginFileTransfer(BytesIO(b"Test content"), consumer)
+        self.assertEqual(consumer.sendFileCalls, [])
+        self.assertEqual(consumer.producer, sender)
+
+
+    def test_sendFileThroughWrapper(self):
+        """
+        L{basic.FileSender.beginFileTransfer} reads the file and writes it to
+        a L{policies.ProtocolWrapper} around a transport providing
+        L{ISendFileTransport}, so that the data goes through the wrapper.
+        """
+        transport = SendFileTransport()
+        wrapper = policies.ProtocolWrapper(
+            policies.WrappingFactory(None), protocol.Protocol())
+        wrapper.makeConnection(transport)
+        sender = basic.FileSender()
+        path = FilePath(self.mktemp())
+        path.setContent(b"Test content")
+        source = path.open()
+        self.addCleanup(source.close)
+        d = sender.beginFileTransfer(source, wrapper)
+        self.assertEqual(transport.sendFileCalls, [])
+        self.assertIs(transport.producer, sender)
+        while transport.producer is not None:
+            sender.resumeProducing()
+        self.assertEqual(b"Test content", transport.value())
+        self.assertEqual(b"t", self.successResultOf(d))
+
+
+    def test_sendFileFailed(self):
+        """
+        If the consumer fails to send the file, the L{Deferred} returned by
+        L{basic.FileSender.beginFileTransfer} fails the same way.
+        """
+        consumer = SendFileTransport()
+        sender = basic.FileSender()
+        path = FilePath(self.mktemp())
+        path.setContent(b"Test content")
+        source = path.open()
+        self.addCleanup(source.close)
+        d = sender.beginFileTransfer(source, consumer)
+        consumer.sendFileCalls[0][3].errback(error.ConnectionLost())
+        self.failureResultOf(d, error.ConnectionLost)
@@ -7,6 +7,8 @@ Tests for L{twisted.protocols.tls}.
 
 from __future__ import division, absolute_import
 
+import struct
+
 from zope.interface.verify import verifyObject
 from zope.interface import Interface, directlyProvides
 
@@ -31,11 +33,11 @@ from twisted.python.filepath import FilePath
 from twisted.python.failure import Failure
 from twisted.python import log
 from twisted.internet.interfaces import ISystemHandle, ISSLTransport
-from twisted.internet.interfaces import IPushProducer
+from twisted.internet.interfaces import IPushProducer, ISendFileTransport
 from twisted.internet.error import ConnectionDone, ConnectionLost
 from twisted.internet.defer import Deferred, gatherResults
 from twisted.internet.protocol import Protocol, ClientFactory, ServerFactory
-from twisted.internet.task import TaskStopped
+from twisted.internet.task import Clock, TaskStopped
 from twisted.protocols.loopback import loopbackAsync, collapsingPumpPolicy
 from twisted.trial.unittest import TestCase
 from twisted.test.test_tcp import ConnectionLostNotifyingProtocol
@@ -237,6 +239,24 @@ class TLSMemoryBIOTests(TestCase):
         self.assertTrue(ITransport.providedBy(tlsProtocol))
 
 
+    def test_sendFileNotProvided(self):
+        """
+        L{TLSMemoryBIOProtocol} does not provide L{ISendFileTransport}, even if
+        the transport it wraps does, since a file sent with it would not be
+        encrypted.
+        """
+        transport = StringTransport()
+        directlyProvides(transport, ISendFileTransport)
+        wrapperFactory = TLSMemoryBIOFactory(
+            ClientTLSContext(), True, ClientFactory())
+        tlsProtocol = TLSMemoryBIOProtocol(wrapperFactory, Protocol())
+        tlsProtocol.makeConnection(transport)
+        self.assertFalse(ISendFileTransport.providedBy(tlsProtocol))
+        self.assertTrue(ISSLTransport.providedBy(tlsProtocol))
+        self.assertRaises(
+            NotImplementedError, tlsProtocol.sendFile, None, 0, None)
+
+
     def test_getHandle(self):
         """
         L{TLSMemoryBIOProtocol.getHandle} returns the L{OpenSSL.SSL.Connection}
@@ -1087,6 +1107,7 @@ class TLSProducerTests(TestCase):
         class TLSConnection(object):
             def __init__(self):
                 self.l = []
+                self.pending = False
 
             def send(self, bytes):
                 # on first write, don't send all bytes:
@@ -1098,12 +1119,17 @@ class TLSProducerTests(TestCase):
                     raise WantReadError()
                 # otherwise just take in data:
                 self.l.append(bytes)
+                self.pending = True
                 return len(bytes)
 
             def bio_write(self, data):
                 pass
 
             def bio_read(self, size):
+                # the send BIO holds one byte for each send:
+                if not self.pending:
+                    raise WantReadError()
+                self.pending = False
                 return b'X'
 
             def recv(self, size):
@@ -1521,3 +1547,254 @@ class NonStreamingProducerTests(TestCase):
         nsProducer = NonStreamingProducer(consumer)
         streamingProducer = _PullToPush(nsProducer, consumer)
         self.assertTrue(verifyObject(IPushProducer, streamingProducer))
+
+
+
+def tlsRecords(data):
+    """
+    Split raw TLS traffic into records.
+
+    @param data: The C{bytes} sent by one side of a TLS connection, which must
+        end on a record boundary.
+
+    @return: A C{list} of two-tuples of the content type and the length of
+        each record in C{data}.
+    """
+    records = []
+    while data:
+        contentType, version, length = struct.unpack("!BHH", data[:5])
+        records.append((contentType, length))
+        data = data[5 + length:]
+    return records
+
+
+
+class TLSWriteCoalescingTests(TestCase):
+    """
+    Tests for L{TLSMemoryBIOProtocol.setWriteCoalescing} and the way
+    L{TLSMemoryBIOProtocol} turns application writes into TLS records.
+    """
+    def handshake(self):
+        """
+        Create a client and a server L{TLSMemoryBIOProtocol} connected by
+        L{StringTransport}s and complete the TLS handshake between them.
+
+        @return: A two-tuple of the client L{TLSMemoryBIOProtocol} and the
+            server's application protocol.  The client's transport has a
+            L{Clock} as its C{reactor}.
+        """
+        clientProtocol, client = buildTLSProtocol()
+        serverProtocol, server = buildTLSProtocol(server=True)
+        client.transport.reactor = self.clock = Clock()
+        self.client = client
+        self.server = server
+        self.pump()
+        return client, serverProtocol
+
+
+    def pump(self):
+        """
+        Deliver the bytes written by each side to the other until neither has
+        anything more to say.
+
+        @return: The C{bytes} the client sent.
+        """
+        sent = []
+        while self.client.transport.value() or self.server.transport.value():
+            data = self.client.transport.value()
+            if data:
+                self.client.transport.clear()
+                sent.append(data)
+                self.server.dataReceived(data)
+            data = self.server.transport.value()
+            if data:
+                self.server.transport.clear()
+                self.client.dataReceived(data)
+        return b"".join(sent)
+
+
+    def recordsFor(self, data):
+        """
+        Get the records a freshly connected client without write coalescing
+        sends for a single write of C{data}.
+        """
+        client, serverProtocol = self.handshake()
+        client.write(data)
+        return tlsRecords(self.pump())
+
+
+    def test_disabledByDefault(self):
+        """
+        Write coalescing is disabled by default, and bytes are encrypted and
+        written to the underlying transport as soon as they are written.
+        """
+        client, serverProtocol = self.handshake()
+        self.assertFalse(client.getWriteCoalescing())
+        client.write(b"hello")
+        self.assertNotEqual(client.transport.value(), b"")
+        self.assertEqual(self.clock.getDelayedCalls(), [])
+
+
+    def test_coalescedAtEndOfIteration(self):
+        """
+        With write coalescing enabled, several writes are buffered until the
+        end of the reactor iteration and then sent in the same records as a
+        single write of all of their bytes would be.
+        """
+        expected = self.recordsFor(b"HTTP/1.1 200 OK\r\n\r\nhello")
+        client, serverProtocol = self.handshake()
+        client.setWriteCoalescing(True)
+        self.assertTrue(client.getWriteCoalescing())
+        client.write(b"HTTP/1.1 200 OK\r\n")
+        client.write(b"\r\n")
+        client.write(b"hello")
+        self.assertEqual(client.transport.value(), b"")
+        self.clock.advance(0)
+        self.assertEqual(tlsRecords(self.pump()), expected)
+        self.assertEqual(
+            b"".join(serverProtocol.received), b"HTTP/1.1 200 OK\r\n\r\nhello")
+
+
+    def test_writeSequenceCoalesced(self):
+        """
+        With write coalescing enabled, the bytes passed to C{writeSequence}
+        are buffered along with those passed to C{write}.
+        """
+        expected = self.recordsFor(b"abcdef")
+        client, serverProtocol = self.handshake()
+        client.setWriteCoalescing(True)
+        client.write(b"ab")
+        client.writeSequence(iter([b"cd", b"ef"]))
+        self.assertEqual(client.transport.value(), b"")
+        self.clock.advance(0)
+        self.assertEqual(tlsRecords(self.pump()), expected)
+        self.assertEqual(b"".join(serverProtocol.received), b"abcdef")
+
+
+    def test_fullRecordsSentImmediately(self):
+        """
+        With write coalescing enabled, as soon as a full record's worth of
+        bytes is buffered it is encrypted and sent, and only the remainder
+        waits for the end of the reactor iteration.
+        """
+        size = TLSMemoryBIOProtocol._maxRecordSize
+        client, serverProtocol = self.handshake()
+        client.setWriteCoalescing(True)
+        client.write(b"x" * (size - 1))
+        self.assertEqual(client.transport.value(), b"")
+        client.write(b"yyy")
+        self.pump()
+        self.assertEqual(
+            b"".join(serverProtocol.received), b"x" * (size - 1) + b"y")
+        self.clock.advance(0)
+        self.pump()
+        self.assertEqual(
+            b"".join(serverProtocol.received), b"x" * (size - 1) + b"yyy")
+
+
+    def test_largeWriteNotCopied(self):
+        """
+        With write coalescing enabled, the full records in a large write are
+        encrypted straight out of the written bytes, without joining or
+        slicing them, and only the remainder is buffered.
+        """
+        size = TLSMemoryBIOProtocol._maxRecordSize
+        data = b"x" * (3 * size + 5)
+        client, serverProtocol = self.handshake()
+        client.setWriteCoalescing(True)
+        written = []
+        write = client._write
+        def recordingWrite(bytes, start=0, end=None):
+            written.append((bytes, start, end))
+            write(bytes, start, end)
+        client._write = recordingWrite
+        client.write(data)
+        self.assertEqual(len(written), 1)
+        self.assertIs(written[0][0], data)
+        self.assertEqual(written[0][1:], (0, 3 * size))
+        self.assertEqual(client._coalesceBuffer, [b"x" * 5])
+        self.clock.advance(0)
+        self.pump()
+        self.assertEqual(b"".join(serverProtocol.received), data)
+
+
+    def test_largeWriteAfterSmallWrites(self):
+        """
+        With write coalescing enabled, a large write after some small ones is
+        sent in the same records as a single write of all of their bytes
+        would be.
+        """
+        size = TLSMemoryBIOProtocol._maxRecordSize
+        pieces = [b"abc", b"d" * (2 * size + 7), b"ef", b"g" * size]
+        expected = self.recordsFor(b"".join(pieces))
+        client, serverProtocol = self.handshake()
+        client.setWriteCoalescing(True)
+        for piece in pieces:
+            client.write(piece)
+        self.clock.advance(0)
+        self.assertEqual(tlsRecords(self.pump()), expected)
+        self.assertEqual(b"".join(serverProtocol.received), b"".join(pieces))
+
+
+    def test_loseConnectionFlushes(self):
+        """
+        Bytes buffered by write coalescing are sent before the TLS connection
+        is shut down by C{loseConnection}.
+        """
+        client, serverProtocol = self.handshake()
+        client.setWriteCoalescing(True)
+        client.write(b"hello")
+        client.loseConnection()
+        self.pump()
+        self.assertEqual(b"".join(serverProtocol.received), b"hello")
+        self.assertTrue(client.transport.disconnecting)
+
+
+    def test_disablingFlushes(self):
+        """
+        Disabling write coalescing sends any bytes buffered by it.
+        """
+        client, serverProtocol = self.handshake()
+        client.setWriteCoalescing(True)
+        client.write(b"hello")
+        client.setWriteCoalescing(False)
+        self.assertFalse(client.getWriteCoalescing())
+        self.pump()
+        self.assertEqual(b"".join(serverProtocol.received), b"hello")
+
+
+    def test_writeSequenceGrouped(self):
+        """
+        Without write coalescing, the small pieces passed to C{writeSequence}
+        are sent in the same records as a single write of all of their bytes
+        would be.
+        """
+        pieces = [intToBytes(i) for i in range(100)]
+        expected = self.recordsFor(b"".join(pieces))
+        client, serverProtocol = self.handshake()
+        client.writeSequence(pieces)
+        self.assertEqual(tlsRecords(self.pump()), expected)
+        self.assertEqual(b"".join(serverProtocol.received), b"".join(pieces))
+
+
+    def test_writeSequenceUnicodeRaisesTypeError(self):
+        """
+        Passing C{unicode} to L{TLSMemoryBIOProtocol.writeSequence} raises
+        C{TypeError}, and none of the sequence is written.
+        """
+        client, serverProtocol = self.handshake()
+        self.assertRaises(
+            TypeError, client.writeSequence, [b"hello", u"world"])
+        self.assertEqual(client.transport.value(), b"")
+
+
+    def test_largeWriteSentAtOnce(self):
+        """
+        All the records produced by a large write are passed to the
+        underlying transport straight away, rather than some of them being
+        left in the send BIO until something else is written.
+        """
+        client, serverProtocol = self.handshake()
+        client.write(b"x" * 2 ** 16)
+        self.server.dataReceived(client.transport.value())
+        self.assertEqual(b"".join(serverProtocol.received), b"x" * 2 ** 16)
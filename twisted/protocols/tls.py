@@ -48,7 +48,7 @@ except TypeError as e:
         raise
     raise ImportError("twisted.protocols.tls requires pyOpenSSL 0.10 or newer.")
 
-from zope.interface import implementer, providedBy, directlyProvides
+from zope.interface import implementer, directlyProvides
 
 from twisted.python.compat import unicode
 from twisted.python.failure import Failure
@@ -58,10 +58,12 @@ from twisted.internet.interfaces import (
     ISystemHandle, ISSLTransport, IPushProducer, ILoggingContext,
     IOpenSSLServerConnectionCreator, IOpenSSLClientConnectionCreator,
 )
+from twisted.internet.base import _flusherFor
 from twisted.internet.main import CONNECTION_LOST
 from twisted.internet.protocol import Protocol
 from twisted.internet.task import cooperate
-from twisted.protocols.policies import ProtocolWrapper, WrappingFactory
+from twisted.protocols.policies import (
+    ProtocolWrapper, WrappingFactory, _wrapperInterfaces)
 
 
 @implementer(IPushProducer)
@@ -267,6 +269,26 @@ class TLSMemoryBIOProtocol(ProtocolWrapper):
     @ivar _aborted: C{abortConnection} has been called.  No further data will
         be received to the wrapped protocol's C{dataReceived}.
     @type _aborted: L{bool}
+
+    @ivar receiveSize: The largest number of application-level bytes to read
+        from the TLS connection at once.  OpenSSL returns the contents of at
+        most one record per read, so there is no point in this being more
+        than the largest record, but it may be made smaller.
+    @type receiveSize: L{int}
+
+    @ivar _coalesceWrites: A flag indicating whether application writes are
+        buffered until the end of the reactor iteration so that they are
+        encrypted into as few, full, records as possible (C{True}) or are
+        encrypted as they are made (C{False}).  See L{setWriteCoalescing}.
+
+    @ivar _coalesceBuffer: A C{list} of C{bytes} written by the application
+        while write coalescing is enabled and not yet encrypted.
+
+    @ivar _coalesceLength: The total length of C{_coalesceBuffer}.
+
+    @ivar _flushPending: A flag indicating whether this protocol is waiting
+        for its buffered writes to be flushed at the end of the reactor
+        iteration (C{True}) or not (C{False}).
     """
 
     _reason = None
@@ -275,6 +297,14 @@ class TLSMemoryBIOProtocol(ProtocolWrapper):
     _writeBlockedOnRead = False
     _producer = None
     _aborted = False
+    _coalesceWrites = False
+    _coalesceLength = 0
+    _flushPending = False
+
+    # The largest amount of application data a single TLS record can carry.
+    _maxRecordSize = 2 ** 14
+
+    receiveSize = 2 ** 14
 
     def __init__(self, factory, wrappedProtocol, _connectWrapped=True):
         ProtocolWrapper.__init__(self, factory, wrappedProtocol)
@@ -301,10 +331,10 @@ class TLSMemoryBIOProtocol(ProtocolWrapper):
         """
         self._tlsConnection = self.factory._createConnection(self)
         self._appSendBuffer = []
+        self._coalesceBuffer = []
 
         # Add interfaces provided by the transport we are wrapping:
-        for interface in providedBy(transport):
-            directlyProvides(self, interface)
+        directlyProvides(self, _wrapperInterfaces(transport))
 
         # Intentionally skip ProtocolWrapper.makeConnection - it might call
         # wrappedProtocol.makeConnection, which we want to make conditional.
@@ -331,16 +361,25 @@ class TLSMemoryBIOProtocol(ProtocolWrapper):
 
     def _flushSendBIO(self):
         """
-        Read any bytes out of the send BIO and write them to the underlying
-        transport.
+        Read all the bytes out of the send BIO and write them to the
+        underlying transport.
         """
-        try:
-            bytes = self._tlsConnection.bio_read(2 ** 15)
-        except WantReadError:
-            # There may be nothing in the send BIO right now.
-            pass
-        else:
-            self.transport.write(bytes)
+        chunks = []
+        while True:
+            try:
+                bytes = self._tlsConnection.bio_read(2 ** 15)
+            except WantReadError:
+                # There is nothing (more) in the send BIO right now.
+                break
+            chunks.append(bytes)
+            if len(bytes) < 2 ** 15:
+                # A short read means the send BIO is empty; don't pay for
+                # the exception another read would raise to say so.
+                break
+        if len(chunks) == 1:
+            self.transport.write(chunks[0])
+        elif chunks:
+            self.transport.writeSequence(chunks)
 
 
     def _flushReceiveBIO(self):
@@ -357,7 +396,7 @@ class TLSMemoryBIOProtocol(ProtocolWrapper):
         # there is no guarantee that a single recv call will do it all.
         while not self._lostTLSConnection:
             try:
-                bytes = self._tlsConnection.recv(2 ** 15)
+                bytes = self._tlsConnection.recv(self.receiveSize)
             except WantReadError:
                 # The newly received bytes might not have been enough to produce
                 # any application data.
@@ -483,6 +522,7 @@ class TLSMemoryBIOProtocol(ProtocolWrapper):
         """
         if self.disconnecting:
             return
+        self._flushWrites()
         self.disconnecting = True
         if not self._writeBlockedOnRead and self._producer is None:
             self._shutdownTLS()
@@ -495,6 +535,8 @@ class TLSMemoryBIOProtocol(ProtocolWrapper):
         """
         self._aborted = True
         self.disconnecting = True
+        self._coalesceBuffer = []
+        self._coalesceLength = 0
         self._shutdownTLS()
         self.transport.abortConnection()
 
@@ -527,10 +569,102 @@ class TLSMemoryBIOProtocol(ProtocolWrapper):
         # is unregistered:
         if self.disconnecting and self._producer is None:
             return
-        self._write(bytes)
+        if self._coalesceWrites:
+            self._coalesce([bytes], len(bytes))
+        else:
+            self._write(bytes)
+
+
+    def setWriteCoalescing(self, enabled):
+        """
+        Enable or disable write coalescing.
+
+        When write coalescing is enabled, the bytes passed to L{write} and
+        L{writeSequence} are not encrypted straight away.  Instead they are
+        buffered, and encrypted into full-sized records as soon as there are
+        enough of them, with whatever is left encrypted at the end of the
+        current reactor iteration, once any timed calls due in it have run.
+        A response written in several pieces is then sent in as few records
+        as possible, which saves both the per-record overhead on the wire and
+        the per-record cost of encryption.
+
+        This does not change the underlying transport, which may have write
+        coalescing of its own.
+
+        Write coalescing is disabled by default.  Disabling it encrypts any
+        buffered bytes immediately.
+
+        @param enabled: C{True} to enable write coalescing, C{False} to disable
+            it.
+        @type enabled: C{bool}
+        """
+        self._coalesceWrites = bool(enabled)
+        if not self._coalesceWrites:
+            self._flushWrites()
 
 
-    def _write(self, bytes):
+    def getWriteCoalescing(self):
+        """
+        @return: C{True} if write coalescing is enabled, C{False} otherwise.
+        """
+        return self._coalesceWrites
+
+
+    def _coalesce(self, chunks, length):
+        """
+        Buffer application bytes while write coalescing is enabled, encrypting
+        as many full records' worth of them as are available.
+
+        @param chunks: A C{list} of C{bytes} to buffer.
+
+        @param length: The total length of C{chunks}.
+        """
+        self._coalesceBuffer.extend(chunks)
+        self._coalesceLength += length
+        recordSize = self._maxRecordSize
+        if self._coalesceLength >= recordSize:
+            # Only the small pieces which share a record are joined; the
+            # whole records in a large chunk are encrypted straight out of it,
+            # so that a large write is not copied.
+            head = []
+            headLength = 0
+            for chunk in self._coalesceBuffer:
+                start = 0
+                if headLength and headLength + len(chunk) >= recordSize:
+                    start = recordSize - headLength
+                    head.append(chunk[:start])
+                    self._write(b"".join(head))
+                    head = []
+                    headLength = 0
+                end = len(chunk) - (len(chunk) - start) % recordSize
+                if end > start:
+                    self._write(chunk, start, end)
+                if end < len(chunk):
+                    head.append(chunk[end:])
+                    headLength += len(chunk) - end
+            self._coalesceBuffer = head
+            self._coalesceLength = headLength
+        if self._coalesceLength and not self._flushPending:
+            self._flushPending = True
+            reactor = getattr(self.transport, "reactor", None)
+            if reactor is None:
+                from twisted.internet import reactor
+            _flusherFor(reactor).add(self)
+
+
+    def _flushWrites(self):
+        """
+        Encrypt and send any application bytes buffered by write coalescing.
+        """
+        self._flushPending = False
+        if self._coalesceLength:
+            data = b"".join(self._coalesceBuffer)
+            self._coalesceBuffer = []
+            self._coalesceLength = 0
+            self._write(data)
+
+
+    def _write(self, bytes, start=0, end=None):
         """
         Process the given application bytes and send any resulting TLS traffic
         which arrives in the send BIO.
@@ -538,23 +672,31 @@ class TLSMemoryBIOProtocol(ProtocolWrapper):
         This may be called by C{dataReceived} with bytes that were buffered
         before C{loseConnection} was called, which is why this function
         doesn't check for disconnection but accepts the bytes regardless.
+
+        @param start: The offset in C{bytes} of the first byte to process.
+
+        @param end: The offset in C{bytes} after the last byte to process, or
+            C{None} to process up to the end of C{bytes}.
         """
         if self._lostTLSConnection:
             return
 
+        if end is None:
+            end = len(bytes)
+
         # A TLS payload is 16kB max
         bufferSize = 2 ** 16
 
         # How far into the input we've gotten so far
-        alreadySent = 0
+        alreadySent = start
 
-        while alreadySent < len(bytes):
-            toSend = bytes[alreadySent:alreadySent + bufferSize]
+        while alreadySent < end:
+            toSend = bytes[alreadySent:min(alreadySent + bufferSize, end)]
             try:
                 sent = self._tlsConnection.send(toSend)
             except WantReadError:
                 self._writeBlockedOnRead = True
-                self._appSendBuffer.append(bytes[alreadySent:])
+                self._appSendBuffer.append(bytes[alreadySent:end])
                 if self._producer is not None:
                     self._producer.pauseProducing()
                 break
@@ -576,10 +718,34 @@ class TLSMemoryBIOProtocol(ProtocolWrapper):
 
     def writeSequence(self, iovec):
         """
-        Write a sequence of application bytes by joining them into one string
-        and passing them to L{write}.
+        Write a sequence of application bytes.
+
+        The bytes are not joined into one string.  Instead, consecutive pieces
+        are joined into groups of about one record's worth, so that small
+        pieces still share records and a long sequence is never copied all at
+        once.  If write coalescing is enabled the pieces are simply buffered.
         """
-        self.write(b"".join(iovec))
+        iovec = list(iovec)
+        for bytes in iovec:
+            if isinstance(bytes, unicode):
+                raise TypeError(
+                    "Must write bytes to a TLS transport, not unicode.")
+        if self.disconnecting and self._producer is None:
+            return
+        if self._coalesceWrites:
+            self._coalesce(iovec, sum(map(len, iovec)))
+            return
+        group = []
+        groupLength = 0
+        for bytes in iovec:
+            group.append(bytes)
+            groupLength += len(bytes)
+            if groupLength >= self._maxRecordSize:
+                self._write(b"".join(group))
+                group = []
+                groupLength = 0
+        if group:
+            self._write(b"".join(group))
 
 
     def getPeerCertificate(self):
@@ -614,8 +780,10 @@ class TLSMemoryBIOProtocol(ProtocolWrapper):
         self._producer = None
         self._producerPaused = False
         self.transport.unregisterProducer()
-        if self.disconnecting and not self._writeBlockedOnRead:
-            self._shutdownTLS()
+        if self.disconnecting:
+            self._flushWrites()
+            if not self._writeBlockedOnRead:
+                self._shutdownTLS()
 
 
 
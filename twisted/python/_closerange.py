@@ -0,0 +1,134 @@
+# -*- test-case-name: twisted.python.test.test_closerange -*-
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Close ranges of file descriptors with one system call, using C{close_range(2)}
+on Linux or C{closefrom(3)} on the BSDs and Solaris.
+
+L{closeRange} is C{None} where neither is available, in which case callers
+must close descriptors one at a time.
+"""
+
+from __future__ import division, absolute_import
+
+import os
+from platform import machine
+
+from twisted.python.runtime import platform
+
+__all__ = ["closeRange"]
+
+# The highest value close_range accepts, meaning "all the rest".
+_MAX_FD = 0xffffffff
+
+# The number of the close_range system call on the Linux architectures which
+# number new system calls from the generic table.  Others, such as alpha,
+# ia64 and mips, offset it, so it is only used on those listed here, by their
+# platform.machine() names.
+_SYS_close_range = 436
+_GENERIC_SYSCALL_MACHINES = frozenset([
+    "x86_64", "amd64", "i386", "i486", "i586", "i686",
+    "aarch64", "arm64", "armv6l", "armv7l", "armv8l",
+    "ppc64", "ppc64le", "s390x", "riscv64",
+])
+
+
+
+def _ctypesCloseRange(libc, machine):
+    """
+    Create a L{closeRange} which calls C{close_range} through ctypes, using
+    the C library's wrapper if it has one and C{syscall} otherwise.
+
+    @param libc: A ctypes library object for the C library, loaded with
+        C{use_errno=True}.
+
+    @param machine: The name of the machine architecture, as returned by
+        L{platform.machine}.  C{syscall} is only used if it is in
+        L{_GENERIC_SYSCALL_MACHINES}.
+
+    @return: A function taking the first and last (or C{None}, for all the
+        rest) descriptors to close, which raises L{OSError} on failure; or
+        C{None} if the C library has no wrapper and the number of the system
+        call on C{machine} is not known.
+    """
+    import ctypes
+
+    function = getattr(libc, "close_range", None)
+    if function is not None:
+        function.argtypes = [ctypes.c_uint, ctypes.c_uint, ctypes.c_int]
+        function.restype = ctypes.c_int
+    elif machine not in _GENERIC_SYSCALL_MACHINES:
+        return None
+    else:
+        syscall = libc.syscall
+        syscall.restype = ctypes.c_long
+        def function(first, last, flags):
+            return syscall(
+                ctypes.c_long(_SYS_close_range), ctypes.c_uint(first),
+                ctypes.c_uint(last), ctypes.c_uint(flags))
+
+    def closeRange(first, last=None):
+        if last is None:
+            last = _MAX_FD
+        if function(first, last, 0) < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+
+    return closeRange
+
+
+
+def _ctypesCloseFrom(libc):
+    """
+    Create a L{closeRange} which calls C{closefrom} through ctypes to close
+    all the rest of the descriptors, and L{os.closerange} otherwise.
+
+    @param libc: A ctypes library object for the C library.
+
+    @return: A function taking the first and last (or C{None}, for all the
+        rest) descriptors to close.
+    """
+    import ctypes
+
+    function = libc.closefrom
+    function.argtypes = [ctypes.c_int]
+    function.restype = None
+
+    def closeRange(first, last=None):
+        if last is None:
+            function(first)
+        else:
+            os.closerange(first, last + 1)
+
+    return closeRange
+
+
+
+def _findCloseRange():
+    """
+    Pick the best way to close ranges of descriptors on this platform.
+
+    @return: A L{closeRange} function, or C{None}.
+    """
+    if platform.getType() != "posix":
+        return None
+    try:
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        if platform.isLinux():
+            closeRange = _ctypesCloseRange(libc, machine())
+            if closeRange is None:
+                return None
+            # Closing only the highest possible descriptor does nothing, but
+            # fails if the kernel is too old to have close_range.
+            closeRange(_MAX_FD, _MAX_FD)
+            return closeRange
+        return _ctypesCloseFrom(libc)
+    except (ImportError, OSError, AttributeError):
+        return None
+
+
+
+closeRange = _findCloseRange()
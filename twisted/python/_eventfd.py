@@ -0,0 +1,61 @@
+# -*- test-case-name: twisted.python.test.test_eventfd -*-
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Access to the Linux C{eventfd(2)} system call, which creates a file
+descriptor holding a counter that can be used to wake up a thread blocked in
+C{poll} or similar.
+
+L{os.eventfd} is used where it exists.  Otherwise, on Linux, an equivalent
+based on ctypes is provided.  Elsewhere L{eventfd} is C{None}.
+"""
+
+from __future__ import division, absolute_import
+
+import os
+
+from twisted.python.runtime import platform
+
+__all__ = ["eventfd"]
+
+
+
+def _ctypesEventfd(libc):
+    """
+    Create a function with the same signature as L{os.eventfd} which calls
+    C{eventfd} through ctypes.
+
+    @param libc: A ctypes library object for the C library, loaded with
+        C{use_errno=True}.
+
+    @return: A function taking the initial value of the counter and flags,
+        and returning a new file descriptor, or raising L{OSError}.
+    """
+    import ctypes
+
+    function = libc.eventfd
+    function.argtypes = [ctypes.c_uint, ctypes.c_int]
+    function.restype = ctypes.c_int
+
+    def eventfd(initval, flags=0):
+        result = function(initval, flags)
+        if result < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        return result
+
+    return eventfd
+
+
+
+eventfd = getattr(os, "eventfd", None)
+
+if eventfd is None and platform.isLinux():
+    try:
+        import ctypes
+        import ctypes.util
+        eventfd = _ctypesEventfd(ctypes.CDLL(
+                ctypes.util.find_library("c"), use_errno=True))
+    except (ImportError, OSError, AttributeError):
+        eventfd = None
@@ -0,0 +1,345 @@
+# -*- test-case-name: twisted.python.test.test_mmsg -*-
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Access to the Linux C{recvmmsg(2)} and C{sendmmsg(2)} system calls, which
+receive or send several datagrams with one system call.
+
+ctypes and a version of libc which provides both calls are required.
+L{available} is C{False} if they are missing.
+
+Only IPv4 and IPv6 datagram sockets are supported.
+"""
+
+from __future__ import division, absolute_import
+
+import os
+import socket
+import struct
+
+from twisted.python.runtime import platform
+
+__all__ = ["available", "DatagramReceiver", "sendDatagrams"]
+
+
+# Large enough for a struct sockaddr_in or a struct sockaddr_in6.
+_NAME_SIZE = 32
+
+# The largest number of messages sendmmsg will send in one call (UIO_MAXIOV).
+_SEND_LIMIT = 1024
+
+# The number of converted addresses to remember.
+_CACHE_SIZE = 1024
+
+# The structures passed to the system calls are built with struct rather than
+# ctypes, which is much slower at filling in many small structures.  On Linux
+# size_t is the same size as unsigned long.
+
+# struct iovec {void *iov_base; size_t iov_len;}
+_IOVEC = struct.Struct("PL")
+
+# struct mmsghdr {struct msghdr msg_hdr; unsigned int msg_len;}, where
+# struct msghdr {void *msg_name; socklen_t msg_namelen; struct iovec *msg_iov;
+#                size_t msg_iovlen; void *msg_control; size_t msg_controllen;
+#                int msg_flags;}
+_MMSGHDR = struct.Struct("PIPLPLi0PI0P")
+
+# msg_namelen and msg_len, the fields set by recvmmsg.
+_NAMELEN_OFFSET = struct.calcsize("P")
+_LEN_OFFSET = struct.calcsize("PIPLPLi0P")
+
+
+def _decodeAddress(name):
+    """
+    Convert a C{struct sockaddr_in} or C{struct sockaddr_in6} into an address
+    tuple.
+
+    @param name: The bytes of the structure.
+    @type name: C{bytes}
+
+    @return: A two-tuple of the host, as a C{str}, and the port number, or
+        C{None} if the address is not an IPv4 or IPv6 address.
+    """
+    if len(name) < 4:
+        return None
+    family, = struct.unpack("=H", name[:2])
+    port, = struct.unpack("!H", name[2:4])
+    if family == socket.AF_INET:
+        return (socket.inet_ntop(socket.AF_INET, name[4:8]), port)
+    elif family == socket.AF_INET6:
+        return (socket.inet_ntop(socket.AF_INET6, name[8:24]), port)
+    return None
+
+
+
+def _encodeAddress(family, address):
+    """
+    Convert an address tuple into a C{struct sockaddr_in} or
+    C{struct sockaddr_in6}.
+
+    @param family: L{socket.AF_INET} or L{socket.AF_INET6}.
+
+    @param address: A tuple of the host, as an IP address, and the port
+        number.  C{"<broadcast>"} is accepted as an IPv4 host.
+
+    @return: The bytes of the structure.
+    @rtype: C{bytes}
+    """
+    host, port = address[:2]
+    if family == socket.AF_INET:
+        if host == "<broadcast>":
+            host = "255.255.255.255"
+        return (struct.pack("=H", family) + struct.pack("!H", port) +
+                socket.inet_pton(family, host) + b"\0" * 8)
+    flowInfo = scopeID = 0
+    if "%" in host:
+        # Let the resolver interpret the scope.
+        host, port, flowInfo, scopeID = socket.getaddrinfo(
+            host, port, family, socket.SOCK_DGRAM, 0,
+            socket.AI_NUMERICHOST)[0][4]
+    return (struct.pack("=H", family) + struct.pack("!HI", port, flowInfo) +
+            socket.inet_pton(family, host) + struct.pack("=I", scopeID))
+
+
+
+def _raiseError():
+    """
+    Raise L{socket.error} for the C{errno} left by a failed system call.
+    """
+    errno = ctypes.get_errno()
+    raise socket.error(errno, os.strerror(errno))
+
+
+
+def _addressOf(data):
+    """
+    Get the address of the contents of a C{bytes} object, which must not be
+    modified through it.
+    """
+    return ctypes.cast(ctypes.c_char_p(data), ctypes.c_void_p).value
+
+
+
+def _initializeModule(libc):
+    """
+    Look up C{recvmmsg} and C{sendmmsg} in C{libc} and declare their
+    signatures.
+
+    @param libc: A ctypes library object for the C library, loaded with
+        C{use_errno=True}.
+
+    @raise AttributeError: If C{libc} lacks either function.
+    """
+    global _recvmmsg, _sendmmsg
+
+    recvmmsg = libc.recvmmsg
+    recvmmsg.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_uint,
+                         ctypes.c_int, ctypes.c_void_p]
+    recvmmsg.restype = ctypes.c_int
+
+    sendmmsg = libc.sendmmsg
+    sendmmsg.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_uint,
+                         ctypes.c_int]
+    sendmmsg.restype = ctypes.c_int
+
+    _recvmmsg = recvmmsg
+    _sendmmsg = sendmmsg
+
+
+
+class DatagramReceiver(object):
+    """
+    Receive up to C{count} datagrams of up to C{size} bytes each with one
+    C{recvmmsg} call, using buffers allocated once.
+
+    @ivar count: The largest number of datagrams to receive at once.
+    @type count: C{int}
+
+    @ivar size: The largest number of bytes to receive for one datagram.
+        Longer datagrams are truncated.
+    @type size: C{int}
+
+    @ivar _headers: The C{struct mmsghdr} array passed to C{recvmmsg}, as
+        it is before a call.
+    @type _headers: C{bytes}
+
+    @ivar _used: Whether C{_messages} has been changed by a call since it was
+        last reset to C{_headers}.
+
+    @ivar _addresses: A C{dict} mapping the socket addresses datagrams have
+        recently come from to their address tuples.
+    """
+    def __init__(self, count, size):
+        self.count = count
+        self.size = size
+        self._data = ctypes.create_string_buffer(count * size)
+        self._dataView = memoryview(self._data)
+        self._names = ctypes.create_string_buffer(count * _NAME_SIZE)
+        dataAddress = ctypes.addressof(self._data)
+        namesAddress = ctypes.addressof(self._names)
+        self._iovecs = ctypes.create_string_buffer(b"".join([
+                    _IOVEC.pack(dataAddress + i * size, size)
+                    for i in range(count)]))
+        iovecsAddress = ctypes.addressof(self._iovecs)
+        self._headers = b"".join([
+                _MMSGHDR.pack(namesAddress + i * _NAME_SIZE, _NAME_SIZE,
+                              iovecsAddress + i * _IOVEC.size, 1, 0, 0, 0, 0)
+                for i in range(count)])
+        self._messages = ctypes.create_string_buffer(self._headers)
+        self._used = False
+        self._addresses = {}
+
+
+    def receive(self, fd):
+        """
+        Receive the datagrams waiting on a socket.
+
+        @param fd: The file descriptor of a non-blocking datagram socket.
+        @type fd: C{int}
+
+        @return: A C{list} of up to C{count} two-tuples of a datagram and the
+            address it came from, as returned by L{socket.socket.recvfrom}
+            but without the IPv6 flow information and scope.
+
+        @raise socket.error: If no datagram could be received.
+        """
+        messages = self._messages
+        if self._used:
+            ctypes.memmove(messages, self._headers, len(self._headers))
+        self._used = True
+        received = _recvmmsg(
+            fd, ctypes.addressof(messages), self.count, 0, None)
+        if received < 0:
+            _raiseError()
+
+        lengths = _lengthsStruct(received).unpack_from(messages)
+        names = ctypes.string_at(self._names, received * _NAME_SIZE)
+        data = self._dataView
+        size = self.size
+        addresses = self._addresses
+        if len(addresses) >= _CACHE_SIZE:
+            addresses.clear()
+        datagrams = []
+        offset = 0
+        nameOffset = 0
+        for i in range(0, 2 * received, 2):
+            name = names[nameOffset:nameOffset + lengths[i]]
+            address = addresses.get(name)
+            if address is None:
+                address = addresses[name] = _decodeAddress(name)
+            datagrams.append(
+                (data[offset:offset + lengths[i + 1]].tobytes(), address))
+            offset += size
+            nameOffset += _NAME_SIZE
+        return datagrams
+
+
+
+def _lengthsStruct(count, _cache={}):
+    """
+    Get a L{struct.Struct} which unpacks the C{msg_namelen} and C{msg_len}
+    fields of an array of C{count} C{struct mmsghdr}s.
+    """
+    lengths = _cache.get(count)
+    if lengths is None:
+        lengths = _cache[count] = struct.Struct("=" + "%dxI%dxI%dx" % (
+                _NAMELEN_OFFSET, _LEN_OFFSET - _NAMELEN_OFFSET - 4,
+                _MMSGHDR.size - _LEN_OFFSET - 4) * count)
+    return lengths
+
+
+
+def _sendStruct(count, _cache={}):
+    """
+    Get a L{struct.Struct} which packs an array of C{count} C{struct
+    mmsghdr}s followed by an array of C{count} C{struct iovec}s.
+    """
+    messages = _cache.get(count)
+    if messages is None:
+        messages = _cache[count] = struct.Struct(
+            _MMSGHDR.format * count + _IOVEC.format * count)
+    return messages
+
+
+
+_encodedAddresses = {}
+
+def sendDatagrams(fd, family, datagrams):
+    """
+    Send several datagrams with one C{sendmmsg} call.
+
+    @param fd: The file descriptor of a datagram socket.
+    @type fd: C{int}
+
+    @param family: L{socket.AF_INET} or L{socket.AF_INET6}, the address family
+        of the socket.
+
+    @param datagrams: A C{list} of two-tuples of a datagram, as C{bytes}, and
+        the address to send it to, or C{None} if the socket is connected.
+
+    @return: The number of datagrams sent, from the start of C{datagrams}.
+        This is fewer than all of them if there are more than the system
+        call accepts at once, or if sending one failed, in which case sending
+        it again reports the error.
+    @rtype: C{int}
+
+    @raise socket.error: If the first datagram could not be sent.
+    """
+    datagrams = datagrams[:_SEND_LIMIT]
+    count = len(datagrams)
+    layout = _sendStruct(count)
+    buf = ctypes.create_string_buffer(layout.size)
+    iovecAddress = ctypes.addressof(buf) + count * _MMSGHDR.size
+    # The datagrams are joined into one string, which the iovecs point
+    # into.  The encoded addresses stay referenced by the cache until the
+    # next call at least.
+    payload = b"".join([datagram for datagram, address in datagrams])
+    payloadAddress = _addressOf(payload)
+    if len(_encodedAddresses) >= _CACHE_SIZE:
+        _encodedAddresses.clear()
+
+    headerFields = []
+    iovecFields = []
+    for datagram, address in datagrams:
+        if address is None:
+            name = (0, 0)
+        else:
+            key = (family, address)
+            name = _encodedAddresses.get(key)
+            if name is None:
+                encoded = _encodeAddress(family, address)
+                name = _encodedAddresses[key] = (
+                    _addressOf(encoded), len(encoded), encoded)
+        headerFields.extend(
+            (name[0], name[1], iovecAddress, 1, 0, 0, 0, 0))
+        size = len(datagram)
+        iovecFields.extend((payloadAddress, size))
+        iovecAddress += _IOVEC.size
+        payloadAddress += size
+    headerFields.extend(iovecFields)
+    layout.pack_into(buf, 0, *headerFields)
+
+    sent = _sendmmsg(fd, ctypes.addressof(buf), count, 0)
+    if sent < 0:
+        _raiseError()
+    return sent
+
+
+
+available = False
+
+if platform.isLinux():
+    try:
+        import ctypes
+        import ctypes.util
+    except ImportError:
+        pass
+    else:
+        try:
+            _initializeModule(ctypes.CDLL(
+                    ctypes.util.find_library("c"), use_errno=True))
+        except (OSError, AttributeError):
+            pass
+        else:
+            available = True
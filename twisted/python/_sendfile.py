@@ -0,0 +1,62 @@
+# -*- test-case-name: twisted.python.test.test_sendfile -*-
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Access to the C{sendfile(2)} system call.
+
+L{os.sendfile} is used where it exists.  Otherwise, on Linux, an equivalent
+based on ctypes is provided.  Elsewhere L{sendfile} is C{None}.
+"""
+
+from __future__ import division, absolute_import
+
+import os
+
+from twisted.python.runtime import platform
+
+__all__ = ["sendfile"]
+
+
+
+def _ctypesSendfile(libc):
+    """
+    Create a function with the same signature as L{os.sendfile} which calls
+    C{sendfile64} through ctypes.
+
+    @param libc: A ctypes library object for the C library, loaded with
+        C{use_errno=True}.
+
+    @return: A function taking an output file descriptor, an input file
+        descriptor, an offset in the input file and a number of bytes, and
+        returning the number of bytes copied, or raising L{OSError}.
+    """
+    import ctypes
+
+    function = libc.sendfile64
+    function.argtypes = [ctypes.c_int, ctypes.c_int,
+                         ctypes.POINTER(ctypes.c_int64), ctypes.c_size_t]
+    function.restype = ctypes.c_ssize_t
+
+    def sendfile(outFile, inFile, offset, count):
+        position = ctypes.c_int64(offset)
+        result = function(outFile, inFile, ctypes.byref(position), count)
+        if result < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        return result
+
+    return sendfile
+
+
+
+sendfile = getattr(os, "sendfile", None)
+
+if sendfile is None and platform.isLinux():
+    try:
+        import ctypes
+        import ctypes.util
+        sendfile = _ctypesSendfile(ctypes.CDLL(
+                ctypes.util.find_library("c"), use_errno=True))
+    except (ImportError, OSError, AttributeError):
+        sendfile = None
@@ -32,6 +32,17 @@ from __future__ import division
 
 modules = [
     "twisted",
+    "twisted.benchmarks",
+    "twisted.benchmarks._benchmark",
+    "twisted.benchmarks.core",
+    "twisted.benchmarks.deferred",
+    "twisted.benchmarks.names",
+    "twisted.benchmarks.network",
+    "twisted.benchmarks.policies",
+    "twisted.benchmarks.protocols",
+    "twisted.benchmarks.runner",
+    "twisted.benchmarks.test",
+    "twisted.benchmarks.web",
     "twisted.copyright",
     "twisted.internet",
     "twisted.internet.abstract",
@@ -92,12 +103,16 @@ modules = [
     "twisted.python.dist3",
     "twisted.python.failure",
     "twisted.python.filepath",
+    "twisted.python._closerange",
+    "twisted.python._eventfd",
     "twisted.python.lockfile",
     "twisted.python.log",
     "twisted.python.monkey",
+    "twisted.python._mmsg",
     "twisted.python.randbytes",
     "twisted.python.reflect",
     "twisted.python.runtime",
+    "twisted.python._sendfile",
     "twisted.python.modules",
     "twisted.python.systemd",
     "twisted.python.test",
@@ -139,6 +154,7 @@ modules = [
 
 
 testModules = [
+    "twisted.benchmarks.test.test_runner",
     "twisted.internet.test.test_abstract",
     "twisted.internet.test.test_address",
     "twisted.internet.test.test_base",
@@ -169,11 +185,15 @@ testModules = [
     "twisted.names.test.test_rfc1982",
     "twisted.protocols.test.test_basic",
     "twisted.protocols.test.test_tls",
+    "twisted.python.test.test_closerange",
     "twisted.python.test.test_components",
     "twisted.python.test.test_constants",
     "twisted.python.test.test_deprecate",
     "twisted.python.test.test_dist3",
+    "twisted.python.test.test_eventfd",
+    "twisted.python.test.test_mmsg",
     "twisted.python.test.test_runtime",
+    "twisted.python.test.test_sendfile",
     "twisted.python.test.test_systemd",
     "twisted.python.test.test_util",
     "twisted.python.test.test_versions",
@@ -0,0 +1,133 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Tests for L{twisted.python._closerange}.
+"""
+
+from __future__ import division, absolute_import
+
+import os
+
+from twisted.trial.unittest import SkipTest, TestCase
+from twisted.python.runtime import platform
+from twisted.python import _closerange
+
+
+
+class CloseRangeTests(TestCase):
+    """
+    Tests for L{twisted.python._closerange.closeRange}.
+    """
+    if _closerange.closeRange is None:
+        skip = "No way to close a range of descriptors on this platform."
+
+    def _openDescriptors(self, count):
+        """
+        Open C{count} descriptors, to be closed after the test if they are
+        still open.
+        """
+        fds = [os.open(os.devnull, os.O_RDONLY) for i in range(count)]
+        self.addCleanup(self._closeAll, fds)
+        return fds
+
+
+    def _closeAll(self, fds):
+        """
+        Close those of C{fds} which are open.
+        """
+        for fd in fds:
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+    def _isOpen(self, fd):
+        """
+        @return: Whether C{fd} is an open descriptor.
+        """
+        try:
+            os.fstat(fd)
+        except OSError:
+            return False
+        return True
+
+
+    def test_closeRange(self):
+        """
+        L{_closerange.closeRange} closes the descriptors from its first to
+        its last argument, inclusive.
+        """
+        source = self._openDescriptors(1)[0]
+        fds = list(range(source + 100, source + 104))
+        for fd in fds:
+            os.dup2(source, fd)
+        self.addCleanup(self._closeAll, fds)
+        _closerange.closeRange(fds[1], fds[2])
+        self.assertEqual([self._isOpen(fd) for fd in fds],
+                         [True, False, False, True])
+
+
+    def test_closeRest(self):
+        """
+        If the last descriptor is C{None}, L{_closerange.closeRange} closes
+        all descriptors from the first.  This is checked in a child process
+        so as not to close the test runner's descriptors.
+        """
+        fds = sorted(self._openDescriptors(3))
+        read, write = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                keep = max(fds + [read, write]) + 1
+                os.dup2(write, keep)
+                _closerange.closeRange(fds[1], keep - 1)
+                _closerange.closeRange(keep + 1, None)
+                result = "".join([
+                        self._isOpen(fd) and "o" or "c" for fd in fds])
+                os.write(keep, result.encode("ascii"))
+            finally:
+                os._exit(0)
+        os.close(write)
+        os.waitpid(pid, 0)
+        result = os.read(read, 100)
+        os.close(read)
+        self.assertEqual(result, b"occ")
+
+
+    def test_syscall(self):
+        """
+        If the C library has no C{close_range} wrapper, the function created
+        by L{_closerange._ctypesCloseRange} makes the system call directly.
+        """
+        if not platform.isLinux():
+            raise SkipTest("close_range is only used on Linux.")
+        import ctypes
+        import ctypes.util
+        class OldLibC(object):
+            syscall = ctypes.CDLL(
+                ctypes.util.find_library("c"), use_errno=True).syscall
+        closeRange = _closerange._ctypesCloseRange(OldLibC(), "x86_64")
+        source = self._openDescriptors(1)[0]
+        fd = source + 100
+        os.dup2(source, fd)
+        self.addCleanup(self._closeAll, [fd])
+        closeRange(fd, fd)
+        self.assertFalse(self._isOpen(fd))
+
+
+    def test_syscallUnknownMachine(self):
+        """
+        If the C library has no C{close_range} wrapper and the machine
+        architecture is not known to number its system calls from the generic
+        table, L{_closerange._ctypesCloseRange} returns C{None}, so that
+        descriptors are closed one at a time rather than by making some other
+        system call.
+        """
+        class OldLibC(object):
+            def syscall(self, *args):
+                raise AssertionError("syscall should not be made")
+        for machine in ["alpha", "ia64", "mips"]:
+            self.assertIs(
+                _closerange._ctypesCloseRange(OldLibC(), machine), None)
@@ -0,0 +1,73 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Tests for L{twisted.python._eventfd}.
+"""
+
+from __future__ import division, absolute_import
+
+import errno
+import os
+import struct
+
+from twisted.trial.unittest import SkipTest, TestCase
+from twisted.python.runtime import platform
+from twisted.python import _eventfd
+
+
+
+class EventfdTests(TestCase):
+    """
+    Tests for L{twisted.python._eventfd.eventfd}.
+    """
+    if _eventfd.eventfd is None:
+        skip = "eventfd is not available on this platform."
+
+    def _eventfdTest(self, eventfd):
+        """
+        Check that C{eventfd} creates a descriptor whose counter is increased
+        by writes and read and reset by reads.
+        """
+        fd = eventfd(0, 0)
+        self.addCleanup(os.close, fd)
+        os.write(fd, struct.pack("@Q", 2))
+        os.write(fd, struct.pack("@Q", 3))
+        self.assertEqual(struct.unpack("@Q", os.read(fd, 8)), (5,))
+
+
+    def test_eventfd(self):
+        """
+        L{_eventfd.eventfd} creates an eventfd descriptor.
+        """
+        self._eventfdTest(_eventfd.eventfd)
+
+
+    def test_ctypesEventfd(self):
+        """
+        The function created by L{_eventfd._ctypesEventfd} creates an eventfd
+        descriptor.
+        """
+        self._eventfdTest(self._ctypesEventfd())
+
+
+    def test_ctypesEventfdError(self):
+        """
+        The function created by L{_eventfd._ctypesEventfd} raises L{OSError}
+        with the C{errno} set by the system call if it fails.
+        """
+        eventfd = self._ctypesEventfd()
+        exc = self.assertRaises(OSError, eventfd, 0, -1)
+        self.assertEqual(exc.errno, errno.EINVAL)
+
+
+    def _ctypesEventfd(self):
+        """
+        Create an C{eventfd} with L{_eventfd._ctypesEventfd}, if possible.
+        """
+        if not platform.isLinux():
+            raise SkipTest("eventfd is only used on Linux.")
+        import ctypes
+        import ctypes.util
+        return _eventfd._ctypesEventfd(
+            ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True))
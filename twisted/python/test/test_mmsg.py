@@ -0,0 +1,156 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Tests for L{twisted.python._mmsg}.
+"""
+
+from __future__ import division, absolute_import
+
+import errno
+import socket
+
+from twisted.trial.unittest import SkipTest, SynchronousTestCase
+from twisted.python import _mmsg
+
+
+
+class AddressTests(SynchronousTestCase):
+    """
+    Tests for the conversion of addresses to and from socket address
+    structures.
+    """
+    def test_IPv4(self):
+        """
+        An IPv4 address is encoded as a 16 byte C{struct sockaddr_in}, and
+        decoded back into the same address.
+        """
+        encoded = _mmsg._encodeAddress(socket.AF_INET, ("10.0.0.1", 53))
+        self.assertEqual(len(encoded), 16)
+        self.assertEqual(encoded[2:8], b"\x00\x35\x0a\x00\x00\x01")
+        self.assertEqual(_mmsg._decodeAddress(encoded), ("10.0.0.1", 53))
+
+
+    def test_broadcast(self):
+        """
+        C{"<broadcast>"} is encoded as the IPv4 broadcast address.
+        """
+        encoded = _mmsg._encodeAddress(socket.AF_INET, ("<broadcast>", 53))
+        self.assertEqual(
+            _mmsg._decodeAddress(encoded), ("255.255.255.255", 53))
+
+
+    def test_IPv6(self):
+        """
+        An IPv6 address is encoded as a 28 byte C{struct sockaddr_in6}, and
+        decoded back into the same address, without flow information or
+        scope.
+        """
+        encoded = _mmsg._encodeAddress(
+            socket.AF_INET6, ("2001:db8::1", 53, 0, 0))
+        self.assertEqual(len(encoded), 28)
+        self.assertEqual(_mmsg._decodeAddress(encoded), ("2001:db8::1", 53))
+
+
+    def test_unknownFamily(self):
+        """
+        Addresses of other families are decoded as C{None}.
+        """
+        self.assertIdentical(_mmsg._decodeAddress(b""), None)
+        self.assertIdentical(
+            _mmsg._decodeAddress(b"\xff\xff" + b"\x00" * 14), None)
+
+
+
+class SystemCallTests(SynchronousTestCase):
+    """
+    Tests for L{_mmsg.DatagramReceiver} and L{_mmsg.sendDatagrams}.
+    """
+    if not _mmsg.available:
+        skip = "recvmmsg and sendmmsg are not available on this platform."
+
+    def _socket(self, family=socket.AF_INET, interface="127.0.0.1"):
+        """
+        Create a non-blocking datagram socket bound to a free port.
+        """
+        skt = socket.socket(family, socket.SOCK_DGRAM)
+        self.addCleanup(skt.close)
+        skt.bind((interface, 0))
+        skt.setblocking(False)
+        return skt
+
+
+    def test_sendAndReceive(self):
+        """
+        L{_mmsg.sendDatagrams} sends datagrams to the given addresses, and
+        L{_mmsg.DatagramReceiver.receive} returns up to C{count} of them with
+        the addresses they came from.
+        """
+        sender = self._socket()
+        receiver = self._socket()
+        datagrams = [(b"a", receiver.getsockname()),
+                     (b"bb", receiver.getsockname()),
+                     (b"ccc", receiver.getsockname())]
+        self.assertEqual(
+            _mmsg.sendDatagrams(sender.fileno(), socket.AF_INET, datagrams),
+            3)
+
+        source = sender.getsockname()
+        batch = _mmsg.DatagramReceiver(2, 100)
+        self.assertEqual(batch.receive(receiver.fileno()),
+                         [(b"a", source), (b"bb", source)])
+        self.assertEqual(batch.receive(receiver.fileno()),
+                         [(b"ccc", source)])
+
+
+    def test_IPv6(self):
+        """
+        Datagrams can be sent and received over IPv6.
+        """
+        try:
+            sender = self._socket(socket.AF_INET6, "::1")
+            receiver = self._socket(socket.AF_INET6, "::1")
+        except socket.error:
+            raise SkipTest("IPv6 loopback is not available.")
+        _mmsg.sendDatagrams(sender.fileno(), socket.AF_INET6,
+                            [(b"a", receiver.getsockname())])
+        batch = _mmsg.DatagramReceiver(2, 100)
+        self.assertEqual(batch.receive(receiver.fileno()),
+                         [(b"a", sender.getsockname()[:2])])
+
+
+    def test_connected(self):
+        """
+        L{_mmsg.sendDatagrams} sends datagrams with an address of C{None} to
+        the address the socket is connected to.
+        """
+        sender = self._socket()
+        receiver = self._socket()
+        sender.connect(receiver.getsockname())
+        _mmsg.sendDatagrams(sender.fileno(), socket.AF_INET, [(b"a", None)])
+        self.assertEqual(receiver.recvfrom(100),
+                         (b"a", sender.getsockname()))
+
+
+    def test_truncated(self):
+        """
+        Datagrams longer than the size given to L{_mmsg.DatagramReceiver} are
+        truncated.
+        """
+        sender = self._socket()
+        receiver = self._socket()
+        sender.sendto(b"abcdef", receiver.getsockname())
+        batch = _mmsg.DatagramReceiver(2, 4)
+        self.assertEqual(batch.receive(receiver.fileno())[0][0], b"abcd")
+
+
+    def test_wouldBlock(self):
+        """
+        L{_mmsg.DatagramReceiver.receive} raises L{socket.error} with
+        C{EAGAIN} if there is nothing to receive.
+        """
+        receiver = self._socket()
+        batch = _mmsg.DatagramReceiver(2, 100)
+        exc = self.assertRaises(
+            socket.error, batch.receive, receiver.fileno())
+        self.assertEqual(exc.args[0], errno.EAGAIN)
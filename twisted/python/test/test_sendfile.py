@@ -0,0 +1,88 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Tests for L{twisted.python._sendfile}.
+"""
+
+from __future__ import division, absolute_import
+
+import errno
+import socket
+
+from twisted.trial.unittest import SkipTest, TestCase
+from twisted.python.runtime import platform
+from twisted.python.filepath import FilePath
+from twisted.python import _sendfile
+
+
+
+class SendfileTests(TestCase):
+    """
+    Tests for L{twisted.python._sendfile.sendfile}.
+    """
+    if _sendfile.sendfile is None:
+        skip = "sendfile is not available on this platform."
+
+    def _sendfileTest(self, sendfile):
+        """
+        Check that C{sendfile} sends the requested part of a file over a
+        socket, returns the number of bytes sent, and leaves the position of
+        the file alone.
+        """
+        client, server = socket.socketpair()
+        self.addCleanup(client.close)
+        self.addCleanup(server.close)
+        path = FilePath(self.mktemp())
+        path.setContent(b"0123456789")
+        fObj = path.open()
+        self.addCleanup(fObj.close)
+
+        self.assertEqual(
+            sendfile(client.fileno(), fObj.fileno(), 3, 4), 4)
+        self.assertEqual(server.recv(100), b"3456")
+        self.assertEqual(fObj.tell(), 0)
+        self.assertEqual(
+            sendfile(client.fileno(), fObj.fileno(), 10, 4), 0)
+
+
+    def test_sendfile(self):
+        """
+        L{_sendfile.sendfile} sends part of a file over a socket.
+        """
+        self._sendfileTest(_sendfile.sendfile)
+
+
+    def test_ctypesSendfile(self):
+        """
+        The function created by L{_sendfile._ctypesSendfile} sends part of a
+        file over a socket.
+        """
+        self._sendfileTest(self._ctypesSendfile())
+
+
+    def test_ctypesSendfileError(self):
+        """
+        The function created by L{_sendfile._ctypesSendfile} raises L{OSError}
+        with the C{errno} set by the system call if it fails.
+        """
+        sendfile = self._ctypesSendfile()
+        path = FilePath(self.mktemp())
+        path.setContent(b"0123456789")
+        fObj = path.open()
+        self.addCleanup(fObj.close)
+        exc = self.assertRaises(
+            OSError, sendfile, fObj.fileno(), fObj.fileno(), 0, 1)
+        self.assertIn(exc.errno, (errno.EBADF, errno.EINVAL))
+
+
+    def _ctypesSendfile(self):
+        """
+        Create a C{sendfile} with L{_sendfile._ctypesSendfile}, if possible.
+        """
+        if not platform.isLinux():
+            raise SkipTest("sendfile64 is only used on Linux.")
+        import ctypes
+        import ctypes.util
+        return _sendfile._ctypesSendfile(
+            ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True))
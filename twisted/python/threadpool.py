@@ -12,12 +12,13 @@ instead of creating a thread pool directly.
 from __future__ import division, absolute_import
 
 try:
-    from Queue import Queue
+    from Queue import Empty, Queue
 except ImportError:
-    from queue import Queue
+    from queue import Empty, Queue
 import contextlib
 import threading
 import copy
+import time
 
 from twisted.python import log, context, failure
 
@@ -25,6 +26,15 @@ from twisted.python import log, context, failure
 WorkerStop = object()
 
 
+
+class ThreadPoolFull(Exception):
+    """
+    A call could not be queued because the L{ThreadPool} was created with a
+    C{maxQueued} limit and that many calls are already waiting for a thread.
+    """
+
+
+
 class ThreadPool:
     """
     This class (hopefully) generalizes the functionality of a pool of
@@ -38,6 +48,14 @@ class ThreadPool:
     @type started: L{bool}
     @ivar threads: List of workers currently running in this thread pool.
     @type threads: L{list}
+    @ivar maxQueued: The largest number of calls which may wait for a thread,
+        or C{None} for no limit.
+    @ivar growAfter: If not C{None}, threads beyond the first (and beyond
+        C{min}) are only started when the call at the head of the queue has
+        waited longer than this many seconds, rather than as soon as any call
+        is queued.  This is checked whenever a call is queued or taken from
+        the queue.  Threads beyond C{min} which have then been idle for this
+        many seconds are stopped again.
     """
     min = 5
     max = 20
@@ -45,26 +63,54 @@ class ThreadPool:
     started = False
     workers = 0
     name = None
+    maxQueued = None
+    growAfter = None
 
     threadFactory = threading.Thread
     currentThread = staticmethod(threading.currentThread)
+    seconds = staticmethod(time.time)
 
-    def __init__(self, minthreads=5, maxthreads=20, name=None):
+    def __init__(self, minthreads=5, maxthreads=20, name=None,
+                 maxQueued=None, growAfter=None):
         """
         Create a new threadpool.
 
         @param minthreads: minimum number of threads in the pool
         @param maxthreads: maximum number of threads in the pool
+        @param name: The name to give this threadpool; visible in log
+            messages and thread names.
+        @param maxQueued: The largest number of calls which may wait for a
+            thread; see L{callInThreadWithCallback}.  C{None}, the default,
+            means no limit.
+        @param growAfter: See L{growAfter}.
         """
         assert minthreads >= 0, 'minimum is negative'
         assert minthreads <= maxthreads, 'minimum is greater than maximum'
+        assert maxQueued is None or maxQueued > 0, 'queue limit is not positive'
         self.q = Queue(0)
         self.min = minthreads
         self.max = maxthreads
         self.name = name
+        self.maxQueued = maxQueued
+        self.growAfter = growAfter
         self.waiters = []
         self.threads = []
         self.working = []
+        self._lock = threading.Lock()
+        self._resizeLock = threading.RLock()
+        self._notFullCallbacks = []
+        self._resetStatistics()
+
+
+    def _resetStatistics(self):
+        """
+        Set all the statistics returned by L{statistics} to zero.
+        """
+        self._completed = 0
+        self._rejected = 0
+        self._waitTime = 0.0
+        self._maxWaitTime = 0.0
+        self._runTime = 0.0
 
 
     def start(self):
@@ -92,21 +138,154 @@ class ThreadPool:
 
     def __setstate__(self, state):
         self.__dict__ = state
-        ThreadPool.__init__(self, self.min, self.max)
+        ThreadPool.__init__(self, self.min, self.max,
+                            maxQueued=self.maxQueued,
+                            growAfter=self.growAfter)
 
 
     def __getstate__(self):
         state = {}
         state['min'] = self.min
         state['max'] = self.max
+        if self.maxQueued is not None:
+            state['maxQueued'] = self.maxQueued
+        if self.growAfter is not None:
+            state['growAfter'] = self.growAfter
         return state
 
 
     def _startSomeWorkers(self):
-        neededSize = self.q.qsize() + len(self.working)
-        # Create enough, but not too many
-        while self.workers < min(self.max, neededSize):
-            self.startAWorker()
+        with self._resizeLock:
+            if self.growAfter is None:
+                neededSize = self.q.qsize() + len(self.working)
+            elif self.workers and self._headWaitTime() <= self.growAfter:
+                return
+            else:
+                neededSize = self.workers + 1
+            # Create enough, but not too many
+            while self.workers < min(self.max, neededSize):
+                self.startAWorker()
+
+
+    def _nextCall(self):
+        """
+        Wait for the next call to run.
+
+        With C{growAfter} set, this also starts another thread if the call
+        behind the one taken has already waited too long, and gives up
+        waiting if this thread has been idle for C{growAfter} seconds while
+        the pool has more than C{min} threads.
+
+        @return: The next call, or L{WorkerStop} if this thread should stop.
+        """
+        if self.growAfter is None:
+            return self.q.get()
+        while True:
+            try:
+                o = self.q.get(timeout=self.growAfter)
+            except Empty:
+                with self._resizeLock:
+                    if self.started and self.workers > self.min:
+                        self.workers -= 1
+                        return WorkerStop
+                continue
+            if o is not WorkerStop and self.started:
+                self._startSomeWorkers()
+            return o
+
+
+    def _headWaitTime(self):
+        """
+        @return: How long the call at the head of the queue has been waiting,
+            or C{0} if there is none.
+        """
+        with self.q.mutex:
+            if not self.q.queue:
+                return 0
+            head = self.q.queue[0]
+        if head is WorkerStop:
+            return 0
+        return self.seconds() - head[5]
+
+
+    def full(self):
+        """
+        @return: C{True} if C{maxQueued} calls are already waiting for a
+            thread, so that L{callInThreadWithCallback} would raise
+            L{ThreadPoolFull}.
+        """
+        return self.maxQueued is not None and self.q.qsize() >= self.maxQueued
+
+
+    def callWhenNotFull(self, callback):
+        """
+        Arrange for C{callback} to be called, with no arguments, when there is
+        room in the queue for another call.
+
+        If there is room already, C{callback} is called immediately.
+        Otherwise it is called in one of the pool's threads once a call
+        leaves the queue; one waiting callback is called for each call
+        which does so.  Like the C{onResult} argument of
+        L{callInThreadWithCallback}, it should not block.
+
+        If the pool is stopped first, the waiting callbacks are called by
+        L{stop}, after L{joined} has been set, so that they can tell the
+        pool is no longer accepting calls.
+
+        @param callback: A callable taking no arguments.
+        """
+        with self._lock:
+            if self.full():
+                self._notFullCallbacks.append(callback)
+                return
+        callback()
+
+
+    def _notifyNotFull(self):
+        """
+        Call the first callback waiting in L{callWhenNotFull}, if any.
+        """
+        with self._lock:
+            if not self._notFullCallbacks or self.full():
+                return
+            callback = self._notFullCallbacks.pop(0)
+        try:
+            callback()
+        except:
+            log.err(None, "Error in threadpool callWhenNotFull callback")
+
+
+    def statistics(self):
+        """
+        Summarize the current state and past activity of the pool.
+
+        @return: A C{dict} with these keys:
+            - C{'queued'}: the number of calls waiting for a thread.
+            - C{'maxQueued'}: the limit on C{'queued'}, or C{None}.
+            - C{'busy'}: the number of threads running calls.
+            - C{'idle'}: the number of threads waiting for calls.
+            - C{'threads'}: the number of threads in the pool.
+            - C{'completed'}: the number of calls which have finished.
+            - C{'rejected'}: the number of calls refused with
+              L{ThreadPoolFull}.
+            - C{'waitTime'}: the total number of seconds the completed calls
+              spent in the queue.
+            - C{'maxWaitTime'}: the longest any of them spent there.
+            - C{'runTime'}: the total number of seconds they spent running.
+        """
+        with self._lock:
+            return {
+                'queued': self.q.qsize(),
+                'maxQueued': self.maxQueued,
+                'busy': len(self.working),
+                'idle': len(self.waiters),
+                'threads': self.workers,
+                'completed': self._completed,
+                'rejected': self._rejected,
+                'waitTime': self._waitTime,
+                'maxWaitTime': self._maxWaitTime,
+                'runTime': self._runTime,
+                }
 
 
     def callInThread(self, func, *args, **kw):
@@ -151,11 +330,20 @@ class ThreadPool:
         @param *args: positional arguments to be passed to C{func}
 
         @param **kwargs: keyword arguments to be passed to C{func}
+
+        @raise ThreadPoolFull: If C{maxQueued} calls are already waiting for
+            a thread.  L{callWhenNotFull} can be used to find out when to
+            try again.
         """
         if self.joined:
             return
+        if self.full():
+            with self._lock:
+                self._rejected += 1
+            raise ThreadPoolFull(
+                "%d calls are already queued" % (self.maxQueued,))
         ctx = context.theContextTracker.currentContext().contexts[-1]
-        o = (ctx, func, args, kw, onResult)
+        o = (ctx, func, args, kw, onResult, self.seconds())
         self.q.put(o)
         if self.started:
             self._startSomeWorkers()
@@ -186,12 +374,15 @@ class ThreadPool:
         threadpool is stopped.
         """
         ct = self.currentThread()
-        o = self.q.get()
+        o = self._nextCall()
         while o is not WorkerStop:
+            if self.maxQueued is not None:
+                self._notifyNotFull()
             with self._workerState(self.working, ct):
-                ctx, function, args, kwargs, onResult = o
+                ctx, function, args, kwargs, onResult, queued = o
                 del o
 
+                started = self.seconds()
                 try:
                     result = context.call(ctx, function, *args, **kwargs)
                     success = True
@@ -205,6 +396,14 @@ class ThreadPool:
 
                 del function, args, kwargs
 
+                finished = self.seconds()
+                with self._lock:
+                    self._completed += 1
+                    self._waitTime += started - queued
+                    self._maxWaitTime = max(
+                        self._maxWaitTime, started - queued)
+                    self._runTime += finished - started
+
             if onResult is not None:
                 try:
                     context.call(ctx, onResult, success, result)
@@ -214,7 +413,7 @@ class ThreadPool:
             del ctx, onResult, result
 
             with self._workerState(self.waiters, ct):
-                o = self.q.get()
+                o = self._nextCall()
 
         self.threads.remove(ct)
 
@@ -222,13 +421,23 @@ class ThreadPool:
     def stop(self):
         """
         Shutdown the threads in the threadpool.
+
+        Any callbacks still waiting in L{callWhenNotFull} are called.
         """
         self.joined = True
         self.started = False
-        threads = copy.copy(self.threads)
-        while self.workers:
-            self.q.put(WorkerStop)
-            self.workers -= 1
+        with self._resizeLock:
+            threads = copy.copy(self.threads)
+            while self.workers:
+                self.q.put(WorkerStop)
+                self.workers -= 1
+        with self._lock:
+            notFull, self._notFullCallbacks = self._notFullCallbacks, []
+        for callback in notFull:
+            try:
+                callback()
+            except:
+                log.err(None, "Error in threadpool callWhenNotFull callback")
 
         # and let's just make sure
         # FIXME: threads that have died before calling stop() are not joined.
@@ -250,17 +459,19 @@ class ThreadPool:
         if not self.started:
             return
 
-        # Kill of some threads if we have too many.
-        while self.workers > self.max:
-            self.stopAWorker()
-        # Start some threads if we have too few.
-        while self.workers < self.min:
-            self.startAWorker()
-        # Start some threads if there is a need.
-        self._startSomeWorkers()
+        with self._resizeLock:
+            # Kill of some threads if we have too many.
+            while self.workers > self.max:
+                self.stopAWorker()
+            # Start some threads if we have too few.
+            while self.workers < self.min:
+                self.startAWorker()
+            # Start some threads if there is a need.
+            self._startSomeWorkers()
 
 
     def dumpStats(self):
+        log.msg('statistics: %r' % (self.statistics(),))
         log.msg('queue: %s'   % self.q.queue)
         log.msg('waiters: %s' % self.waiters)
         log.msg('workers: %s' % self.working)
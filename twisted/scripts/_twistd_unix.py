@@ -16,6 +16,13 @@ def _umask(value):
     return int(value, 8)
 
 
+def _workers(value):
+    workers = int(value)
+    if workers < 1:
+        raise ValueError("at least one worker is needed")
+    return workers
+
+
 class ServerOptions(app.ServerOptions):
     synopsis = "Usage: twistd [options]"
 
@@ -42,6 +49,11 @@ class ServerOptions(app.ServerOptions):
                      ['gid', 'g', None, "The gid to run as.", gidFromString],
                      ['umask', None, None,
                       "The (octal) file creation mask to apply.", _umask],
+                     ['workers', None, None,
+                      "Run the application in this many worker processes, "
+                      "restarting them when they exit.  Its listening ports "
+                      "must set SO_REUSEPORT, for example "
+                      "tcp:8080:reusePort=1.", _workers],
                     ]
 
     compData = usage.Completions(
@@ -157,6 +169,44 @@ class UnixAppLogger(app.AppLogger):
 
 
 
+def _workerArguments(argv, subCommand):
+    """
+    Compute the command line arguments for a worker process started by
+    C{twistd --workers}.
+
+    Workers run in the foreground, logging to standard output (which the
+    supervising process logs) unless a log file or syslog was asked for, and
+    leave the PID file to the supervising process.
+
+    @param argv: The arguments the supervising process was given, not
+        including the program name.
+    @type argv: C{list} of C{str}
+
+    @param subCommand: The name of the sub command in C{argv}, or C{None}.
+    @type subCommand: C{str} or C{NoneType}
+
+    @return: The arguments to give the worker, not including the program
+        name.
+    @rtype: C{list} of C{str}
+    """
+    arguments = ['--nodaemon', '--logfile=-', '--pidfile=']
+    argv = iter(argv)
+    for argument in argv:
+        if argument == subCommand:
+            # The rest belongs to the sub command.
+            arguments.append(argument)
+            arguments.extend(argv)
+            break
+        name = argument.split('=', 1)[0]
+        if name in ('--workers', '--pidfile'):
+            if name == argument:
+                next(argv, None)
+            continue
+        arguments.append(argument)
+    return arguments
+
+
+
 def launchWithName(name):
     if name and name != sys.argv[0]:
         exe = os.path.realpath(sys.executable)
@@ -169,6 +219,11 @@ class UnixApplicationRunner(app.ApplicationRunner):
     """
     An ApplicationRunner which does Unix-specific things, like fork,
     shed privileges, and maintain a PID file.
+
+    If the C{workers} option is given, the application is not run in this
+    process.  Instead, that many worker processes are started to run it and
+    restarted when they exit.  Stopping this process stops the workers, and
+    sending it C{SIGHUP} restarts them.
     """
     loggerFactory = UnixAppLogger
 
@@ -209,6 +264,48 @@ class UnixApplicationRunner(app.ApplicationRunner):
         self.removePID(self.config['pidfile'])
 
 
+    def createOrGetApplication(self):
+        """
+        Create or load the application to run, or if the C{workers} option was
+        given, create an application which supervises the worker processes.
+        """
+        if self.config['workers'] is not None:
+            return self.createWorkerSupervisor()
+        return app.ApplicationRunner.createOrGetApplication(self)
+
+
+    def createWorkerSupervisor(self):
+        """
+        Create an application running a
+        L{twisted.runner.procmon.ProcessMonitor} which keeps as many worker
+        processes as the C{workers} option asks for running this twistd
+        command line, and restarts them all on C{SIGHUP}.
+
+        @return: The supervising application.
+        """
+        from twisted.internet import reactor
+        from twisted.runner.procmon import ProcessMonitor
+
+        # Persisting the supervisor in place of the application would be
+        # wrong; the workers save the application themselves if asked to.
+        self.config['no_save'] = True
+        arguments = [sys.executable, sys.argv[0]] + _workerArguments(
+            sys.argv[1:], self.config.subCommand)
+        monitor = ProcessMonitor(reactor)
+        for i in range(self.config['workers']):
+            monitor.addProcess(
+                'worker-%d' % (i + 1,), arguments, env=os.environ.copy())
+
+        import signal
+        signal.signal(
+            signal.SIGHUP,
+            lambda *args: reactor.callFromThread(monitor.restartAll))
+
+        application = service.Application('twistd-workers')
+        monitor.setServiceParent(application)
+        return application
+
+
     def removePID(self, pidfile):
         """
         Remove the specified PID file, if possible.  Errors are logged, not
@@ -373,18 +470,26 @@ class UnixApplicationRunner(app.ApplicationRunner):
         process = service.IProcess(application)
         if not self.config['originalname']:
             launchWithName(process.processName)
+        supervising = self.config['workers'] is not None
+        if supervising:
+            # The workers change their root and working directory themselves,
+            # and keep any privileges they need until they have bound their
+            # ports.
+            chroot, rundir = None, '.'
+        else:
+            chroot, rundir = self.config['chroot'], self.config['rundir']
         self.setupEnvironment(
-            self.config['chroot'], self.config['rundir'],
-            self.config['nodaemon'], self.config['umask'],
+            chroot, rundir, self.config['nodaemon'], self.config['umask'],
             self.config['pidfile'])
 
         service.IService(application).privilegedStartService()
 
-        uid, gid = self.config['uid'], self.config['gid']
-        if uid is None:
-            uid = process.uid
-        if gid is None:
-            gid = process.gid
+        if not supervising:
+            uid, gid = self.config['uid'], self.config['gid']
+            if uid is None:
+                uid = process.uid
+            if gid is None:
+                gid = process.gid
 
-        self.shedPrivileges(self.config['euid'], uid, gid)
+            self.shedPrivileges(self.config['euid'], uid, gid)
         app.startApplication(application, not self.config['no_save'])
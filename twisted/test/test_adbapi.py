@@ -807,6 +807,32 @@ class ConnectionPoolTestCase(unittest.TestCase):
         self.assertFalse(reactor.triggers)
 
 
+    def test_maxQueued(self):
+        """
+        The C{cp_max_queued} argument to L{ConnectionPool} limits the number
+        of operations which may be queued in its threadpool.
+        """
+        reactor = EventReactor(False)
+        pool = ConnectionPool('twisted.test.test_adbapi', cp_reactor=reactor,
+                              cp_max_queued=7)
+        self.assertEqual(pool.threadpool.maxQueued, 7)
+        pool.close()
+
+
+    def test_statistics(self):
+        """
+        L{ConnectionPool.statistics} returns the statistics of its
+        threadpool.
+        """
+        reactor = EventReactor(False)
+        pool = ConnectionPool('twisted.test.test_adbapi', cp_reactor=reactor)
+        statistics = pool.statistics()
+        self.assertEqual(statistics['queued'], 0)
+        self.assertEqual(statistics['completed'], 0)
+        self.assertIdentical(statistics['maxQueued'], None)
+        pool.close()
+
+
     def test_startedClose(self):
         """
         If L{ConnectionPool.close} is called after it has been started, but
@@ -709,3 +709,157 @@ class RunStateTests(unittest.TestCase):
 
 
 
+
+
+
+class SchedulingTests(unittest.TestCase):
+    """
+    Tests for the priority classes, weights, work accounting and adaptive
+    time budget of L{task.Cooperator}.
+    """
+
+    def setUp(self):
+        """
+        Create a cooperator with a fake scheduler and a fake clock whose steps
+        each run a fixed number of work units.
+        """
+        self.scheduler = FakeScheduler()
+        self.now = 0.0
+        self.budgets = []
+        self.unitsPerStep = 6
+        self.cooperator = task.Cooperator(
+            scheduler=self.scheduler,
+            terminationPredicateFactory=self.terminationPredicate,
+            seconds=lambda: self.now)
+        self.ran = []
+
+
+    def terminationPredicate(self, *budget):
+        """
+        Record the budget given, if any, and return a predicate which stops
+        the step after C{self.unitsPerStep} units of work.
+        """
+        self.budgets.extend(budget)
+        units = iter(range(self.unitsPerStep - 1, -1, -1))
+        return lambda: not next(units)
+
+
+    def worker(self, name, units=100, duration=0.0):
+        """
+        Generate units of work which record C{name} and advance the clock by
+        C{duration}.
+        """
+        for i in range(units):
+            self.ran.append(name)
+            self.now += duration
+            yield None
+
+
+    def test_priority(self):
+        """
+        Tasks of a lower priority class do not run while a task of a higher
+        class is able to, and do once it is not.
+        """
+        self.cooperator.cooperate(self.worker("low"), priority=0)
+        high = self.cooperator.cooperate(self.worker("high"), priority=1)
+        self.scheduler.pump()
+        self.assertEqual(self.ran, ["high"] * 6)
+        del self.ran[:]
+        high.pause()
+        self.scheduler.pump()
+        self.assertEqual(self.ran, ["low"] * 6)
+
+
+    def test_higherPriorityAdded(self):
+        """
+        A task of a higher priority class added while lower ones are running
+        runs from the next work unit.
+        """
+        def add():
+            self.cooperator.cooperate(self.worker("high"), priority=1)
+            while True:
+                yield None
+        self.cooperator.cooperate(self.worker("low"))
+        self.cooperator.cooperate(add())
+        self.cooperator.cooperate(self.worker("low"))
+        self.unitsPerStep = 3
+        self.scheduler.pump()
+        self.assertEqual(self.ran, ["low", "high"])
+
+
+    def test_weight(self):
+        """
+        Each task performs as many work units in a row as its weight.
+        """
+        self.cooperator.cooperate(self.worker("a"), weight=2)
+        self.cooperator.cooperate(self.worker("b"))
+        self.scheduler.pump()
+        self.assertEqual(self.ran, ["a", "a", "b", "a", "a", "b"])
+
+
+    def test_invalidWeight(self):
+        """
+        L{task.Cooperator.cooperate} raises L{ValueError} if C{weight} is less
+        than 1.
+        """
+        self.assertRaises(ValueError, self.cooperator.cooperate,
+                          self.worker("a"), weight=0)
+
+
+    def test_workAccounting(self):
+        """
+        L{task.CooperativeTask.workUnits} and L{task.CooperativeTask.workTime}
+        count the work units a task has performed and the time they took.
+        """
+        a = self.cooperator.cooperate(self.worker("a", duration=0.5))
+        b = self.cooperator.cooperate(self.worker("b", 2))
+        self.scheduler.pump()
+        self.assertEqual((a.workUnits, a.workTime), (3, 1.5))
+        self.assertEqual((b.workUnits, b.workTime), (3, 0.0))
+
+
+    def test_budgetWithoutLagTarget(self):
+        """
+        Without a C{lagTarget}, the termination predicate factory is called
+        with no arguments, but C{lag} is still measured.
+        """
+        self.cooperator.cooperate(self.worker("a"))
+        self.now += 0.5
+        self.scheduler.pump()
+        self.assertEqual(self.budgets, [])
+        self.assertEqual(self.cooperator.lag, 0.5)
+
+
+    def test_adaptiveBudget(self):
+        """
+        With a C{lagTarget}, the time budget passed to the termination
+        predicate factory is halved, down to C{minimumBudget}, after a step
+        which started later than C{lagTarget}, and grows back after steps
+        which started less than half as late.
+        """
+        cooperator = task.Cooperator(
+            scheduler=self.scheduler,
+            terminationPredicateFactory=self.terminationPredicate,
+            lagTarget=0.05, seconds=lambda: self.now)
+        cooperator.cooperate(self.worker("a"))
+        maxSlice = task._Timer.MAX_SLICE
+        for i in range(5):
+            self.now += 0.1
+            self.scheduler.pump()
+        self.assertEqual(
+            self.budgets,
+            [maxSlice / 2, maxSlice / 4, maxSlice / 8, cooperator.minimumBudget,
+             cooperator.minimumBudget])
+        self.scheduler.pump()
+        self.assertEqual(self.budgets[-1], cooperator.minimumBudget * 1.25)
+        for i in range(20):
+            self.scheduler.pump()
+        self.assertEqual(cooperator.timeBudget, maxSlice)
+
+
+    def test_timerBudget(self):
+        """
+        The default termination predicate factory accepts a time budget.
+        """
+        self.assertTrue(task._Timer(-1)())
+        self.assertFalse(task._Timer(60)())
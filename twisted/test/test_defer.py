@@ -9,6 +9,7 @@ from __future__ import division, absolute_import
 
 import warnings
 import gc, traceback
+import weakref
 import re
 
 from twisted.python import failure, log
@@ -530,6 +531,79 @@ class DeferredTestCase(unittest.SynchronousTestCase, ImmediateFailureMixin):
         self.assertEqual(result, [None])
 
 
+    def test_callbacksDiscardedAfterRunning(self):
+        """
+        Callbacks which have run are removed from L{Deferred.callbacks}, while
+        those which have not yet run because the L{Deferred} is waiting on
+        another L{Deferred} are kept.
+        """
+        waitOn = defer.Deferred()
+        d = defer.Deferred()
+        d.addCallback(lambda ignored: waitOn)
+        d.addCallback(lambda result: result + 1)
+        d.callback(None)
+        self.assertEqual(len(d.callbacks), 1)
+        waitOn.callback(1)
+        self.assertEqual(d.callbacks, [])
+        self.assertEqual(self.successResultOf(d), 2)
+
+
+    def test_callbacksAddedWhileRunning(self):
+        """
+        Callbacks added to a L{Deferred} by one of its own callbacks are run
+        after the callbacks which were already there, with the arguments they
+        were added with.
+        """
+        calls = []
+        d = defer.Deferred()
+        def first(result):
+            d.addBoth(lambda result, extra: result + extra, extra=1)
+            d.addCallback(calls.append)
+            d.addErrback(calls.append)
+            return result
+        d.addCallback(first)
+        d.addCallback(lambda result, extra: result + extra, 1)
+        d.callback(1)
+        self.assertEqual(calls, [3])
+        self.assertEqual(self.successResultOf(d), None)
+
+
+    def test_succeed(self):
+        """
+        L{defer.succeed} returns a L{Deferred} which has been called with the
+        given result and which has no callbacks.
+        """
+        d = defer.succeed(1)
+        self.assertTrue(d.called)
+        self.assertEqual(d.callbacks, [])
+        self.assertEqual(self.successResultOf(d), 1)
+
+
+    def test_succeedFailure(self):
+        """
+        A L{failure.Failure} passed to L{defer.succeed} becomes the failure
+        result of the returned L{Deferred}, and is logged if it is not
+        handled.
+        """
+        d = defer.succeed(failure.Failure(GenericError()))
+        self.failureResultOf(d, GenericError)
+        d = defer.succeed(failure.Failure(GenericError()))
+        del d
+        gc.collect()
+        self.assertEqual(len(self.flushLoggedErrors(GenericError)), 1)
+
+
+    def test_attributes(self):
+        """
+        Attributes other than those used by L{Deferred} itself can be set on
+        an instance, and it can be weakly referenced.
+        """
+        d = defer.Deferred()
+        d.extra = 1
+        self.assertEqual(d.extra, 1)
+        self.assertIdentical(weakref.ref(d)(), d)
+
+
     def test_gatherResults(self):
         # test successful list of deferreds
         l = []
@@ -2228,6 +2302,204 @@ class OtherPrimitives(unittest.SynchronousTestCase, ImmediateFailureMixin):
 
 
 
+class DeferredFanOutTests(unittest.SynchronousTestCase):
+    """
+    Tests for L{defer.DeferredFanOut} and L{defer.gatherBounded}.
+    """
+
+    def setUp(self):
+        """
+        Create a list of unfired L{Deferred}s and an iterable of calls which
+        return them, recording which have been started and which have been
+        cancelled.
+        """
+        self.cancelled = []
+        self.deferreds = [
+            defer.Deferred(self.cancelled.append) for i in range(5)]
+        self.started = []
+
+
+    def calls(self):
+        """
+        Generate calls returning the L{Deferred}s in C{self.deferreds}.
+        """
+        for i, d in enumerate(self.deferreds):
+            def call(i=i, d=d):
+                self.started.append(i)
+                return d
+            yield call
+
+
+    def test_invalidConcurrency(self):
+        """
+        L{defer.DeferredFanOut} raises L{ValueError} if C{concurrency} is
+        less than 1.
+        """
+        self.assertRaises(ValueError, defer.DeferredFanOut, self.calls(), 0)
+
+
+    def test_concurrency(self):
+        """
+        At most C{concurrency} calls are started, and calls are taken from
+        the iterable only as they are started.
+        """
+        calls = self.calls()
+        defer.DeferredFanOut(calls, 2)
+        self.assertEqual(self.started, [0, 1])
+        self.assertEqual(len(list(calls)), 3)
+
+
+    def test_completionOrder(self):
+        """
+        L{defer.DeferredFanOut.get} delivers C{(index, result)} pairs in the
+        order the calls complete, and then C{None}.
+        """
+        fanOut = defer.DeferredFanOut(self.calls(), 5)
+        first = fanOut.get()
+        self.assertNoResult(first)
+        self.deferreds[3].callback("d")
+        self.assertEqual(self.successResultOf(first), (3, "d"))
+        for i in [1, 4, 0, 2]:
+            self.deferreds[i].callback(i)
+        self.assertEqual(
+            [self.successResultOf(fanOut.get()) for i in range(5)],
+            [(1, 1), (4, 4), (0, 0), (2, 2), None])
+
+
+    def test_capacityReleasedOnGet(self):
+        """
+        A call's capacity is given back when its result is retrieved, not
+        when it completes.
+        """
+        fanOut = defer.DeferredFanOut(self.calls(), 2)
+        self.deferreds[0].callback(None)
+        self.assertEqual(self.started, [0, 1])
+        fanOut.get()
+        self.assertEqual(self.started, [0, 1, 2])
+
+
+    def test_synchronousCalls(self):
+        """
+        Calls which return plain results or raise exceptions are supported,
+        and many synchronous calls do not exhaust the stack.
+        """
+        def raiser():
+            raise GenericError()
+        fanOut = defer.DeferredFanOut([lambda: 1, raiser], 1)
+        self.assertEqual(self.successResultOf(fanOut.get()), (0, 1))
+        failure = self.failureResultOf(fanOut.get(), defer.FirstError)
+        self.assertEqual(failure.value.index, 1)
+        failure.value.subFailure.trap(GenericError)
+
+        calls = (lambda: defer.succeed(i) for i in range(10000))
+        d = defer.gatherBounded(calls, 3)
+        self.assertEqual(len(self.successResultOf(d)), 10000)
+
+
+    def test_failure(self):
+        """
+        When a call fails, the running calls are cancelled and no more are
+        started.  Results which already completed are delivered before a
+        L{defer.FirstError} wrapping the failure.
+        """
+        fanOut = defer.DeferredFanOut(self.calls(), 3)
+        self.deferreds[2].callback("c")
+        self.deferreds[0].errback(GenericError())
+        self.assertEqual(self.cancelled, [self.deferreds[1]])
+        self.assertEqual(self.started, [0, 1, 2])
+        self.assertEqual(self.successResultOf(fanOut.get()), (2, "c"))
+        failure = self.failureResultOf(fanOut.get(), defer.FirstError)
+        self.assertEqual(failure.value.index, 0)
+
+
+    def test_failureWhileWaiting(self):
+        """
+        A L{Deferred} returned by L{defer.DeferredFanOut.get} which is
+        waiting for a result fails when a call fails.
+        """
+        fanOut = defer.DeferredFanOut(self.calls(), 2)
+        waiting = fanOut.get()
+        self.deferreds[1].errback(GenericError())
+        self.failureResultOf(waiting, defer.FirstError)
+
+
+    def test_iterableFailure(self):
+        """
+        An exception raised by the iterable of calls ends the fan-out with
+        that exception.
+        """
+        def calls():
+            yield lambda: 1
+            raise GenericError()
+        fanOut = defer.DeferredFanOut(calls(), 5)
+        self.assertEqual(self.successResultOf(fanOut.get()), (0, 1))
+        self.failureResultOf(fanOut.get(), GenericError)
+
+
+    def test_cancel(self):
+        """
+        L{defer.DeferredFanOut.cancel} cancels the running calls, and
+        L{defer.DeferredFanOut.get} then fails with L{defer.CancelledError}.
+        """
+        fanOut = defer.DeferredFanOut(self.calls(), 2)
+        fanOut.cancel()
+        self.assertEqual(set(self.cancelled), set(self.deferreds[:2]))
+        self.failureResultOf(fanOut.get(), defer.CancelledError)
+        self.assertEqual(self.started, [0, 1])
+
+
+    def test_cancelGet(self):
+        """
+        Cancelling a L{Deferred} returned by L{defer.DeferredFanOut.get}
+        does not affect the calls, whose results are left for the next
+        L{defer.DeferredFanOut.get}.
+        """
+        fanOut = defer.DeferredFanOut(self.calls(), 2)
+        waiting = fanOut.get()
+        waiting.cancel()
+        self.failureResultOf(waiting, defer.CancelledError)
+        self.deferreds[0].callback("a")
+        self.assertEqual(self.successResultOf(fanOut.get()), (0, "a"))
+
+
+    def test_gatherBounded(self):
+        """
+        L{defer.gatherBounded} fires with the results of the calls in the
+        order of the calls.
+        """
+        d = defer.gatherBounded(self.calls(), 2)
+        for i in [1, 0, 3, 2, 4]:
+            self.deferreds[i].callback(i)
+        self.assertEqual(self.successResultOf(d), [0, 1, 2, 3, 4])
+
+
+    def test_gatherBoundedFailure(self):
+        """
+        If a call fails, the L{Deferred} returned by L{defer.gatherBounded}
+        fails with a L{defer.FirstError} and the running calls are
+        cancelled.
+        """
+        d = defer.gatherBounded(self.calls(), 2)
+        self.deferreds[1].errback(GenericError())
+        failure = self.failureResultOf(d, defer.FirstError)
+        self.assertEqual(failure.value.index, 1)
+        self.assertEqual(self.cancelled, [self.deferreds[0]])
+        self.assertEqual(self.started, [0, 1])
+
+
+    def test_gatherBoundedCancel(self):
+        """
+        Cancelling the L{Deferred} returned by L{defer.gatherBounded} cancels
+        the running calls.
+        """
+        d = defer.gatherBounded(self.calls(), 2)
+        d.cancel()
+        self.failureResultOf(d, defer.CancelledError)
+        self.assertEqual(set(self.cancelled), set(self.deferreds[:2]))
+        self.assertEqual(self.started, [0, 1])
+
+
+
 class DeferredFilesystemLockTestCase(unittest.TestCase):
     """
     Test the behavior of L{DeferredFilesystemLock}
@@ -296,6 +296,46 @@ class InlineCallbacksTests(BaseDefgenTests, unittest.TestCase):
         return _return().addCallback(self.assertEqual, 6)
 
 
+    def test_yieldFired(self):
+        """
+        The result of a L{Deferred} which has already fired is taken by the
+        generator which yields it, leaving C{None} in its place, and a failure
+        taken this way is not logged as unhandled.
+        """
+        succeeded = defer.succeed(1)
+        failed = defer.fail(TerminalException("taken"))
+        results = []
+        def _yieldFired():
+            results.append((yield succeeded))
+            try:
+                yield failed
+            except TerminalException as e:
+                results.append(str(e))
+        _yieldFired = inlineCallbacks(_yieldFired)
+
+        self.successResultOf(_yieldFired())
+        self.assertEqual(results, [1, "taken"])
+        self.assertIdentical(self.successResultOf(succeeded), None)
+        self.assertIdentical(self.successResultOf(failed), None)
+
+
+    def test_yieldPausedFired(self):
+        """
+        A L{Deferred} which has fired but is paused is waited on until it is
+        unpaused.
+        """
+        paused = defer.succeed(1)
+        paused.pause()
+        def _yieldPaused():
+            returnValue((yield paused))
+        _yieldPaused = inlineCallbacks(_yieldPaused)
+
+        d = _yieldPaused()
+        self.assertNoResult(d)
+        paused.unpause()
+        self.assertEqual(self.successResultOf(d), 1)
+
+
     def test_nonGeneratorReturn(self):
         """
         Ensure that C{TypeError} with a message about L{inlineCallbacks} is
@@ -12,7 +12,8 @@ import pickle
 from twisted.trial.unittest import TestCase
 
 from twisted.internet.task import Clock
-from twisted.internet.protocol import ReconnectingClientFactory, Protocol
+from twisted.internet.protocol import (
+    Factory, ReconnectingClientFactory, Protocol)
 
 
 class FakeConnector(object):
@@ -143,3 +144,44 @@ class ReconnectingFactoryTestCase(TestCase):
 
         factory.clientConnectionLost(FakeConnector(), None)
         self.assertEqual(len(clock.calls), 1)
+
+
+
+class WriteBufferLimitsTests(TestCase):
+    """
+    Tests for L{Factory.writeBufferLimits}.
+    """
+    def test_applied(self):
+        """
+        The limits are passed to the C{setWriteBufferLimits} method of the
+        transport of a protocol built by the factory when it is connected.
+        """
+        limits = []
+        class Transport(object):
+            def setWriteBufferLimits(self, high=None, low=None):
+                limits.append((high, low))
+
+        factory = Factory.forProtocol(Protocol)
+        factory.writeBufferLimits = (1024, None)
+        factory.buildProtocol(None).makeConnection(Transport())
+        self.assertEqual(limits, [(1024, None)])
+
+
+    def test_unsupportedTransport(self):
+        """
+        The limits are ignored if the transport has no
+        C{setWriteBufferLimits} method, and the protocol is still connected
+        to it.
+        """
+        made = []
+        class RecordingProtocol(Protocol):
+            def connectionMade(self):
+                made.append(self.transport)
+
+        factory = Factory.forProtocol(RecordingProtocol)
+        factory.writeBufferLimits = (1024, 256)
+        protocol = factory.buildProtocol(None)
+        transport = object()
+        protocol.makeConnection(transport)
+        self.assertIs(protocol.transport, transport)
+        self.assertEqual(made, [transport])
@@ -8,13 +8,17 @@ Test code for policies.
 from __future__ import division, absolute_import
 
 from zope.interface import Interface, implementer, implementedBy
+from zope.interface.verify import verifyObject
 
 from twisted.python.compat import NativeStringIO
 from twisted.trial import unittest
 from twisted.test.proto_helpers import StringTransport
 from twisted.test.proto_helpers import StringTransportWithDisconnection
 
-from twisted.internet import protocol, reactor, address, defer, task
+from twisted.internet import protocol, reactor, address, defer, task, error
+from twisted.internet.interfaces import IReactorTime, IDelayedCall
+from twisted.internet.interfaces import (
+    ISendFileTransport, ITransport, IConsumer)
 from twisted.protocols import policies
 
 
@@ -165,6 +169,26 @@ class WrapperTestCase(unittest.TestCase):
         self.assertTrue(IStubTransport.providedBy(proto.transport))
 
 
+    def test_sendFileNotProvided(self):
+        """
+        L{policies.ProtocolWrapper} does not provide L{ISendFileTransport},
+        even if the transport it wraps does, and its C{sendFile} refuses to
+        send a file past the wrapper.
+        """
+        @implementer(ISendFileTransport)
+        class SendFileTransport(StringTransport):
+            def sendFile(self, fileObject, offset, count):
+                raise AssertionError("sendFile should not be called")
+
+        wrapper = policies.ProtocolWrapper(
+            policies.WrappingFactory(None), protocol.Protocol())
+        wrapper.makeConnection(SendFileTransport())
+        self.assertFalse(ISendFileTransport.providedBy(wrapper))
+        self.assertTrue(ITransport.providedBy(wrapper))
+        self.assertTrue(IConsumer.providedBy(wrapper))
+        self.assertRaises(NotImplementedError, wrapper.sendFile, None, 0, None)
+
+
     def test_factoryLogPrefix(self):
         """
         L{WrappingFactory.logPrefix} is customized to mention both the original
@@ -584,6 +608,30 @@ class TimeoutTestCase(unittest.TestCase):
         self.failUnless(self.proto.wrappedProtocol.disconnected)
 
 
+    def test_timeoutClock(self):
+        """
+        L{policies.TimeoutFactory} schedules the timeouts of the connections
+        it builds with its C{timeoutClock}, if it is given one.
+        """
+        manager = policies.IdleTimeoutManager(self.clock)
+        wrappedFactory = protocol.ServerFactory()
+        wrappedFactory.protocol = SimpleProtocol
+        factory = policies.TimeoutFactory(wrappedFactory, 3, manager)
+        proto = factory.buildProtocol(
+            address.IPv4Address('TCP', '127.0.0.1', 12345))
+        transport = StringTransportWithDisconnection()
+        transport.protocol = proto
+        proto.makeConnection(transport)
+        self.assertEqual(manager.getDelayedCalls(), [proto.timeoutCall])
+
+        self.clock.pump([1.0] * 2)
+        proto.dataReceived(b'bytes')
+        self.clock.pump([1.0] * 2)
+        self.assertFalse(proto.wrappedProtocol.disconnected)
+        self.clock.advance(1)
+        self.assertTrue(proto.wrappedProtocol.disconnected)
+
+
 
 class TimeoutTester(protocol.Protocol, policies.TimeoutMixin):
     """
@@ -661,6 +709,20 @@ class TestTimeout(unittest.TestCase):
         self.assertEqual(len(self.clock.calls), 1)
 
 
+    def test_timeoutClock(self):
+        """
+        If C{timeoutClock} is set, the timeout is scheduled with it instead of
+        the reactor.
+        """
+        proto = policies.TimeoutMixin()
+        proto.timeoutClock = self.clock
+        proto.timeoutConnection = lambda: setattr(proto, "timedOut", True)
+        proto.setTimeout(3)
+        self.assertEqual(len(self.clock.calls), 1)
+        self.clock.advance(3)
+        self.assertTrue(proto.timedOut)
+
+
     def test_timeout(self):
         """
         Check that the protocol does timeout at the time specified by its
@@ -737,6 +799,287 @@ class TestTimeout(unittest.TestCase):
 
 
 
+class IdleTimeoutManagerTests(unittest.TestCase):
+    """
+    Tests for L{policies.IdleTimeoutManager}.
+    """
+
+    def setUp(self):
+        """
+        Create a L{policies.IdleTimeoutManager} ticking every second with a
+        deterministic clock.
+        """
+        self.clock = task.Clock()
+        self.manager = policies.IdleTimeoutManager(self.clock, 1.0)
+        self.called = []
+
+
+    def test_interfaces(self):
+        """
+        L{policies.IdleTimeoutManager} is a L{task.CoalescingClock} with
+        windows of C{granularity} seconds, so it provides L{IReactorTime},
+        and its timeouts provide L{IDelayedCall}.
+        """
+        self.assertIsInstance(self.manager, task.CoalescingClock)
+        self.assertEqual(self.manager.granularity, 1.0)
+        self.assertEqual(self.manager.slack, 1.0)
+        self.assertTrue(verifyObject(IReactorTime, self.manager))
+        timeout = self.manager.callLater(1, self.called.append, 1)
+        self.assertTrue(verifyObject(IDelayedCall, timeout))
+
+
+    def test_invalidGranularity(self):
+        """
+        L{policies.IdleTimeoutManager} raises L{ValueError} if C{granularity}
+        is not positive.
+        """
+        self.assertRaises(
+            ValueError, policies.IdleTimeoutManager, self.clock, 0)
+
+
+    def test_seconds(self):
+        """
+        L{policies.IdleTimeoutManager.seconds} returns the time of the
+        underlying clock.
+        """
+        self.clock.advance(12.5)
+        self.assertEqual(self.manager.seconds(), 12.5)
+
+
+    def test_clockJump(self):
+        """
+        When the clock jumps far ahead, such as after the machine has been
+        suspended, the timeouts which have become due run in the order of
+        the ticks they fell due in, in a single sweep.
+        """
+        self.manager.callLater(5, self.called.append, 2)
+        self.manager.callLater(1, self.called.append, 1)
+        self.clock.advance(10 ** 12)
+        self.assertEqual(self.called, [1, 2])
+        self.assertEqual(self.manager.getDelayedCalls(), [])
+        self.assertEqual(self.clock.getDelayedCalls(), [])
+
+
+    def test_notEarly(self):
+        """
+        A timeout runs, with the given arguments, at the end of the tick its
+        time falls in.
+        """
+        timeout = self.manager.callLater(
+            2.5, lambda *a, **kw: self.called.append((a, kw)), 1, b=2)
+        self.assertEqual(timeout.getTime(), 2.5)
+        self.clock.pump([1.0] * 2)
+        self.assertEqual(self.called, [])
+        self.assertTrue(timeout.active())
+        self.clock.advance(1)
+        self.assertEqual(self.called, [((1,), {"b": 2})])
+        self.assertFalse(timeout.active())
+        self.assertEqual(self.manager.getDelayedCalls(), [])
+        self.assertEqual(self.clock.getDelayedCalls(), [])
+
+
+    def test_oneTimedCall(self):
+        """
+        However many ticks have timeouts due, the underlying clock has one
+        timed call, for the end of the earliest of them.
+        """
+        self.manager.callLater(43200, self.called.append, 2)
+        self.manager.callLater(7, self.called.append, 1)
+        self.manager.callLater(30, self.called.append, 1)
+        [tick] = self.clock.getDelayedCalls()
+        self.assertEqual(tick.getTime(), 7.0)
+        self.clock.advance(7)
+        self.assertEqual(self.called, [1])
+        [tick] = self.clock.getDelayedCalls()
+        self.assertEqual(tick.getTime(), 30.0)
+
+
+    def test_resetOnlyRecordsDeadline(self):
+        """
+        Postponing a timeout with C{reset}, however often, does not touch the
+        underlying clock: it has one timed call, for the tick the timeout was
+        first due in, which is neither reset nor replaced.
+        """
+        timeout = self.manager.callLater(3, self.called.append, 1)
+        [tick] = self.clock.getDelayedCalls()
+        for i in range(1000):
+            self.clock.advance(0.001)
+            timeout.reset(3)
+        self.assertEqual(self.clock.getDelayedCalls(), [tick])
+        self.assertEqual(tick.getTime(), 3.0)
+
+
+    def test_reset(self):
+        """
+        A postponed timeout runs at the end of the tick its new time falls
+        in.
+        """
+        timeout = self.manager.callLater(3, self.called.append, 1)
+        self.clock.pump([1.0] * 2)
+        timeout.reset(3)
+        self.clock.pump([1.0] * 2)
+        self.assertEqual(self.called, [])
+        self.clock.advance(1)
+        self.assertEqual(self.called, [1])
+
+
+    def test_resetSooner(self):
+        """
+        A timeout brought forward with C{reset} runs at its new time, and
+        the underlying clock's timed call is brought forward with it.
+        """
+        timeout = self.manager.callLater(30, self.called.append, 1)
+        timeout.reset(1)
+        self.assertEqual(timeout.getTime(), 1.0)
+        [tick] = self.clock.getDelayedCalls()
+        self.assertEqual(tick.getTime(), 1.0)
+        self.clock.advance(1)
+        self.assertEqual(self.called, [1])
+
+
+    def test_delay(self):
+        """
+        C{delay} postpones a timeout by the given number of seconds.
+        """
+        timeout = self.manager.callLater(1, self.called.append, 1)
+        timeout.delay(2)
+        self.assertEqual(timeout.getTime(), 3.0)
+        self.clock.pump([1.0] * 2)
+        self.assertEqual(self.called, [])
+        self.clock.advance(1)
+        self.assertEqual(self.called, [1])
+
+
+    def test_cancel(self):
+        """
+        A cancelled timeout does not run, and once there are no timeouts left
+        the manager stops sweeping.
+        """
+        timeout = self.manager.callLater(1, self.called.append, 1)
+        timeout.cancel()
+        self.assertFalse(timeout.active())
+        self.assertEqual(self.manager.getDelayedCalls(), [])
+        self.assertEqual(self.clock.getDelayedCalls(), [])
+        self.assertRaises(error.AlreadyCancelled, timeout.cancel)
+        self.assertRaises(error.AlreadyCancelled, timeout.reset, 1)
+        self.clock.advance(10)
+        self.assertEqual(self.called, [])
+
+
+    def test_cancelEarliest(self):
+        """
+        Cancelling the timeouts of the earliest tick with any leaves the
+        timeouts of later ticks to run at their own times.
+        """
+        timeout = self.manager.callLater(1, self.called.append, 1)
+        self.manager.callLater(5, self.called.append, 5)
+        timeout.cancel()
+        self.clock.pump([1.0] * 4)
+        self.assertEqual(self.called, [])
+        self.clock.advance(1)
+        self.assertEqual(self.called, [5])
+        self.assertEqual(self.clock.getDelayedCalls(), [])
+
+
+    def test_alreadyCalled(self):
+        """
+        A timeout which has run cannot be cancelled or reset.
+        """
+        timeout = self.manager.callLater(0, self.called.append, 1)
+        self.clock.advance(1)
+        self.assertRaises(error.AlreadyCalled, timeout.cancel)
+        self.assertRaises(error.AlreadyCalled, timeout.reset, 1)
+
+
+    def test_cancelledDuringSweep(self):
+        """
+        A timeout cancelled by another which runs in the same sweep does not
+        run.
+        """
+        timeouts = []
+        def first():
+            self.called.append(1)
+            for timeout in timeouts:
+                if timeout.active():
+                    timeout.cancel()
+        timeouts.append(self.manager.callLater(1, first))
+        timeouts.append(self.manager.callLater(1, first))
+        self.clock.advance(2)
+        self.assertEqual(self.called, [1])
+        self.assertEqual(self.clock.getDelayedCalls(), [])
+
+
+    def test_scheduledDuringSweep(self):
+        """
+        A timeout scheduled by another while it runs is run at a later sweep.
+        """
+        def first():
+            self.manager.callLater(1, self.called.append, 2)
+        self.manager.callLater(1, first)
+        self.clock.advance(1)
+        self.assertEqual(self.called, [])
+        self.assertEqual(len(self.clock.getDelayedCalls()), 1)
+        self.clock.advance(1)
+        self.assertEqual(self.called, [2])
+
+
+    def test_idleRestart(self):
+        """
+        A timeout scheduled after the manager has been idle is measured from
+        the time it is scheduled.
+        """
+        self.manager.callLater(0, self.called.append, 1)
+        self.clock.advance(1)
+        self.clock.advance(100)
+        timeout = self.manager.callLater(2, self.called.append, 2)
+        self.assertEqual(timeout.getTime(), 103.0)
+        self.clock.advance(1)
+        self.assertEqual(self.called, [1])
+        self.clock.advance(1)
+        self.assertEqual(self.called, [1, 2])
+
+
+    def test_errorLogged(self):
+        """
+        An exception raised by a timeout is logged, and the other timeouts in
+        the same sweep still run.
+        """
+        self.manager.callLater(1, lambda: 1 // 0)
+        self.manager.callLater(1, self.called.append, 1)
+        self.clock.advance(2)
+        self.assertEqual(self.called, [1])
+        self.assertEqual(len(self.flushLoggedErrors(ZeroDivisionError)), 1)
+
+
+    def test_timeoutMixin(self):
+        """
+        Many L{policies.TimeoutMixin} protocols sharing a manager as their
+        C{timeoutClock} cost the underlying clock one timed call, and are
+        timed out once they stop receiving data.
+        """
+        protocols = []
+        for i in range(100):
+            proto = policies.TimeoutMixin()
+            proto.timeoutClock = self.manager
+            proto.timeoutConnection = (
+                lambda proto=proto: self.called.append(proto))
+            proto.setTimeout(3)
+            protocols.append(proto)
+        self.assertEqual(len(self.clock.getDelayedCalls()), 1)
+        for i in range(2):
+            self.clock.advance(1)
+            for proto in protocols[:50]:
+                proto.resetTimeout()
+        self.assertEqual(self.called, [])
+        self.clock.advance(1)
+        self.assertEqual(set(self.called), set(protocols[50:]))
+        self.assertEqual(len(self.clock.getDelayedCalls()), 1)
+        for proto in protocols[:50]:
+            proto.setTimeout(None)
+        self.assertEqual(self.clock.getDelayedCalls(), [])
+
+
+
 class LimitTotalConnectionsFactoryTestCase(unittest.TestCase):
     """Tests for policies.LimitTotalConnectionsFactory"""
     def testConnectionCounting(self):
@@ -797,6 +1140,208 @@ class LimitTotalConnectionsFactoryTestCase(unittest.TestCase):
         self.assertEqual(0, factory.connectionCount)
 
 
+
+class FakePort(object):
+    """
+    A listening port which records whether it is accepting connections.
+
+    @ivar reading: C{True} unless C{stopReading} has been called more recently
+        than C{startReading}.
+    """
+    connected = True
+    reading = True
+
+    def startReading(self):
+        self.reading = True
+
+
+    def stopReading(self):
+        self.reading = False
+
+
+
+class BufferingTransport(StringTransport):
+    """
+    A L{StringTransport} reporting a given number of bytes as waiting to be
+    sent.
+    """
+    buffered = 0
+
+    def _bufferedLength(self):
+        return self.buffered
+
+
+
+class AdmissionControlFactoryTests(unittest.TestCase):
+    """
+    Tests for L{policies.AdmissionControlFactory}.
+    """
+    def setUp(self):
+        self.clock = task.Clock()
+        self.port = FakePort()
+
+
+    def factory(self, **kwargs):
+        """
+        Create and start a L{policies.AdmissionControlFactory} probing the lag
+        every second, with L{FakePort} added.
+        """
+        factory = policies.AdmissionControlFactory(
+            Server(), probeInterval=1, clock=self.clock, **kwargs)
+        factory.doStart()
+        self.addCleanup(factory.doStop)
+        factory.addPort(self.port)
+        return factory
+
+
+    def connect(self, factory):
+        """
+        Build a protocol with C{factory} and connect it to a
+        L{BufferingTransport}.
+        """
+        p = factory.buildProtocol(None)
+        p.makeConnection(BufferingTransport())
+        return p
+
+
+    def test_lag(self):
+        """
+        Once the reactor runs timed calls more than C{maxLag} seconds late,
+        the ports stop accepting connections and connections accepted anyway
+        are closed.
+        """
+        factory = self.factory(maxLag=0.5)
+        self.clock.advance(1.5)
+        self.assertEqual(factory.lag, 0.5)
+        self.assertFalse(factory.overloaded)
+        self.assertIsNot(factory.buildProtocol(None), None)
+        self.clock.advance(1.6)
+        self.assertAlmostEqual(factory.lag, 0.6)
+        self.assertTrue(factory.overloaded)
+        self.assertFalse(self.port.reading)
+        self.assertIs(factory.buildProtocol(None), None)
+        self.assertEqual(factory.rejected, 1)
+
+
+    def test_resume(self):
+        """
+        Connections are admitted again once the lag is back at or below
+        C{resumeRatio} times C{maxLag}.
+        """
+        factory = self.factory(maxLag=0.5, resumeRatio=0.5)
+        self.clock.advance(1.6)
+        self.assertTrue(factory.overloaded)
+        self.clock.advance(1.3)
+        self.assertTrue(factory.overloaded)
+        self.clock.advance(1.25)
+        self.assertFalse(factory.overloaded)
+        self.assertTrue(self.port.reading)
+        self.assertIsNot(factory.buildProtocol(None), None)
+
+
+    def test_maxConnections(self):
+        """
+        Once C{maxConnections} connections are open, the ports stop accepting
+        connections, and new connections are turned away until enough of
+        them are closed.
+        """
+        factory = self.factory(maxConnections=2, resumeRatio=0.5)
+        first = self.connect(factory)
+        self.assertFalse(factory.overloaded)
+        second = self.connect(factory)
+        self.assertTrue(factory.overloaded)
+        self.assertFalse(self.port.reading)
+        self.assertIs(factory.buildProtocol(None), None)
+        first.connectionLost(None)
+        self.assertTrue(factory.overloaded)
+        second.connectionLost(None)
+        self.assertFalse(factory.overloaded)
+        self.assertTrue(self.port.reading)
+
+
+    def test_maxBuffered(self):
+        """
+        Once more than C{maxBuffered} bytes are waiting to be sent on the
+        connections, new connections are turned away.
+        """
+        factory = self.factory(maxBuffered=100)
+        first = self.connect(factory)
+        second = self.connect(factory)
+        first.transport.buffered = 60
+        second.transport.buffered = 40
+        self.clock.advance(1)
+        self.assertEqual(factory.bufferedBytes(), 100)
+        self.assertFalse(factory.overloaded)
+        second.transport.buffered = 41
+        self.clock.advance(1)
+        self.assertTrue(factory.overloaded)
+        first.transport.buffered = 0
+        self.clock.advance(1)
+        self.assertFalse(factory.overloaded)
+
+
+    def test_rejectProtocol(self):
+        """
+        While overloaded, connections accepted anyway are given a
+        C{rejectProtocol}, which is not counted as an open connection.
+        """
+        factory = self.factory(
+            maxConnections=1, rejectProtocol=protocol.Protocol)
+        self.connect(factory)
+        rejection = factory.buildProtocol(None)
+        self.assertIsInstance(rejection, protocol.Protocol)
+        self.assertIs(rejection.factory, factory)
+        self.assertEqual(len(factory.protocols), 1)
+
+
+    def test_addPortWhileOverloaded(self):
+        """
+        A port added while the server is overloaded stops accepting
+        connections immediately.
+        """
+        factory = self.factory(maxConnections=1)
+        self.connect(factory)
+        factory.buildProtocol(None)
+        port = FakePort()
+        factory.addPort(port)
+        self.assertFalse(port.reading)
+
+
+    def test_stoppedPortNotResumed(self):
+        """
+        A port which has stopped listening does not start accepting
+        connections again when the server is no longer overloaded.
+        """
+        factory = self.factory(maxConnections=1, resumeRatio=1)
+        p = self.connect(factory)
+        factory.buildProtocol(None)
+        self.port.connected = False
+        p.connectionLost(None)
+        self.assertFalse(factory.overloaded)
+        self.assertFalse(self.port.reading)
+
+
+    def test_stopFactory(self):
+        """
+        The lag is no longer probed once the factory has stopped.
+        """
+        factory = self.factory(maxLag=1)
+        self.assertEqual(len(self.clock.getDelayedCalls()), 1)
+        factory.doStop()
+        self.assertEqual(self.clock.getDelayedCalls(), [])
+
+
+    def test_invalidResumeRatio(self):
+        """
+        L{policies.AdmissionControlFactory} raises L{ValueError} if
+        C{resumeRatio} is not between 0 and 1.
+        """
+        self.assertRaises(
+            ValueError, policies.AdmissionControlFactory, Server(),
+            resumeRatio=1.5)
+
+
+
 class WriteSequenceEchoProtocol(EchoProtocol):
     def dataReceived(self, bytes):
         if bytes.find(b'vector!') != -1:
@@ -1688,6 +1688,8 @@ class MockProcessTestCase(unittest.TestCase):
         self.patch(process.Process, "processReaderFactory", DumbProcessReader)
         self.patch(process.Process, "processWriterFactory", DumbProcessWriter)
         self.patch(process, "pty", self.mockos)
+        # Closing ranges of descriptors would bypass the fake os module.
+        self.patch(process, "closeRange", None)
 
         self.mocksig = MockSignal()
         self.patch(process, "signal", self.mocksig)
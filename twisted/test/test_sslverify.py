@@ -1113,6 +1113,220 @@ class OpenSSLOptions(unittest.TestCase):
 
 
 
+class SessionCacheTests(unittest.SynchronousTestCase):
+    """
+    Tests for L{sslverify.OpenSSLSessionCache} and the session options of
+    L{sslverify.OpenSSLCertificateOptions} and L{sslverify.optionsForClientTLS}.
+    """
+    if skipSSL:
+        skip = skipSSL
+
+    def setUp(self):
+        pem = FilePath(__file__).sibling("server.pem").getContent()
+        self.serverCertificate = sslverify.PrivateCertificate.loadPEM(pem)
+        self.trustRoot = sslverify.Certificate.loadPEM(pem)
+        self.serverCache = sslverify.OpenSSLSessionCache()
+        self.serverOptions = sslverify.OpenSSLCertificateOptions(
+            privateKey=self.serverCertificate.privateKey.original,
+            certificate=self.serverCertificate.original,
+            sessionCache=self.serverCache)
+        self.cache = sslverify.OpenSSLSessionCache()
+
+
+    def connect(self, port=443, trustRoot=None, clientCertificate=None):
+        """
+        Connect a client using C{self.cache} to a server using
+        C{self.serverOptions}, complete the handshake and close the
+        connection.
+
+        @param port: The port to tell the client it is connecting to.
+
+        @param trustRoot: The client's trust root, C{self.trustRoot} by
+            default.
+
+        @param clientCertificate: The certificate the client authenticates
+            with, if any.
+
+        @return: The client's L{TLSMemoryBIOProtocol}.
+        """
+        if trustRoot is None:
+            trustRoot = self.trustRoot
+        clientOptions = sslverify.optionsForClientTLS(
+            u"localhost", trustRoot=trustRoot,
+            clientCertificate=clientCertificate, sessionCache=self.cache,
+            port=port)
+        clientFactory = TLSMemoryBIOFactory(
+            clientOptions, isClient=True,
+            wrappedFactory=protocol.Factory.forProtocol(protocol.Protocol))
+        serverFactory = TLSMemoryBIOFactory(
+            self.serverOptions, isClient=False,
+            wrappedFactory=protocol.Factory.forProtocol(protocol.Protocol))
+        sProto, cProto, pump = connectedServerAndClient(
+            lambda: serverFactory.buildProtocol(None),
+            lambda: clientFactory.buildProtocol(None))
+        pump.flush()
+        cProto.loseConnection()
+        pump.flush()
+        return cProto
+
+
+    def test_clientResumesSession(self):
+        """
+        A client given a session cache by L{sslverify.optionsForClientTLS}
+        resumes the session it established with a server when it connects to
+        the same host name and port again, and the handshakes are counted as
+        hits and misses on both sides.
+        """
+        self.connect()
+        self.assertEqual((self.cache.hits, self.cache.misses), (0, 1))
+        self.assertEqual(
+            (self.serverCache.hits, self.serverCache.misses), (0, 1))
+        self.connect()
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+        self.assertEqual(
+            (self.serverCache.hits, self.serverCache.misses), (1, 1))
+
+
+    def test_keyedByPort(self):
+        """
+        A session established with a server on one port is not offered to a
+        server on another port of the same host.
+        """
+        self.connect(port=443)
+        self.connect(port=8443)
+        self.assertEqual((self.cache.hits, self.cache.misses), (0, 2))
+        self.assertEqual(
+            sorted(key[:2] for key in self.cache._sessions),
+            [(u"localhost", 443), (u"localhost", 8443)])
+
+
+    def test_keyedByTrustRoot(self):
+        """
+        A session established with a server under one trust root is not
+        offered to it under another, since resuming it would skip verifying
+        the server's certificate against the other trust root.
+        """
+        otherTrustRoot = sslverify.OpenSSLCertificateAuthorities([
+            self.trustRoot.original,
+            sslverify.Certificate.loadPEM(A_PEER_CERTIFICATE_PEM).original])
+        self.connect()
+        self.connect(trustRoot=otherTrustRoot)
+        self.assertEqual((self.cache.hits, self.cache.misses), (0, 2))
+        self.assertEqual(
+            (self.serverCache.hits, self.serverCache.misses), (0, 2))
+        self.assertEqual(len(self.cache._sessions), 2)
+
+
+    def test_keyedByClientCertificate(self):
+        """
+        A session established with a server by a client authenticating with
+        one certificate is not offered to it by a client with no certificate.
+        """
+        self.connect(clientCertificate=self.serverCertificate)
+        self.connect()
+        self.assertEqual((self.cache.hits, self.cache.misses), (0, 2))
+        self.assertEqual(
+            (self.serverCache.hits, self.serverCache.misses), (0, 2))
+
+
+    def test_withoutCache(self):
+        """
+        Without a session cache, L{sslverify.optionsForClientTLS} makes
+        clients which do a full handshake every time.
+        """
+        self.cache = None
+        self.connect()
+        self.connect()
+        self.assertEqual(
+            (self.serverCache.hits, self.serverCache.misses), (0, 2))
+
+
+    def test_sessionsUnsupported(self):
+        """
+        If pyOpenSSL is too old to resume sessions,
+        L{sslverify.optionsForClientTLS} ignores the session cache it is given
+        and makes clients which do a full handshake every time.
+        """
+        self.patch(sslverify, "_sessionsSupported", False)
+        creator = sslverify.optionsForClientTLS(
+            u"localhost", trustRoot=self.trustRoot, sessionCache=self.cache)
+        self.assertIs(creator._sessionCache, None)
+        self.connect()
+        self.connect()
+        self.assertEqual((self.cache.hits, self.cache.misses), (0, 0))
+        self.assertEqual(len(self.cache._sessions), 0)
+        self.assertEqual(
+            (self.serverCache.hits, self.serverCache.misses), (0, 2))
+
+
+    def test_leastRecentlyUsedDiscarded(self):
+        """
+        When L{sslverify.OpenSSLSessionCache} has more than C{maxSessions}
+        sessions, the least recently used are discarded.
+        """
+        cache = sslverify.OpenSSLSessionCache(maxSessions=2)
+        a, b, c = object(), object(), object()
+        cache._storeSession("a", a)
+        cache._storeSession("b", b)
+        self.assertIs(cache._sessionFor("a"), a)
+        cache._storeSession("c", c)
+        self.assertIs(cache._sessionFor("a"), a)
+        self.assertIs(cache._sessionFor("b"), None)
+        self.assertIs(cache._sessionFor("c"), c)
+
+
+    def test_storeNoneForgets(self):
+        """
+        Storing L{None} as the session for a key forgets any session stored
+        for it.
+        """
+        cache = sslverify.OpenSSLSessionCache()
+        cache._storeSession("a", object())
+        cache._storeSession("a", None)
+        self.assertIs(cache._sessionFor("a"), None)
+        self.assertEqual(len(cache._sessions), 0)
+
+
+    def test_sessionTimeout(self):
+        """
+        The C{sessionTimeout} of L{sslverify.OpenSSLCertificateOptions} is set
+        on the contexts it makes.
+        """
+        opts = sslverify.OpenSSLCertificateOptions(sessionTimeout=17)
+        self.assertEqual(opts.getContext().get_timeout(), 17)
+
+
+    def test_ticketKeyLifetimeRequiresTickets(self):
+        """
+        L{sslverify.OpenSSLCertificateOptions} raises L{ValueError} if given a
+        C{sessionTicketKeyLifetime} without C{enableSessionTickets}.
+        """
+        self.assertRaises(
+            ValueError, sslverify.OpenSSLCertificateOptions,
+            sessionTicketKeyLifetime=10)
+
+
+    def test_ticketKeyRotation(self):
+        """
+        With a C{sessionTicketKeyLifetime},
+        L{sslverify.OpenSSLCertificateOptions.getContext} makes a new context,
+        and so new session ticket keys, once the current one is that old.
+        """
+        opts = sslverify.OpenSSLCertificateOptions(
+            enableSessionTickets=True, sessionTicketKeyLifetime=10)
+        now = [100.0]
+        opts._now = lambda: now[0]
+        first = opts.getContext()
+        now[0] = 109.0
+        self.assertIs(opts.getContext(), first)
+        now[0] = 110.0
+        second = opts.getContext()
+        self.assertIsNot(second, first)
+        now[0] = 119.0
+        self.assertIs(opts.getContext(), second)
+
+
+
 class DeprecationTests(unittest.SynchronousTestCase):
     """
     Tests for deprecation of L{sslverify.OpenSSLCertificateOptions}'s support
@@ -7,6 +7,8 @@ Tests for L{twisted.internet.task}.
 
 from __future__ import division, absolute_import
 
+from zope.interface.verify import verifyObject
+
 from twisted.trial import unittest
 
 from twisted.internet import interfaces, task, reactor, defer, error
@@ -704,6 +706,170 @@ class ReactorLoopTestCase(unittest.TestCase):
 
 
 
+class CoalescingClockTests(unittest.TestCase):
+    """
+    Tests for L{task.CoalescingClock}.
+    """
+
+    def setUp(self):
+        """
+        Create a L{task.CoalescingClock} with windows of a quarter of a second
+        over a L{task.Clock}.
+        """
+        self.clock = task.Clock()
+        self.coalescing = task.CoalescingClock(self.clock, 0.25)
+        self.events = []
+
+
+    def test_interface(self):
+        """
+        L{task.CoalescingClock} provides L{interfaces.IReactorTime}, and its
+        calls provide L{interfaces.IDelayedCall}.
+        """
+        self.assertTrue(verifyObject(interfaces.IReactorTime, self.coalescing))
+        call = self.coalescing.callLater(1, lambda: None)
+        self.assertTrue(verifyObject(interfaces.IDelayedCall, call))
+
+
+    def test_invalidSlack(self):
+        """
+        L{task.CoalescingClock} raises L{ValueError} if C{slack} is not
+        positive.
+        """
+        self.assertRaises(ValueError, task.CoalescingClock, self.clock, 0)
+
+
+    def test_seconds(self):
+        """
+        L{task.CoalescingClock.seconds} returns the time of the underlying
+        clock.
+        """
+        self.clock.advance(5)
+        self.assertEqual(self.coalescing.seconds(), 5)
+
+
+    def test_coalesce(self):
+        """
+        Calls falling due in the same window share one timed call on the
+        underlying clock, which runs them at the end of the window.
+        """
+        self.coalescing.callLater(1.1, self.events.append, "a")
+        self.coalescing.callLater(1.2, self.events.append, "b")
+        self.coalescing.callLater(1.3, self.events.append, "c")
+        self.assertEqual(
+            [call.getTime() for call in self.clock.getDelayedCalls()],
+            [1.25, 1.5])
+        self.assertEqual(len(self.coalescing.getDelayedCalls()), 3)
+        self.clock.advance(1.2)
+        self.assertEqual(self.events, [])
+        self.clock.advance(0.05)
+        self.assertEqual(sorted(self.events), ["a", "b"])
+        self.clock.advance(0.25)
+        self.assertEqual(self.events[2:], ["c"])
+        self.assertEqual(self.clock.getDelayedCalls(), [])
+        self.assertEqual(self.coalescing.getDelayedCalls(), [])
+
+
+    def test_cancel(self):
+        """
+        Cancelling a call stops it being run, and cancelling the last call of
+        a window cancels the timed call on the underlying clock.
+        """
+        a = self.coalescing.callLater(1, self.events.append, "a")
+        b = self.coalescing.callLater(1, self.events.append, "b")
+        a.cancel()
+        self.assertEqual(len(self.clock.getDelayedCalls()), 1)
+        b.cancel()
+        self.assertEqual(self.clock.getDelayedCalls(), [])
+        self.assertFalse(b.active())
+        self.assertRaises(error.AlreadyCancelled, b.cancel)
+
+
+    def test_resetEarlier(self):
+        """
+        A call reset to an earlier time moves to the window of that time.
+        """
+        call = self.coalescing.callLater(2, self.events.append, "a")
+        call.reset(0.5)
+        self.assertEqual(
+            [c.getTime() for c in self.clock.getDelayedCalls()], [0.5])
+        self.clock.advance(0.5)
+        self.assertEqual(self.events, ["a"])
+        self.assertRaises(error.AlreadyCalled, call.reset, 1)
+
+
+    def test_resetLater(self):
+        """
+        A call reset or delayed to a later time stays in its window until
+        that comes around, then moves to the window of its new time.
+        """
+        call = self.coalescing.callLater(0.5, self.events.append, "a")
+        call.reset(1)
+        call.delay(0.5)
+        self.assertEqual(call.getTime(), 1.5)
+        self.clock.advance(0.5)
+        self.assertEqual(self.events, [])
+        self.assertEqual(
+            [c.getTime() for c in self.clock.getDelayedCalls()], [1.5])
+        self.clock.advance(1)
+        self.assertEqual(self.events, ["a"])
+
+
+    def test_cancelFromBatch(self):
+        """
+        A call cancelled by another call of the same window is not run.
+        """
+        calls = []
+        def cancelOther():
+            self.events.append(None)
+            for call in calls:
+                if call.active():
+                    call.cancel()
+        calls.append(self.coalescing.callLater(1, cancelOther))
+        calls.append(self.coalescing.callLater(1, cancelOther))
+        self.clock.advance(1)
+        self.assertEqual(self.events, [None])
+
+
+    def test_error(self):
+        """
+        An exception raised by a call is logged, and the other calls of the
+        window are still run.
+        """
+        self.coalescing.callLater(1, lambda: 1 // 0)
+        self.coalescing.callLater(1, self.events.append, "a")
+        self.clock.advance(1)
+        self.assertEqual(self.events, ["a"])
+        self.assertEqual(len(self.flushLoggedErrors(ZeroDivisionError)), 1)
+
+
+    def test_loopingCalls(self):
+        """
+        L{task.LoopingCall}s using a L{task.CoalescingClock} with the same
+        interval, started within one window of each other, share a timed
+        call on the underlying clock and keep their interval.
+        """
+        loops = []
+        for i in range(3):
+            self.clock.advance(0.05)
+            loop = task.LoopingCall(self.events.append, i)
+            loop.clock = self.coalescing
+            loop.start(1, now=False)
+            loops.append(loop)
+        self.assertEqual(len(self.clock.getDelayedCalls()), 1)
+        self.clock.advance(1.2 - self.clock.seconds())
+        self.assertEqual(self.events, [])
+        self.clock.advance(1.25 - self.clock.seconds())
+        self.assertEqual(sorted(self.events), [0, 1, 2])
+        self.assertEqual(len(self.clock.getDelayedCalls()), 1)
+        self.clock.advance(1)
+        self.assertEqual(sorted(self.events), [0, 0, 1, 1, 2, 2])
+        for loop in loops:
+            loop.stop()
+        self.assertEqual(self.clock.getDelayedCalls(), [])
+
+
+
 class DeferLaterTests(unittest.TestCase):
     """
     Tests for L{task.deferLater}.
@@ -556,6 +556,211 @@ class ThreadPoolTestCase(unittest.SynchronousTestCase):
 
 
 
+class FakeThread(object):
+    """
+    A thread which is never started, for counting the workers a
+    L{threadpool.ThreadPool} creates.
+    """
+    def __init__(self, target, name):
+        self.target = target
+        self.name = name
+
+
+    def start(self):
+        pass
+
+
+
+class BoundedThreadPoolTests(unittest.SynchronousTestCase):
+    """
+    Tests for the queue limit, latency-based sizing and statistics of
+    L{threadpool.ThreadPool}.
+    """
+
+    def getTimeout(self):
+        """
+        Return number of seconds to wait before giving up.
+        """
+        return 5
+
+
+    def test_full(self):
+        """
+        Once C{maxQueued} calls are queued, L{threadpool.ThreadPool.full}
+        returns C{True} and L{threadpool.ThreadPool.callInThreadWithCallback}
+        raises L{threadpool.ThreadPoolFull} and counts the rejection.
+        """
+        pool = threadpool.ThreadPool(0, 1, maxQueued=2)
+        self.assertEqual(pool.maxQueued, 2)
+        self.assertFalse(pool.full())
+        pool.callInThread(lambda: None)
+        pool.callInThread(lambda: None)
+        self.assertTrue(pool.full())
+        self.assertRaises(threadpool.ThreadPoolFull,
+                          pool.callInThreadWithCallback, None, lambda: None)
+        statistics = pool.statistics()
+        self.assertEqual(statistics['queued'], 2)
+        self.assertEqual(statistics['maxQueued'], 2)
+        self.assertEqual(statistics['rejected'], 1)
+
+
+    def test_unbounded(self):
+        """
+        By default there is no limit on the number of queued calls.
+        """
+        pool = threadpool.ThreadPool(0, 1)
+        self.assertIdentical(pool.maxQueued, None)
+        for i in range(100):
+            pool.callInThread(lambda: None)
+        self.assertFalse(pool.full())
+
+
+    def test_callWhenNotFullImmediately(self):
+        """
+        L{threadpool.ThreadPool.callWhenNotFull} calls the callback
+        immediately if the queue has room.
+        """
+        pool = threadpool.ThreadPool(0, 1, maxQueued=1)
+        called = []
+        pool.callWhenNotFull(lambda: called.append(True))
+        self.assertEqual(called, [True])
+
+
+    def test_callWhenNotFull(self):
+        """
+        If the queue is full, the callback passed to
+        L{threadpool.ThreadPool.callWhenNotFull} is called when a worker
+        takes a call from it.
+        """
+        pool = threadpool.ThreadPool(0, 1, maxQueued=1)
+        pool.callInThread(lambda: None)
+        notFull = threading.Event()
+        pool.callWhenNotFull(notFull.set)
+        self.assertFalse(notFull.isSet())
+        pool.start()
+        self.addCleanup(pool.stop)
+        notFull.wait(self.getTimeout())
+        self.assertTrue(notFull.isSet())
+
+
+    def test_statistics(self):
+        """
+        L{threadpool.ThreadPool.statistics} reports how long completed calls
+        waited in the queue and ran for, measured with
+        L{threadpool.ThreadPool.seconds}.
+        """
+        times = [10.0, 13.0, 17.0]
+        pool = threadpool.ThreadPool(0, 1)
+        pool.seconds = lambda: times.pop(0)
+        done = threading.Event()
+        pool.callInThreadWithCallback(lambda success, result: done.set(),
+                                      lambda: None)
+        pool.start()
+        self.addCleanup(pool.stop)
+        done.wait(self.getTimeout())
+
+        statistics = pool.statistics()
+        self.assertEqual(statistics['completed'], 1)
+        self.assertEqual(statistics['waitTime'], 3.0)
+        self.assertEqual(statistics['maxWaitTime'], 3.0)
+        self.assertEqual(statistics['runTime'], 4.0)
+        self.assertEqual(statistics['queued'], 0)
+        self.assertEqual(statistics['threads'], 1)
+        self.assertEqual(statistics['busy'] + statistics['idle'], 1)
+
+
+    def test_growAfter(self):
+        """
+        If C{growAfter} is set, a thread beyond the first is only started
+        when the call at the head of the queue has waited longer than that.
+        """
+        now = [0.0]
+        pool = threadpool.ThreadPool(0, 3, growAfter=5)
+        pool.threadFactory = FakeThread
+        pool.seconds = lambda: now[0]
+        pool.start()
+
+        pool.callInThread(lambda: None)
+        self.assertEqual(pool.workers, 1)
+        pool.callInThread(lambda: None)
+        self.assertEqual(pool.workers, 1)
+        now[0] = 6.0
+        pool.callInThread(lambda: None)
+        self.assertEqual(pool.workers, 2)
+
+
+    def test_growAfterOnDequeue(self):
+        """
+        If C{growAfter} is set, another thread is also started when a call
+        is taken from the queue and the one behind it has waited longer than
+        that, so that the pool grows even when no more calls are queued.
+        """
+        now = [0.0]
+        pool = threadpool.ThreadPool(0, 3, growAfter=5)
+        pool.threadFactory = FakeThread
+        pool.seconds = lambda: now[0]
+        pool.start()
+
+        for i in range(3):
+            pool.callInThread(lambda: None)
+        self.assertEqual(pool.workers, 1)
+        now[0] = 6.0
+        self.assertIsNot(pool._nextCall(), threadpool.WorkerStop)
+        self.assertEqual(pool.workers, 2)
+
+
+    def test_idleThreadsStopped(self):
+        """
+        If C{growAfter} is set, a thread beyond C{min} which has waited that
+        long for a call stops, but the threads up to C{min} keep waiting.
+        """
+        pool = threadpool.ThreadPool(1, 3, growAfter=0.01)
+        pool.threadFactory = FakeThread
+        pool.start()
+        pool.startAWorker()
+        self.assertEqual(pool.workers, 2)
+        self.assertIs(pool._nextCall(), threadpool.WorkerStop)
+        self.assertEqual(pool.workers, 1)
+
+        result = []
+        waiter = threading.Thread(
+            target=lambda: result.append(pool._nextCall()))
+        waiter.start()
+        waiter.join(0.1)
+        self.assertEqual(result, [])
+        pool.q.put(threadpool.WorkerStop)
+        waiter.join(self.getTimeout())
+        self.assertEqual(result, [threadpool.WorkerStop])
+        self.assertEqual(pool.workers, 1)
+
+
+    def test_stopCallsNotFullCallbacks(self):
+        """
+        L{threadpool.ThreadPool.stop} calls the callbacks still waiting in
+        L{threadpool.ThreadPool.callWhenNotFull}, after setting C{joined}.
+        """
+        pool = threadpool.ThreadPool(0, 1, maxQueued=1)
+        pool.callInThread(lambda: None)
+        joined = []
+        pool.callWhenNotFull(lambda: joined.append(pool.joined))
+        self.assertEqual(joined, [])
+        pool.stop()
+        self.assertEqual(joined, [True])
+        pool.stop()
+        self.assertEqual(joined, [True])
+
+
+    def test_persistence(self):
+        """
+        The queue limit and C{growAfter} survive pickling.
+        """
+        pool = threadpool.ThreadPool(1, 2, maxQueued=10, growAfter=0.5)
+        copy = pickle.loads(pickle.dumps(pool))
+        self.assertEqual(copy.maxQueued, 10)
+        self.assertEqual(copy.growAfter, 0.5)
+
+
+
 class RaceConditionTestCase(unittest.SynchronousTestCase):
 
     def getTimeout(self):
@@ -328,6 +328,50 @@ class DeferToThreadPoolTestCase(unittest.TestCase):
 
 
 
+    def test_full(self):
+        """
+        L{threads.deferToThreadPool} returns a failed L{defer.Deferred} if
+        the threadpool's queue is full.
+        """
+        tp = threadpool.ThreadPool(0, 1, maxQueued=1)
+        tp.callInThread(lambda: None)
+        d = threads.deferToThreadPool(reactor, tp, lambda: None)
+        self.assertEqual(tp.statistics()['rejected'], 1)
+        return self.assertFailure(d, threadpool.ThreadPoolFull)
+
+
+    def test_whenReady(self):
+        """
+        L{threads.deferToThreadPoolWhenReady} waits for room in the
+        threadpool's queue instead of failing.
+        """
+        tp = threadpool.ThreadPool(0, 1, maxQueued=1)
+        first = threads.deferToThreadPoolWhenReady(reactor, tp, lambda: 1)
+        second = threads.deferToThreadPoolWhenReady(
+            reactor, tp, lambda x, y=0: x + y, 1, y=1)
+        self.assertEqual(tp.statistics()['queued'], 1)
+        tp.start()
+        self.addCleanup(tp.stop)
+        d = defer.gatherResults([first, second])
+        d.addCallback(self.assertEqual, [1, 2])
+        return d
+
+
+    def test_whenReadyStopped(self):
+        """
+        The L{defer.Deferred} returned by
+        L{threads.deferToThreadPoolWhenReady} while it waits for room in the
+        threadpool's queue fails with L{defer.CancelledError} if the
+        threadpool is stopped.
+        """
+        tp = threadpool.ThreadPool(0, 1, maxQueued=1)
+        threads.deferToThreadPoolWhenReady(reactor, tp, lambda: 1)
+        waiting = threads.deferToThreadPoolWhenReady(reactor, tp, lambda: 2)
+        tp.stop()
+        return self.assertFailure(waiting, defer.CancelledError)
+
+
+
 _callBeforeStartupProgram = """
 import time
 import %(reactor)s
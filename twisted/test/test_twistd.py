@@ -324,6 +324,30 @@ class ServerOptionsTest(unittest.TestCase):
         test_defaultUmask.skip = test_umask.skip = test_invalidUmask.skip = msg
 
 
+    def test_workers(self):
+        """
+        The value given for the C{workers} option is parsed as an integer,
+        and defaults to C{None}.
+        """
+        config = twistd.ServerOptions()
+        self.assertEqual(config['workers'], None)
+        config.parseOptions(['--workers', '4'])
+        self.assertEqual(config['workers'], 4)
+
+
+    def test_invalidWorkers(self):
+        """
+        If the value given for the C{workers} option is not a positive
+        integer, L{UsageError} is raised by L{ServerOptions.parseOptions}.
+        """
+        config = twistd.ServerOptions()
+        self.assertRaises(UsageError, config.parseOptions, ['--workers', '0'])
+        self.assertRaises(UsageError, config.parseOptions, ['--workers', 'x'])
+
+    if _twistd_unix is None:
+        test_workers.skip = test_invalidWorkers.skip = msg
+
+
     def test_unimportableConfiguredLogObserver(self):
         """
         C{--logger} with an unimportable module raises a L{UsageError}.
@@ -788,6 +812,90 @@ class UnixApplicationRunnerStartApplicationTests(unittest.TestCase):
 
 
 
+class UnixApplicationRunnerWorkersTests(unittest.TestCase):
+    """
+    Tests for L{UnixApplicationRunner} when the C{workers} option is given.
+    """
+    if _twistd_unix is None:
+        skip = "twistd unix not available"
+
+    def test_workerArguments(self):
+        """
+        L{_twistd_unix._workerArguments} runs workers in the foreground,
+        logging to standard output and without a PID file, and otherwise
+        passes the arguments on without the C{workers} option.
+        """
+        self.assertEqual(
+            _twistd_unix._workerArguments(
+                ['--workers', '4', '--pidfile', 'x.pid', '--reactor=epoll',
+                 'web', '--port', 'tcp:8080:reusePort=1', '--workers=2'],
+                'web'),
+            ['--nodaemon', '--logfile=-', '--pidfile=', '--reactor=epoll',
+             'web', '--port', 'tcp:8080:reusePort=1', '--workers=2'])
+        self.assertEqual(
+            _twistd_unix._workerArguments(
+                ['--workers=4', '--pidfile=x.pid', '-y', 'app.tac'], None),
+            ['--nodaemon', '--logfile=-', '--pidfile=', '-y', 'app.tac'])
+
+
+    def test_createWorkerSupervisor(self):
+        """
+        L{UnixApplicationRunner.createOrGetApplication} creates an application
+        supervising as many worker processes as asked for, each running
+        twistd with the arguments computed by
+        L{_twistd_unix._workerArguments}, and which is not saved.
+        """
+        from twisted.runner.procmon import ProcessMonitor
+        self.addCleanup(
+            signal.signal, signal.SIGHUP, signal.getsignal(signal.SIGHUP))
+        self.patch(sys, 'argv', ['twistd', '--workers', '2', '-y', 'app.tac'])
+        options = twistd.ServerOptions()
+        options.parseOptions(sys.argv[1:])
+        runner = UnixApplicationRunner(options)
+
+        application = runner.createOrGetApplication()
+
+        self.assertTrue(options['no_save'])
+        monitor = list(service.IServiceCollection(application))[0]
+        self.assertIsInstance(monitor, ProcessMonitor)
+        arguments = [sys.executable, 'twistd', '--nodaemon', '--logfile=-',
+                     '--pidfile=', '-y', 'app.tac']
+        self.assertEqual(
+            sorted(monitor.processes.keys()), ['worker-1', 'worker-2'])
+        for name, (args, uid, gid, env) in monitor.processes.items():
+            self.assertEqual(args, arguments)
+            self.assertEqual(env, os.environ)
+
+
+    def test_startApplicationLeavesEnvironmentToWorkers(self):
+        """
+        When supervising workers, L{UnixApplicationRunner.startApplication}
+        neither changes the root and working directory nor sheds privileges,
+        since the workers do that themselves.
+        """
+        options = twistd.ServerOptions()
+        options.parseOptions([
+            '--workers', '2', '--chroot', '/foo/chroot',
+            '--rundir', '/foo/rundir', '--uid', '1234'])
+        runner = UnixApplicationRunner(options)
+
+        args = []
+        def fakeSetupEnvironment(self, chroot, rundir, nodaemon, umask,
+                                 pidfile):
+            args.extend((chroot, rundir))
+        shed = []
+        self.patch(
+            UnixApplicationRunner, 'setupEnvironment', fakeSetupEnvironment)
+        self.patch(UnixApplicationRunner, 'shedPrivileges',
+                   lambda *a, **kw: shed.append(a))
+        self.patch(app, 'startApplication', lambda *a, **kw: None)
+        runner.startApplication(service.Application("test_workers"))
+
+        self.assertEqual(args, [None, '.'])
+        self.assertEqual(shed, [])
+
+
+
 class UnixApplicationRunnerRemovePID(unittest.TestCase):
     """
     Tests for L{UnixApplicationRunner.removePID}.
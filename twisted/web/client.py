@@ -766,7 +766,8 @@ except ImportError:
 else:
     from twisted.internet.ssl import (CertificateOptions,
                                       platformTrust,
-                                      optionsForClientTLS)
+                                      optionsForClientTLS,
+                                      SessionCache)
 
 
 def _requireSSL(decoratee):
@@ -846,9 +847,33 @@ class WebClientContextFactory(object):
 class BrowserLikePolicyForHTTPS(object):
     """
     SSL connection creator for web clients.
+
+    Like a browser, this resumes the TLS sessions it has established with a
+    server when it connects to that server again, which saves both ends the
+    work of a full handshake.
+
+    @ivar sessionCache: The cache of sessions to resume, whose C{hits} and
+        C{misses} count the handshakes which did and did not resume a
+        session.  L{None} if pyOpenSSL is not available, or is too old to
+        resume sessions.
+    @type sessionCache: L{twisted.internet.ssl.SessionCache}
     """
-    def __init__(self, trustRoot=None):
+    def __init__(self, trustRoot=None, sessionCache=None):
+        """
+        @param trustRoot: The C{trustRoot} to pass to
+            L{twisted.internet.ssl.optionsForClientTLS}.
+
+        @param sessionCache: The cache of sessions to resume.  By default, a
+            new cache is used if pyOpenSSL can resume sessions.  Policies
+            sharing a cache only resume each other's sessions if they have the
+            same C{trustRoot}.
+        @type sessionCache: L{twisted.internet.ssl.SessionCache}
+        """
         self._trustRoot = trustRoot
+        if (sessionCache is None and SSL is not None and
+                getattr(SSL.Connection, "set_session", None) is not None):
+            sessionCache = SessionCache()
+        self.sessionCache = sessionCache
 
 
     @_requireSSL
@@ -873,7 +898,9 @@ class BrowserLikePolicyForHTTPS(object):
             <twisted.internet.interfaces.IOpenSSLClientConnectionCreator>}
         """
         return optionsForClientTLS(hostname.decode("ascii"),
-                                   trustRoot=self._trustRoot)
+                                   trustRoot=self._trustRoot,
+                                   sessionCache=self.sessionCache,
+                                   port=port)
 
 
 
@@ -1993,6 +1993,9 @@ class HTTPFactory(protocol.ServerFactory):
 
     @ivar _reactor: An L{IReactorTime} provider used to compute logging
         timestamps.
+
+    @ivar timeoutClock: C{None}, or the L{IReactorTime} provider the channels
+        schedule their idle timeouts with instead of the reactor.
     """
 
     protocol = HTTPChannel
@@ -2001,18 +2004,27 @@ class HTTPFactory(protocol.ServerFactory):
 
     timeOut = 60 * 60 * 12
 
+    timeoutClock = None
+
     _reactor = reactor
 
-    def __init__(self, logPath=None, timeout=60*60*12, logFormatter=None):
+    def __init__(self, logPath=None, timeout=60*60*12, logFormatter=None,
+                 timeoutClock=None):
         """
         @param logFormatter: An object to format requests into log lines for
             the access log.
         @type logFormatter: L{IAccessLogFormatter} provider
+
+        @param timeoutClock: An L{IReactorTime} provider to schedule the idle
+            timeouts of the channels with, such as an
+            L{IdleTimeoutManager<twisted.protocols.policies.IdleTimeoutManager>}
+            shared by all of them, or C{None} to use the reactor.
         """
         if logPath is not None:
             logPath = os.path.abspath(logPath)
         self.logPath = logPath
         self.timeOut = timeout
+        self.timeoutClock = timeoutClock
         if logFormatter is None:
             logFormatter = combinedLogFormatter
         self._logFormatter = logFormatter
@@ -2035,6 +2047,8 @@ class HTTPFactory(protocol.ServerFactory):
         # timeOut needs to be on the Protocol instance cause
         # TimeoutMixin expects it there
         p.timeOut = self.timeOut
+        if self.timeoutClock is not None:
+            p.timeoutClock = self.timeoutClock
         return p
 
 
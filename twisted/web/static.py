@@ -23,7 +23,7 @@ from twisted.web import http
 from twisted.web.util import redirectTo
 
 from twisted.python import components, filepath, log
-from twisted.internet import abstract, interfaces
+from twisted.internet import abstract, interfaces, error
 from twisted.persisted import styles
 from twisted.python.util import InsensitiveDict
 from twisted.python.runtime import platformType
@@ -690,6 +690,76 @@ class StaticProducer(object):
         raise NotImplementedError(self.resumeProducing)
 
 
+    def _sendFileParts(self, parts):
+        """
+        Send the body of the response with the C{sendFile} method of the
+        request's transport, if it has one and the body is sent unchanged.
+
+        @param parts: A list of tuples C{(separator, offset, size)}.  For each
+            one, C{separator} is written to the request, then C{size} bytes of
+            the file starting at C{offset} (or the rest of the file, if
+            C{size} is C{None}) are sent.
+
+        @return: C{True} if the body is being sent, or C{False} if it has to be
+            produced by reading the file.
+        """
+        request = self.request
+        transport = getattr(request, 'transport', None)
+        if (request.method == 'HEAD' or
+                getattr(request, '_encoder', None) is not None or
+                not interfaces.ISendFileTransport.providedBy(transport)):
+            return False
+        try:
+            self.fileObject.fileno()
+        except (AttributeError, ValueError, IOError, OSError):
+            return False
+        # Write the status line and headers, to find out whether the body is
+        # going to be chunked.
+        request.write('')
+        if request.chunked:
+            return False
+        self._sendNextPart(None, iter(parts))
+        return True
+
+
+    def _sendNextPart(self, sent, parts):
+        """
+        Send the next part of the body, or finish the request if there are no
+        more.
+
+        @param sent: The number of bytes of the file sent for the previous
+            part, or C{None} if there was no previous part.
+
+        @param parts: An iterator over the remaining parts, as passed to
+            L{_sendFileParts}.
+        """
+        request = self.request
+        if request is None:
+            return
+        if sent is not None:
+            request.sentLength += sent
+        for separator, offset, size in parts:
+            if separator:
+                request.write(separator)
+            if size != 0:
+                sending = request.transport.sendFile(
+                    self.fileObject, offset, size)
+                sending.addCallbacks(self._sendNextPart, self._sendFailed,
+                                     callbackArgs=(parts,))
+                return
+        request.finish()
+        self.stopProducing()
+
+
+    def _sendFailed(self, reason):
+        """
+        Sending part of the file failed, and the connection has been closed.
+        """
+        if not reason.check(error.ConnectionLost):
+            log.err(reason, "Failed to send %r" % (self.fileObject,))
+        self.stopProducing()
+
+
     def stopProducing(self):
         """
         Stop producing data.
@@ -709,7 +779,8 @@ class NoRangeStaticProducer(StaticProducer):
     """
 
     def start(self):
-        self.request.registerProducer(self, False)
+        if not self._sendFileParts([('', self.fileObject.tell(), None)]):
+            self.request.registerProducer(self, False)
 
 
     def resumeProducing(self):
@@ -747,9 +818,10 @@ class SingleRangeStaticProducer(StaticProducer):
 
 
     def start(self):
-        self.fileObject.seek(self.offset)
         self.bytesWritten = 0
-        self.request.registerProducer(self, 0)
+        if not self._sendFileParts([('', self.offset, self.size)]):
+            self.fileObject.seek(self.offset)
+            self.request.registerProducer(self, 0)
 
 
     def resumeProducing(self):
@@ -791,6 +863,8 @@ class MultipleRangeStaticProducer(StaticProducer):
 
 
     def start(self):
+        if self._sendFileParts(self.rangeInfo):
+            return
         self.rangeIter = iter(self.rangeInfo)
         self._nextRange()
         self.request.registerProducer(self, 0)
@@ -1336,6 +1336,46 @@ class AgentHTTPSTests(TestCase, FakeReactorAndConnectMixin):
         self.assertIs(trustRoot.context, connection.get_context())
 
 
+    def test_sessionCache(self):
+        """
+        L{BrowserLikePolicyForHTTPS.creatorForNetloc} returns a creator which
+        resumes the sessions in the policy's C{sessionCache} established with
+        the given host name and port.  By default the policy has a new cache
+        of its own.
+        """
+        policy = BrowserLikePolicyForHTTPS()
+        self.assertIsInstance(policy.sessionCache, ssl.SessionCache)
+        self.assertIsNot(
+            policy.sessionCache, BrowserLikePolicyForHTTPS().sessionCache)
+        creator = policy.creatorForNetloc(b"thingy", 4321)
+        self.assertIs(creator._sessionCache, policy.sessionCache)
+        self.assertEqual(creator._sessionKey[:2], (u"thingy", 4321))
+
+
+    def test_sessionsUnsupported(self):
+        """
+        If pyOpenSSL is too old to resume sessions, L{BrowserLikePolicyForHTTPS}
+        has no C{sessionCache} by default.
+        """
+        class OldConnection(object):
+            pass
+        class OldSSL(object):
+            Connection = OldConnection
+        self.patch(client, "SSL", OldSSL)
+        self.assertIs(BrowserLikePolicyForHTTPS().sessionCache, None)
+
+
+    def test_sharedSessionCache(self):
+        """
+        L{BrowserLikePolicyForHTTPS} uses the C{sessionCache} it is given.
+        """
+        cache = ssl.SessionCache()
+        policy = BrowserLikePolicyForHTTPS(sessionCache=cache)
+        self.assertIs(policy.sessionCache, cache)
+        creator = policy.creatorForNetloc(b"thingy", 4321)
+        self.assertIs(creator._sessionCache, cache)
+
+
 
 class WebClientContextFactoryTests(TestCase):
     """
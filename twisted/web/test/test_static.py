@@ -11,9 +11,11 @@ import os
 import re
 import StringIO
 
+from zope.interface import implementer
 from zope.interface.verify import verifyObject
 
-from twisted.internet import abstract, interfaces
+from twisted.internet import abstract, interfaces, error
+from twisted.internet.defer import succeed, fail
 from twisted.python.runtime import platform
 from twisted.python.filepath import FilePath
 from twisted.python import log
@@ -912,6 +914,180 @@ class MultipleRangeStaticProducerTests(TestCase):
 
 
 
+@implementer(interfaces.ISendFileTransport)
+class SendFileTransport(object):
+    """
+    A fake L{interfaces.ISendFileTransport} which reads the parts of files it
+    is asked to send and writes them to a L{DummyRequest}.
+
+    @ivar calls: A C{list} of the C{(offset, count)} of each call to
+        C{sendFile}.
+
+    @ivar failure: An exception to fail C{sendFile} with, or C{None}.
+    """
+    failure = None
+
+    def __init__(self, request):
+        self.request = request
+        self.calls = []
+
+
+    def sendFile(self, fileObject, offset, count):
+        self.calls.append((offset, count))
+        if self.failure is not None:
+            return fail(self.failure)
+        fileObject.seek(offset)
+        if count is None:
+            data = fileObject.read()
+        else:
+            data = fileObject.read(count)
+        self.request.written.append(data)
+        return succeed(len(data))
+
+
+
+class SendFileRequest(DummyRequest):
+    """
+    A L{DummyRequest} with a transport which provides
+    L{interfaces.ISendFileTransport}.
+    """
+    chunked = False
+    sentLength = 0
+
+    def __init__(self, postpath):
+        DummyRequest.__init__(self, postpath)
+        self.transport = SendFileTransport(self)
+
+
+
+class StaticProducerSendFileTests(TestCase):
+    """
+    Tests for the use of L{interfaces.ISendFileTransport.sendFile} by the
+    L{StaticProducer} subclasses.
+    """
+
+    def test_noRange(self):
+        """
+        L{NoRangeStaticProducer.start} sends the whole file with the
+        transport's C{sendFile}, then finishes the request and closes the
+        file.
+        """
+        request = SendFileRequest([])
+        path = FilePath(self.mktemp())
+        path.setContent('abcdef')
+        fileObject = path.open()
+        self.addCleanup(fileObject.close)
+        producer = static.NoRangeStaticProducer(request, fileObject)
+        finished = request.finished
+        producer.start()
+        self.assertEqual(request.transport.calls, [(0, None)])
+        self.assertEqual('abcdef', ''.join(request.written))
+        self.assertEqual(request.sentLength, 6)
+        self.assertEqual(request.finished, finished + 1)
+        self.assertTrue(fileObject.closed)
+
+
+    def test_singleRange(self):
+        """
+        L{SingleRangeStaticProducer.start} sends the requested part of the
+        file with the transport's C{sendFile}.
+        """
+        request = SendFileRequest([])
+        path = FilePath(self.mktemp())
+        path.setContent('abcdef')
+        fileObject = path.open()
+        self.addCleanup(fileObject.close)
+        producer = static.SingleRangeStaticProducer(request, fileObject, 1, 3)
+        producer.start()
+        self.assertEqual(request.transport.calls, [(1, 3)])
+        self.assertEqual('bcd', ''.join(request.written))
+        self.assertEqual(request.sentLength, 3)
+
+
+    def test_multipleRanges(self):
+        """
+        L{MultipleRangeStaticProducer.start} writes each boundary and then
+        sends the corresponding part of the file with the transport's
+        C{sendFile}.
+        """
+        request = SendFileRequest([])
+        path = FilePath(self.mktemp())
+        path.setContent('abcdef')
+        fileObject = path.open()
+        self.addCleanup(fileObject.close)
+        producer = static.MultipleRangeStaticProducer(
+            request, fileObject,
+            [('1', 1, 3), ('2', 5, 1), ('3', 0, 0)])
+        producer.start()
+        self.assertEqual(request.transport.calls, [(1, 3), (5, 1)])
+        self.assertEqual('1bcd2f3', ''.join(request.written))
+
+
+    def test_withoutFileno(self):
+        """
+        A file object without a file descriptor is read and written to the
+        request instead of being sent with C{sendFile}.
+        """
+        request = SendFileRequest([])
+        producer = static.NoRangeStaticProducer(
+            request, StringIO.StringIO('abcdef'))
+        producer.start()
+        self.assertEqual(request.transport.calls, [])
+        self.assertEqual('abcdef', ''.join(request.written))
+
+
+    def test_chunked(self):
+        """
+        If the response is chunked, the file is read and written to the
+        request instead of being sent with C{sendFile}.
+        """
+        request = SendFileRequest([])
+        request.chunked = True
+        path = FilePath(self.mktemp())
+        path.setContent('abcdef')
+        fileObject = path.open()
+        self.addCleanup(fileObject.close)
+        producer = static.NoRangeStaticProducer(request, fileObject)
+        producer.start()
+        self.assertEqual(request.transport.calls, [])
+        self.assertEqual('abcdef', ''.join(request.written))
+
+
+    def test_head(self):
+        """
+        Nothing is sent with C{sendFile} in response to a I{HEAD} request.
+        """
+        request = SendFileRequest([])
+        request.method = 'HEAD'
+        path = FilePath(self.mktemp())
+        path.setContent('abcdef')
+        fileObject = path.open()
+        self.addCleanup(fileObject.close)
+        producer = static.NoRangeStaticProducer(request, fileObject)
+        producer.start()
+        self.assertEqual(request.transport.calls, [])
+
+
+    def test_connectionLost(self):
+        """
+        If C{sendFile} fails because the connection was lost, the file is
+        closed and the request is not finished.
+        """
+        request = SendFileRequest([])
+        request.transport.failure = error.ConnectionLost()
+        path = FilePath(self.mktemp())
+        path.setContent('abcdef')
+        fileObject = path.open()
+        self.addCleanup(fileObject.close)
+        producer = static.NoRangeStaticProducer(request, fileObject)
+        finished = request.finished
+        producer.start()
+        self.assertEqual(request.finished, finished)
+        self.assertTrue(fileObject.closed)
+        self.assertIdentical(producer.request, None)
+        self.assertEqual(self.flushLoggedErrors(), [])
+
+
 class RangeTests(TestCase):
     """
     Tests for I{Range-Header} support in L{twisted.web.static.File}.
@@ -84,6 +84,20 @@ class SiteTests(unittest.TestCase):
             sres2, "Got the wrong resource.")
 
 
+    def test_timeoutClock(self):
+        """
+        The channels built by a L{Site} given a C{timeoutClock} schedule
+        their timeouts with it.
+        """
+        clock = Clock()
+        site = server.Site(SimpleResource(), timeoutClock=clock)
+        channel = site.buildProtocol(IPv4Address("TCP", "127.0.0.1", 12345))
+        self.assertIs(channel.timeoutClock, clock)
+        channel.setTimeout(10)
+        self.assertEqual(len(clock.getDelayedCalls()), 1)
+        channel.setTimeout(None)
+
+
 
 class SessionTests(unittest.TestCase):
     """